@@ -0,0 +1,87 @@
+"""Per-request query count with and without the identity cache.
+
+Logs in as the administrator on the demo dataset and requests a few pages
+repeatedly, once with the identity cache disabled (``USER_CACHE_TTL=0``) and
+once with the default settings::
+
+    python benchmarks/bench_identity.py --repeat 50 --output bench-identity.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.utils.profiling import count_queries, percentile
+from gmao.utils.seed import populate_demo_data
+
+PAGES = ["/", "/aircrafts/", "/workshops/", "/personnel/", "/auth/users"]
+
+
+def measure(cache_ttl: Optional[int], repeat: int) -> Dict[str, Dict[str, float]]:
+    attributes = {"WTF_CSRF_ENABLED": False}
+    if cache_ttl is not None:
+        attributes["USER_CACHE_TTL"] = cache_ttl
+    app = create_app(type("IdentityBenchmarkConfig", (TestingConfig,), attributes))
+    with app.app_context():
+        populate_demo_data(reset=True, skip_if_exists=False)
+        engine = db.engine
+        db.session.remove()
+
+    # Requests run without an outer application context so that Flask-Login
+    # resolves the user from the session on every request, as in production.
+    client = app.test_client()
+    client.post("/auth/login", data={"username": "admin", "password": "admin123"})
+    results: Dict[str, Dict[str, float]] = {}
+    for page in PAGES:
+        client.get(page)
+        timings: List[float] = []
+        queries: List[int] = []
+        for _ in range(repeat):
+            with count_queries(engine) as counter:
+                started = time.perf_counter()
+                client.get(page)
+                timings.append((time.perf_counter() - started) * 1000.0)
+            queries.append(counter.count)
+        results[page] = {
+            "p50_ms": round(percentile(timings, 50), 3),
+            "queries": int(percentile(queries, 50)),
+        }
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+
+    report = {
+        "repeat": args.repeat,
+        "uncached": measure(0, args.repeat),
+        "cached": measure(None, args.repeat),
+    }
+    print(f"{'page':<14} {'queries':>15} {'p50 uncached':>13} {'p50 cached':>11}")
+    for page in PAGES:
+        before, after = report["uncached"][page], report["cached"][page]
+        print(
+            f"{page:<14} {before['queries']:>6} -> {after['queries']:<6} "
+            f"{before['p50_ms']:>11.2f}ms {after['p50_ms']:>9.2f}ms"
+        )
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
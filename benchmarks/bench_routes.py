@@ -0,0 +1,215 @@
+"""Route-level latency and query-count benchmark.
+
+Seeds a fleet-scale dataset, then drives every GET route of every blueprint
+through the Flask test client and records p50/p95 latency and the number of
+SQL statements per request. Results are written as JSON so that runs from
+different versions can be compared::
+
+    python benchmarks/bench_routes.py --aircraft 50 --materials 2000 --visits 500 \\
+        --output bench-routes.json --compare previous-bench-routes.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from flask import url_for
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.models import (
+    Aircraft,
+    JobCard,
+    JobCardAttachment,
+    MaintenanceTask,
+    MaintenanceVisit,
+    Material,
+    MaterialSerial,
+    User,
+    Workshop,
+)
+from gmao.utils.profiling import count_queries, percentile
+from gmao.utils.scale_data import populate_scale_data
+
+SKIPPED_ENDPOINTS = {"static", "auth.logout"}
+
+
+def build_app(database_uri: Optional[str]):
+    attributes = {"WTF_CSRF_ENABLED": False, "PROPAGATE_EXCEPTIONS": False}
+    if database_uri:
+        attributes["SQLALCHEMY_DATABASE_URI"] = database_uri
+    config = type("BenchmarkConfig", (TestingConfig,), attributes)
+    return create_app(config)
+
+
+def sample_arguments() -> Dict[str, int]:
+    """Pick one identifier per URL argument name used by the blueprints."""
+
+    candidates = {
+        "aircraft_id": Aircraft,
+        "material_id": Material,
+        "workshop_id": Workshop,
+        "visit_id": MaintenanceVisit,
+        "task_id": MaintenanceTask,
+        "card_id": JobCard,
+        "user_id": User,
+        "attachment_id": JobCardAttachment,
+        "serial_id": MaterialSerial,
+    }
+    arguments: Dict[str, int] = {}
+    for name, model in candidates.items():
+        identifier = db.session.query(model.id).order_by(model.id.desc()).limit(1).scalar()
+        if identifier is not None:
+            arguments[name] = identifier
+    return arguments
+
+
+def collect_routes(app, arguments: Dict[str, int]):
+    routes = []
+    skipped = []
+    for rule in sorted(app.url_map.iter_rules(), key=lambda item: item.endpoint):
+        if rule.endpoint in SKIPPED_ENDPOINTS or "GET" not in (rule.methods or set()):
+            continue
+        missing = [name for name in rule.arguments if name not in arguments]
+        if missing:
+            skipped.append({"endpoint": rule.endpoint, "reason": f"no sample for {', '.join(missing)}"})
+            continue
+        with app.test_request_context():
+            url = url_for(rule.endpoint, **{name: arguments[name] for name in rule.arguments})
+        routes.append((rule.endpoint, url))
+    return routes, skipped
+
+
+def run(app, repeat: int, warmup: int) -> Dict[str, object]:
+    client = app.test_client()
+    response = client.post("/auth/login", data={"username": "admin", "password": "admin123"})
+    if response.status_code not in (200, 302):
+        raise SystemExit(f"Login failed with status {response.status_code}")
+
+    with app.app_context():
+        arguments = sample_arguments()
+        engine = db.engine
+    routes, skipped = collect_routes(app, arguments)
+
+    results: List[Dict[str, object]] = []
+    for endpoint, url in routes:
+        for _ in range(warmup):
+            client.get(url)
+        timings: List[float] = []
+        queries: List[int] = []
+        status = None
+        for _ in range(repeat):
+            with count_queries(engine) as counter:
+                started = time.perf_counter()
+                response = client.get(url)
+                timings.append((time.perf_counter() - started) * 1000.0)
+            queries.append(counter.count)
+            status = response.status_code
+        results.append(
+            {
+                "endpoint": endpoint,
+                "url": url,
+                "status": status,
+                "p50_ms": round(percentile(timings, 50), 3),
+                "p95_ms": round(percentile(timings, 95), 3),
+                "mean_ms": round(sum(timings) / len(timings), 3),
+                "queries": int(percentile(queries, 50)),
+            }
+        )
+        print(f"{endpoint:<40} {status} p50={results[-1]['p50_ms']:>9.2f}ms "
+              f"p95={results[-1]['p95_ms']:>9.2f}ms queries={results[-1]['queries']}")
+    return {"routes": results, "skipped": skipped}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip() or None
+
+
+def compare(current: Dict[str, object], previous_path: Path) -> None:
+    previous = json.loads(previous_path.read_text(encoding="utf-8"))
+    previous_routes = {item["endpoint"]: item for item in previous.get("routes", [])}
+    print(f"\nComparison with {previous_path} (revision {previous.get('revision')})")
+    print(f"{'endpoint':<40} {'p50 before':>11} {'p50 after':>10} {'delta':>8} {'queries':>12}")
+    for item in current["routes"]:
+        before = previous_routes.get(item["endpoint"])
+        if before is None:
+            continue
+        delta = (item["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 if before["p50_ms"] else 0.0
+        print(
+            f"{item['endpoint']:<40} {before['p50_ms']:>9.2f}ms {item['p50_ms']:>8.2f}ms "
+            f"{delta:>+7.1f}% {before['queries']:>5} -> {item['queries']:<5}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--aircraft", type=int, default=50)
+    parser.add_argument("--materials", type=int, default=2000)
+    parser.add_argument("--visits", type=int, default=500)
+    parser.add_argument("--serials-per-material", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20, help="Timed requests per route.")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed requests per route.")
+    parser.add_argument("--database", help="SQLAlchemy URI (default: in-memory SQLite).")
+    parser.add_argument("--output", type=Path, default=Path("bench-routes.json"))
+    parser.add_argument("--compare", type=Path, help="Previous result file to compare against.")
+    args = parser.parse_args(argv)
+
+    app = build_app(args.database)
+    with app.app_context():
+        started = time.perf_counter()
+        counts = populate_scale_data(
+            aircraft=args.aircraft,
+            materials=args.materials,
+            visits=args.visits,
+            serials_per_material=args.serials_per_material,
+        )
+        seed_seconds = time.perf_counter() - started
+    print(f"Seeded {sum(counts.values())} rows in {seed_seconds:.2f}s")
+
+    report = {
+        "generated_at": datetime.utcnow().isoformat() + "Z",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "dataset": {
+            "aircraft": args.aircraft,
+            "materials": args.materials,
+            "visits": args.visits,
+            "serials_per_material": args.serials_per_material,
+            "rows": counts,
+            "seed_seconds": round(seed_seconds, 3),
+        },
+        "repeat": args.repeat,
+    }
+    report.update(run(app, args.repeat, args.warmup))
+
+    args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"Results written to {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
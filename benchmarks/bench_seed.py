@@ -0,0 +1,63 @@
+"""Timing comparison for the demo seeding routine.
+
+Runs ``populate_demo_data(reset=True)`` several times against a fresh
+in-memory database and reports wall time and the number of SQL statements::
+
+    python benchmarks/bench_seed.py --repeat 5 --output bench-seed.json
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.utils.profiling import count_queries, percentile
+from gmao.utils.seed import populate_demo_data
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args(argv)
+
+    app = create_app(TestingConfig)
+    timings: List[float] = []
+    statements: List[int] = []
+    with app.app_context():
+        for _ in range(args.repeat):
+            with count_queries(db.engine) as counter:
+                started = time.perf_counter()
+                populate_demo_data(reset=True, skip_if_exists=False)
+                timings.append((time.perf_counter() - started) * 1000.0)
+            statements.append(counter.count)
+            db.session.remove()
+
+    report = {
+        "repeat": args.repeat,
+        "p50_ms": round(percentile(timings, 50), 2),
+        "min_ms": round(min(timings), 2),
+        "max_ms": round(max(timings), 2),
+        "statements": statements[-1],
+    }
+    print(
+        f"populate_demo_data(reset=True): p50={report['p50_ms']:.1f}ms "
+        f"min={report['min_ms']:.1f}ms max={report['max_ms']:.1f}ms statements={report['statements']}"
+    )
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,8 +6,10 @@ from typing import Optional
 from flask import Flask
 from sqlalchemy import inspect, text
 
+from .archive.search import ensure_search_index
 from .config import BaseConfig
 from .extensions import db, login_manager
+from .materials.history import ensure_serial_history
 from .models import Role, Workshop, User
 
 
@@ -27,6 +29,8 @@ def create_app(config_class: Optional[type] = None) -> Flask:
     with app.app_context():
         apply_schema_upgrades()
         db.create_all()
+        ensure_search_index()
+        ensure_serial_history()
         ensure_seed_data()
 
     register_blueprints(app)
@@ -77,9 +81,33 @@ def register_blueprints(app: Flask) -> None:
 
 
 def register_cli(app: Flask) -> None:
+    from .analytics.forecasting import register_forecast_commands
+    from .analytics.visit_demand import register_visit_demand_commands
+    from .archive.importer import register_import_commands
+    from .archive.search import register_search_commands
+    from .dashboard.rollup import register_rollup_commands
+    from .maintenance.planner import register_planner_commands
+    from .materials.history import register_history_commands
+    from .materials.serials import register_serial_commands
+    from .materials.snapshots import register_snapshot_commands
+    from .utils.attachment_gc import register_gc_commands
+    from .utils.blobs import register_blob_commands
     from .utils.seed import register_seed_commands
+    from .workshops.reconcile import register_reconcile_commands
 
     register_seed_commands(app)
+    register_rollup_commands(app)
+    register_blob_commands(app)
+    register_gc_commands(app)
+    register_search_commands(app)
+    register_import_commands(app)
+    register_reconcile_commands(app)
+    register_serial_commands(app)
+    register_history_commands(app)
+    register_snapshot_commands(app)
+    register_forecast_commands(app)
+    register_visit_demand_commands(app)
+    register_planner_commands(app)
 
 
 def apply_schema_upgrades() -> None:
@@ -103,6 +131,23 @@ def apply_schema_upgrades() -> None:
         if "mime_type" not in columns:
             statements.append(text("ALTER TABLE job_card_attachments ADD COLUMN mime_type VARCHAR(120);"))
 
+        if "sha256" not in columns:
+            statements.append(text("ALTER TABLE job_card_attachments ADD COLUMN sha256 VARCHAR(64);"))
+            statements.append(
+                text("CREATE INDEX IF NOT EXISTS ix_job_card_attachments_sha256 ON job_card_attachments (sha256);")
+            )
+
+        if "size_bytes" not in columns:
+            statements.append(text("ALTER TABLE job_card_attachments ADD COLUMN size_bytes INTEGER;"))
+
+        if "blob_id" not in columns:
+            statements.append(
+                text("ALTER TABLE job_card_attachments ADD COLUMN blob_id INTEGER REFERENCES attachment_blobs(id);")
+            )
+            statements.append(
+                text("CREATE INDEX IF NOT EXISTS ix_job_card_attachments_blob_id ON job_card_attachments (blob_id);")
+            )
+
         for statement in statements:
             db.session.execute(statement)
             executed_any_statement = True
@@ -241,6 +286,17 @@ def apply_schema_upgrades() -> None:
             )
             executed_any_statement = True
 
+    if "personnel_statuses" in table_names:
+        indexes = {index["name"] for index in inspector.get_indexes("personnel_statuses")}
+        if "ix_personnel_statuses_latest" not in indexes:
+            db.session.execute(
+                text(
+                    "CREATE INDEX IF NOT EXISTS ix_personnel_statuses_latest "
+                    "ON personnel_statuses (personnel_id, start_date, id);"
+                )
+            )
+            executed_any_statement = True
+
     if executed_any_statement:
         db.session.commit()
 
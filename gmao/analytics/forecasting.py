@@ -0,0 +1,295 @@
+"""Demand forecasts for the whole catalog, with a backtest per material.
+
+Demand is read from the inventory snapshots: each drop of ``available``
+between two snapshots of a material is consumption, and rises are
+deliveries. The drops are summed into ``FORECAST_PERIOD_DAYS`` periods
+over the last ``FORECAST_HISTORY_PERIODS`` periods. This gives one demand
+matrix with a row per material and a column per period.
+
+Every model works on the whole matrix at once. Each returns, for every
+period, the forecast it would have made from the periods before, plus one
+more column for the next period:
+
+* ``moving_average``: mean of the last ``MOVING_AVERAGE_PERIODS`` periods;
+* ``ses``: simple exponential smoothing;
+* ``croston``: Croston's method, which smooths the size of the non-zero
+  demands and the interval between them separately. It fits spare parts
+  that are used only now and then.
+
+The backtest compares those one-step forecasts with the demand of the last
+``FORECAST_BACKTEST_PERIODS`` periods. The score is the root mean squared
+error, since the absolute error favours forecasting zero for intermittent
+demand. Each material keeps the model with the lowest error. Materials with
+fewer than two snapshots have no demand history. They keep the former
+Wilson estimate, based on their reserved quantity or annual consumption.
+"""
+from __future__ import annotations
+
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from math import sqrt
+from typing import Callable, Dict, List, Optional
+
+import click
+import numpy as np
+from flask import current_app
+from sqlalchemy import func, select, update
+
+from ..extensions import db
+from ..models import DemandPrediction, InventorySnapshot, Material
+from ..utils.bulk import bulk_insert
+
+MOVING_AVERAGE_PERIODS = 4
+SES_ALPHA = 0.3
+CROSTON_ALPHA = 0.1
+FALLBACK_MODEL = "wilson"
+MODEL_LABELS = {
+    "moving_average": "Moyenne mobile",
+    "ses": "Lissage exponentiel",
+    "croston": "Croston",
+    FALLBACK_MODEL: "Wilson",
+}
+
+
+def wilson_eoq(demand_rate: float, order_cost: float = 1.0, holding_cost: float = 0.5) -> float:
+    if demand_rate <= 0:
+        return 0
+    return sqrt((2 * demand_rate * order_cost) / holding_cost)
+
+
+def _starts(demand: np.ndarray, starts: Optional[np.ndarray]) -> np.ndarray:
+    return np.zeros(demand.shape[0], dtype=np.int64) if starts is None else starts
+
+
+def moving_average(
+    demand: np.ndarray, starts: Optional[np.ndarray] = None, periods: int = MOVING_AVERAGE_PERIODS
+) -> np.ndarray:
+    starts = _starts(demand, starts)
+    totals = np.concatenate([np.zeros((demand.shape[0], 1)), np.cumsum(demand, axis=1)], axis=1)
+    ends = np.broadcast_to(np.arange(demand.shape[1] + 1), totals.shape)
+    firsts = np.minimum(np.maximum(ends - periods, starts[:, None]), ends)
+    counts = ends - firsts
+    sums = np.take_along_axis(totals, ends, axis=1) - np.take_along_axis(totals, firsts, axis=1)
+    return np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+
+def ses(demand: np.ndarray, starts: Optional[np.ndarray] = None, alpha: float = SES_ALPHA) -> np.ndarray:
+    starts = _starts(demand, starts)
+    forecasts = np.zeros((demand.shape[0], demand.shape[1] + 1))
+    level = np.zeros(demand.shape[0])
+    for period in range(demand.shape[1]):
+        values = demand[:, period]
+        level = np.where(period == starts, values, np.where(period > starts, level + alpha * (values - level), 0))
+        forecasts[:, period + 1] = level
+    return forecasts
+
+
+def croston(demand: np.ndarray, starts: Optional[np.ndarray] = None, alpha: float = CROSTON_ALPHA) -> np.ndarray:
+    starts = _starts(demand, starts)
+    rows = demand.shape[0]
+    forecasts = np.zeros((rows, demand.shape[1] + 1))
+    size, interval = np.zeros(rows), np.ones(rows)
+    since, seen = np.ones(rows), np.zeros(rows, dtype=bool)
+    for period in range(demand.shape[1]):
+        forecasts[:, period] = np.where(seen, size / interval, 0)
+        values = demand[:, period]
+        hit = values > 0
+        # The first demand seeds the estimates, later ones are smoothed in.
+        size = np.where(hit, np.where(seen, size + alpha * (values - size), values), size)
+        interval = np.where(hit, np.where(seen, interval + alpha * (since - interval), since), interval)
+        # Intervals are counted from the first observed period.
+        since = np.where(hit | (period < starts), 1, since + 1)
+        seen |= hit
+    forecasts[:, -1] = np.where(seen, size / interval, 0)
+    return forecasts
+
+
+MODELS: Dict[str, Callable[..., np.ndarray]] = {
+    "moving_average": moving_average,
+    "ses": ses,
+    "croston": croston,
+}
+
+
+@dataclass
+class Backtest:
+    models: List[str]
+    # Rows follow ``models``, columns follow the materials.
+    errors: np.ndarray
+    next_period: np.ndarray
+
+    @property
+    def best(self) -> np.ndarray:
+        return np.argmin(self.errors, axis=0)
+
+
+def backtest(demand: np.ndarray, holdout: int, starts: Optional[np.ndarray] = None) -> Backtest:
+    """Score every model on the last ``holdout`` observed periods of ``demand``.
+
+    ``starts`` gives the first observed period of each row; the periods
+    before it are neither used nor scored.
+    """
+
+    starts = _starts(demand, starts)
+    periods = demand.shape[1]
+    holdout = max(0, min(holdout, periods - 1))
+    columns = np.arange(periods - holdout, periods)
+    # The first observed period of a row has no forecast to score.
+    scored = columns[None, :] > starts[:, None]
+    scored_counts = scored.sum(axis=1)
+    errors, next_period = [], []
+    for model in MODELS.values():
+        forecasts = model(demand, starts)
+        squared = np.where(scored, (forecasts[:, columns] - demand[:, columns]) ** 2, 0)
+        mean = np.divide(squared.sum(axis=1), scored_counts, out=np.zeros(demand.shape[0]), where=scored_counts > 0)
+        errors.append(np.sqrt(mean))
+        next_period.append(forecasts[:, -1])
+    return Backtest(models=list(MODELS), errors=np.array(errors), next_period=np.array(next_period))
+
+
+def demand_matrix(material_ids: List[int], today: date, period_days: int, periods: int) -> tuple:
+    """Consumption per material and period, ending with ``today``.
+
+    Also returns the snapshot count and the first period with a snapshot
+    (``periods`` when there is none) of each material.
+    """
+
+    rows = {material_id: row for row, material_id in enumerate(material_ids)}
+    end = datetime.combine(today + timedelta(days=1), datetime.min.time())
+    start = end - timedelta(days=period_days * periods)
+    snapshots = db.session.execute(
+        select(InventorySnapshot.material_id, InventorySnapshot.taken_at, InventorySnapshot.available)
+        .where(InventorySnapshot.taken_at >= start, InventorySnapshot.taken_at < end)
+        .order_by(InventorySnapshot.material_id, InventorySnapshot.taken_at, InventorySnapshot.id)
+    ).all()
+    demand = np.zeros((len(material_ids), periods))
+    counts = np.zeros(len(material_ids), dtype=np.int64)
+    starts = np.full(len(material_ids), periods, dtype=np.int64)
+    if not snapshots:
+        return demand, counts, starts
+    owners = np.array([rows.get(material_id, -1) for material_id, _, _ in snapshots], dtype=np.int64)
+    ages = np.array([(end - taken_at).total_seconds() for _, taken_at, _ in snapshots]) // 86400
+    levels = np.array([available or 0 for _, _, available in snapshots], dtype=np.float64)
+    columns = periods - 1 - (ages // period_days).astype(np.int64)
+    # Rows are sorted by material, so a drop is measured against the row before.
+    same = np.concatenate([[False], owners[1:] == owners[:-1]])
+    drops = np.where(same, np.maximum(np.concatenate([[0.0], levels[:-1]]) - levels, 0), 0)
+    known = owners >= 0
+    np.add.at(demand, (owners[known], columns[known]), drops[known])
+    np.add.at(counts, owners[known], 1)
+    np.minimum.at(starts, owners[known], columns[known])
+    return demand, counts, starts
+
+
+@dataclass
+class CatalogForecast:
+    material_ids: List[int]
+    models: List[str]
+    predicted_need: np.ndarray
+    errors: np.ndarray
+    last_snapshot: Dict[int, datetime] = field(default_factory=dict)
+    load_seconds: float = 0.0
+    score_seconds: float = 0.0
+
+    def model_counts(self) -> Dict[str, int]:
+        return dict(Counter(self.models))
+
+    def summary(self) -> str:
+        models = ", ".join(f"{MODEL_LABELS[name]} : {count}" for name, count in sorted(self.model_counts().items()))
+        return (
+            f"{len(self.material_ids)} matériel(s) prévus en {self.load_seconds + self.score_seconds:.2f}s "
+            f"(lecture {self.load_seconds:.2f}s, backtest {self.score_seconds:.2f}s) — {models}"
+        )
+
+
+def forecast_catalog(window_days: int, today: Optional[date] = None) -> CatalogForecast:
+    """Forecast the need of every material over the next ``window_days`` days."""
+
+    started = time.perf_counter()
+    today = today or date.today()
+    config = current_app.config
+    period_days = config["FORECAST_PERIOD_DAYS"]
+    materials = db.session.execute(select(Material.id, Material.annual_consumption).order_by(Material.id)).all()
+    material_ids = [material_id for material_id, _ in materials]
+    demand, counts, starts = demand_matrix(material_ids, today, period_days, config["FORECAST_HISTORY_PERIODS"])
+    rank = (
+        func.row_number()
+        .over(
+            partition_by=InventorySnapshot.material_id,
+            order_by=(InventorySnapshot.taken_at.desc(), InventorySnapshot.id.desc()),
+        )
+        .label("rank")
+    )
+    ranked = select(
+        InventorySnapshot.material_id,
+        InventorySnapshot.taken_at,
+        InventorySnapshot.reserved,
+        InventorySnapshot.consumption_window_days,
+        rank,
+    ).subquery()
+    latest = db.session.execute(
+        select(ranked.c.material_id, ranked.c.taken_at, ranked.c.reserved, ranked.c.consumption_window_days).where(
+            ranked.c.rank == 1
+        )
+    )
+    last = {material_id: (taken_at, reserved, days) for material_id, taken_at, reserved, days in latest}
+    loaded = time.perf_counter()
+
+    result = backtest(demand, config["FORECAST_BACKTEST_PERIODS"], starts)
+    best = result.best
+    picked = np.arange(len(material_ids))
+    need = result.next_period[best, picked] * window_days / period_days
+    errors = result.errors[best, picked]
+    models = [result.models[index] for index in best.tolist()]
+    for row, (material_id, annual_consumption) in enumerate(materials):
+        if counts[row] >= 2:
+            continue
+        _, reserved, days = last.get(material_id, (None, 0, 0))
+        rate = (reserved or 0) / days if days else (annual_consumption or 0) / 365
+        need[row] = wilson_eoq(rate * window_days, order_cost=1.5, holding_cost=0.7)
+        errors[row] = np.nan
+        models[row] = FALLBACK_MODEL
+    return CatalogForecast(
+        material_ids=material_ids,
+        models=models,
+        predicted_need=need,
+        errors=errors,
+        last_snapshot={material_id: values[0] for material_id, values in last.items()},
+        load_seconds=loaded - started,
+        score_seconds=time.perf_counter() - loaded,
+    )
+
+
+def save_predictions(forecast: CatalogForecast, window_days: int) -> None:
+    """Store the forecast as ``DemandPrediction`` rows, one per material and window; the caller commits."""
+
+    existing = dict(
+        db.session.execute(
+            select(DemandPrediction.material_id, DemandPrediction.id).where(DemandPrediction.window_days == window_days)
+        ).all()
+    )
+    now = datetime.utcnow()
+    updates, inserts = [], []
+    for material_id, model, need in zip(forecast.material_ids, forecast.models, forecast.predicted_need.tolist()):
+        row = {"predicted_need": need, "model": model, "created_at": now}
+        if material_id in existing:
+            updates.append(dict(row, id=existing[material_id]))
+        else:
+            inserts.append(dict(row, material_id=material_id, window_days=window_days))
+    if updates:
+        db.session.execute(update(DemandPrediction), updates)
+    bulk_insert(DemandPrediction, inserts)
+
+
+def register_forecast_commands(app):
+    @app.cli.command("forecast-demand")
+    @click.option("--window", type=int, default=30, show_default=True, help="Forecast window in days.")
+    def forecast_demand_command(window):
+        """Backtest the forecasting models and store the best prediction of every material."""
+
+        forecast = forecast_catalog(window)
+        save_predictions(forecast, window)
+        db.session.commit()
+        click.echo(forecast.summary())
@@ -1,47 +1,52 @@
-from math import sqrt
-from statistics import mean
-
-from flask import Blueprint, render_template, request
+from flask import Blueprint, jsonify, render_template, request
 from flask_login import login_required
 
 from ..extensions import db
-from ..models import DemandPrediction, InventorySnapshot, Material
+from ..models import Material
+from .forecasting import MODEL_LABELS, forecast_catalog, save_predictions
+from .visit_demand import MAX_VISIT_DEMAND_MONTHS, forecast_visit_parts
 
 bp = Blueprint("analytics", __name__, url_prefix="/analytics")
 
 
-def wilson_eoq(demand_rate: float, order_cost: float = 1.0, holding_cost: float = 0.5) -> float:
-    if demand_rate <= 0:
-        return 0
-    return sqrt((2 * demand_rate * order_cost) / holding_cost)
-
-
 @bp.route("/predictions")
 @login_required
 def predictions():
     window = request.args.get("window", type=int, default=30)
+    forecast = forecast_catalog(window)
+    save_predictions(forecast, window)
+    db.session.commit()
+
+    rows = {material_id: row for row, material_id in enumerate(forecast.material_ids)}
     materials = Material.query.order_by(Material.designation).all()
     results = []
     for material in materials:
-        snapshots = (
-            InventorySnapshot.query.filter_by(material_id=material.id)
-            .order_by(InventorySnapshot.taken_at.desc())
-            .limit(6)
-            .all()
+        row = rows.get(material.id)
+        if row is None:
+            continue
+        error = forecast.errors[row]
+        results.append(
+            (
+                material,
+                float(forecast.predicted_need[row]),
+                MODEL_LABELS[forecast.models[row]],
+                None if error != error else float(error),
+                forecast.last_snapshot.get(material.id),
+            )
         )
-        consumption_rates = []
-        for snapshot in snapshots:
-            if snapshot.consumption_window_days:
-                consumption_rates.append(snapshot.reserved / snapshot.consumption_window_days)
-        avg_rate = mean(consumption_rates) if consumption_rates else material.annual_consumption / 365 or 0
-        predicted_need = wilson_eoq(avg_rate * window, order_cost=1.5, holding_cost=0.7)
-        record = DemandPrediction.query.filter_by(material_id=material.id, window_days=window).first()
-        if record:
-            record.predicted_need = predicted_need
-        else:
-            record = DemandPrediction(material=material, window_days=window, predicted_need=predicted_need)
-            db.session.add(record)
-        results.append((material, predicted_need, snapshots))
+    return render_template(
+        "analytics/predictions.html",
+        results=results,
+        window=window,
+        forecast=forecast,
+        model_labels=MODEL_LABELS,
+    )
 
-    db.session.commit()
-    return render_template("analytics/predictions.html", results=results, window=window)
+
+@bp.route("/visit-demand")
+@login_required
+def visit_demand():
+    """Monthly parts need of the planned and projected package visits."""
+
+    months = min(max(request.args.get("months", 120, type=int), 1), MAX_VISIT_DEMAND_MONTHS)
+    return jsonify(forecast_visit_parts(months=months).as_dict())
@@ -0,0 +1,115 @@
+"""Parts needed by the upcoming package visits, per month.
+
+The planned and projected visits of :mod:`gmao.maintenance.schedule` are
+counted per month and package. Each package expands into the
+``JobCardMaterial`` quantities of its job cards and of the lighter
+packages' ones, so the monthly need is the
+product of the visit counts and the package parts matrix.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import click
+import numpy as np
+from sqlalchemy import func, select
+
+from ..extensions import db
+from ..maintenance.packages import JOB_CARD_PACKAGES
+from ..maintenance.schedule import PACKAGES, month_start, project_visits
+from ..models import JobCard, JobCardMaterial, Material
+
+MAX_VISIT_DEMAND_MONTHS = 240
+
+
+@dataclass
+class VisitPartsForecast:
+    months: List[date]
+    material_ids: List[int]
+    # Rows follow ``material_ids``, columns follow ``months``.
+    quantities: np.ndarray
+    # Rows follow ``months``, columns follow ``PACKAGES``.
+    visits: np.ndarray
+    seconds: float = 0.0
+
+    def totals(self) -> Dict[int, float]:
+        return dict(zip(self.material_ids, self.quantities.sum(axis=1).tolist()))
+
+    def as_dict(self) -> dict:
+        return {
+            "months": [month.strftime("%Y-%m") for month in self.months],
+            "packages": PACKAGES,
+            "visits": self.visits.tolist(),
+            "materials": [
+                {"id": material_id, "quantities": np.round(row, 2).tolist()}
+                for material_id, row in zip(self.material_ids, self.quantities)
+            ],
+            "seconds": round(self.seconds, 3),
+        }
+
+
+def package_parts() -> Tuple[List[int], np.ndarray]:
+    """Material ids and quantities needed by one visit of each package (rows follow ``PACKAGES``)."""
+
+    lines = db.session.execute(
+        select(JobCard.card_number, JobCardMaterial.material_id, func.sum(JobCardMaterial.quantity))
+        .join(JobCard, JobCard.id == JobCardMaterial.job_card_id)
+        .group_by(JobCard.card_number, JobCardMaterial.material_id)
+    ).all()
+    material_ids = sorted({material_id for _, material_id, _ in lines})
+    columns = {material_id: column for column, material_id in enumerate(material_ids)}
+    cards: Dict[str, List[Tuple[int, float]]] = {}
+    for card_number, material_id, quantity in lines:
+        cards.setdefault(card_number, []).append((columns[material_id], quantity or 0.0))
+    parts = np.zeros((len(PACKAGES), len(material_ids)))
+    codes: set = set()
+    for row, package in enumerate(PACKAGES):
+        # A package includes the job cards of the lighter ones, each card counted once.
+        codes.update(JOB_CARD_PACKAGES.get(package, []))
+        for code in codes:
+            for column, quantity in cards.get(code, ()):
+                parts[row, column] += quantity
+    return material_ids, parts
+
+
+def forecast_visit_parts(today: Optional[date] = None, months: int = 120) -> VisitPartsForecast:
+    """Monthly parts need of the fleet's visits from the month of ``today`` for ``months`` months."""
+
+    started = time.perf_counter()
+    visits = project_visits(today, months)
+    counts = visits.counts()
+    material_ids, parts = package_parts()
+    quantities = (counts @ parts).T
+    used = quantities.any(axis=1)
+    return VisitPartsForecast(
+        months=[month_start(visits.first_month + offset) for offset in range(months)],
+        material_ids=[material_id for material_id, keep in zip(material_ids, used) if keep],
+        quantities=quantities[used],
+        visits=counts,
+        seconds=time.perf_counter() - started,
+    )
+
+
+def register_visit_demand_commands(app):
+    @app.cli.command("forecast-visit-parts")
+    @click.option("--years", default=10, show_default=True, type=click.IntRange(1, MAX_VISIT_DEMAND_MONTHS // 12))
+    @click.option("--top", default=20, show_default=True, help="Number of materials listed.")
+    def forecast_visit_parts_command(years, top):
+        """Parts needed by the planned and projected package visits."""
+
+        forecast = forecast_visit_parts(months=years * 12)
+        click.echo(
+            f"{int(forecast.visits.sum())} visite(s) sur {years} an(s), "
+            f"{len(forecast.material_ids)} matériel(s) — calcul en {forecast.seconds:.2f}s"
+        )
+        totals = sorted(forecast.totals().items(), key=lambda item: -item[1])[:top]
+        names = dict(
+            db.session.execute(
+                select(Material.id, Material.designation).where(Material.id.in_([item[0] for item in totals]))
+            ).all()
+        )
+        for material_id, quantity in totals:
+            click.echo(f"{names.get(material_id, material_id)} : {quantity:g}")
@@ -0,0 +1,511 @@
+"""Bulk import of job cards with their paragraph/step/substep trees.
+
+Two layouts are accepted:
+
+* nested JSON: a list of cards, each with ``paragraphs``, ``steps`` (steps
+  outside any paragraph) and ``materials``. Paragraphs hold ``steps`` and
+  ``materials``, steps hold ``substeps`` and ``materials``. Substeps hold
+  ``materials``;
+* flat rows (CSV, XLSX or a JSON list of flat objects): one node per row,
+  with ``type`` set to ``card``, ``paragraph``, ``step``, ``substep`` or
+  ``material``. ``card_number`` places the row on its card, and the
+  ``paragraph``, ``step`` and ``substep`` numbers place it in the tree.
+  These numbers also give the display order. A material row is attached to
+  the deepest node it names.
+
+Node fields follow the model columns (``title``, ``description``,
+``estimated_minutes``…). ``workshop`` is a workshop name. ``material`` is a
+part number, or a designation when no part number matches.
+
+The whole bundle is validated before anything is written, then inserted
+level by level with multi-row ``INSERT`` statements in one transaction.
+With ``upsert`` an existing card number has its fields updated and its tree
+replaced. Otherwise existing numbers are reported as errors.
+"""
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import click
+from sqlalchemy import delete, select, update
+
+from ..extensions import db
+from ..models import (
+    JobCard,
+    JobCardMaterial,
+    JobCardParagraph,
+    JobCardStep,
+    JobCardSubstep,
+    Material,
+    Workshop,
+)
+from ..utils.bulk import bulk_insert, existing_ids, insert_with_ids
+
+NODE_TYPES = ("card", "paragraph", "step", "substep", "material")
+CARD_FIELDS = ("title", "revision", "summary", "content")
+MAX_REPORTED_ERRORS = 50
+
+
+class JobCardImportError(ValueError):
+    """Raised when a bundle cannot be imported; ``errors`` lists every problem."""
+
+    def __init__(self, errors: List[str]) -> None:
+        super().__init__("; ".join(errors[:5]))
+        self.errors = errors
+
+
+@dataclass
+class ImportResult:
+    cards_created: int = 0
+    cards_updated: int = 0
+    paragraphs: int = 0
+    steps: int = 0
+    substeps: int = 0
+    materials: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rows(self) -> int:
+        return (
+            self.cards_created + self.cards_updated + self.paragraphs + self.steps + self.substeps + self.materials
+        )
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.cards_created} job card(s) créée(s), {self.cards_updated} mise(s) à jour, "
+            f"{self.paragraphs} paragraphe(s), {self.steps} étape(s), {self.substeps} sous-étape(s), "
+            f"{self.materials} matériel(s) : {self.rows} ligne(s) en {self.elapsed:.2f}s "
+            f"({self.rows_per_second:.0f} lignes/s)"
+        )
+
+
+@dataclass
+class _Node:
+    values: dict
+    order: int
+    children: Dict[int, "_Node"] = field(default_factory=dict)
+    materials: List[dict] = field(default_factory=list)
+
+
+@dataclass
+class _Card:
+    card_number: str
+    values: dict = field(default_factory=dict)
+    paragraphs: Dict[int, _Node] = field(default_factory=dict)
+    steps: Dict[int, _Node] = field(default_factory=dict)
+    materials: List[dict] = field(default_factory=list)
+
+
+def _clean(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, float) and value != value:  # NaN from spreadsheets
+        return None
+    text = str(value).strip()
+    return text or None
+
+
+def _number(value, label: str, where: str, errors: List[str]) -> Optional[int]:
+    text = _clean(value)
+    if text is None:
+        return None
+    try:
+        number = int(float(text))
+    except ValueError:
+        errors.append(f"{where} : {label} « {text} » n'est pas un nombre.")
+        return None
+    return number
+
+
+def read_records(stream, filename: str) -> list:
+    """Read a bundle into a list of dicts, from its file extension."""
+
+    suffix = Path(filename or "").suffix.lower()
+    if suffix == ".json":
+        raw = stream.read()
+        try:
+            data = json.loads(raw.decode("utf-8-sig") if isinstance(raw, bytes) else raw)
+        except (UnicodeDecodeError, json.JSONDecodeError) as exc:
+            raise JobCardImportError([f"JSON invalide : {exc}"]) from exc
+        if isinstance(data, dict):
+            data = data.get("job_cards") or data.get("cards") or [data]
+        if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+            raise JobCardImportError(["Le JSON doit contenir une liste d'objets."])
+        return data
+
+    if suffix not in (".csv", ".xlsx", ".xlsm", ".xls"):
+        raise JobCardImportError(["Format non pris en charge : utilisez un fichier CSV, JSON ou XLSX."])
+
+    import pandas as pd
+
+    try:
+        if suffix == ".csv":
+            # sep=None sniffs the delimiter: French Excel exports use ";".
+            frame = pd.read_csv(stream, dtype=str, keep_default_na=False, sep=None, engine="python")
+        else:
+            frame = pd.read_excel(stream, dtype=str, keep_default_na=False)
+    except ImportError as exc:
+        message = f"Lecture Excel indisponible ({exc.name or exc}). Exportez le fichier en CSV."
+        raise JobCardImportError([message]) from exc
+    except (ValueError, pd.errors.ParserError) as exc:
+        raise JobCardImportError([f"Fichier illisible : {exc}"]) from exc
+    frame.columns = [str(column).strip().lower() for column in frame.columns]
+    return frame.to_dict("records")
+
+
+def _node_values(record: dict) -> dict:
+    return {
+        "title": _clean(record.get("title")),
+        "description": _clean(record.get("description")),
+        "workshop": _clean(record.get("workshop")),
+        "estimated_minutes": record.get("estimated_minutes"),
+    }
+
+
+def _material_values(record: dict) -> dict:
+    return {
+        "material": _clean(record.get("material")),
+        "quantity": record.get("quantity"),
+        "notes": _clean(record.get("notes")),
+    }
+
+
+def _parse_nested(records: list, errors: List[str]) -> Dict[str, _Card]:
+    cards: Dict[str, _Card] = {}
+
+    def children(items, where: str, level: str, depth: int) -> Dict[int, _Node]:
+        nodes: Dict[int, _Node] = {}
+        for position, item in enumerate(items or [], start=1):
+            if not isinstance(item, dict):
+                errors.append(f"{where} : {level} {position} n'est pas un objet.")
+                continue
+            order = _number(item.get("order_index"), "order_index", where, errors)
+            node = _Node(_node_values(item), position - 1 if order is None else order)
+            node.materials = [_material_values(material) for material in item.get("materials") or []]
+            if depth:
+                key, label = ("steps", "étape") if depth == 2 else ("substeps", "sous-étape")
+                node.children = children(item.get(key), f"{where}, {level} {position}", label, depth - 1)
+            nodes[position] = node
+        return nodes
+
+    for index, record in enumerate(records, start=1):
+        number = _clean(record.get("card_number"))
+        where = f"Carte {index}"
+        if number is None:
+            errors.append(f"{where} : numéro de carte manquant.")
+            continue
+        if number in cards:
+            errors.append(f"{where} : la carte {number} apparaît deux fois.")
+            continue
+        card = cards[number] = _Card(number, {name: _clean(record.get(name)) for name in CARD_FIELDS})
+        card.paragraphs = children(record.get("paragraphs"), number, "paragraphe", 2)
+        card.steps = children(record.get("steps"), number, "étape", 1)
+        card.materials = [_material_values(material) for material in record.get("materials") or []]
+    return cards
+
+
+def _parse_flat(records: list, errors: List[str]) -> Dict[str, _Card]:
+    cards: Dict[str, _Card] = {}
+    for index, record in enumerate(records, start=2):
+        where = f"Ligne {index}"
+        kind = (_clean(record.get("type")) or "").lower()
+        number = _clean(record.get("card_number"))
+        if kind not in NODE_TYPES:
+            errors.append(f"{where} : type « {kind} » inconnu ({', '.join(NODE_TYPES)}).")
+            continue
+        if number is None:
+            errors.append(f"{where} : numéro de carte manquant.")
+            continue
+        card = cards.setdefault(number, _Card(number))
+        if kind == "card":
+            if card.values:
+                errors.append(f"{where} : la carte {number} apparaît deux fois.")
+            card.values = {name: _clean(record.get(name)) for name in CARD_FIELDS}
+            continue
+
+        paragraph_no = _number(record.get("paragraph"), "paragraph", where, errors)
+        step_no = _number(record.get("step"), "step", where, errors)
+        substep_no = _number(record.get("substep"), "substep", where, errors)
+        required = {"paragraph": paragraph_no, "step": step_no, "substep": substep_no}
+        if kind in required and required[kind] is None:
+            errors.append(f"{where} : numéro de {kind} manquant.")
+            continue
+
+        paragraph = card.paragraphs.get(paragraph_no) if paragraph_no is not None else None
+        if paragraph_no is not None and paragraph is None and kind != "paragraph":
+            errors.append(f"{where} : paragraphe {paragraph_no} inconnu pour {number} (déclarez-le avant).")
+            continue
+        steps = paragraph.children if paragraph is not None else card.steps
+        step = steps.get(step_no) if step_no is not None else None
+        if step_no is not None and step is None and kind not in ("paragraph", "step"):
+            errors.append(f"{where} : étape {step_no} inconnue pour {number} (déclarez-la avant).")
+            continue
+
+        if kind == "paragraph":
+            card.paragraphs[paragraph_no] = _Node(_node_values(record), paragraph_no - 1)
+        elif kind == "step":
+            steps[step_no] = _Node(_node_values(record), step_no - 1)
+        elif kind == "substep":
+            step.children[substep_no] = _Node(_node_values(record), substep_no - 1)
+        else:
+            target = card
+            if substep_no is not None:
+                target = step.children.get(substep_no)
+                if target is None:
+                    errors.append(f"{where} : sous-étape {substep_no} inconnue pour {number}.")
+                    continue
+            elif step is not None:
+                target = step
+            elif paragraph is not None:
+                target = paragraph
+            target.materials.append(_material_values(record))
+    return cards
+
+
+def parse_bundle(records: list) -> Dict[str, _Card]:
+    errors: List[str] = []
+    nested = not any("type" in record for record in records)
+    cards = _parse_nested(records, errors) if nested else _parse_flat(records, errors)
+    if not cards and not errors:
+        errors.append("Aucune job card dans le fichier.")
+    if errors:
+        raise JobCardImportError(errors[:MAX_REPORTED_ERRORS])
+    return cards
+
+
+def _walk(cards: Iterable[_Card]):
+    """Yield ``(card, paragraph, step, substep)`` for every node, parents first."""
+
+    for card in cards:
+        for paragraph in card.paragraphs.values():
+            yield card, paragraph, None, None
+            for step in paragraph.children.values():
+                yield card, paragraph, step, None
+                for substep in step.children.values():
+                    yield card, paragraph, step, substep
+        for step in card.steps.values():
+            yield card, None, step, None
+            for substep in step.children.values():
+                yield card, None, step, substep
+
+
+def _lookup_materials(references: Iterable[str]) -> Dict[str, int]:
+    references = set(references)
+    if not references:
+        return {}
+    found: Dict[str, int] = {}
+    # Lowest id wins when several materials share a part number or designation.
+    for column in (Material.designation, Material.part_number):
+        for chunk in _chunks(sorted(references), 500):
+            rows = db.session.execute(
+                select(column, Material.id).where(column.in_(chunk)).order_by(Material.id.desc())
+            )
+            found.update(dict(rows.all()))
+    return found
+
+
+def _chunks(items: list, size: int):
+    for offset in range(0, len(items), size):
+        yield items[offset : offset + size]
+
+
+def _validate(cards: Dict[str, _Card], upsert: bool) -> Tuple[Dict[str, int], Dict[str, int], Dict[str, int]]:
+    errors: List[str] = []
+    existing = existing_ids(JobCard.card_number, cards)
+    if existing and not upsert:
+        listed = ", ".join(sorted(existing)[:10])
+        errors.append(f"{len(existing)} carte(s) existent déjà ({listed}) : activez la mise à jour.")
+
+    workshop_names = set()
+    material_refs = set()
+    for card in cards.values():
+        if card.card_number not in existing and not card.values.get("title"):
+            errors.append(f"{card.card_number} : titre obligatoire pour une nouvelle carte.")
+        material_refs.update(material["material"] for material in card.materials if material["material"])
+        if any(not material["material"] for material in card.materials):
+            errors.append(f"{card.card_number} : référence matériel manquante.")
+    for card, paragraph, step, substep in _walk(cards.values()):
+        node = substep or step or paragraph
+        where = f"{card.card_number}, {'sous-étape' if substep else 'étape' if step else 'paragraphe'}"
+        if node is paragraph and not node.values["title"]:
+            errors.append(f"{where} {node.order + 1} : titre obligatoire.")
+        if node is not paragraph and not (node.values["description"] or node.values["title"]):
+            errors.append(f"{where} {node.order + 1} : description obligatoire.")
+        if node.values["workshop"]:
+            workshop_names.add(node.values["workshop"])
+        material_refs.update(material["material"] for material in node.materials if material["material"])
+        if any(not material["material"] for material in node.materials):
+            errors.append(f"{where} {node.order + 1} : référence matériel manquante.")
+
+    workshops = existing_ids(Workshop.name, workshop_names)
+    for name in sorted(workshop_names - set(workshops)):
+        errors.append(f"Atelier inconnu : {name}.")
+    materials = _lookup_materials(material_refs)
+    for reference in sorted(material_refs - set(materials)):
+        errors.append(f"Matériel inconnu : {reference}.")
+    if errors:
+        raise JobCardImportError(errors[:MAX_REPORTED_ERRORS])
+    return existing, workshops, materials
+
+
+def _minutes(value) -> int:
+    text = _clean(value)
+    try:
+        return max(int(float(text)), 0) if text else 0
+    except ValueError:
+        return 0
+
+
+def _quantity(value) -> float:
+    text = _clean(value)
+    try:
+        return float(text.replace(",", ".")) if text else 1.0
+    except ValueError:
+        return 1.0
+
+
+def _replace_trees(card_ids: List[int]) -> None:
+    for chunk in _chunks(card_ids, 500):
+        for model in (JobCardMaterial, JobCardSubstep, JobCardStep, JobCardParagraph):
+            db.session.execute(delete(model).where(model.job_card_id.in_(chunk)))
+
+
+def import_job_cards(records: list, upsert: bool = False) -> ImportResult:
+    """Validate ``records`` and write every card in a single transaction.
+
+    Nothing is written when the bundle has errors. The caller commits.
+    """
+
+    started = time.perf_counter()
+    cards = parse_bundle(records)
+    existing, workshops, materials = _validate(cards, upsert)
+    result = ImportResult()
+
+    replaced = [existing[number] for number in cards if number in existing]
+    if replaced:
+        _replace_trees(replaced)
+    updates = [
+        {"id": existing[card.card_number], **{key: value for key, value in card.values.items() if value is not None}}
+        for card in cards.values()
+        if card.card_number in existing
+    ]
+    updates = [row for row in updates if len(row) > 1]
+    if updates:
+        db.session.execute(update(JobCard), updates)
+    result.cards_updated = len(replaced)
+
+    new_cards = [card for card in cards.values() if card.card_number not in existing]
+    new_ids = insert_with_ids(
+        JobCard, [{"card_number": card.card_number, **card.values} for card in new_cards]
+    )
+    card_ids = dict(existing)
+    card_ids.update({card.card_number: card_id for card, card_id in zip(new_cards, new_ids)})
+    result.cards_created = len(new_cards)
+
+    def node_row(card, node):
+        return {
+            "job_card_id": card_ids[card.card_number],
+            "order_index": node.order,
+            "workshop_id": workshops.get(node.values["workshop"]),
+            "estimated_minutes": _minutes(node.values["estimated_minutes"]),
+        }
+
+    nodes = list(_walk(cards.values()))
+    paragraph_nodes = [(card, paragraph) for card, paragraph, step, substep in nodes if step is None]
+    paragraph_ids = insert_with_ids(
+        JobCardParagraph,
+        [
+            dict(
+                node_row(card, paragraph),
+                title=paragraph.values["title"],
+                description=paragraph.values["description"],
+            )
+            for card, paragraph in paragraph_nodes
+        ],
+    )
+    ids = {id(paragraph): row_id for (_, paragraph), row_id in zip(paragraph_nodes, paragraph_ids)}
+
+    step_nodes = [(card, paragraph, step) for card, paragraph, step, substep in nodes if step and substep is None]
+    step_ids = insert_with_ids(
+        JobCardStep,
+        [
+            dict(
+                node_row(card, step),
+                paragraph_id=ids[id(paragraph)] if paragraph else None,
+                title=step.values["title"],
+                description=step.values["description"] or step.values["title"],
+            )
+            for card, paragraph, step in step_nodes
+        ],
+    )
+    ids.update({id(step): row_id for (_, _, step), row_id in zip(step_nodes, step_ids)})
+
+    substep_nodes = [(card, step, substep) for card, _, step, substep in nodes if substep]
+    substep_ids = insert_with_ids(
+        JobCardSubstep,
+        [
+            dict(
+                node_row(card, substep),
+                step_id=ids[id(step)],
+                description=substep.values["description"] or substep.values["title"],
+            )
+            for card, step, substep in substep_nodes
+        ],
+    )
+    ids.update({id(substep): row_id for (_, _, substep), row_id in zip(substep_nodes, substep_ids)})
+
+    material_rows = []
+    # Like the card page, a material hangs on one level only: its deepest owner.
+    owners = [(card, None, None, None, card) for card in cards.values()]
+    owners += [
+        (card, None if step else paragraph, None if substep else step, substep, substep or step or paragraph)
+        for card, paragraph, step, substep in nodes
+    ]
+    for card, paragraph, step, substep, owner in owners:
+        for material in owner.materials:
+            material_rows.append(
+                {
+                    "job_card_id": card_ids[card.card_number],
+                    "material_id": materials[material["material"]],
+                    "paragraph_id": ids[id(paragraph)] if paragraph else None,
+                    "step_id": ids[id(step)] if step else None,
+                    "substep_id": ids[id(substep)] if substep else None,
+                    "quantity": _quantity(material["quantity"]),
+                    "notes": material["notes"],
+                }
+            )
+    bulk_insert(JobCardMaterial, material_rows)
+
+    result.paragraphs = len(paragraph_ids)
+    result.steps = len(step_ids)
+    result.substeps = len(substep_ids)
+    result.materials = len(material_rows)
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def register_import_commands(app):
+    @app.cli.command("import-job-cards")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+    @click.option("--upsert", is_flag=True, help="Update cards whose number already exists and replace their tree.")
+    def import_job_cards_command(path, upsert):
+        """Import job cards from a CSV, JSON or XLSX bundle."""
+
+        try:
+            with path.open("rb") as stream:
+                result = import_job_cards(read_records(stream, path.name), upsert=upsert)
+        except JobCardImportError as exc:
+            db.session.rollback()
+            for error in exc.errors:
+                click.echo(error, err=True)
+            raise click.ClickException("Import annulé, aucune carte n'a été modifiée.") from exc
+        db.session.commit()
+        click.echo(result.summary())
@@ -0,0 +1,524 @@
+"""Plain-text extraction from PDF files, in pure Python.
+
+Only the standard library is used so extraction runs in any worker process
+without native dependencies. The extractor covers what scanned-then-OCRed
+and office-generated job cards contain:
+- the page tree, with inherited resources;
+- object streams and cross-reference streams;
+- ``FlateDecode`` and ``ASCIIHexDecode`` content;
+- text shown with ``Tj``, ``TJ``, ``'`` and ``"``, decoded through the font
+  ``ToUnicode`` map when there is one.
+
+Layout is approximated: text objects and line moves become line breaks and
+large ``TJ`` kerning becomes a space. Encrypted documents and image-only
+pages yield no text.
+"""
+from __future__ import annotations
+
+import re
+import zlib
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+MAX_PAGE_CHARS = 100_000
+# Decoded size above which a stream is rejected as a decompression bomb.
+MAX_STREAM_BYTES = 64 * 1024 * 1024
+
+_OBJECT_RE = re.compile(rb"(?<![0-9])(\d+)\s+(\d+)\s+obj\b")
+_STREAM_RE = re.compile(rb"stream\r?\n")
+_WHITESPACE = b" \t\r\n\f\x00"
+_DELIMITERS = b"()<>[]{}/%"
+
+
+class PdfError(ValueError):
+    """Raised when a file cannot be read as a PDF."""
+
+
+class Ref(tuple):
+    """Indirect reference ``n 0 R``."""
+
+    @property
+    def number(self) -> int:
+        return self[0]
+
+
+class Name(str):
+    """PDF name object, without the leading slash."""
+
+
+class Operator(str):
+    """Bare keyword of a content stream (``Tj``, ``BT``…)."""
+
+
+class Stream:
+    def __init__(self, attributes: dict, raw: bytes) -> None:
+        self.attributes = attributes
+        self.raw = raw
+
+
+PdfObject = Union[None, bool, int, float, bytes, Name, list, dict, Ref, Stream]
+
+
+class _Lexer:
+    def __init__(self, data: bytes, position: int = 0) -> None:
+        self.data = data
+        self.position = position
+
+    def _skip_space(self) -> None:
+        data = self.data
+        length = len(data)
+        while self.position < length:
+            char = data[self.position]
+            if char in _WHITESPACE:
+                self.position += 1
+            elif char == 0x25:  # comment
+                end = data.find(b"\n", self.position)
+                self.position = length if end < 0 else end + 1
+            else:
+                break
+
+    def token(self):
+        """Return the next token, or ``None`` at the end of the data."""
+
+        self._skip_space()
+        data = self.data
+        if self.position >= len(data):
+            return None
+        start = self.position
+        char = data[start]
+        if char == 0x28:  # (
+            return self._literal_string()
+        if char == 0x3C:  # <
+            if data[start + 1 : start + 2] == b"<":
+                self.position += 2
+                return "<<"
+            end = data.find(b">", start)
+            end = len(data) if end < 0 else end
+            self.position = end + 1
+            digits = re.sub(rb"[^0-9A-Fa-f]", b"", data[start + 1 : end])
+            if len(digits) % 2:
+                digits += b"0"
+            return bytes.fromhex(digits.decode("ascii"))
+        if char == 0x3E and data[start + 1 : start + 2] == b">":
+            self.position += 2
+            return ">>"
+        if char in b"[]{}":
+            self.position += 1
+            return chr(char)
+        if char == 0x2F:  # /
+            self.position += 1
+            end = self._word_end()
+            name = re.sub(rb"#([0-9A-Fa-f]{2})", lambda match: bytes([int(match.group(1), 16)]), data[start + 1 : end])
+            return Name(name.decode("latin-1"))
+        end = self._word_end()
+        if end == start:
+            self.position += 1
+            return Operator(chr(char))
+        word = data[start:end]
+        try:
+            return int(word)
+        except ValueError:
+            pass
+        try:
+            return float(word)
+        except ValueError:
+            pass
+        if word == b"true":
+            return True
+        if word == b"false":
+            return False
+        if word == b"null":
+            return None
+        return Operator(word.decode("latin-1"))
+
+    def _word_end(self) -> int:
+        data = self.data
+        position = self.position
+        while position < len(data) and data[position] not in _WHITESPACE and data[position] not in _DELIMITERS:
+            position += 1
+        self.position = position
+        return position
+
+    def _literal_string(self) -> bytes:
+        data = self.data
+        position = self.position + 1
+        depth = 1
+        out = bytearray()
+        while position < len(data):
+            char = data[position]
+            if char == 0x5C:  # backslash
+                position += 1
+                escaped = data[position : position + 1]
+                if escaped in b"nrtbf" and escaped:
+                    out += {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}[escaped]
+                elif escaped.isdigit():
+                    octal = re.match(rb"[0-7]{1,3}", data[position : position + 3]).group(0)
+                    out.append(int(octal, 8) & 0xFF)
+                    position += len(octal) - 1
+                elif escaped in (b"\r", b"\n"):
+                    if data[position : position + 2] == b"\r\n":
+                        position += 1
+                else:
+                    out += escaped
+            elif char == 0x28:
+                depth += 1
+                out.append(char)
+            elif char == 0x29:
+                depth -= 1
+                if depth == 0:
+                    position += 1
+                    break
+                out.append(char)
+            else:
+                out.append(char)
+            position += 1
+        self.position = position
+        return bytes(out)
+
+    def value(self, token=None):
+        """Parse one object, resolving ``n g R`` into :class:`Ref`."""
+
+        if token is None:
+            token = self.token()
+        if token == "[":
+            items = []
+            while True:
+                token = self.token()
+                if token in ("]", None):
+                    return _fold_refs(items)
+                items.append(self.value(token))
+        if token == "<<":
+            entries = []
+            while True:
+                token = self.token()
+                if token in (">>", None):
+                    break
+                entries.append(self.value(token))
+            entries = _fold_refs(entries)
+            return {
+                entries[index]: entries[index + 1]
+                for index in range(0, len(entries) - 1, 2)
+                if isinstance(entries[index], Name)
+            }
+        return token
+
+
+def _fold_refs(items: list) -> list:
+    folded: list = []
+    for item in items:
+        if (
+            item == "R"
+            and isinstance(item, Operator)
+            and len(folded) >= 2
+            and isinstance(folded[-1], int)
+            and isinstance(folded[-2], int)
+            and not isinstance(folded[-1], bool)
+        ):
+            generation = folded.pop()
+            folded[-1] = Ref((folded[-1], generation))
+        else:
+            folded.append(item)
+    return folded
+
+
+def _decode(stream: Stream) -> bytes:
+    filters = stream.attributes.get("Filter")
+    if filters is None:
+        return stream.raw
+    if not isinstance(filters, list):
+        filters = [filters]
+    data = stream.raw
+    for name in filters:
+        if name in ("FlateDecode", "Fl"):
+            decompressor = zlib.decompressobj()
+            try:
+                data = decompressor.decompress(data, MAX_STREAM_BYTES + 1)
+            except zlib.error:
+                return b""
+            if len(data) > MAX_STREAM_BYTES or decompressor.unconsumed_tail:
+                raise PdfError(f"Flux décompressé de plus de {MAX_STREAM_BYTES // (1024 * 1024)} Mo.")
+        elif name in ("ASCIIHexDecode", "AHx"):
+            digits = re.sub(rb"[^0-9A-Fa-f]", b"", data.split(b">", 1)[0])
+            data = bytes.fromhex((digits + b"0" * (len(digits) % 2)).decode("ascii"))
+        else:
+            # Image and exotic filters carry no extractable text.
+            return b""
+    return data
+
+
+class PdfDocument:
+    def __init__(self, data: bytes) -> None:
+        if not data.lstrip()[:5] == b"%PDF-":
+            raise PdfError("Le fichier n'est pas un PDF.")
+        self.data = data
+        self.offsets: Dict[int, int] = {}
+        self._cache: Dict[int, PdfObject] = {}
+        self._compressed: Dict[int, Tuple[int, int]] = {}
+        self.trailer: dict = {}
+        self._scan()
+        if not self.offsets:
+            raise PdfError("Aucun objet PDF trouvé.")
+
+    def _scan(self) -> None:
+        # Scanning for "n g obj" instead of trusting the xref table also reads
+        # files whose offsets were broken by a careless editor.
+        for match in _OBJECT_RE.finditer(self.data):
+            self.offsets[int(match.group(1))] = match.end()
+        for marker in re.finditer(rb"trailer\s*<<", self.data):
+            trailer = _Lexer(self.data, marker.end() - 2).value()
+            if isinstance(trailer, dict):
+                self.trailer.update(trailer)
+        for number in list(self.offsets):
+            obj = self.get(number)
+            if isinstance(obj, Stream):
+                kind = obj.attributes.get("Type")
+                if kind == "XRef":
+                    for key in ("Root", "Info", "Encrypt"):
+                        if key in obj.attributes:
+                            self.trailer.setdefault(key, obj.attributes[key])
+                elif kind == "ObjStm":
+                    self._index_object_stream(number, obj)
+
+    def _index_object_stream(self, number: int, stream: Stream) -> None:
+        data = _decode(stream)
+        first = stream.attributes.get("First", 0)
+        header = _Lexer(data[:first])
+        values = []
+        while True:
+            token = header.token()
+            if token is None:
+                break
+            values.append(token)
+        for index in range(0, len(values) - 1, 2):
+            self._compressed.setdefault(values[index], (number, first + values[index + 1]))
+
+    def get(self, number: int) -> PdfObject:
+        if number in self._cache:
+            return self._cache[number]
+        self._cache[number] = None  # guards against reference cycles
+        if number in self.offsets:
+            value = self._read(self.offsets[number])
+        elif number in self._compressed:
+            container, offset = self._compressed[number]
+            value = _Lexer(_decode(self.get(container)), offset).value()
+        else:
+            value = None
+        if isinstance(value, Stream) and value.attributes.get("Type") != "ObjStm":
+            # Content and image streams are read once; keeping them would
+            # double the memory used by large scans.
+            del self._cache[number]
+        else:
+            self._cache[number] = value
+        return value
+
+    def _read(self, position: int) -> PdfObject:
+        lexer = _Lexer(self.data, position)
+        value = lexer.value()
+        if not isinstance(value, dict):
+            return value
+        lexer._skip_space()
+        match = _STREAM_RE.match(self.data, lexer.position)
+        if not match:
+            return value
+        start = match.end()
+        length = value.get("Length")
+        if isinstance(length, Ref):
+            length = self.get(length.number)
+        if not isinstance(length, int) or self.data[start + length : start + length + 30].find(b"endstream") < 0:
+            end = self.data.find(b"endstream", start)
+            length = (len(self.data) if end < 0 else end) - start
+        return Stream(value, self.data[start : start + length])
+
+    def resolve(self, value: PdfObject) -> PdfObject:
+        while isinstance(value, Ref):
+            value = self.get(value.number)
+        return value
+
+    def pages(self) -> Iterator[Tuple[dict, dict]]:
+        """Yield ``(page, resources)`` in reading order."""
+
+        root = self.resolve(self.trailer.get("Root"))
+        tree = self.resolve(root.get("Pages")) if isinstance(root, dict) else None
+        if not isinstance(tree, dict):
+            for number in sorted(self.offsets):
+                obj = self.get(number)
+                if isinstance(obj, dict) and obj.get("Type") == "Page":
+                    yield obj, self.resolve(obj.get("Resources")) or {}
+            return
+        stack = [(tree, {})]
+        seen = set()
+        while stack:
+            node, inherited = stack.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            resources = self.resolve(node.get("Resources")) or inherited
+            kids = self.resolve(node.get("Kids"))
+            if isinstance(kids, list):
+                for kid in reversed(kids):
+                    kid = self.resolve(kid)
+                    if isinstance(kid, dict):
+                        stack.append((kid, resources))
+            else:
+                yield node, resources
+
+    def contents(self, page: dict) -> bytes:
+        contents = self.resolve(page.get("Contents"))
+        if not isinstance(contents, list):
+            contents = [contents]
+        parts = []
+        for item in contents:
+            stream = self.resolve(item)
+            if isinstance(stream, Stream):
+                parts.append(_decode(stream))
+        return b"\n".join(parts)
+
+
+class _Font:
+    def __init__(self, mapping: Dict[int, str], code_width: int) -> None:
+        self.mapping = mapping
+        self.code_width = code_width
+
+    def decode(self, raw: bytes) -> str:
+        if not self.mapping:
+            return raw.decode("cp1252", errors="replace")
+        width = self.code_width
+        return "".join(
+            self.mapping.get(int.from_bytes(raw[index : index + width], "big"), "")
+            for index in range(0, len(raw), width)
+        )
+
+
+_PLAIN_FONT = _Font({}, 1)
+
+
+def _unicode(raw) -> str:
+    if not isinstance(raw, bytes):
+        return ""
+    return raw.decode("utf-16-be", errors="ignore") if len(raw) % 2 == 0 else raw.decode("latin-1")
+
+
+def _parse_cmap(data: bytes) -> _Font:
+    mapping: Dict[int, str] = {}
+    width = 1
+    lexer = _Lexer(data)
+    operands: list = []
+    mode = None
+    while True:
+        token = lexer.token()
+        if token is None:
+            break
+        if isinstance(token, Operator):
+            if token in ("beginbfchar", "beginbfrange", "begincodespacerange"):
+                mode = token
+            elif token == "endcodespacerange":
+                if operands and isinstance(operands[0], bytes):
+                    width = max(1, len(operands[0]))
+                mode = None
+            elif token == "endbfchar":
+                for index in range(0, len(operands) - 1, 2):
+                    source, target = operands[index], operands[index + 1]
+                    if isinstance(source, bytes):
+                        mapping[int.from_bytes(source, "big")] = _unicode(target)
+                mode = None
+            elif token == "endbfrange":
+                for index in range(0, len(operands) - 2, 3):
+                    low, high, target = operands[index : index + 3]
+                    if not isinstance(low, bytes) or not isinstance(high, bytes):
+                        continue
+                    low_code, high_code = int.from_bytes(low, "big"), int.from_bytes(high, "big")
+                    for offset, code in enumerate(range(low_code, min(high_code, low_code + 0xFFFF) + 1)):
+                        if isinstance(target, list):
+                            mapping[code] = _unicode(target[offset]) if offset < len(target) else ""
+                        else:
+                            text = _unicode(target)
+                            mapping[code] = text[:-1] + chr(ord(text[-1]) + offset) if text else ""
+                mode = None
+            operands = []
+            continue
+        if mode is not None:
+            operands.append(lexer.value(token) if token in ("[", "<<") else token)
+    return _Font(mapping, width)
+
+
+def _fonts(document: PdfDocument, resources: dict, cache: Dict[int, _Font]) -> Dict[str, _Font]:
+    fonts = {}
+    entries = document.resolve(resources.get("Font")) if isinstance(resources, dict) else None
+    for name, reference in (entries or {}).items():
+        font = document.resolve(reference)
+        if not isinstance(font, dict):
+            continue
+        cmap_ref = font.get("ToUnicode")
+        if isinstance(cmap_ref, Ref):
+            if cmap_ref.number not in cache:
+                stream = document.resolve(cmap_ref)
+                cache[cmap_ref.number] = _parse_cmap(_decode(stream)) if isinstance(stream, Stream) else _PLAIN_FONT
+            fonts[name] = cache[cmap_ref.number]
+        else:
+            fonts[name] = _PLAIN_FONT
+    return fonts
+
+
+def _page_text(content: bytes, fonts: Dict[str, _Font]) -> str:
+    lexer = _Lexer(content)
+    pieces: List[str] = []
+    operands: list = []
+    font = _PLAIN_FONT
+    size = 0
+    while size < MAX_PAGE_CHARS:
+        token = lexer.token()
+        if token is None:
+            break
+        if not isinstance(token, Operator) or token in ("[", "<<"):
+            operands.append(lexer.value(token) if token in ("[", "<<") else token)
+            continue
+        if token == "BI":
+            end = content.find(b"EI", lexer.position)
+            lexer.position = len(content) if end < 0 else end + 2
+        elif token == "Tf" and len(operands) >= 2:
+            font = fonts.get(operands[-2], _PLAIN_FONT)
+        elif token in ("Tj", "'", '"') and operands and isinstance(operands[-1], bytes):
+            if token != "Tj":
+                pieces.append("\n")
+            pieces.append(font.decode(operands[-1]))
+        elif token == "TJ" and operands and isinstance(operands[-1], list):
+            for item in operands[-1]:
+                if isinstance(item, bytes):
+                    pieces.append(font.decode(item))
+                elif isinstance(item, (int, float)) and item < -200:
+                    pieces.append(" ")
+        elif token in ("ET", "T*", "TD", "Td", "Tm"):
+            if pieces and not pieces[-1].endswith(("\n", " ")):
+                pieces.append("\n" if token in ("ET", "T*", "TD") else " ")
+        if pieces:
+            size += len(pieces[-1])
+        operands = []
+    text = "".join(pieces)
+    return re.sub(r"[ \t]+", " ", re.sub(r"\n\s*\n+", "\n", text)).strip()[:MAX_PAGE_CHARS]
+
+
+def extract_pages(source: Union[str, Path, bytes]) -> List[str]:
+    """Return the text of every page of a PDF, in order."""
+
+    data = source if isinstance(source, bytes) else Path(source).read_bytes()
+    document = PdfDocument(data)
+    if document.trailer.get("Encrypt") is not None:
+        raise PdfError("Document chiffré.")
+    cmaps: Dict[int, _Font] = {}
+    pages = []
+    for page, resources in document.pages():
+        pages.append(_page_text(document.contents(page), _fonts(document, resources, cmaps)))
+    return pages
+
+
+def extract_file(path: str) -> Tuple[Optional[List[str]], Optional[str]]:
+    """Process pool entry point: ``(pages, None)`` or ``(None, error)``."""
+
+    try:
+        return extract_pages(path), None
+    except (OSError, ValueError, RecursionError) as exc:
+        return None, str(exc) or exc.__class__.__name__
+    except Exception as exc:
+        # Malformed files trip the parser in many ways (wrong object types,
+        # bad indexes); a failure must not stop the indexing of the batch.
+        return None, f"{exc.__class__.__name__}: {exc}"
@@ -1,17 +1,25 @@
+import os
+import unicodedata
 from pathlib import Path
+from urllib.parse import quote
 
 from flask import (
     Blueprint,
+    abort,
     current_app,
     flash,
+    jsonify,
     redirect,
     render_template,
     request,
-    send_from_directory,
     url_for,
 )
 from flask_login import login_required
+from sqlalchemy import select
 from sqlalchemy.orm import selectinload
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
 
 from ..extensions import db
 from ..models import (
@@ -24,7 +32,11 @@ from ..models import (
     Material,
     Workshop,
 )
-from ..utils import UploadError, save_job_card_file
+from ..utils import UploadError
+from ..utils.blobs import attach_upload, release_attachment, remove_files, store_blob
+from .importer import JobCardImportError, import_job_cards, read_records
+from .search import hits_by_card, schedule_indexing, search_attachments
+from .tree import TreeDiffError, apply_tree_diff
 
 bp = Blueprint("archive", __name__, url_prefix="/archive")
 
@@ -34,18 +46,46 @@ bp = Blueprint("archive", __name__, url_prefix="/archive")
 def index():
     search = request.args.get("search", "").strip()
     query = JobCard.query
+    page_hits = {}
     if search:
-        query = query.filter(JobCard.title.contains(search) | JobCard.card_number.contains(search))
+        page_hits = hits_by_card(search_attachments(search))
+        query = query.filter(
+            JobCard.title.contains(search) | JobCard.card_number.contains(search) | JobCard.id.in_(page_hits)
+        )
     cards = query.order_by(JobCard.card_number).all()
     attachments_by_card = {
         card.id: card.attachments.order_by(JobCardAttachment.uploaded_at.desc()).all()
         for card in cards
     }
     return render_template(
-        "archive/index.html", cards=cards, search=search, attachments_by_card=attachments_by_card
+        "archive/index.html",
+        cards=cards,
+        search=search,
+        attachments_by_card=attachments_by_card,
+        page_hits=page_hits,
     )
 
 
+@bp.route("/import", methods=["POST"])
+@login_required
+def import_cards():
+    file = request.files.get("bundle")
+    if not file or not file.filename:
+        flash("Merci de choisir un fichier CSV, JSON ou XLSX.", "danger")
+        return redirect(url_for("archive.index"))
+    try:
+        result = import_job_cards(read_records(file.stream, file.filename), upsert=bool(request.form.get("upsert")))
+    except JobCardImportError as exc:
+        db.session.rollback()
+        shown = exc.errors[:5]
+        more = f" (+{len(exc.errors) - len(shown)} autre(s))" if len(exc.errors) > len(shown) else ""
+        flash("Import annulé : " + " ".join(shown) + more, "danger")
+        return redirect(url_for("archive.index"))
+    db.session.commit()
+    flash(result.summary(), "success")
+    return redirect(url_for("archive.index"))
+
+
 @bp.route("/<int:card_id>")
 @login_required
 def card_detail(card_id: int):
@@ -88,8 +128,10 @@ def update_card(card_id: int):
 @login_required
 def delete_card(card_id: int):
     card = JobCard.query.get_or_404(card_id)
+    orphaned = [release_attachment(attachment, current_app.config) for attachment in card.attachments]
     db.session.delete(card)
     db.session.commit()
+    remove_files(orphaned)
     flash("Job card supprimée", "success")
     return redirect(url_for("archive.index"))
 
@@ -120,15 +162,18 @@ def create():
 @login_required
 def add_attachment(card_id: int):
     card = JobCard.query.get_or_404(card_id)
-    file = request.files.get("attachment")
+    try:
+        file = request.files.get("attachment")
+    except RequestEntityTooLarge:
+        limit_mb = current_app.config["JOB_CARD_MAX_UPLOAD_BYTES"] / (1024 * 1024)
+        flash(f"Le fichier dépasse la taille maximale autorisée ({limit_mb:.0f} Mo).", "danger")
+        return redirect(url_for("archive.index"))
     if file is None:
         flash("Merci de sélectionner un fichier PDF.", "danger")
         return redirect(url_for("archive.index"))
 
     try:
-        stored_name, relative_path, mimetype, original_name = save_job_card_file(
-            file, card.id, current_app.config
-        )
+        saved = store_blob(file, current_app.config)
     except UploadError as exc:
         flash(str(exc), "danger")
         return redirect(url_for("archive.index"))
@@ -137,15 +182,9 @@ def add_attachment(card_id: int):
         flash("Impossible d'enregistrer le fichier pour le moment.", "danger")
         return redirect(url_for("archive.index"))
 
-    attachment = JobCardAttachment(
-        job_card=card,
-        filename=stored_name,
-        original_name=original_name,
-        file_path=relative_path,
-        mime_type=mimetype,
-    )
-    db.session.add(attachment)
+    attach_upload(card, saved, current_app.config)
     db.session.commit()
+    schedule_indexing()
     flash("Pièce jointe ajoutée", "success")
     return redirect(url_for("archive.index"))
 
@@ -155,29 +194,103 @@ def add_attachment(card_id: int):
 def delete_attachment(attachment_id: int):
     attachment = JobCardAttachment.query.get_or_404(attachment_id)
     card_id = attachment.job_card_id
+    orphaned = release_attachment(attachment, current_app.config)
     db.session.delete(attachment)
     db.session.commit()
+    remove_files([orphaned])
     flash("Pièce jointe supprimée", "success")
     return redirect(url_for("archive.card_detail", card_id=card_id))
 
 
+def _download_names(download_name: str) -> dict:
+    """``Content-Disposition`` file name parameters, as ``send_file`` builds them."""
+
+    try:
+        download_name.encode("ascii")
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize("NFKD", download_name).encode("ascii", "ignore").decode("ascii")
+        return {"filename": simple, "filename*": f"UTF-8''{quote(download_name, safe='!#$&+^`|~')}"}
+    return {"filename": download_name}
+
+
+def _attachment_response(attachment: JobCardAttachment, file_path: Path, stat: os.stat_result):
+    """Serve ``file_path`` with validators, ranges and optional proxy offload.
+
+    Conditional requests are answered before the file is opened. With
+    ``ATTACHMENT_OFFLOAD`` set to ``x-sendfile`` or ``x-accel-redirect`` Flask
+    only authorizes the download and the front-end server sends the bytes.
+    """
+
+    config = current_app.config
+    download_name = attachment.original_name or attachment.filename
+    mimetype = attachment.mime_type or "application/pdf"
+    etag = attachment.sha256 or f"{int(stat.st_mtime)}-{stat.st_size}-{attachment.id}"
+
+    def finish(response):
+        response.set_etag(etag)
+        response.last_modified = int(stat.st_mtime)
+        response.cache_control.no_cache = None
+        response.cache_control.public = None
+        response.cache_control.private = True
+        response.cache_control.max_age = config.get("ATTACHMENT_CACHE_MAX_AGE", 0)
+        return response
+
+    probe = finish(current_app.response_class(mimetype=mimetype)).make_conditional(request)
+    if probe.status_code == 304:
+        return probe
+
+    offload = (config.get("ATTACHMENT_OFFLOAD") or "").lower()
+    if offload == "x-accel-redirect":
+        response = finish(current_app.response_class(mimetype=mimetype))
+        prefix = config.get("ATTACHMENT_ACCEL_PREFIX", "/protected-uploads/").rstrip("/")
+        response.headers["X-Accel-Redirect"] = f"{prefix}/{quote(attachment.file_path)}"
+        response.headers.set("Content-Disposition", "attachment", **_download_names(download_name))
+        return response
+
+    response = send_file(
+        file_path,
+        environ=request.environ,
+        mimetype=mimetype,
+        as_attachment=True,
+        download_name=download_name,
+        conditional=True,
+        etag=etag,
+        last_modified=int(stat.st_mtime),
+        use_x_sendfile=offload == "x-sendfile",
+        response_class=current_app.response_class,
+    )
+    return finish(response)
+
+
 @bp.route("/attachments/<int:attachment_id>")
 @login_required
 def download_attachment(attachment_id: int):
     attachment = JobCardAttachment.query.get_or_404(attachment_id)
     upload_root = Path(current_app.config["UPLOAD_ROOT"]).expanduser()
-    file_path = upload_root / attachment.file_path
-    if not file_path.exists():
+    file_path = safe_join(str(upload_root), attachment.file_path)
+    try:
+        stat = os.stat(file_path) if file_path else None
+    except OSError:
+        stat = None
+    if stat is None:
         flash("Fichier introuvable sur le serveur.", "danger")
         return redirect(url_for("archive.index"))
+    return _attachment_response(attachment, Path(file_path), stat)
 
-    return send_from_directory(
-        str(upload_root),
-        attachment.file_path,
-        as_attachment=True,
-        download_name=attachment.original_name or attachment.filename,
-        mimetype=attachment.mime_type or "application/pdf",
-    )
+
+@bp.route("/<int:card_id>/tree", methods=["POST"])
+@login_required
+def update_tree(card_id: int):
+    # Only the id: loading the card would join its whole tree.
+    if db.session.scalar(select(JobCard.id).where(JobCard.id == card_id)) is None:
+        abort(404)
+    try:
+        result = apply_tree_diff(card_id, request.get_json(silent=True))
+    except TreeDiffError as exc:
+        db.session.rollback()
+        return jsonify({"errors": exc.errors}), 400
+    db.session.commit()
+    return jsonify(result.as_dict())
 
 
 @bp.route("/<int:card_id>/paragraphs", methods=["POST"])
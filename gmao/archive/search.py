@@ -0,0 +1,332 @@
+"""Full-text search across job card attachments.
+
+Text is extracted once per attachment content (its SHA-256), so the same
+PDF attached to several cards is read a single time. Each page is stored in
+``attachment_pages``. On SQLite an FTS5 index mirrors that table through
+triggers and answers the searches. Other databases fall back to ``LIKE``.
+
+:func:`index_pending_attachments` only extracts hashes that have no
+``attachment_texts`` row yet. It works in batches of ``batch_size`` files,
+read from the database in hash order and committed one after the other, so
+a scan of the whole archive keeps a bounded amount of text in memory. With
+several workers the PDFs are parsed in a process pool, since the pure-Python
+extractor is CPU bound and would otherwise hold the GIL. Uploads are indexed
+from a background thread of the web process, which only reads and writes the
+database: parsing happens in a separate process so requests are not slowed.
+"""
+from __future__ import annotations
+
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import click
+from flask import current_app
+from markupsafe import Markup, escape
+from sqlalchemy import column, delete, exists, func, literal_column, select, table, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import StaticPool
+
+from ..extensions import db
+from ..models import AttachmentPage, AttachmentText, JobCard, JobCardAttachment
+from ..utils.bulk import bulk_insert
+from ..utils.executors import get_thread_pool
+from .pdf_text import extract_file
+
+SEARCH_TABLE = "attachment_pages_fts"
+SNIPPET_OPEN = "\x02"
+SNIPPET_CLOSE = "\x03"
+SNIPPET_WORDS = 12
+
+_FTS_STATEMENTS = (
+    f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+    "content, content='attachment_pages', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER attachment_pages_ai AFTER INSERT ON attachment_pages BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, content) VALUES (new.id, new.content); END",
+    f"CREATE TRIGGER attachment_pages_ad AFTER DELETE ON attachment_pages BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, content) VALUES ('delete', old.id, old.content); END",
+    f"CREATE TRIGGER attachment_pages_au AFTER UPDATE ON attachment_pages BEGIN "
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, content) VALUES ('delete', old.id, old.content); "
+    f"INSERT INTO {SEARCH_TABLE}(rowid, content) VALUES (new.id, new.content); END",
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')",
+)
+
+
+@dataclass
+class IndexResult:
+    indexed: int = 0
+    failed: int = 0
+    pages: int = 0
+    bytes_read: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return (self.indexed + self.failed) / self.elapsed if self.elapsed else 0.0
+
+
+@dataclass
+class PageHit:
+    card_id: int
+    card_number: str
+    card_title: str
+    attachment_id: int
+    attachment_name: str
+    page_number: int
+    snippet: Markup
+
+
+def ensure_search_index() -> None:
+    """Create the FTS5 index and its triggers on SQLite if they are missing."""
+
+    if db.engine.dialect.name != "sqlite":
+        return
+    found = db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": SEARCH_TABLE}
+    ).first()
+    if found:
+        return
+    try:
+        for statement in _FTS_STATEMENTS:
+            db.session.execute(text(statement))
+        db.session.commit()
+    except OperationalError:
+        # SQLite built without FTS5: searches use LIKE instead.
+        db.session.rollback()
+        current_app.logger.warning("FTS5 indisponible, recherche plein texte par LIKE.")
+
+
+def _has_fts() -> bool:
+    if db.engine.dialect.name != "sqlite":
+        return False
+    return (
+        db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": SEARCH_TABLE}
+        ).first()
+        is not None
+    )
+
+
+def _pending_batch(after: str, limit: int) -> List[Tuple[str, str]]:
+    """Next ``limit`` unindexed hashes after ``after``, with one file each."""
+
+    already = exists().where(AttachmentText.sha256 == JobCardAttachment.sha256)
+    return db.session.execute(
+        select(JobCardAttachment.sha256, func.min(JobCardAttachment.file_path))
+        .where(JobCardAttachment.sha256.is_not(None), JobCardAttachment.sha256 > after, ~already)
+        .group_by(JobCardAttachment.sha256)
+        .order_by(JobCardAttachment.sha256)
+        .limit(limit)
+    ).all()
+
+
+def _extract_batch(paths: List[str], pool: Optional[ProcessPoolExecutor]) -> Iterable:
+    if pool is None:
+        return map(extract_file, paths)
+    return pool.map(extract_file, paths)
+
+
+def index_pending_attachments(
+    workers: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    rebuild: bool = False,
+    isolated: bool = False,
+) -> IndexResult:
+    """Extract and index the text of every attachment not indexed yet.
+
+    With ``isolated`` a single worker also parses in a separate process.
+    """
+
+    config = current_app.config
+    if workers is None:
+        workers = config.get("ATTACHMENT_INDEX_WORKERS") or os.cpu_count() or 1
+    batch_size = batch_size or config.get("ATTACHMENT_INDEX_BATCH_SIZE", 32)
+    root = Path(config["UPLOAD_ROOT"])
+    result = IndexResult()
+    started = time.perf_counter()
+    if rebuild:
+        db.session.execute(delete(AttachmentPage))
+        db.session.execute(delete(AttachmentText))
+        db.session.commit()
+
+    pool = None
+    if workers > 1 or isolated:
+        # Spawned workers do not inherit the database connections of the app.
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        after = ""
+        while True:
+            batch = _pending_batch(after, batch_size)
+            if not batch:
+                break
+            after = batch[-1][0]
+            paths = [str(root / file_path) for _, file_path in batch]
+            texts, pages = [], []
+            for (sha256, _), path, (extracted, error) in zip(batch, paths, _extract_batch(paths, pool)):
+                if extracted is None:
+                    result.failed += 1
+                    texts.append({"sha256": sha256, "status": "failed", "page_count": 0, "error": error[:255]})
+                    continue
+                result.indexed += 1
+                result.pages += len(extracted)
+                result.bytes_read += os.path.getsize(path)
+                texts.append({"sha256": sha256, "status": "indexed", "page_count": len(extracted), "error": None})
+                pages.extend(
+                    {"sha256": sha256, "page_number": number, "content": content}
+                    for number, content in enumerate(extracted, start=1)
+                    if content
+                )
+            bulk_insert(AttachmentText, texts)
+            bulk_insert(AttachmentPage, pages, batch_size=200)
+            db.session.commit()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def prune_unreferenced_text() -> int:
+    """Drop extracted text whose content no attachment uses any more."""
+
+    orphan = ~exists().where(JobCardAttachment.sha256 == AttachmentText.sha256)
+    hashes = db.session.scalars(select(AttachmentText.sha256).where(orphan)).all()
+    for offset in range(0, len(hashes), 500):
+        chunk = hashes[offset : offset + 500]
+        db.session.execute(delete(AttachmentPage).where(AttachmentPage.sha256.in_(chunk)))
+        db.session.execute(delete(AttachmentText).where(AttachmentText.sha256.in_(chunk)))
+    db.session.commit()
+    return len(hashes)
+
+
+def _background_index(app) -> None:
+    with app.app_context():
+        try:
+            index_pending_attachments(workers=1, isolated=True)
+        except Exception:
+            db.session.rollback()
+            app.logger.exception("Indexation des pièces jointes impossible")
+        finally:
+            db.session.remove()
+
+
+def schedule_indexing() -> None:
+    """Index new uploads in the background, outside the request.
+
+    One thread coordinates and one spawned process parses, so the GIL of the
+    web process stays free. Set ``ATTACHMENT_INDEX_ON_UPLOAD`` off to leave
+    indexing to ``flask index-attachments`` instead.
+    """
+
+    if not current_app.config.get("ATTACHMENT_INDEX_ON_UPLOAD", True):
+        return
+    # A StaticPool shares the request's connection (in-memory SQLite).
+    if isinstance(db.engine.pool, StaticPool):
+        return
+    pool = get_thread_pool("attachment-index", 1)
+    pool.submit(_background_index, current_app._get_current_object())
+
+
+def _match_expression(query: str) -> Optional[str]:
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    # Each word is quoted so FTS5 operators typed by users are taken literally.
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _highlight(snippet: str) -> Markup:
+    return Markup(
+        str(escape(snippet)).replace(SNIPPET_OPEN, Markup("<mark>")).replace(SNIPPET_CLOSE, Markup("</mark>"))
+    )
+
+
+def _escape_like(query: str) -> str:
+    # Wildcards typed by users are taken literally, like FTS operators.
+    return query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _like_snippet(content: str, query: str) -> str:
+    position = content.lower().find(query.lower())
+    start = max(position - 60, 0)
+    end = position + len(query)
+    before = ("…" if start else "") + content[start:position]
+    after = content[end : end + 60] + ("…" if end + 60 < len(content) else "")
+    return f"{before}{SNIPPET_OPEN}{content[position:end]}{SNIPPET_CLOSE}{after}"
+
+
+def search_attachments(query: str, limit: int = 50) -> List[PageHit]:
+    """Pages matching ``query``, best first, with the card they belong to."""
+
+    query = query.strip()
+    if not query:
+        return []
+    columns = (
+        JobCard.id,
+        JobCard.card_number,
+        JobCard.title,
+        JobCardAttachment.id,
+        func.coalesce(JobCardAttachment.original_name, JobCardAttachment.filename),
+        AttachmentPage.page_number,
+    )
+    joined = (
+        select(*columns)
+        .select_from(AttachmentPage)
+        .join(JobCardAttachment, JobCardAttachment.sha256 == AttachmentPage.sha256)
+        .join(JobCard, JobCard.id == JobCardAttachment.job_card_id)
+    )
+    if _has_fts():
+        expression = _match_expression(query)
+        if expression is None:
+            return []
+        fts = table(SEARCH_TABLE, column("rowid"))
+        name = literal_column(SEARCH_TABLE)
+        statement = (
+            joined.add_columns(func.snippet(name, 0, SNIPPET_OPEN, SNIPPET_CLOSE, "…", SNIPPET_WORDS))
+            .join(fts, fts.c.rowid == AttachmentPage.id)
+            .where(name.op("MATCH")(expression))
+            .order_by(func.bm25(name), JobCard.card_number, AttachmentPage.page_number)
+            .limit(limit)
+        )
+        return [PageHit(*row[:-1], snippet=_highlight(row[-1])) for row in db.session.execute(statement)]
+
+    statement = (
+        joined.add_columns(AttachmentPage.content)
+        .where(AttachmentPage.content.ilike(f"%{_escape_like(query)}%", escape="\\"))
+        .order_by(JobCard.card_number, AttachmentPage.page_number)
+        .limit(limit)
+    )
+    return [
+        PageHit(*row[:-1], snippet=_highlight(_like_snippet(row[-1], query)))
+        for row in db.session.execute(statement)
+    ]
+
+
+def hits_by_card(hits: Iterable[PageHit]) -> Dict[int, List[PageHit]]:
+    grouped: Dict[int, List[PageHit]] = {}
+    for hit in hits:
+        grouped.setdefault(hit.card_id, []).append(hit)
+    return grouped
+
+
+def register_search_commands(app):
+    @app.cli.command("index-attachments")
+    @click.option("--workers", type=int, default=None, help="Extraction processes (default: CPU count).")
+    @click.option("--batch-size", type=int, default=None, help="Files extracted per transaction.")
+    @click.option("--rebuild", is_flag=True, help="Forget the extracted text and index everything again.")
+    def index_attachments_command(workers, batch_size, rebuild):
+        """Extract the text of new PDF attachments into the search index."""
+
+        result = index_pending_attachments(workers=workers, batch_size=batch_size, rebuild=rebuild)
+        pruned = prune_unreferenced_text()
+        click.echo(
+            f"{result.indexed} document(s) indexé(s) ({result.pages} page(s), "
+            f"{result.bytes_read / (1024 * 1024):.1f} Mo), {result.failed} échec(s), "
+            f"{pruned} texte(s) obsolète(s) supprimé(s) en {result.elapsed:.2f}s "
+            f"({result.files_per_second:.1f} fichiers/s)"
+        )
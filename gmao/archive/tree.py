@@ -0,0 +1,224 @@
+"""Batch edits of a job card tree.
+
+The card editor sends one diff for the whole tree instead of one form post
+per item:
+
+.. code-block:: json
+
+    {
+      "paragraphs": [{"id": 4, "order_index": 0, "estimated_minutes": 30}],
+      "steps": [{"id": 12, "paragraph_id": 4, "order_index": 3}],
+      "substeps": [{"id": 40, "step_id": 12, "order_index": 0}],
+      "delete": {"paragraphs": [5], "steps": [], "substeps": [41]}
+    }
+
+Updates only carry the fields that change. ``paragraph_id`` (``null`` for a
+root step) and ``step_id`` move items. Every id must belong to the card,
+and the diff is checked as a whole before anything is written. Updates are
+applied with bulk ``UPDATE`` by primary key, then deletions, which cascade
+like the ORM relationships do (a deleted paragraph takes the steps still in
+it, their substeps and material links). Steps moved out of a paragraph in
+the same diff are kept.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Set
+
+from sqlalchemy import delete, func, or_, select, update
+
+from ..extensions import db
+from ..models import JobCardMaterial, JobCardParagraph, JobCardStep, JobCardSubstep, Workshop
+
+_KINDS = {
+    "paragraphs": (JobCardParagraph, ("order_index", "estimated_minutes", "workshop_id", "title", "description")),
+    "steps": (
+        JobCardStep,
+        ("order_index", "estimated_minutes", "workshop_id", "title", "description", "paragraph_id"),
+    ),
+    "substeps": (JobCardSubstep, ("order_index", "estimated_minutes", "workshop_id", "description", "step_id")),
+}
+_INTEGER_FIELDS = {"order_index", "estimated_minutes"}
+_REQUIRED_TEXT = {("paragraphs", "title"), ("steps", "description"), ("substeps", "description")}
+
+
+class TreeDiffError(ValueError):
+    """Raised when a diff cannot be applied; ``errors`` lists every problem."""
+
+    def __init__(self, errors: List[str]) -> None:
+        super().__init__("; ".join(errors[:5]))
+        self.errors = errors
+
+
+@dataclass
+class TreeDiffResult:
+    updated: Dict[str, int]
+    deleted: Dict[str, int]
+    estimated_minutes: int
+
+    @property
+    def estimated_hours(self) -> float:
+        return round(self.estimated_minutes / 60.0, 2) if self.estimated_minutes else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "updated": self.updated,
+            "deleted": self.deleted,
+            "estimated_minutes": self.estimated_minutes,
+            "estimated_hours": self.estimated_hours,
+        }
+
+
+def card_estimated_minutes(card_id: int) -> int:
+    """Same total as :attr:`JobCard.estimated_minutes`, computed in one query."""
+
+    totals = [
+        select(func.coalesce(func.sum(model.estimated_minutes), 0))
+        .where(model.job_card_id == card_id)
+        .scalar_subquery()
+        for model in (JobCardParagraph, JobCardStep, JobCardSubstep)
+    ]
+    return int(db.session.execute(select(totals[0] + totals[1] + totals[2])).scalar_one())
+
+
+def _card_ids(model, card_id: int) -> Set[int]:
+    return set(db.session.scalars(select(model.id).where(model.job_card_id == card_id)))
+
+
+def _validated_rows(kind: str, items, owned: Dict[str, Set[int]], workshops: Set[int], errors: List[str]):
+    model, fields = _KINDS[kind]
+    rows = []
+    if not isinstance(items, list):
+        errors.append(f"« {kind} » doit être une liste.")
+        return rows
+    seen = set()
+    for position, item in enumerate(items, start=1):
+        where = f"{kind}[{position}]"
+        if not isinstance(item, dict) or not isinstance(item.get("id"), int):
+            errors.append(f"{where} : identifiant manquant.")
+            continue
+        if item["id"] not in owned[kind]:
+            errors.append(f"{where} : {item['id']} n'appartient pas à cette job card.")
+            continue
+        if item["id"] in seen:
+            errors.append(f"{where} : {item['id']} apparaît deux fois.")
+            continue
+        seen.add(item["id"])
+        row = {"id": item["id"]}
+        for name, value in item.items():
+            if name == "id":
+                continue
+            if name not in fields:
+                errors.append(f"{where} : champ « {name} » non modifiable.")
+                continue
+            if name in _INTEGER_FIELDS:
+                if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+                    errors.append(f"{where} : {name} doit être un entier positif.")
+                    continue
+            elif name == "paragraph_id":
+                if value is not None and value not in owned["paragraphs"]:
+                    errors.append(f"{where} : paragraphe {value} inconnu pour cette job card.")
+                    continue
+            elif name == "step_id":
+                if value not in owned["steps"]:
+                    errors.append(f"{where} : étape {value} inconnue pour cette job card.")
+                    continue
+            elif name == "workshop_id":
+                if value is not None and value not in workshops:
+                    errors.append(f"{where} : atelier {value} inconnu.")
+                    continue
+            else:
+                value = (value or "").strip() if isinstance(value, str) or value is None else value
+                if not isinstance(value, str):
+                    errors.append(f"{where} : {name} doit être un texte.")
+                    continue
+                if not value and (kind, name) in _REQUIRED_TEXT:
+                    errors.append(f"{where} : {name} ne peut pas être vide.")
+                    continue
+                value = value or None
+            row[name] = value
+        if len(row) > 1:
+            rows.append(row)
+    return rows
+
+
+def _bulk_update(model, rows: List[dict]) -> None:
+    # ORM bulk UPDATE by primary key groups rows with the same columns into
+    # one executemany, so the statement count depends on the fields, not
+    # on the number of items.
+    by_fields: Dict[tuple, List[dict]] = {}
+    for row in rows:
+        by_fields.setdefault(tuple(sorted(row)), []).append(row)
+    for group in by_fields.values():
+        db.session.execute(update(model), group)
+
+
+def apply_tree_diff(card_id: int, payload) -> TreeDiffResult:
+    """Apply ``payload`` to the tree of card ``card_id``; the caller commits."""
+
+    if not isinstance(payload, dict):
+        raise TreeDiffError(["Le corps doit être un objet JSON."])
+    owned = {kind: _card_ids(model, card_id) for kind, (model, _) in _KINDS.items()}
+    workshops = set(db.session.scalars(select(Workshop.id)))
+    errors: List[str] = []
+    updates = {kind: _validated_rows(kind, payload.get(kind, []), owned, workshops, errors) for kind in _KINDS}
+
+    deletions = payload.get("delete") or {}
+    removed: Dict[str, Set[int]] = {}
+    if not isinstance(deletions, dict):
+        errors.append("« delete » doit être un objet.")
+        deletions = {}
+    for kind in _KINDS:
+        ids = deletions.get(kind) or []
+        if not isinstance(ids, list) or not all(isinstance(value, int) for value in ids):
+            errors.append(f"delete.{kind} doit être une liste d'identifiants.")
+            ids = []
+        foreign = [value for value in ids if value not in owned[kind]]
+        if foreign:
+            errors.append(f"delete.{kind} : {foreign[:5]} n'appartiennent pas à cette job card.")
+        removed[kind] = set(ids)
+    for row in updates["steps"]:
+        if row.get("paragraph_id") in removed["paragraphs"]:
+            errors.append(f"steps : l'étape {row['id']} est déplacée vers un paragraphe supprimé.")
+    # Steps deleted with their paragraph, unless the diff moves them out of it.
+    steps = set(removed["steps"])
+    if removed["paragraphs"]:
+        moved = {row["id"]: row["paragraph_id"] for row in updates["steps"] if "paragraph_id" in row}
+        steps |= {
+            step_id
+            for step_id, paragraph_id in db.session.execute(
+                select(JobCardStep.id, JobCardStep.paragraph_id).where(
+                    JobCardStep.paragraph_id.in_(removed["paragraphs"])
+                )
+            )
+            if moved.get(step_id, paragraph_id) in removed["paragraphs"]
+        }
+    for row in updates["substeps"]:
+        if row.get("step_id") in steps:
+            errors.append(f"substeps : la sous-étape {row['id']} est déplacée vers une étape supprimée.")
+    if errors:
+        raise TreeDiffError(errors)
+
+    for kind, (model, _) in _KINDS.items():
+        _bulk_update(model, updates[kind])
+
+    substeps = set(removed["substeps"])
+    if steps:
+        substeps |= set(db.session.scalars(select(JobCardSubstep.id).where(JobCardSubstep.step_id.in_(steps))))
+    targets = (
+        (JobCardMaterial.paragraph_id, removed["paragraphs"]),
+        (JobCardMaterial.step_id, steps),
+        (JobCardMaterial.substep_id, substeps),
+    )
+    conditions = [column.in_(ids) for column, ids in targets if ids]
+    if conditions:
+        db.session.execute(delete(JobCardMaterial).where(or_(*conditions)))
+    for model, ids in ((JobCardSubstep, substeps), (JobCardStep, steps), (JobCardParagraph, removed["paragraphs"])):
+        if ids:
+            db.session.execute(delete(model).where(model.id.in_(ids)))
+
+    return TreeDiffResult(
+        updated={kind: len(rows) for kind, rows in updates.items()},
+        deleted={"paragraphs": len(removed["paragraphs"]), "steps": len(steps), "substeps": len(substeps)},
+        estimated_minutes=card_estimated_minutes(card_id),
+    )
@@ -5,7 +5,9 @@ from wtforms import PasswordField, StringField
 from wtforms.validators import DataRequired
 
 from ..extensions import db
-from ..models import PersonnelStatus, Role, User, Workshop
+from ..models import Role, User, Workshop
+from ..personnel.status import current_statuses, status_options
+from ..utils.passwords import LoginBusyError, authenticate
 
 bp = Blueprint("auth", __name__, url_prefix="/auth")
 
@@ -32,8 +34,17 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
-        if user and user.check_password(form.password.data):
-            login_user(user)
+        try:
+            valid = user is not None and authenticate(user, form.password.data)
+        except LoginBusyError as exc:
+            flash(str(exc), "warning")
+            return render_template("login.html", form=form), 503
+        if valid:
+            if db.session.is_modified(user):
+                db.session.commit()
+            if not login_user(user):
+                flash("Ce compte est désactivé", "danger")
+                return render_template("login.html", form=form)
             flash("Bienvenue sur la plateforme GMAO C-130H", "success")
             return redirect(url_for("dashboard.home"))
         flash("Identifiants invalides", "danger")
@@ -78,11 +89,7 @@ def manage_users():
             return redirect(url_for("auth.manage_users"))
 
     users = User.query.order_by(User.rank.desc()).all()
-    statuses = PersonnelStatus.query.order_by(PersonnelStatus.start_date.desc()).all()
-    latest_status = {}
-    for record in statuses:
-        latest_status.setdefault(record.personnel_id, record)
-    status_options = sorted({record.status for record in statuses})
+    latest_status = current_statuses()
     workshops = Workshop.query.order_by(Workshop.name).all()
     roles = Role.query.order_by(Role.name).all()
     return render_template(
@@ -90,9 +97,8 @@ def manage_users():
         users=users,
         manage_mode=True,
         form=form,
-        statuses=statuses,
         latest_status=latest_status,
-        status_options=status_options,
+        status_options=status_options(),
         status_filter=None,
         workshops=workshops,
         roles=roles,
@@ -131,6 +137,13 @@ def update_user(user_id: int):
         user.workshop = Workshop.query.get(workshop_id)
     else:
         user.workshop = None
+    active_values = request.form.getlist("is_active")
+    if active_values:
+        is_active = active_values[-1] == "1"
+        if not is_active and user.id == current_user.id:
+            flash("Vous ne pouvez pas désactiver votre propre compte.", "warning")
+        else:
+            user.is_active_flag = is_active
     password = request.form.get("password")
     if password:
         user.set_password(password)
@@ -8,11 +8,47 @@ class BaseConfig:
     DEFAULT_UPLOAD_ROOT = BASE_DIR.parent / "uploads"
     UPLOAD_ROOT = Path(os.environ.get("GMAO_UPLOAD_ROOT", DEFAULT_UPLOAD_ROOT)).expanduser().resolve()
     JOB_CARD_UPLOAD_SUBDIR = "job_cards"
+    ATTACHMENT_BLOB_SUBDIR = "blobs"
     JOB_CARD_ALLOWED_MIME_TYPES = {"application/pdf"}
+    JOB_CARD_MAX_UPLOAD_BYTES = int(os.environ.get("GMAO_MAX_UPLOAD_MB", 50)) * 1024 * 1024
+    UPLOAD_CHUNK_SIZE = 64 * 1024
+    # Reject oversized bodies before werkzeug parses them; leaves room for the form fields.
+    MAX_CONTENT_LENGTH = JOB_CARD_MAX_UPLOAD_BYTES + 1024 * 1024
+    # 0 uses one extraction process per CPU.
+    ATTACHMENT_INDEX_WORKERS = int(os.environ.get("GMAO_ATTACHMENT_INDEX_WORKERS", 0))
+    ATTACHMENT_INDEX_BATCH_SIZE = 32
+    ATTACHMENT_INDEX_ON_UPLOAD = os.environ.get("GMAO_ATTACHMENT_INDEX_ON_UPLOAD", "1") != "0"
+    ATTACHMENT_GC_GRACE_SECONDS = int(os.environ.get("GMAO_ATTACHMENT_GC_GRACE", 3600))
+    ATTACHMENT_CACHE_MAX_AGE = int(os.environ.get("GMAO_ATTACHMENT_CACHE_MAX_AGE", 3600))
+    # "", "x-sendfile" (Apache, lighttpd) or "x-accel-redirect" (nginx).
+    ATTACHMENT_OFFLOAD = os.environ.get("GMAO_ATTACHMENT_OFFLOAD", "")
+    ATTACHMENT_ACCEL_PREFIX = os.environ.get("GMAO_ATTACHMENT_ACCEL_PREFIX", "/protected-uploads/")
+    # Working hours of one person in a day, for the workshop load heatmap.
+    WORKSHOP_DAY_HOURS = float(os.environ.get("GMAO_WORKSHOP_DAY_HOURS", 8))
+    WORKSHOP_LOAD_CACHE_TTL = int(os.environ.get("GMAO_WORKSHOP_LOAD_CACHE_TTL", 300))
+    PERSONNEL_AVAILABILITY_CACHE_TTL = int(os.environ.get("GMAO_PERSONNEL_AVAILABILITY_CACHE_TTL", 3600))
+    PERSONNEL_HISTORY_PAGE_SIZE = int(os.environ.get("GMAO_PERSONNEL_HISTORY_PAGE_SIZE", 20))
+    INVENTORY_SNAPSHOT_DAILY_DAYS = int(os.environ.get("GMAO_INVENTORY_SNAPSHOT_DAILY_DAYS", 90))
+    INVENTORY_SNAPSHOT_WEEKLY_DAYS = int(os.environ.get("GMAO_INVENTORY_SNAPSHOT_WEEKLY_DAYS", 730))
+    FORECAST_PERIOD_DAYS = int(os.environ.get("GMAO_FORECAST_PERIOD_DAYS", 7))
+    FORECAST_HISTORY_PERIODS = int(os.environ.get("GMAO_FORECAST_HISTORY_PERIODS", 104))
+    FORECAST_BACKTEST_PERIODS = int(os.environ.get("GMAO_FORECAST_BACKTEST_PERIODS", 26))
+    HANGAR_CAPACITY = int(os.environ.get("GMAO_HANGAR_CAPACITY", 2))
+    FLEET_PLAN_MONTHS = int(os.environ.get("GMAO_FLEET_PLAN_MONTHS", 60))
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         "GMAO_DATABASE_URI", f"sqlite:///{BASE_DIR.parent / 'gmao.db'}"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DEMO_SNAPSHOT_DIR = Path(
+        os.environ.get("GMAO_SNAPSHOT_DIR", BASE_DIR.parent / "snapshots")
+    ).expanduser()
+    USER_CACHE_TTL = int(os.environ.get("GMAO_USER_CACHE_TTL", 300))
+    USER_CACHE_SIZE = int(os.environ.get("GMAO_USER_CACHE_SIZE", 512))
+    DASHBOARD_CACHE_TTL = int(os.environ.get("GMAO_DASHBOARD_CACHE_TTL", 60))
+    DASHBOARD_CHART_WORKERS = int(os.environ.get("GMAO_DASHBOARD_CHART_WORKERS", 3))
+    PASSWORD_HASH_METHOD = os.environ.get("GMAO_PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    LOGIN_HASH_WORKERS = int(os.environ.get("GMAO_LOGIN_HASH_WORKERS", 2))
+    LOGIN_QUEUE_TIMEOUT = float(os.environ.get("GMAO_LOGIN_QUEUE_TIMEOUT", 10))
     SECURITY_PASSWORD_SALT = os.environ.get("GMAO_PASSWORD_SALT", "gmao-salt")
 
 
@@ -23,3 +59,5 @@ class DevelopmentConfig(BaseConfig):
 class TestingConfig(BaseConfig):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    # Hashing cost is irrelevant for tests and dominates login and seed time.
+    PASSWORD_HASH_METHOD = "pbkdf2:sha256:1000"
@@ -0,0 +1,250 @@
+"""Daily fleet KPI rollup.
+
+``flask rollup-kpis`` fills :class:`~gmao.models.DailyKpiRollup` with one row
+per day, so that trend charts over several years read a few hundred rows
+instead of scanning ``maintenance_tasks`` and ``maintenance_visits``.
+
+Only days that have no row yet are processed, and days before today only,
+since the current day is still moving. Task states are rebuilt from
+timestamps. A task is pending from its visit start until ``started_at``, in
+progress until ``completed_at``, and completed afterwards. Tasks without
+timestamps fall back to their visit dates. Each series is accumulated with
+a difference array, so a run costs one query per source table whatever the
+number of days.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import click
+from sqlalchemy import delete, func, select
+
+from ..extensions import db
+from ..models import (
+    DailyKpiRollup,
+    InventorySnapshot,
+    MaintenanceTask,
+    MaintenanceVisit,
+    Material,
+    PersonnelStatus,
+)
+from ..personnel.availability import on_site_days
+from ..utils.bulk import bulk_insert
+
+PENDING_TASK_STATUSES = {None, "pending"}
+
+
+@dataclass
+class RollupResult:
+    days: int
+    first_day: Optional[date] = None
+    last_day: Optional[date] = None
+
+
+class _Timeline:
+    """Per-day counters over ``[start, end]`` built from a difference array."""
+
+    def __init__(self, start: date, end: date) -> None:
+        self.start = start
+        self.size = (end - start).days + 1
+        self._delta = [0] * (self.size + 1)
+
+    def shift(self, day: date, amount: int) -> None:
+        """Add ``amount`` to the counter of ``day`` and of every later day."""
+
+        index = max((day - self.start).days, 0)
+        if index < self.size:
+            self._delta[index] += amount
+
+    def add(self, begin: Optional[date], finish: Optional[date] = None) -> None:
+        """Count one item on each day of ``[begin, finish)``; ``None`` leaves it open."""
+
+        if begin is None or (finish is not None and finish <= begin):
+            return
+        self.shift(begin, 1)
+        if finish is not None:
+            self.shift(finish, -1)
+
+    def counts(self) -> List[int]:
+        values: List[int] = []
+        running = 0
+        for amount in self._delta[: self.size]:
+            running += amount
+            values.append(running)
+        return values
+
+
+def _as_date(value) -> Optional[date]:
+    if value is None:
+        return None
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _task_timelines(start: date, end: date):
+    pending, in_progress, completed = (_Timeline(start, end) for _ in range(3))
+    rows = db.session.execute(
+        select(
+            MaintenanceTask.status,
+            MaintenanceTask.started_at,
+            MaintenanceTask.completed_at,
+            MaintenanceVisit.start_date,
+            MaintenanceVisit.end_date,
+        ).join(MaintenanceVisit, MaintenanceTask.visit_id == MaintenanceVisit.id)
+    )
+    for status, started_at, completed_at, visit_start, visit_end in rows:
+        opened = visit_start
+        started = _as_date(started_at)
+        closed = _as_date(completed_at)
+        if closed is None and status == "completed":
+            closed = visit_end or started or visit_start
+        if started is None and status not in PENDING_TASK_STATUSES:
+            started = visit_start
+        if closed is not None and (started is None or started > closed):
+            started = closed
+        if started is not None and opened > started:
+            opened = started
+        pending.add(opened, started)
+        in_progress.add(started, closed)
+        completed.add(closed)
+    return pending.counts(), in_progress.counts(), completed.counts()
+
+
+def _visit_events(start: date, end: date):
+    started: Dict[date, int] = {}
+    closed: Dict[date, int] = {}
+    for column, counts in ((MaintenanceVisit.start_date, started), (MaintenanceVisit.end_date, closed)):
+        rows = db.session.execute(
+            select(column, func.count()).where(column >= start, column <= end).group_by(column)
+        )
+        counts.update({_as_date(day): total for day, total in rows})
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    return [started.get(day, 0) for day in days], [closed.get(day, 0) for day in days]
+
+
+def _materials_under_dotation(start: date, end: date) -> List[int]:
+    """Materials whose last known level at each day end is below dotation.
+
+    Levels come from the inventory snapshots. Before its first snapshot a
+    material is assumed to be at that first level, or at its current stock
+    when it was never snapshotted.
+    """
+
+    timeline = _Timeline(start, end)
+    materials = db.session.execute(select(Material.id, Material.dotation, Material.stock)).all()
+    snapshots: Dict[int, List[tuple]] = {}
+    rows = db.session.execute(
+        select(InventorySnapshot.material_id, InventorySnapshot.taken_at, InventorySnapshot.available)
+        .where(InventorySnapshot.taken_at < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+        .order_by(InventorySnapshot.material_id, InventorySnapshot.taken_at, InventorySnapshot.id)
+    )
+    for material_id, taken_at, available in rows:
+        snapshots.setdefault(material_id, []).append((_as_date(taken_at), available))
+
+    for material_id, dotation, stock in materials:
+        history = snapshots.get(material_id)
+        level = history[0][1] if history else stock or 0
+        under = level < (dotation or 0)
+        if under:
+            timeline.shift(start, 1)
+        for day, available in history or ():
+            now_under = available < (dotation or 0)
+            if now_under != under:
+                timeline.shift(day, 1 if now_under else -1)
+                under = now_under
+    return timeline.counts()
+
+
+def compute_daily_kpis(start: date, end: date) -> List[dict]:
+    """Return one rollup row per day of ``[start, end]``."""
+
+    pending, in_progress, completed = _task_timelines(start, end)
+    visits_started, visits_closed = _visit_events(start, end)
+    under_dotation = _materials_under_dotation(start, end)
+    # Overlapping statuses are resolved per person by the availability index.
+    on_site = on_site_days(start, end)
+    computed_at = datetime.utcnow()
+    return [
+        {
+            "day": start + timedelta(days=offset),
+            "tasks_pending": pending[offset],
+            "tasks_in_progress": in_progress[offset],
+            "tasks_completed": completed[offset],
+            "visits_started": visits_started[offset],
+            "visits_closed": visits_closed[offset],
+            "materials_under_dotation": under_dotation[offset],
+            "personnel_on_site": on_site[offset],
+            "computed_at": computed_at,
+        }
+        for offset in range((end - start).days + 1)
+    ]
+
+
+def _first_activity_day() -> Optional[date]:
+    candidates = db.session.execute(
+        select(
+            select(func.min(MaintenanceVisit.start_date)).scalar_subquery(),
+            select(func.min(PersonnelStatus.start_date)).scalar_subquery(),
+        )
+    ).one()
+    days = [_as_date(value) for value in candidates if value is not None]
+    return min(days) if days else None
+
+
+def rollup_kpis(since: Optional[date] = None, until: Optional[date] = None, rebuild: bool = False) -> RollupResult:
+    """Roll up every day of ``[since, until]`` that has no row yet.
+
+    ``since`` defaults to the first visit or personnel status and ``until``
+    to yesterday. ``rebuild`` recomputes the days that were already rolled up.
+    """
+
+    until = until or date.today() - timedelta(days=1)
+    since = since or _first_activity_day()
+    if since is None or since > until:
+        return RollupResult(days=0)
+
+    window = DailyKpiRollup.day.between(since, until)
+    if rebuild:
+        db.session.execute(delete(DailyKpiRollup).where(window))
+        existing = set()
+    else:
+        existing = set(db.session.scalars(select(DailyKpiRollup.day).where(window)))
+    missing = [
+        day
+        for day in (since + timedelta(days=offset) for offset in range((until - since).days + 1))
+        if day not in existing
+    ]
+    if not missing:
+        return RollupResult(days=0)
+
+    missing_set = set(missing)
+    rows = [row for row in compute_daily_kpis(missing[0], missing[-1]) if row["day"] in missing_set]
+    bulk_insert(DailyKpiRollup, rows)
+    db.session.commit()
+    return RollupResult(days=len(rows), first_day=missing[0], last_day=missing[-1])
+
+
+def register_rollup_commands(app):
+    @app.cli.command("rollup-kpis")
+    @click.option("--since", type=click.DateTime(formats=["%Y-%m-%d"]), help="First day (default: first activity).")
+    @click.option("--until", type=click.DateTime(formats=["%Y-%m-%d"]), help="Last day (default: yesterday).")
+    @click.option("--rebuild", is_flag=True, help="Recompute days that were already rolled up.")
+    def rollup_kpis_command(since, until, rebuild):
+        """Aggregate daily fleet KPIs for the days not rolled up yet."""
+
+        started = time.perf_counter()
+        result = rollup_kpis(
+            since=since.date() if since else None,
+            until=until.date() if until else None,
+            rebuild=rebuild,
+        )
+        elapsed = time.perf_counter() - started
+        if not result.days:
+            click.echo("Aucun jour à agréger.")
+            return
+        click.echo(
+            f"{result.days} jour(s) agrégé(s) du {result.first_day:%d/%m/%Y} "
+            f"au {result.last_day:%d/%m/%Y} en {elapsed:.2f}s"
+        )
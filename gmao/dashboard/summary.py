@@ -0,0 +1,351 @@
+"""Dashboard KPIs and charts computed with a handful of grouped queries.
+
+The summary and the chart payloads only hold plain values (no ORM
+instances) so they can be cached across requests. They are kept for
+``DASHBOARD_CACHE_TTL`` seconds and dropped as soon as a transaction writing
+to one of :data:`DEPENDENT_TABLES` commits.
+
+Charts are served separately by the dashboard API. When the cache is cold,
+every missing chart is computed at once on a thread pool, each with its own
+session, and concurrent requests for a chart wait on the same computation.
+"""
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from dateutil.relativedelta import relativedelta
+from flask import current_app
+from sqlalchemy.pool import StaticPool
+from sqlalchemy import func, literal, select, union_all
+
+from ..extensions import db
+from ..models import (
+    Aircraft,
+    DailyKpiRollup,
+    MaintenanceTask,
+    MaintenanceVisit,
+    Material,
+)
+from ..personnel.availability import count_available
+from ..utils.cache import get_cache
+from ..utils.executors import get_thread_pool
+
+DASHBOARD_CACHE = "dashboard"
+DEPENDENT_TABLES = {
+    "aircraft",
+    "daily_kpi_rollups",
+    "maintenance_tasks",
+    "maintenance_visits",
+    "materials",
+    "personnel_statuses",
+    "users",
+}
+VISIT_PROGRESS_MONTHS = 6
+KPI_TREND_MONTHS = 36
+CRITICAL_MATERIALS_LIMIT = 5
+SHORTAGE_CHART_LIMIT = 7
+
+
+@dataclass(frozen=True)
+class OngoingVisit:
+    id: int
+    name: str
+    tail_number: str
+    vp_type: str
+    status: str
+    start_date: date
+
+
+@dataclass(frozen=True)
+class CriticalMaterial:
+    id: int
+    designation: str
+    category: Optional[str]
+    dotation: int
+    stock: int
+
+
+@dataclass
+class DashboardSummary:
+    aircraft_total: int = 0
+    pending_tasks: int = 0
+    available_personnel: int = 0
+    tasks_today: int = 0
+    ongoing_visits: List[OngoingVisit] = field(default_factory=list)
+    critical_materials: List[CriticalMaterial] = field(default_factory=list)
+    task_status_counts: List[tuple] = field(default_factory=list)
+    generated_at: datetime = field(default_factory=datetime.utcnow)
+
+
+def _dashboard_cache():
+    return get_cache(
+        DASHBOARD_CACHE,
+        maxsize=16,
+        ttl=current_app.config.get("DASHBOARD_CACHE_TTL", 60),
+        depends_on=DEPENDENT_TABLES,
+    )
+
+
+def get_dashboard_summary(today: Optional[date] = None) -> DashboardSummary:
+    """Return the cached summary for ``today``, computing it when missing."""
+
+    today = today or date.today()
+    # Keyed by day: "tasks today" and the month window move at midnight.
+    return _dashboard_cache().get_or_set((today, "summary"), lambda: build_dashboard_summary(today))
+
+
+def build_dashboard_summary(today: Optional[date] = None) -> DashboardSummary:
+    today = today or date.today()
+    summary = DashboardSummary()
+    _load_counters(summary, today)
+    summary.task_status_counts = _task_status_counts()
+    # NULL statuses are not open tasks, as with ``status != 'completed'`` in SQL.
+    summary.pending_tasks = sum(
+        count for status, count in summary.task_status_counts if status is not None and status != "completed"
+    )
+    summary.ongoing_visits = _ongoing_visits()
+    summary.critical_materials = _critical_materials()
+    return summary
+
+
+def _load_counters(summary: DashboardSummary, today: date) -> None:
+    day_start = datetime.combine(today, datetime.min.time())
+    row = db.session.execute(
+        select(
+            select(func.count(Aircraft.id)).scalar_subquery(),
+            select(func.count(MaintenanceTask.id))
+            .where(MaintenanceTask.started_at >= day_start)
+            .scalar_subquery(),
+        )
+    ).one()
+    summary.aircraft_total, summary.tasks_today = row
+    summary.available_personnel = count_available(today)
+
+
+def _task_status_counts():
+    rows = db.session.execute(
+        select(MaintenanceTask.status, func.count(MaintenanceTask.id)).group_by(MaintenanceTask.status)
+    ).all()
+    return [tuple(row) for row in sorted(rows, key=lambda item: item[0] or "")]
+
+
+def build_task_status_chart(today: Optional[date] = None) -> Dict[str, list]:
+    status_counts = _task_status_counts()
+    return {
+        "labels": [status or "Non défini" for status, _ in status_counts],
+        "datasets": [{"label": "Répartition des tâches", "data": [count for _, count in status_counts]}],
+    }
+
+
+def _ongoing_visits() -> List[OngoingVisit]:
+    rows = db.session.execute(
+        select(
+            MaintenanceVisit.id,
+            MaintenanceVisit.name,
+            Aircraft.tail_number,
+            MaintenanceVisit.vp_type,
+            MaintenanceVisit.status,
+            MaintenanceVisit.start_date,
+        )
+        .join(Aircraft, MaintenanceVisit.aircraft_id == Aircraft.id)
+        .where(MaintenanceVisit.status == "ongoing")
+        .order_by(MaintenanceVisit.id)
+    ).all()
+    return [OngoingVisit(*row) for row in rows]
+
+
+def _critical_materials() -> List[CriticalMaterial]:
+    rows = db.session.execute(
+        select(Material.id, Material.designation, Material.category, Material.dotation, Material.stock)
+        .where(Material.stock < Material.dotation)
+        .order_by(Material.id)
+        .limit(CRITICAL_MATERIALS_LIMIT)
+    ).all()
+    return [CriticalMaterial(*row) for row in rows]
+
+
+def build_material_shortages_chart(today: Optional[date] = None) -> Dict[str, list]:
+    rows = db.session.execute(
+        select(Material.designation, Material.dotation, Material.stock)
+        .where(Material.dotation > Material.stock)
+        .order_by((Material.dotation - Material.stock).desc())
+        .limit(SHORTAGE_CHART_LIMIT)
+    ).all()
+    return {
+        "labels": [row.designation for row in rows],
+        "datasets": [
+            {"label": "Dotation", "data": [row.dotation for row in rows]},
+            {"label": "Stock", "data": [row.stock for row in rows]},
+        ],
+    }
+
+
+def month_bucket(column):
+    """``YYYY-MM`` key of a date column, computed by the database."""
+
+    if db.engine.dialect.name == "sqlite":
+        return func.strftime("%Y-%m", column)
+    return func.to_char(column, "YYYY-MM")
+
+
+def build_visit_progress_chart(today: Optional[date] = None) -> Dict[str, list]:
+    """Visits started and closed per month over the last six months.
+
+    Counted live from ``maintenance_visits``: visits can be created, dated
+    back or moved within the window after the KPI rollup was computed.
+    """
+
+    today = today or date.today()
+    current_month = today.replace(day=1)
+    months = [current_month - relativedelta(months=offset) for offset in range(VISIT_PROGRESS_MONTHS - 1, -1, -1)]
+    window_start, window_end = months[0], current_month + relativedelta(months=1)
+
+    def bucketed(column, kind: str):
+        bucket = month_bucket(column)
+        return (
+            select(literal(kind).label("kind"), bucket.label("month"), func.count().label("total"))
+            .where(column >= window_start, column < window_end)
+            .group_by(bucket)
+        )
+
+    rows = db.session.execute(
+        union_all(
+            bucketed(MaintenanceVisit.start_date, "started"),
+            bucketed(MaintenanceVisit.end_date, "completed"),
+        )
+    ).all()
+    counts = {(kind, month): total for kind, month, total in rows}
+    keys = [month.strftime("%Y-%m") for month in months]
+    return {
+        "labels": [month.strftime("%m/%Y") for month in months],
+        "datasets": [
+            {"label": "Visites démarrées", "data": [counts.get(("started", key), 0) for key in keys]},
+            {"label": "Visites clôturées", "data": [counts.get(("completed", key), 0) for key in keys]},
+        ],
+    }
+
+
+def build_kpi_trend_chart(today: Optional[date] = None) -> Dict[str, list]:
+    """Monthly fleet trend over three years, read from the KPI rollup only."""
+
+    today = today or date.today()
+    current_month = today.replace(day=1)
+    months = [current_month - relativedelta(months=offset) for offset in range(KPI_TREND_MONTHS - 1, -1, -1)]
+    bucket = month_bucket(DailyKpiRollup.day)
+    rows = db.session.execute(
+        select(
+            bucket,
+            func.avg(DailyKpiRollup.tasks_in_progress),
+            func.sum(DailyKpiRollup.visits_started),
+            func.avg(DailyKpiRollup.materials_under_dotation),
+            func.avg(DailyKpiRollup.personnel_on_site),
+        )
+        .where(DailyKpiRollup.day >= months[0])
+        .group_by(bucket)
+    ).all()
+    by_month = {row[0]: row[1:] for row in rows}
+    keys = [month.strftime("%Y-%m") for month in months]
+    labels = ["Tâches en cours (moy.)", "Visites démarrées", "Matériels sous dotation (moy.)", "Personnel sur site (moy.)"]
+    return {
+        "labels": [month.strftime("%m/%Y") for month in months],
+        "datasets": [
+            {
+                "label": label,
+                "data": [round(float(by_month[key][index] or 0), 1) if key in by_month else 0 for key in keys],
+            }
+            for index, label in enumerate(labels)
+        ],
+    }
+
+
+CHART_BUILDERS: Dict[str, Callable[[date], Dict[str, list]]] = {
+    "task-status": build_task_status_chart,
+    "visit-progress": build_visit_progress_chart,
+    "material-shortages": build_material_shortages_chart,
+    "kpi-trend": build_kpi_trend_chart,
+}
+
+_inflight: Dict[tuple, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _build_chart_in_context(app, name: str, today: date) -> Dict[str, list]:
+    with app.app_context():
+        try:
+            return CHART_BUILDERS[name](today)
+        finally:
+            db.session.remove()
+
+
+def _can_build_concurrently() -> bool:
+    # A StaticPool shares one connection (in-memory SQLite): a worker session
+    # releasing it would roll back the request's transaction.
+    return current_app.config.get("DASHBOARD_CHART_WORKERS", 3) > 0 and not isinstance(db.engine.pool, StaticPool)
+
+
+def get_charts(names: Iterable[str], today: Optional[date] = None) -> Dict[str, Dict[str, list]]:
+    """Return the payloads of the charts ``names``, computing the missing ones.
+
+    Missing charts are built concurrently on the dashboard pool. A chart that
+    another request is already building is awaited rather than rebuilt.
+    """
+
+    today = today or date.today()
+    cache = _dashboard_cache()
+    charts: Dict[str, Dict[str, list]] = {}
+    missing: List[str] = []
+    for name in names:
+        payload = cache.get((today, name))
+        if payload is None:
+            missing.append(name)
+        else:
+            charts[name] = payload
+    if not missing:
+        return charts
+
+    if not _can_build_concurrently():
+        for name in missing:
+            charts[name] = CHART_BUILDERS[name](today)
+            cache.set((today, name), charts[name])
+        return charts
+
+    app = current_app._get_current_object()
+    pool = get_thread_pool("dashboard", current_app.config.get("DASHBOARD_CHART_WORKERS", 3))
+    futures: Dict[str, Future] = {}
+    owned: List[str] = []
+    with _inflight_lock:
+        for name in missing:
+            key = (app, today, name)
+            future = _inflight.get(key)
+            if future is None:
+                future = _inflight[key] = pool.submit(_build_chart_in_context, app, name, today)
+                owned.append(name)
+            futures[name] = future
+    try:
+        for name, future in futures.items():
+            charts[name] = future.result()
+            if name in owned:
+                cache.set((today, name), charts[name])
+    finally:
+        with _inflight_lock:
+            for name in owned:
+                _inflight.pop((app, today, name), None)
+    return charts
+
+
+def get_chart(name: str, today: Optional[date] = None) -> Dict[str, list]:
+    """Return one chart payload; on a cold cache every chart is warmed at once.
+
+    The dashboard page requests all of its charts in parallel, so building
+    them together on the first request lets the others find them ready.
+    """
+
+    today = today or date.today()
+    payload = _dashboard_cache().get((today, name))
+    if payload is None:
+        payload = get_charts(CHART_BUILDERS, today)[name]
+    return payload
@@ -348,6 +348,25 @@ JOB_CARD_PACKAGES: Dict[str, List[str]] = {
 }
 
 
+# Months between two visits of each package, lightest first. Each package
+# includes the job cards of the lighter ones.
+PACKAGE_PERIODICITY_MONTHS: Dict[str, int] = {
+    "A": 9,
+    "B": 18,
+    "C": 36,
+    "D1": 72,
+    "D2": 144,
+}
+# Usual hangar time of each package, for visits planned without an end date.
+PACKAGE_DURATION_DAYS: Dict[str, int] = {
+    "A": 7,
+    "B": 14,
+    "C": 21,
+    "D1": 60,
+    "D2": 90,
+}
+
+
 def normalize_visit_type(value: str | None) -> str:
     """Normalize the visit type string used in forms."""
     if not value:
@@ -0,0 +1,348 @@
+"""Rolling fleet plan: next due packages and hangar overloads.
+
+The planned and projected visits of :mod:`gmao.maintenance.schedule` are
+cached per aircraft in ``fleet_plan_entries``. ``fleet_plan_states``
+records the month and horizon each aircraft was computed for. Committing a
+change to the visits of an aircraft drops its state, and
+:func:`refresh_plan` recomputes only the aircraft without a current state.
+The whole plan rolls over when the month changes.
+
+The next due date of a package is the due date of the first upcoming
+visit that covers it, i.e. of that package or a heavier one. A day is
+overloaded when more aircraft are in the hangar than ``HANGAR_CAPACITY``;
+each visit takes its days from ``start_date`` to ``end_date`` included.
+Open visits that started before the month are kept in the plan from its
+first day; they are stored as planned entries whose ``due_date`` (their
+actual start) precedes ``start_date``.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+import click
+import numpy as np
+from flask import current_app
+from sqlalchemy import delete, event, or_, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import Session
+
+from ..extensions import db
+from ..models import Aircraft, FleetPlanEntry, FleetPlanState, MaintenanceVisit
+from ..utils.bulk import bulk_insert
+from .schedule import PACKAGES, ProjectedVisits, month_index, month_start, project_visits
+
+_STALE_KEY = "gmao.stale_plan_aircraft"
+_DROPPED_KEY = "gmao.dropped_plan_aircraft"
+
+
+def mark_plan_stale(aircraft_ids: Iterable[int], session: Optional[Session] = None) -> None:
+    """Recompute the plan of ``aircraft_ids`` once the current transaction commits (for Core bulk writes)."""
+
+    session = session or db.session()
+    session.info.setdefault(_STALE_KEY, set()).update(aircraft_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_visit_changes(session, flush_context):
+    stale = set()
+    for visit in session.new | session.dirty | session.deleted:
+        if isinstance(visit, MaintenanceVisit):
+            history = db.inspect(visit).attrs.aircraft_id.history
+            stale.update(value for value in (*history.added, *history.unchanged, *history.deleted) if value)
+    if stale:
+        mark_plan_stale(stale, session)
+    dropped = {aircraft.id for aircraft in session.deleted if isinstance(aircraft, Aircraft)}
+    if dropped:
+        session.info.setdefault(_DROPPED_KEY, set()).update(dropped)
+
+
+@event.listens_for(Session, "before_commit")
+def _drop_stale_plans(session):
+    session.flush()
+    stale = session.info.pop(_STALE_KEY, set())
+    dropped = session.info.pop(_DROPPED_KEY, set())
+    if stale or dropped:
+        _delete_plan(stale | dropped, session, entries=bool(dropped))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_visit_changes(session):
+    session.info.pop(_STALE_KEY, None)
+    session.info.pop(_DROPPED_KEY, None)
+
+
+def _delete_plan(aircraft_ids: Iterable[int], session: Session, entries: bool = True) -> None:
+    aircraft_ids = sorted(aircraft_ids)
+    for offset in range(0, len(aircraft_ids), 500):
+        chunk = aircraft_ids[offset : offset + 500]
+        session.execute(delete(FleetPlanState).where(FleetPlanState.aircraft_id.in_(chunk)))
+        if entries:
+            session.execute(delete(FleetPlanEntry).where(FleetPlanEntry.aircraft_id.in_(chunk)))
+
+
+def stale_aircraft(today: date, months: int) -> List[int]:
+    first_day = month_start(month_index(today))
+    return list(
+        db.session.scalars(
+            select(Aircraft.id)
+            .outerjoin(FleetPlanState, FleetPlanState.aircraft_id == Aircraft.id)
+            .where(
+                or_(
+                    FleetPlanState.aircraft_id.is_(None),
+                    FleetPlanState.computed_for != first_day,
+                    FleetPlanState.months < months,
+                )
+            )
+            .order_by(Aircraft.id)
+        )
+    )
+
+
+def refresh_plan(today: Optional[date] = None, months: Optional[int] = None, full: bool = False) -> List[int]:
+    """Recompute the plan of the stale aircraft, or of all with ``full``; the caller commits."""
+
+    today = today or date.today()
+    months = months or current_app.config["FLEET_PLAN_MONTHS"]
+    if full:
+        aircraft_ids = list(db.session.scalars(select(Aircraft.id).order_by(Aircraft.id)))
+    else:
+        aircraft_ids = stale_aircraft(today, months)
+    if not aircraft_ids:
+        return []
+    visits = project_visits(today, months, aircraft_ids)
+    try:
+        with db.session.begin_nested():
+            _write_plan(aircraft_ids, months, visits)
+    except (IntegrityError, OperationalError) as exc:
+        # Another request refreshed the same aircraft first (state primary key
+        # taken, or SQLite write lock): its plan is read instead.
+        if isinstance(exc, OperationalError) and "locked" not in str(exc).lower():
+            raise
+        return []
+    return aircraft_ids
+
+
+def _write_plan(aircraft_ids: List[int], months: int, visits: ProjectedVisits) -> None:
+    _delete_plan(aircraft_ids, db.session())
+    ids = np.array(aircraft_ids, dtype=np.int64)[visits.aircraft].tolist()
+    bulk_insert(
+        FleetPlanEntry,
+        [
+            {
+                "aircraft_id": aircraft_id,
+                "package": PACKAGES[package],
+                "due_date": due,
+                "start_date": start,
+                "end_date": end,
+                "planned": planned,
+            }
+            for aircraft_id, package, due, start, end, planned in zip(
+                ids,
+                visits.package.tolist(),
+                visits.due.tolist(),
+                visits.start.tolist(),
+                visits.end.tolist(),
+                visits.planned.tolist(),
+            )
+        ],
+    )
+    computed_for = month_start(visits.first_month)
+    bulk_insert(
+        FleetPlanState,
+        [{"aircraft_id": aircraft_id, "computed_for": computed_for, "months": months} for aircraft_id in aircraft_ids],
+    )
+
+
+@dataclass
+class HangarConflict:
+    start: date
+    # Last overloaded day.
+    end: date
+    peak: int
+    # (tail number, package, start date) of the visits in the hangar during the conflict.
+    visits: List[Tuple[str, str, date]]
+
+
+@dataclass
+class FleetPlan:
+    first_day: date
+    # First day after the horizon.
+    end_day: date
+    capacity: int
+    aircraft: List[Tuple[int, str]]
+    # Rows follow ``aircraft``, columns follow ``PACKAGES``; None when not due within the horizon.
+    next_due: List[List[Optional[date]]]
+    # (aircraft id, package, due date, start date, end date, planned), by start date.
+    entries: List[tuple]
+    conflicts: List[HangarConflict]
+    recomputed: int = 0
+    seconds: float = 0.0
+
+    def summary(self) -> str:
+        overdue = sum(1 for entry in self.entries if not entry[5] and entry[2] < self.first_day)
+        return (
+            f"{len(self.entries)} visite(s) pour {len(self.aircraft)} appareil(s) jusqu'au "
+            f"{self.end_day - timedelta(days=1):%d/%m/%Y}, {overdue} en retard, "
+            f"{len(self.conflicts)} dépassement(s) de capacité hangar ({self.capacity}) — "
+            f"{self.recomputed} appareil(s) recalculé(s) en {self.seconds:.2f}s"
+        )
+
+    def as_dict(self) -> dict:
+        tails = dict(self.aircraft)
+        return {
+            "first_day": self.first_day.isoformat(),
+            "end_day": self.end_day.isoformat(),
+            "capacity": self.capacity,
+            "packages": PACKAGES,
+            "aircraft": [
+                {
+                    "id": aircraft_id,
+                    "tail_number": tail_number,
+                    "next_due": {
+                        package: due.isoformat() if due else None for package, due in zip(PACKAGES, next_due)
+                    },
+                }
+                for (aircraft_id, tail_number), next_due in zip(self.aircraft, self.next_due)
+            ],
+            "visits": [
+                {
+                    "aircraft_id": aircraft_id,
+                    "tail_number": tails.get(aircraft_id),
+                    "package": package,
+                    "due_date": due.isoformat(),
+                    "start_date": start.isoformat(),
+                    "end_date": end.isoformat(),
+                    "planned": planned,
+                }
+                for aircraft_id, package, due, start, end, planned in self.entries
+            ],
+            "conflicts": [
+                {
+                    "start": conflict.start.isoformat(),
+                    "end": conflict.end.isoformat(),
+                    "peak": conflict.peak,
+                    "visits": [
+                        {"tail_number": tail, "package": package, "start_date": start.isoformat()}
+                        for tail, package, start in conflict.visits
+                    ],
+                }
+                for conflict in self.conflicts
+            ],
+            "recomputed": self.recomputed,
+            "seconds": round(self.seconds, 3),
+        }
+
+
+def hangar_conflicts(
+    first_day: date, end_day: date, starts: np.ndarray, ends: np.ndarray, capacity: int
+) -> List[Tuple[int, int, int]]:
+    """Runs of days over ``capacity`` as (first offset, last offset, peak), from inclusive ``datetime64[D]`` bounds."""
+
+    days = (end_day - first_day).days
+    origin = np.datetime64(first_day, "D")
+    first = np.clip((starts - origin).astype(np.int64), 0, days)
+    last = np.clip(np.maximum((ends - origin).astype(np.int64) + 1, first + 1), 0, days)
+    occupancy = np.zeros(days + 1, dtype=np.int64)
+    np.add.at(occupancy, first, 1)
+    np.add.at(occupancy, last, -1)
+    occupancy = np.cumsum(occupancy[:-1])
+    over = np.concatenate([[False], occupancy > capacity, [False]])
+    edges = np.flatnonzero(over[1:] != over[:-1])
+    return [
+        (int(begin), int(stop) - 1, int(occupancy[begin:stop].max())) for begin, stop in zip(edges[::2], edges[1::2])
+    ]
+
+
+def load_plan(today: Optional[date] = None, months: Optional[int] = None, full: bool = False) -> FleetPlan:
+    """Refresh the stale aircraft (all with ``full``), then read the plan for ``months`` months; the caller commits."""
+
+    started = time.perf_counter()
+    today = today or date.today()
+    months = months or current_app.config["FLEET_PLAN_MONTHS"]
+    capacity = current_app.config["HANGAR_CAPACITY"]
+    recomputed = refresh_plan(today, months, full)
+    first = month_index(today)
+    first_day, end_day = month_start(first), month_start(first + months)
+
+    aircraft = db.session.execute(select(Aircraft.id, Aircraft.tail_number).order_by(Aircraft.tail_number)).all()
+    rows = {aircraft_id: row for row, (aircraft_id, _) in enumerate(aircraft)}
+    entries = db.session.execute(
+        select(
+            FleetPlanEntry.aircraft_id,
+            FleetPlanEntry.package,
+            FleetPlanEntry.due_date,
+            FleetPlanEntry.start_date,
+            FleetPlanEntry.end_date,
+            FleetPlanEntry.planned,
+        )
+        .where(FleetPlanEntry.start_date < end_day)
+        .order_by(FleetPlanEntry.start_date, FleetPlanEntry.aircraft_id)
+    ).all()
+    entries = [tuple(entry) for entry in entries if entry[0] in rows]
+
+    row = np.array([rows[entry[0]] for entry in entries], dtype=np.int64)
+    package = np.array([PACKAGES.index(entry[1]) for entry in entries], dtype=np.int64)
+    due, starts, ends = (np.array([entry[index] for entry in entries], dtype="datetime64[D]") for index in (2, 3, 4))
+    ongoing = np.array([entry[5] for entry in entries], dtype=bool) & (due < starts)
+
+    # First due date per aircraft and package, then carried to the lighter packages it covers.
+    never = np.iinfo(np.int64).max
+    first_due = np.full((len(aircraft), len(PACKAGES)), never, dtype=np.int64)
+    np.minimum.at(first_due, (row[~ongoing], package[~ongoing]), due[~ongoing].astype(np.int64))
+    first_due = np.minimum.accumulate(first_due[:, ::-1], axis=1)[:, ::-1]
+    next_due = [
+        [None if value == never else date(1970, 1, 1) + timedelta(days=int(value)) for value in values]
+        for values in first_due.tolist()
+    ]
+
+    tails = dict(aircraft)
+    conflicts = []
+    for begin, stop, peak in hangar_conflicts(first_day, end_day, starts, ends, capacity):
+        begin_day, stop_day = first_day + timedelta(days=begin), first_day + timedelta(days=stop)
+        inside = (starts <= np.datetime64(stop_day, "D")) & (np.maximum(ends, starts) >= np.datetime64(begin_day, "D"))
+        conflicts.append(
+            HangarConflict(
+                start=begin_day,
+                end=stop_day,
+                peak=peak,
+                visits=[
+                    (tails[entries[index][0]], entries[index][1], entries[index][3]) for index in np.flatnonzero(inside)
+                ],
+            )
+        )
+    return FleetPlan(
+        first_day=first_day,
+        end_day=end_day,
+        capacity=capacity,
+        aircraft=[tuple(item) for item in aircraft],
+        next_due=next_due,
+        entries=entries,
+        conflicts=conflicts,
+        recomputed=len(recomputed),
+        seconds=time.perf_counter() - started,
+    )
+
+
+def register_planner_commands(app):
+    @app.cli.command("fleet-plan")
+    @click.option("--months", type=int, default=None, help="Horizon in months (FLEET_PLAN_MONTHS by default).")
+    @click.option("--full", is_flag=True, help="Recompute every aircraft, not only the stale ones.")
+    def fleet_plan_command(months, full):
+        """Refresh the fleet plan and list the next due packages and hangar overloads."""
+
+        plan = load_plan(months=months, full=full)
+        db.session.commit()
+        click.echo(plan.summary())
+        for (_, tail_number), next_due in zip(plan.aircraft, plan.next_due):
+            dues = ", ".join(
+                f"{package} {due:%d/%m/%Y}" if due else f"{package} —" for package, due in zip(PACKAGES, next_due)
+            )
+            click.echo(f"{tail_number} : {dues}")
+        for conflict in plan.conflicts:
+            visits = ", ".join(f"{tail} {package}" for tail, package, _ in conflict.visits)
+            click.echo(
+                f"Hangar plein du {conflict.start:%d/%m/%Y} au {conflict.end:%d/%m/%Y} ({conflict.peak}) : {visits}"
+            )
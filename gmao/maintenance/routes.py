@@ -2,7 +2,7 @@ from datetime import date, datetime
 
 from typing import Dict, Iterable, List
 
-from flask import Blueprint, flash, redirect, render_template, request, url_for
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, url_for
 from flask_login import login_required
 
 from ..extensions import db
@@ -13,19 +13,13 @@ from ..models import (
     MaintenanceVisit,
     Material,
     MaterialRequirement,
-    PersonnelStatus,
     User,
     Workshop,
 )
-from .packages import normalize_visit_type, package_for_visit
+from .packages import PACKAGE_PERIODICITY_MONTHS, normalize_visit_type, package_for_visit
+from .planner import load_plan
 
-PACKAGE_PERIODICITY_MONTHS = {
-    "A": 9,
-    "B": 18,
-    "C": 36,
-    "D1": 72,
-    "D2": 144,
-}
+MAX_PLAN_MONTHS = 240
 
 bp = Blueprint("maintenance", __name__, url_prefix="/maintenance")
 
@@ -42,6 +36,19 @@ def index():
     return render_template("maintenance/index.html", visits=visits, aircrafts=aircrafts)
 
 
+@bp.route("/plan")
+@login_required
+def plan():
+    """Next due packages, planned and projected visits and hangar overloads of the fleet."""
+
+    months = request.args.get("months", type=int)
+    if months is not None:
+        months = min(max(months, 1), MAX_PLAN_MONTHS)
+    fleet_plan = load_plan(months=months)
+    db.session.commit()
+    return jsonify(fleet_plan.as_dict())
+
+
 @bp.route("/create", methods=["POST"])
 @login_required
 def create():
@@ -90,7 +97,6 @@ def detail(visit_id: int):
     workshops = Workshop.query.order_by(Workshop.name).all()
     personnel = User.query.order_by(User.rank.desc()).all()
     materials = Material.query.order_by(Material.designation).all()
-    statuses = PersonnelStatus.query.filter_by(status="on-site").all()
     job_cards = JobCard.query.order_by(JobCard.card_number).all()
     aircrafts = Aircraft.query.order_by(Aircraft.tail_number).all()
     tasks = visit.tasks.order_by(MaintenanceTask.name).all()
@@ -104,7 +110,6 @@ def detail(visit_id: int):
         workshops=workshops,
         personnel=personnel,
         materials=materials,
-        statuses=statuses,
         job_cards=job_cards,
         aircrafts=aircrafts,
         tasks=tasks,
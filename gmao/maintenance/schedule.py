@@ -0,0 +1,245 @@
+"""Upcoming package visits of the fleet, projected from their periodicity.
+
+Each package (A, B, C, D1, D2) of an aircraft falls due
+``PACKAGE_PERIODICITY_MONTHS`` months after its last visit. A visit
+includes the lighter packages, so it restarts their clock too, and when
+several packages fall due in the same month only the heaviest is
+projected. A package never recorded for an aircraft is counted from the
+aircraft's first visit, or from the current month for an aircraft
+without any visit.
+
+Visits started before the current month, or completed, make the history.
+The other ones are planned: they are kept as they are and take the place
+of the projection in their month. An overdue visit is projected on the
+first day of the current month, so the result only depends on the month
+it is computed in. The projection walks the horizon month by month, each
+step working on every aircraft and package at once.
+
+Open visits started before the current month and still running are part
+of the history, but they are also returned as ``ongoing``, from the first
+day of the month, since they still hold a hangar place. A visit lasts from
+its start to its end date included, ``PACKAGE_DURATION_DAYS`` when it has
+no end date.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import func, or_, select
+
+from ..extensions import db
+from ..models import Aircraft, MaintenanceVisit
+from .packages import PACKAGE_DURATION_DAYS, PACKAGE_PERIODICITY_MONTHS, normalize_visit_type
+
+PACKAGES: List[str] = list(PACKAGE_PERIODICITY_MONTHS)
+PERIODS = np.array([PACKAGE_PERIODICITY_MONTHS[package] for package in PACKAGES], dtype="timedelta64[M]")
+DURATIONS = np.array([PACKAGE_DURATION_DAYS[package] for package in PACKAGES], dtype="timedelta64[D]")
+
+
+def month_index(day: date) -> int:
+    return day.year * 12 + day.month - 1
+
+
+def month_start(index: int) -> date:
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def package_index(vp_type: Optional[str]) -> int:
+    """Index of the visit type in ``PACKAGES``, -1 for other visits."""
+
+    key = normalize_visit_type(vp_type)
+    return PACKAGES.index(key) if key in PACKAGE_PERIODICITY_MONTHS else -1
+
+
+def add_months(days: np.ndarray, months: np.ndarray) -> np.ndarray:
+    """``days`` plus ``months``, on the same day of the month or the last day of shorter months."""
+
+    month = days.astype("datetime64[M]")
+    day = days - month.astype("datetime64[D]")
+    target = month + months
+    length = (target + 1).astype("datetime64[D]") - target.astype("datetime64[D]")
+    return target.astype("datetime64[D]") + np.minimum(day, length - 1)
+
+
+@dataclass
+class ProjectedVisits:
+    first_month: int
+    months: int
+    aircraft_ids: List[int]
+    # One entry per visit, by month: row in ``aircraft_ids`` and index in ``PACKAGES``.
+    aircraft: np.ndarray
+    package: np.ndarray
+    # ``datetime64[D]`` arrays; ``due`` is before ``start`` for overdue and ongoing visits.
+    due: np.ndarray
+    start: np.ndarray
+    end: np.ndarray
+    # True for the visits already planned, False for the projected ones.
+    planned: np.ndarray
+    # True for the planned visits that started before the current month.
+    ongoing: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    @property
+    def month(self) -> np.ndarray:
+        return self.start.astype("datetime64[M]").astype(np.int64) + 1970 * 12
+
+    def counts(self) -> np.ndarray:
+        """Visits per month (rows) and package (columns), leaving out the ongoing ones."""
+
+        counts = np.zeros((self.months, len(PACKAGES)), dtype=np.int64)
+        upcoming = ~self.ongoing
+        np.add.at(counts, (self.month[upcoming] - self.first_month, self.package[upcoming]), 1)
+        return counts
+
+
+def _history_filter(first_day: date):
+    return or_(MaintenanceVisit.start_date < first_day, MaintenanceVisit.status == "completed")
+
+
+def last_visit_dates(aircraft_ids: List[int], first_day: date) -> np.ndarray:
+    """Date of the last visit before ``first_day`` of each aircraft (rows) and package (columns).
+
+    Packages never recorded get the date of the aircraft's first visit, or
+    ``first_day`` when the aircraft has none.
+    """
+
+    rows = {aircraft_id: row for row, aircraft_id in enumerate(aircraft_ids)}
+    history = db.session.execute(
+        select(
+            MaintenanceVisit.aircraft_id,
+            MaintenanceVisit.vp_type,
+            func.min(MaintenanceVisit.start_date),
+            func.max(MaintenanceVisit.start_date),
+        )
+        .where(_history_filter(first_day), MaintenanceVisit.aircraft_id.in_(aircraft_ids))
+        .group_by(MaintenanceVisit.aircraft_id, MaintenanceVisit.vp_type)
+    ).all()
+    never = np.datetime64("NaT", "D")
+    last = np.full((len(aircraft_ids), len(PACKAGES)), never)
+    first = np.full(len(aircraft_ids), np.datetime64(first_day, "D"))
+    for aircraft_id, vp_type, first_date, last_date in history:
+        row = rows[aircraft_id]
+        first[row] = min(first[row], np.datetime64(first_date, "D"))
+        package = package_index(vp_type)
+        if package >= 0 and (np.isnat(last[row, package]) or last[row, package] < np.datetime64(last_date, "D")):
+            last[row, package] = last_date
+    return np.where(np.isnat(last), first[:, None], last)
+
+
+def project_visits(
+    today: Optional[date] = None, months: int = 120, aircraft_ids: Optional[List[int]] = None
+) -> ProjectedVisits:
+    """Planned and projected visits from the month of ``today`` for ``months`` months.
+
+    ``aircraft_ids`` restricts the projection to these aircraft, the whole
+    fleet by default.
+    """
+
+    today = today or date.today()
+    first = month_index(today)
+    first_day = month_start(first)
+    if aircraft_ids is None:
+        aircraft_ids = list(db.session.scalars(select(Aircraft.id).order_by(Aircraft.id)))
+    rows = {aircraft_id: row for row, aircraft_id in enumerate(aircraft_ids)}
+
+    # Heaviest package planned per month (rows) and aircraft (columns), -1 when none, with its dates.
+    planned = np.full((months, len(aircraft_ids)), -1, dtype=np.int64)
+    planned_start = np.full(planned.shape, np.datetime64("NaT", "D"))
+    planned_end = planned_start.copy()
+    for aircraft_id, vp_type, start_date, end_date in db.session.execute(
+        select(
+            MaintenanceVisit.aircraft_id,
+            MaintenanceVisit.vp_type,
+            MaintenanceVisit.start_date,
+            MaintenanceVisit.end_date,
+        ).where(
+            MaintenanceVisit.start_date >= first_day,
+            or_(MaintenanceVisit.status.is_(None), MaintenanceVisit.status != "completed"),
+            MaintenanceVisit.start_date < month_start(first + months),
+            MaintenanceVisit.aircraft_id.in_(aircraft_ids),
+        )
+    ):
+        package = package_index(vp_type)
+        offset, row = month_index(start_date) - first, rows[aircraft_id]
+        if package > planned[offset, row]:
+            planned[offset, row] = package
+            planned_start[offset, row] = start_date
+            planned_end[offset, row] = end_date or np.datetime64(start_date, "D") + DURATIONS[package] - 1
+
+    # A visit restarts the clock of its package and of every lighter one.
+    last = np.maximum.accumulate(last_visit_dates(aircraft_ids, first_day)[:, ::-1], axis=1)[:, ::-1]
+    lighter = np.arange(len(PACKAGES))[None, :]
+    visits = []
+    for offset in range(months):
+        month_begin = np.datetime64(month_start(first + offset), "D")
+        due_dates = add_months(last, PERIODS)
+        due = due_dates < np.datetime64(month_start(first + offset + 1), "D")
+        heaviest = np.where(due.any(axis=1), len(PACKAGES) - 1 - np.argmax(due[:, ::-1], axis=1), -1)
+        is_planned = planned[offset] >= 0
+        package = np.where(is_planned, planned[offset], heaviest)
+        aircraft = np.flatnonzero(package >= 0)
+        if not aircraft.size:
+            continue
+        package, is_planned = package[aircraft], is_planned[aircraft]
+        projected_due = due_dates[aircraft, package]
+        start = np.where(is_planned, planned_start[offset, aircraft], np.maximum(projected_due, month_begin))
+        end = np.where(is_planned, planned_end[offset, aircraft], start + DURATIONS[package] - 1)
+        visits.append((aircraft, package, np.where(is_planned, start, projected_due), start, end, is_planned))
+        last[aircraft] = np.where(lighter <= package[:, None], start[:, None], last[aircraft])
+
+    ongoing = _ongoing_visits(aircraft_ids, first_day)
+    aircraft, package, due, start, end, is_planned = (
+        np.concatenate(column) for column in zip(ongoing, *visits)
+    )
+    return ProjectedVisits(
+        first_month=first,
+        months=months,
+        aircraft_ids=aircraft_ids,
+        aircraft=aircraft,
+        package=package,
+        due=due,
+        start=start,
+        end=end,
+        planned=is_planned,
+        ongoing=np.arange(len(start)) < len(ongoing[0]),
+    )
+
+
+def _ongoing_visits(aircraft_ids: List[int], first_day: date) -> tuple:
+    """Open visits started before ``first_day`` and ending on or after it, as visit columns."""
+
+    rows = {aircraft_id: row for row, aircraft_id in enumerate(aircraft_ids)}
+    visits = []
+    for aircraft_id, vp_type, start_date, end_date in db.session.execute(
+        select(
+            MaintenanceVisit.aircraft_id,
+            MaintenanceVisit.vp_type,
+            MaintenanceVisit.start_date,
+            MaintenanceVisit.end_date,
+        ).where(
+            MaintenanceVisit.start_date < first_day,
+            or_(MaintenanceVisit.end_date.is_(None), MaintenanceVisit.end_date >= first_day),
+            or_(MaintenanceVisit.status.is_(None), MaintenanceVisit.status != "completed"),
+            MaintenanceVisit.aircraft_id.in_(aircraft_ids),
+        )
+    ):
+        package = package_index(vp_type)
+        if package < 0:
+            continue
+        end = np.datetime64(end_date or start_date, "D") + (0 if end_date else DURATIONS[package] - 1)
+        if end >= np.datetime64(first_day, "D"):
+            visits.append((rows[aircraft_id], package, start_date, first_day, end))
+    columns = list(zip(*visits)) or [()] * 5
+    return (
+        np.array(columns[0], dtype=np.int64),
+        np.array(columns[1], dtype=np.int64),
+        np.array(columns[2], dtype="datetime64[D]"),
+        np.array(columns[3], dtype="datetime64[D]"),
+        np.array(columns[4], dtype="datetime64[D]"),
+        np.ones(len(visits), dtype=bool),
+    )
@@ -0,0 +1,331 @@
+"""Serial status history and point-in-time counts per designation.
+
+Every status change of a serial is appended to ``material_serial_events``
+in the transaction that makes it. ORM changes are picked up by the flush
+listeners below. The bulk paths of :mod:`gmao.materials.serials` call
+:func:`record_serial_events` themselves. An event with no ``from_status``
+creates a serial, and one with no ``to_status`` deletes it. As with the
+stock counters, an empty status counts as ``stock``.
+
+Serials that predate the log get one ``baseline`` event at their
+``created_at``, with their status at the time the log was started.
+
+Counts at a date are rebuilt from the latest checkpoint before it, plus
+the events since then. Checkpoints are written once a month by
+:func:`take_checkpoints` (``flask --app gmao serial-checkpoints``).
+Without them the replay starts from the first event, which is still
+correct, only slower.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import click
+import numpy as np
+from sqlalchemy import event, exists, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from ..dashboard.summary import month_bucket
+from ..extensions import db
+from ..models import Material, MaterialSerial, MaterialSerialEvent, SerialStatusCheckpoint
+from ..utils.bulk import bulk_insert
+
+DEFAULT_STATUS = "stock"
+MAX_HISTORY_DAYS = 3660
+_PENDING_KEY = "gmao.serial_events"
+
+Counts = Dict[str, Dict[str, int]]
+
+
+def record_serial_events(rows: List[dict], source: str) -> int:
+    """Append events (``serial_id``, ``material_id``, ``designation``, ``from_status``, ``to_status``)."""
+
+    now = datetime.utcnow()
+    return bulk_insert(MaterialSerialEvent, [dict(row, source=source, occurred_at=now) for row in rows])
+
+
+def record_baseline_events() -> int:
+    """Give every serial without any event its ``baseline`` event; the caller commits."""
+
+    missing = ~exists().where(MaterialSerialEvent.serial_id == MaterialSerial.id)
+    first = db.session.scalar(select(func.min(MaterialSerial.created_at)).where(missing))
+    columns = ("serial_id", "material_id", "designation", "to_status", "source", "occurred_at")
+    source = (
+        select(
+            MaterialSerial.id,
+            MaterialSerial.material_id,
+            Material.designation,
+            func.coalesce(MaterialSerial.status, DEFAULT_STATUS),
+            literal("baseline"),
+            func.coalesce(MaterialSerial.created_at, datetime.utcnow()),
+        )
+        .join(Material, Material.id == MaterialSerial.material_id)
+        .where(missing)
+    )
+    added = db.session.execute(insert(MaterialSerialEvent).from_select(columns, source)).rowcount
+    if added and first is not None:
+        # The new events are older than the checkpoints written since.
+        db.session.execute(
+            SerialStatusCheckpoint.__table__.delete().where(SerialStatusCheckpoint.as_of > first.date())
+        )
+    return added
+
+
+def ensure_serial_history() -> None:
+    if db.session.scalar(select(MaterialSerial.id).limit(1)) is None:
+        return
+    if record_baseline_events():
+        db.session.commit()
+
+
+def _designations(connection, material_ids) -> Dict[int, str]:
+    if not material_ids:
+        return {}
+    return dict(
+        connection.execute(select(Material.id, Material.designation).where(Material.id.in_(material_ids))).all()
+    )
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_serial_changes(session, flush_context, instances):
+    # Old statuses and deleted rows must be read before the flush writes them.
+    changes = []
+    for serial in session.dirty:
+        if not isinstance(serial, MaterialSerial):
+            continue
+        history = db.inspect(serial).attrs.status.history
+        if not history.added or not history.deleted:
+            continue
+        before, after = history.deleted[0] or DEFAULT_STATUS, history.added[0] or DEFAULT_STATUS
+        if before != after:
+            changes.append((serial, before, after))
+    changes.extend(
+        (serial, serial.status or DEFAULT_STATUS, None)
+        for serial in session.deleted
+        if isinstance(serial, MaterialSerial) and serial.id is not None
+    )
+    if not changes:
+        session.info.pop(_PENDING_KEY, None)
+        return
+    with session.no_autoflush:
+        designations = _designations(session.connection(), {serial.material_id for serial, _, _ in changes})
+    session.info[_PENDING_KEY] = [
+        {
+            "serial_id": serial.id,
+            "material_id": serial.material_id,
+            "designation": designations.get(serial.material_id, ""),
+            "from_status": before,
+            "to_status": after,
+        }
+        for serial, before, after in changes
+    ]
+
+
+@event.listens_for(Session, "after_flush")
+def _write_serial_events(session, flush_context):
+    rows = session.info.pop(_PENDING_KEY, [])
+    created = [serial for serial in session.new if isinstance(serial, MaterialSerial)]
+    if created:
+        connection = session.connection()
+        designations = _designations(connection, {serial.material_id for serial in created})
+        rows += [
+            {
+                "serial_id": serial.id,
+                "material_id": serial.material_id,
+                "designation": designations.get(serial.material_id, ""),
+                "from_status": None,
+                "to_status": serial.status or DEFAULT_STATUS,
+            }
+            for serial in created
+        ]
+    if rows:
+        now = datetime.utcnow()
+        session.connection().execute(
+            insert(MaterialSerialEvent.__table__), [dict(row, source="edit", occurred_at=now) for row in rows]
+        )
+
+
+def _start_of(day: date) -> datetime:
+    return datetime.combine(day, time.min)
+
+
+def _apply_events(counts: Counts, since: Optional[date], until: date, designations: Optional[List[str]]) -> None:
+    """Add the events of ``[since, until)`` to ``counts`` with two ``GROUP BY``."""
+
+    for column, sign in ((MaterialSerialEvent.to_status, 1), (MaterialSerialEvent.from_status, -1)):
+        statement = (
+            select(MaterialSerialEvent.designation, column, func.count())
+            .where(column.is_not(None), MaterialSerialEvent.occurred_at < _start_of(until))
+            .group_by(MaterialSerialEvent.designation, column)
+        )
+        if since is not None:
+            statement = statement.where(MaterialSerialEvent.occurred_at >= _start_of(since))
+        if designations is not None:
+            statement = statement.where(MaterialSerialEvent.designation.in_(designations))
+        for designation, status, count in db.session.execute(statement):
+            by_status = counts.setdefault(designation, {})
+            by_status[status] = by_status.get(status, 0) + sign * count
+
+
+def status_counts_at(day: date, designations: Optional[Iterable[str]] = None) -> Counts:
+    """Serials per designation and status at the end of ``day``."""
+
+    designations = sorted(set(designations)) if designations is not None else None
+    until = day + timedelta(days=1)
+    as_of = db.session.scalar(
+        select(func.max(SerialStatusCheckpoint.as_of)).where(SerialStatusCheckpoint.as_of <= until)
+    )
+    counts: Counts = {}
+    if as_of is not None:
+        statement = select(
+            SerialStatusCheckpoint.designation, SerialStatusCheckpoint.status, SerialStatusCheckpoint.count
+        ).where(SerialStatusCheckpoint.as_of == as_of)
+        if designations is not None:
+            statement = statement.where(SerialStatusCheckpoint.designation.in_(designations))
+        for designation, status, count in db.session.execute(statement):
+            counts.setdefault(designation, {})[status] = count
+    _apply_events(counts, as_of, until, designations)
+    return {
+        designation: {status: count for status, count in by_status.items() if count}
+        for designation, by_status in counts.items()
+        if any(by_status.values())
+    }
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def take_checkpoints(until: Optional[date] = None) -> int:
+    """Write the monthly checkpoints missing up to the start of ``until``'s month; the caller commits."""
+
+    limit = _month_start(until or date.today())
+    last = db.session.scalar(select(func.max(SerialStatusCheckpoint.as_of)))
+    if last is None:
+        first = db.session.scalar(select(func.min(MaterialSerialEvent.occurred_at)))
+        if first is None:
+            return 0
+        month = _next_month(first.date())
+    else:
+        month = _next_month(last)
+    if month > limit:
+        return 0
+
+    counts = status_counts_at(month - timedelta(days=1))
+    # Changes per month up to ``limit``, with the same two ``GROUP BY``.
+    monthly: Dict[str, Counts] = {}
+    bucket = month_bucket(MaterialSerialEvent.occurred_at)
+    for column, sign in ((MaterialSerialEvent.to_status, 1), (MaterialSerialEvent.from_status, -1)):
+        rows = db.session.execute(
+            select(bucket, MaterialSerialEvent.designation, column, func.count())
+            .where(
+                column.is_not(None),
+                MaterialSerialEvent.occurred_at >= _start_of(last or month),
+                MaterialSerialEvent.occurred_at < _start_of(limit),
+            )
+            .group_by(bucket, MaterialSerialEvent.designation, column)
+        )
+        for key, designation, status, count in rows:
+            by_status = monthly.setdefault(key, {}).setdefault(designation, {})
+            by_status[status] = by_status.get(status, 0) + sign * count
+
+    rows = []
+    changed = last is None or any(key < month.strftime("%Y-%m") for key in monthly)
+    while month <= limit:
+        # A month without events would repeat the previous checkpoint.
+        if changed:
+            rows.extend(
+                {"as_of": month, "designation": designation, "status": status, "count": count}
+                for designation, by_status in counts.items()
+                for status, count in by_status.items()
+                if count
+            )
+        changes = monthly.get(month.strftime("%Y-%m"), {})
+        for designation, by_status in changes.items():
+            target = counts.setdefault(designation, {})
+            for status, delta in by_status.items():
+                target[status] = target.get(status, 0) + delta
+        changed = bool(changes)
+        month = _next_month(month)
+    bulk_insert(SerialStatusCheckpoint, rows)
+    return len(rows)
+
+
+@dataclass
+class StatusHistory:
+    days: List[date]
+    statuses: List[str]
+    # Rows follow ``statuses``, columns follow ``days``.
+    counts: np.ndarray
+
+    def as_dict(self, labels: Optional[Dict[str, str]] = None) -> dict:
+        labels = labels or {}
+        order = [status for status in labels if status in self.statuses]
+        order += [status for status in self.statuses if status not in labels]
+        return {
+            "labels": [day.isoformat() for day in self.days],
+            "datasets": [
+                {
+                    "status": status,
+                    "label": labels.get(status, status),
+                    "data": self.counts[self.statuses.index(status)].tolist(),
+                }
+                for status in order
+            ],
+        }
+
+
+def status_history(start: date, end: date, designation: Optional[str] = None) -> StatusHistory:
+    """Serials per status at the end of each day of ``[start, end]``, for one or all designations."""
+
+    designations = [designation] if designation is not None else None
+    base: Dict[str, int] = {}
+    for by_status in status_counts_at(start - timedelta(days=1), designations).values():
+        for status, count in by_status.items():
+            base[status] = base.get(status, 0) + count
+
+    statement = select(
+        MaterialSerialEvent.occurred_at, MaterialSerialEvent.from_status, MaterialSerialEvent.to_status
+    ).where(
+        MaterialSerialEvent.occurred_at >= _start_of(start),
+        MaterialSerialEvent.occurred_at < _start_of(end + timedelta(days=1)),
+    )
+    if designation is not None:
+        statement = statement.where(MaterialSerialEvent.designation == designation)
+    events = db.session.execute(statement).all()
+
+    statuses = sorted(set(base) | {status for _, *pair in events for status in pair if status})
+    rows = {status: row for row, status in enumerate(statuses)}
+    size = (end - start).days + 1
+    delta = np.zeros((len(statuses), size), dtype=np.int64)
+    delta[:, 0] = [base.get(status, 0) for status in statuses]
+    offsets = np.array([occurred_at.toordinal() - start.toordinal() for occurred_at, _, _ in events], dtype=np.int64)
+    for position, sign in ((2, 1), (1, -1)):
+        kept = np.array([event[position] is not None for event in events], dtype=bool)
+        if kept.any():
+            owners = np.array([rows[event[position]] for event in events if event[position] is not None])
+            np.add.at(delta, (owners, offsets[kept]), sign)
+    return StatusHistory(
+        days=[start + timedelta(days=offset) for offset in range(size)],
+        statuses=statuses,
+        counts=np.cumsum(delta, axis=1),
+    )
+
+
+def register_history_commands(app):
+    @app.cli.command("serial-checkpoints")
+    @click.option("--until", type=click.DateTime(formats=["%Y-%m-%d"]), help="Last month to checkpoint.")
+    def serial_checkpoints_command(until):
+        """Write the missing monthly checkpoints of serial status counts."""
+
+        started = datetime.utcnow()
+        written = take_checkpoints(until.date() if until else None)
+        db.session.commit()
+        elapsed = (datetime.utcnow() - started).total_seconds()
+        click.echo(f"{written} ligne(s) de point de contrôle enregistrée(s) en {elapsed:.2f}s")
@@ -1,9 +1,9 @@
 from __future__ import annotations
 
-from datetime import date
+from datetime import date, timedelta
 from typing import Dict, List, Optional, Tuple
 
-from flask import Blueprint, flash, redirect, render_template, request, url_for
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, url_for
 from flask_login import login_required
 from sqlalchemy import or_
 
@@ -15,20 +15,13 @@ from ..models import (
     MaterialSerial,
     Workshop,
 )
+from .history import MAX_HISTORY_DAYS, status_history
+from .serials import SERIAL_STATUS_CHOICES, SerialBulkError, import_serials, read_serial_records, transition_serials
 
 bp = Blueprint("materials", __name__, url_prefix="/materials")
 
 DEFAULT_CATEGORY = "reparable"
 CATEGORY_ORDER = ["reparable", "consommable", "outillage", "banc d'essai"]
-SERIAL_STATUS_CHOICES: List[Tuple[str, str]] = [
-    ("avionnee", "Avionnée"),
-    ("att_rpn", "ATT RPN"),
-    ("rpn", "RPN"),
-    ("litige", "Litige"),
-    ("nivellement", "Nivellement"),
-    ("stock", "Stock"),
-    ("sous_garantie", "Sous garantie"),
-]
 
 
 def _normalize_category(raw: Optional[str]) -> str:
@@ -351,6 +344,113 @@ def update_serial(material_id: int, serial_id: int):
     return redirect(url_for("materials.detail", material_id=material_id))
 
 
+def _flash_serial_errors(prefix: str, exc: SerialBulkError) -> None:
+    shown = exc.errors[:5]
+    more = f" (+{len(exc.errors) - len(shown)} autre(s))" if len(exc.errors) > len(shown) else ""
+    flash(prefix + " " + " ".join(shown) + more, "danger")
+
+
+@bp.route("/<int:material_id>/serials/import", methods=["POST"])
+@login_required
+def import_serial_file(material_id: int):
+    material = Material.query.get_or_404(material_id)
+    file = request.files.get("serials")
+    if not file or not file.filename:
+        flash("Merci de choisir le fichier CSV ou XLSX des numéros de série.", "danger")
+        return redirect(url_for("materials.detail", material_id=material_id))
+    try:
+        result = import_serials(material, read_serial_records(file.stream, file.filename))
+    except SerialBulkError as exc:
+        db.session.rollback()
+        _flash_serial_errors("Import rejeté :", exc)
+        return redirect(url_for("materials.detail", material_id=material_id))
+    db.session.commit()
+    flash(result.summary(), "success")
+    return redirect(url_for("materials.detail", material_id=material_id))
+
+
+@bp.route("/serials/transition", methods=["POST"])
+@login_required
+def transition_serial_numbers():
+    """Move many serials to one status.
+
+    Takes JSON (``serial_numbers`` list, ``status``, optional ``material_id``,
+    ``aircraft``, ``da_reference``, ``da_status``, ``notes``) and answers in
+    JSON, or the detail page form with one serial number per line.
+    """
+
+    if request.is_json:
+        payload = request.get_json(silent=True) or {}
+        serial_numbers = payload.get("serial_numbers")
+        errors = []
+        if not isinstance(serial_numbers, list) or not all(isinstance(value, str) for value in serial_numbers):
+            errors.append("« serial_numbers » doit être une liste de textes.")
+        for field in ("status", "aircraft", "da_reference", "da_status", "notes"):
+            if payload.get(field) is not None and not isinstance(payload[field], str):
+                errors.append(f"« {field} » doit être un texte.")
+        material_id = payload.get("material_id")
+        if material_id is not None and (not isinstance(material_id, int) or isinstance(material_id, bool)):
+            errors.append("« material_id » doit être un entier.")
+        if errors:
+            return jsonify({"errors": errors}), 400
+        try:
+            result = transition_serials(
+                serial_numbers,
+                payload.get("status") or "",
+                material_id=material_id,
+                aircraft=payload.get("aircraft"),
+                da_reference=payload.get("da_reference"),
+                da_status=payload.get("da_status"),
+                notes=payload.get("notes"),
+            )
+        except SerialBulkError as exc:
+            db.session.rollback()
+            return jsonify({"errors": exc.errors}), 400
+        db.session.commit()
+        return jsonify({"updated": result.updated, "designations": result.designations})
+
+    material_id = _parse_optional_int("material_id")
+    target = (
+        url_for("materials.detail", material_id=material_id)
+        if material_id
+        else url_for("materials.index")
+    )
+    text = request.form.get("serial_numbers") or ""
+    try:
+        result = transition_serials(
+            text.replace(",", "\n").replace(";", "\n").splitlines(),
+            request.form.get("status") or "",
+            material_id=material_id,
+            aircraft=_parse_optional_string("aircraft"),
+            da_reference=_parse_optional_string("da_reference"),
+            da_status=_parse_optional_string("da_status"),
+            notes=_parse_optional_string("notes"),
+        )
+    except SerialBulkError as exc:
+        db.session.rollback()
+        _flash_serial_errors("Changement de statut rejeté :", exc)
+        return redirect(target)
+    db.session.commit()
+    flash(result.summary(), "success")
+    return redirect(target)
+
+
+@bp.route("/serials/history")
+@login_required
+def serial_history():
+    """Serials per status at the end of each day, for one designation or the whole fleet."""
+
+    try:
+        end = date.fromisoformat(request.args["end"]) if request.args.get("end") else date.today()
+        start = date.fromisoformat(request.args["start"]) if request.args.get("start") else end - timedelta(days=179)
+    except ValueError:
+        return jsonify({"error": "Date attendue au format AAAA-MM-JJ"}), 400
+    if start > end or (end - start).days >= MAX_HISTORY_DAYS:
+        return jsonify({"error": f"Période invalide (au plus {MAX_HISTORY_DAYS} jours)"}), 400
+    history = status_history(start, end, request.args.get("designation") or None)
+    return jsonify(history.as_dict(dict(SERIAL_STATUS_CHOICES)))
+
+
 @bp.route("/<int:material_id>/delete", methods=["POST"])
 @login_required
 def delete(material_id: int):
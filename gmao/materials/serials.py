@@ -0,0 +1,350 @@
+"""Bulk operations on the serial numbers of reparables.
+
+The stock counters of a reparable (``dotation``, ``stock``, ``in_repair``…)
+are shared by every reparable with the same designation and derived from
+their serials, as in :meth:`Material.recompute_status_counters`.
+:func:`recompute_designation_counters` does the same for many designations
+at once, with one ``GROUP BY`` and one bulk ``UPDATE``. The import and the
+transitions below call it once, after all their rows are written, and log
+their status changes with :func:`gmao.materials.history.record_serial_events`.
+
+An import file (CSV or XLSX) has one row per unit: ``serial_number``,
+``status``, ``aircraft`` (tail number), ``da_reference``, ``da_status``,
+``notes`` and ``under_warranty``. Serial numbers that the material already
+has are updated, and the others are added.
+
+A transition moves a list of serial numbers to one status. Like the
+material page, it keeps the aircraft only for ``avionnee`` serials, and the
+DA reference and status only for ``att_rpn`` and ``rpn`` serials.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import click
+from sqlalchemy import case, func, select, update
+
+from ..extensions import db
+from ..models import Aircraft, Material, MaterialSerial
+from ..utils.bulk import insert_with_ids
+from .history import DEFAULT_STATUS, record_serial_events
+from .snapshots import mark_stock_changed
+
+SERIAL_STATUS_CHOICES: List[Tuple[str, str]] = [
+    ("avionnee", "Avionnée"),
+    ("att_rpn", "ATT RPN"),
+    ("rpn", "RPN"),
+    ("litige", "Litige"),
+    ("nivellement", "Nivellement"),
+    ("stock", "Stock"),
+    ("sous_garantie", "Sous garantie"),
+]
+SERIAL_STATUSES = {value for value, _ in SERIAL_STATUS_CHOICES}
+STATUS_REQUIRES_AIRCRAFT = {"avionnee"}
+STATUS_REQUIRES_DA = {"att_rpn", "rpn"}
+# Material column holding the count of each serial status.
+STATUS_COUNTERS = {
+    "avionnee": "avionnee",
+    "att_rpn": "unavailable_for_repair",
+    "rpn": "in_repair",
+    "litige": "litigation",
+    "nivellement": "nivellement",
+    "stock": "stock",
+}
+TRUE_VALUES = {"1", "true", "vrai", "oui", "yes", "x", "o"}
+MAX_REPORTED_ERRORS = 50
+
+
+class SerialBulkError(ValueError):
+    """Raised when a serial import or transition is rejected; ``errors`` lists every problem."""
+
+    def __init__(self, errors: List[str]) -> None:
+        super().__init__("; ".join(errors[:5]))
+        self.errors = errors
+
+
+@dataclass
+class SerialBulkResult:
+    created: int = 0
+    updated: int = 0
+    designations: int = 0
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.created} numéro(s) de série ajouté(s), {self.updated} mis à jour, "
+            f"compteurs recalculés pour {self.designations} désignation(s) en {self.elapsed:.2f}s"
+        )
+
+
+def recompute_designation_counters(designations: Iterable[str]) -> int:
+    """Recompute the counters of every reparable sharing one of ``designations``."""
+
+    designations = sorted(set(designations))
+    if not designations:
+        return 0
+    status = func.coalesce(MaterialSerial.status, "stock")
+    counts: Dict[str, Dict[str, int]] = {designation: {} for designation in designations}
+    warranty: Dict[str, bool] = {}
+    for offset in range(0, len(designations), 500):
+        chunk = designations[offset : offset + 500]
+        rows = db.session.execute(
+            select(
+                Material.designation,
+                status,
+                func.count(MaterialSerial.id),
+                func.max(case((MaterialSerial.under_warranty.is_(True), 1), else_=0)),
+            )
+            .join(Material, Material.id == MaterialSerial.material_id)
+            .where(Material.category == "reparable", Material.designation.in_(chunk))
+            .group_by(Material.designation, status)
+        )
+        for designation, serial_status, count, any_warranty in rows:
+            counts[designation][serial_status] = count
+            warranty[designation] = warranty.get(designation, False) or bool(any_warranty)
+
+    peers = db.session.execute(
+        select(Material.id, Material.designation).where(
+            Material.category == "reparable", Material.designation.in_(designations)
+        )
+    ).all()
+    rows = []
+    for material_id, designation in peers:
+        by_status = counts[designation]
+        row = {"id": material_id, "dotation": sum(by_status.values()), "warranty": warranty.get(designation, False)}
+        row.update({column: by_status.get(name, 0) for name, column in STATUS_COUNTERS.items()})
+        rows.append(row)
+    if rows:
+        db.session.execute(update(Material), rows)
+        mark_stock_changed(row["id"] for row in rows)
+    return len(designations)
+
+
+def _text(value) -> Optional[str]:
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    text = str(value).strip()
+    return text or None
+
+
+def read_serial_records(stream, filename: str) -> List[dict]:
+    """Rows of a CSV or XLSX serial file with normalised column names."""
+
+    suffix = Path(filename or "").suffix.lower()
+    if suffix not in (".csv", ".xlsx", ".xlsm", ".xls"):
+        raise SerialBulkError(["Format non pris en charge : utilisez un fichier CSV ou XLSX."])
+
+    import pandas as pd
+
+    try:
+        if suffix == ".csv":
+            # sep=None sniffs the delimiter: French Excel exports use ";".
+            frame = pd.read_csv(stream, dtype=str, keep_default_na=False, sep=None, engine="python")
+        else:
+            frame = pd.read_excel(stream, dtype=str, keep_default_na=False)
+    except ImportError as exc:
+        raise SerialBulkError([f"Lecture Excel indisponible ({exc.name or exc}). Exportez le fichier en CSV."]) from exc
+    except (ValueError, UnicodeDecodeError, pd.errors.ParserError) as exc:
+        raise SerialBulkError([f"Fichier illisible : {exc}"]) from exc
+    frame.columns = [str(column).strip().lower() for column in frame.columns]
+    if "serial_number" not in frame.columns:
+        raise SerialBulkError(["Colonne « serial_number » manquante."])
+    return frame.to_dict("records")
+
+
+def _serial_values(status: str, aircraft_id, da_reference, da_status) -> dict:
+    return {
+        "status": status,
+        "aircraft_id": aircraft_id if status in STATUS_REQUIRES_AIRCRAFT else None,
+        "da_reference": da_reference if status in STATUS_REQUIRES_DA else None,
+        "da_status": da_status if status in STATUS_REQUIRES_DA else None,
+    }
+
+
+def import_serials(material: Material, records: List[dict]) -> SerialBulkResult:
+    """Add or update the serials of ``material`` from ``records``; the caller commits."""
+
+    started = time.perf_counter()
+    if material.category != "reparable":
+        raise SerialBulkError(["Seuls les matériels réparables ont des numéros de série."])
+    aircraft = {
+        tail.strip().upper(): aircraft_id
+        for aircraft_id, tail in db.session.execute(select(Aircraft.id, Aircraft.tail_number))
+    }
+    existing = {
+        serial_number: (serial_id, status or DEFAULT_STATUS)
+        for serial_number, serial_id, status in db.session.execute(
+            select(MaterialSerial.serial_number, MaterialSerial.id, MaterialSerial.status).where(
+                MaterialSerial.material_id == material.id
+            )
+        )
+    }
+    errors: List[str] = []
+    inserts, updates, events = [], [], []
+    seen = set()
+    for line, record in enumerate(records, start=2):
+        where = f"Ligne {line}"
+        serial_number = _text(record.get("serial_number"))
+        if not serial_number:
+            errors.append(f"{where} : numéro de série manquant.")
+        elif serial_number in seen:
+            errors.append(f"{where} : numéro de série {serial_number} en double.")
+        seen.add(serial_number)
+        status = (_text(record.get("status")) or "stock").lower()
+        if status not in SERIAL_STATUSES:
+            errors.append(f"{where} : statut « {status} » inconnu.")
+        tail = _text(record.get("aircraft"))
+        aircraft_id = aircraft.get(tail.upper()) if tail else None
+        if tail and aircraft_id is None:
+            errors.append(f"{where} : appareil {tail} inconnu.")
+        if len(errors) >= MAX_REPORTED_ERRORS:
+            errors.append("Trop d'erreurs, vérification interrompue.")
+            break
+        if errors:
+            continue
+        values = _serial_values(status, aircraft_id, _text(record.get("da_reference")), _text(record.get("da_status")))
+        values["notes"] = _text(record.get("notes"))
+        values["under_warranty"] = status == "sous_garantie" or (
+            (_text(record.get("under_warranty")) or "").lower() in TRUE_VALUES
+        )
+        if serial_number in existing:
+            serial_id, previous = existing[serial_number]
+            updates.append(dict(values, id=serial_id))
+            if previous != status:
+                events.append({"serial_id": serial_id, "from_status": previous, "to_status": status})
+        else:
+            inserts.append(dict(values, material_id=material.id, serial_number=serial_number))
+    if errors:
+        raise SerialBulkError(errors)
+
+    serial_ids = insert_with_ids(MaterialSerial, inserts)
+    events += [
+        {"serial_id": serial_id, "from_status": None, "to_status": row["status"]}
+        for serial_id, row in zip(serial_ids, inserts)
+    ]
+    if updates:
+        db.session.execute(update(MaterialSerial), updates)
+    record_serial_events(
+        [dict(row, material_id=material.id, designation=material.designation) for row in events], "import"
+    )
+    result = SerialBulkResult(created=len(inserts), updated=len(updates))
+    result.designations = recompute_designation_counters([material.designation])
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def transition_serials(
+    serial_numbers: List[str],
+    status: str,
+    material_id: Optional[int] = None,
+    aircraft: Optional[str] = None,
+    da_reference: Optional[str] = None,
+    da_status: Optional[str] = None,
+    notes: Optional[str] = None,
+) -> SerialBulkResult:
+    """Move every serial of ``serial_numbers`` to ``status``; the caller commits."""
+
+    started = time.perf_counter()
+    serial_numbers = list(dict.fromkeys(number.strip() for number in serial_numbers if number and number.strip()))
+    errors: List[str] = []
+    status = (status or "").strip().lower()
+    if status not in SERIAL_STATUSES:
+        errors.append(f"Statut « {status} » inconnu.")
+    if not serial_numbers:
+        errors.append("Aucun numéro de série fourni.")
+    aircraft_id = None
+    if aircraft and status in STATUS_REQUIRES_AIRCRAFT:
+        aircraft_id = db.session.scalar(
+            select(Aircraft.id).where(func.upper(Aircraft.tail_number) == aircraft.strip().upper())
+        )
+        if aircraft_id is None:
+            errors.append(f"Appareil {aircraft} inconnu.")
+    if status in STATUS_REQUIRES_AIRCRAFT and not aircraft:
+        errors.append("Un appareil est requis pour le statut avionnée.")
+
+    matches: Dict[str, List[Tuple[int, int, str, str]]] = {}
+    statement = (
+        select(
+            MaterialSerial.serial_number,
+            MaterialSerial.id,
+            MaterialSerial.material_id,
+            Material.designation,
+            func.coalesce(MaterialSerial.status, DEFAULT_STATUS),
+        )
+        .join(Material, Material.id == MaterialSerial.material_id)
+        .where(Material.category == "reparable")
+    )
+    if material_id is not None:
+        statement = statement.where(MaterialSerial.material_id == material_id)
+    for offset in range(0, len(serial_numbers), 500):
+        chunk = serial_numbers[offset : offset + 500]
+        for serial_number, *found in db.session.execute(statement.where(MaterialSerial.serial_number.in_(chunk))):
+            matches.setdefault(serial_number, []).append(tuple(found))
+    missing = [number for number in serial_numbers if number not in matches]
+    if missing:
+        errors.append(f"Numéro(s) de série introuvable(s) : {', '.join(missing[:20])}.")
+    ambiguous = [number for number, found in matches.items() if len(found) > 1]
+    if ambiguous:
+        errors.append(
+            "Numéro(s) de série présent(s) sur plusieurs matériels, précisez le matériel : "
+            f"{', '.join(ambiguous[:20])}."
+        )
+    if errors:
+        raise SerialBulkError(errors)
+
+    values = _serial_values(status, aircraft_id, da_reference or None, da_status or None)
+    if status == "sous_garantie":
+        values["under_warranty"] = True
+    if notes:
+        values["notes"] = notes
+    serials = [serial for found in matches.values() for serial in found]
+    serial_ids = [serial_id for serial_id, _, _, _ in serials]
+    for offset in range(0, len(serial_ids), 500):
+        chunk = serial_ids[offset : offset + 500]
+        db.session.execute(
+            update(MaterialSerial).where(MaterialSerial.id.in_(chunk)).values(**values),
+            execution_options={"synchronize_session": False},
+        )
+    record_serial_events(
+        [
+            {
+                "serial_id": serial_id,
+                "material_id": material_id,
+                "designation": designation,
+                "from_status": previous,
+                "to_status": status,
+            }
+            for serial_id, material_id, designation, previous in serials
+            if previous != status
+        ],
+        "transition",
+    )
+    result = SerialBulkResult(updated=len(serial_ids))
+    result.designations = recompute_designation_counters(designation for _, _, designation, _ in serials)
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def register_serial_commands(app):
+    @app.cli.command("import-serials")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+    @click.option("--material", "material_id", type=int, required=True, help="Reparable receiving the serials.")
+    def import_serials_command(path, material_id):
+        """Add or update the serial numbers of a reparable from a CSV or XLSX file."""
+
+        material = db.session.get(Material, material_id)
+        if material is None:
+            raise click.ClickException(f"Matériel {material_id} introuvable.")
+        try:
+            with path.open("rb") as stream:
+                result = import_serials(material, read_serial_records(stream, path.name))
+        except SerialBulkError as exc:
+            db.session.rollback()
+            for error in exc.errors:
+                click.echo(error, err=True)
+            raise click.ClickException("Import annulé, aucun numéro de série n'a été modifié.") from exc
+        db.session.commit()
+        click.echo(result.summary())
@@ -0,0 +1,184 @@
+"""Inventory snapshots taken from live stock changes.
+
+A material gets a snapshot when a committed transaction changes its stock
+(``stock`` or ``consumable_stock``, including the serial counters) or its
+material requirements. ``available`` is the stock on hand: the consumable
+stock when it is set, otherwise ``stock``. ``reserved`` is what unfulfilled
+requirements of open tasks still ask for.
+
+The materials touched by a transaction are collected at each flush. Their
+snapshots are written once, just before the commit, with a couple of
+set-based statements. A material has at most one snapshot per day: a later
+change on the same day updates that row instead of adding one.
+
+Older snapshots are thinned by :func:`prune_snapshots`. Within
+``INVENTORY_SNAPSHOT_DAILY_DAYS`` every day is kept. Up to
+``INVENTORY_SNAPSHOT_WEEKLY_DAYS``, only the last snapshot of each week is
+kept, and beyond that the last of each month.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Optional
+
+import click
+from flask import current_app
+from sqlalchemy import delete, event, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..extensions import db
+from ..models import InventorySnapshot, MaintenanceTask, Material, MaterialRequirement
+
+_TOUCHED_KEY = "gmao.snapshot_materials"
+STOCK_COLUMNS = ("stock", "consumable_stock")
+# strftime (SQLite) and to_char (PostgreSQL) keys of a retention period.
+_PERIOD_FORMATS = {"week": ("%Y-%W", "IYYY-IW"), "month": ("%Y-%m", "YYYY-MM")}
+
+
+def mark_stock_changed(material_ids: Iterable[int], session: Optional[Session] = None) -> None:
+    """Snapshot ``material_ids`` when the current transaction commits (for Core bulk writes)."""
+
+    session = session or db.session()
+    session.info.setdefault(_TOUCHED_KEY, set()).update(material_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_stock_changes(session, flush_context):
+    touched = set()
+    for material in session.new | session.dirty:
+        if not isinstance(material, Material):
+            continue
+        state = db.inspect(material)
+        if material in session.new or any(state.attrs[name].history.has_changes() for name in STOCK_COLUMNS):
+            touched.add(material.id)
+    for requirement in session.new | session.dirty | session.deleted:
+        if isinstance(requirement, MaterialRequirement):
+            history = db.inspect(requirement).attrs.material_id.history
+            touched.update(value for value in (*history.added, *history.unchanged, *history.deleted) if value)
+    deleted = {material.id for material in session.deleted if isinstance(material, Material)}
+    if touched - deleted:
+        mark_stock_changed(touched - deleted, session)
+    if deleted and _TOUCHED_KEY in session.info:
+        session.info[_TOUCHED_KEY] -= deleted
+
+
+@event.listens_for(Session, "before_commit")
+def _write_pending_snapshots(session):
+    # Flush first so that the last changes of the transaction are collected.
+    session.flush()
+    material_ids = session.info.pop(_TOUCHED_KEY, None)
+    if material_ids:
+        capture_snapshots(material_ids, session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_stock_changes(session):
+    session.info.pop(_TOUCHED_KEY, None)
+
+
+def _available():
+    return func.coalesce(func.nullif(Material.consumable_stock, 0), Material.stock, 0)
+
+
+def capture_snapshots(
+    material_ids: Iterable[int], session: Optional[Session] = None, now: Optional[datetime] = None
+) -> int:
+    """Write today's snapshot of ``material_ids``; returns the number of rows written."""
+
+    session = session or db.session()
+    now = now or datetime.utcnow()
+    day_start = datetime.combine(now.date(), time.min)
+    material_ids = sorted(set(material_ids))
+    written = 0
+    for offset in range(0, len(material_ids), 500):
+        chunk = material_ids[offset : offset + 500]
+        levels = session.execute(select(Material.id, _available()).where(Material.id.in_(chunk))).all()
+        reserved = dict(
+            session.execute(
+                select(MaterialRequirement.material_id, func.sum(MaterialRequirement.quantity))
+                .join(MaintenanceTask, MaintenanceTask.id == MaterialRequirement.task_id)
+                .where(
+                    MaterialRequirement.material_id.in_(chunk),
+                    MaterialRequirement.fulfilled.is_not(True),
+                    or_(MaintenanceTask.status.is_(None), MaintenanceTask.status != "completed"),
+                )
+                .group_by(MaterialRequirement.material_id)
+            ).all()
+        )
+        today = dict(
+            session.execute(
+                select(InventorySnapshot.material_id, func.max(InventorySnapshot.id))
+                .where(InventorySnapshot.material_id.in_(chunk), InventorySnapshot.taken_at >= day_start)
+                .group_by(InventorySnapshot.material_id)
+            ).all()
+        )
+        updates, inserts = [], []
+        for material_id, available in levels:
+            row = {"taken_at": now, "available": available, "reserved": reserved.get(material_id) or 0}
+            if material_id in today:
+                updates.append(dict(row, id=today[material_id]))
+            else:
+                inserts.append(dict(row, material_id=material_id, consumption_window_days=30))
+        if updates:
+            session.execute(update(InventorySnapshot), updates)
+        if inserts:
+            session.execute(insert(InventorySnapshot), inserts)
+        written += len(updates) + len(inserts)
+    return written
+
+
+def _period(column, period: str):
+    sqlite_format, postgres_format = _PERIOD_FORMATS[period]
+    if db.engine.dialect.name == "sqlite":
+        return func.strftime(sqlite_format, column)
+    return func.to_char(column, postgres_format)
+
+
+def prune_snapshots(today: Optional[date] = None, dry_run: bool = False) -> Dict[str, int]:
+    """Keep one snapshot per material and week, then month, past the daily window; the caller commits."""
+
+    today = today or date.today()
+    daily_limit = datetime.combine(
+        today - timedelta(days=current_app.config["INVENTORY_SNAPSHOT_DAILY_DAYS"]), time.min
+    )
+    weekly_limit = datetime.combine(
+        today - timedelta(days=current_app.config["INVENTORY_SNAPSHOT_WEEKLY_DAYS"]), time.min
+    )
+    removed: Dict[str, int] = {}
+    for period, newest, oldest in (("week", daily_limit, weekly_limit), ("month", weekly_limit, None)):
+        rank = (
+            func.row_number()
+            .over(
+                partition_by=(InventorySnapshot.material_id, _period(InventorySnapshot.taken_at, period)),
+                order_by=(InventorySnapshot.taken_at.desc(), InventorySnapshot.id.desc()),
+            )
+            .label("rank")
+        )
+        ranked = select(InventorySnapshot.id, rank).where(InventorySnapshot.taken_at < newest)
+        if oldest is not None:
+            ranked = ranked.where(InventorySnapshot.taken_at >= oldest)
+        ranked = ranked.subquery()
+        surplus = select(ranked.c.id).where(ranked.c.rank > 1)
+        if dry_run:
+            removed[period] = db.session.scalar(select(func.count()).select_from(surplus.subquery()))
+        else:
+            removed[period] = db.session.execute(
+                delete(InventorySnapshot).where(InventorySnapshot.id.in_(surplus)),
+                execution_options={"synchronize_session": False},
+            ).rowcount
+    return removed
+
+
+def register_snapshot_commands(app):
+    @app.cli.command("prune-snapshots")
+    @click.option("--dry-run", is_flag=True, help="Only count the snapshots that would be removed.")
+    def prune_snapshots_command(dry_run):
+        """Downsample old inventory snapshots to one per week, then one per month."""
+
+        removed = prune_snapshots(dry_run=dry_run)
+        db.session.commit()
+        verb = "à supprimer" if dry_run else "supprimé(s)"
+        click.echo(
+            f"{sum(removed.values())} instantané(s) {verb} "
+            f"(hebdomadaire : {removed['week']}, mensuel : {removed['month']})"
+        )
@@ -1,10 +1,16 @@
 from datetime import datetime, date
 from typing import Optional
 
+from flask import current_app
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import inspect
+from sqlalchemy.orm import column_property, joinedload, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from werkzeug.security import check_password_hash
 
 from .extensions import db, login_manager
+from .utils.cache import get_cache
+from .utils.passwords import hash_password
 
 
 class Role(db.Model):
@@ -63,7 +69,7 @@ class User(UserMixin, db.Model):
     assignments = db.relationship("MaintenanceTask", back_populates="lead", lazy="dynamic")
 
     def set_password(self, password: str) -> None:
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password: str) -> bool:
         return check_password_hash(self.password_hash, password)
@@ -76,11 +82,59 @@ class User(UserMixin, db.Model):
         return f"<User {self.username}>"
 
 
+IDENTITY_CACHE = "identity"
+
+
+def identity_cache():
+    """Column snapshots of recently loaded users with their role and workshop.
+
+    Any committed write to ``users``, ``roles`` or ``workshops`` clears the
+    cache, so profile, role and activation changes apply on the next request.
+    """
+
+    return get_cache(
+        IDENTITY_CACHE,
+        maxsize=current_app.config.get("USER_CACHE_SIZE", 512),
+        ttl=current_app.config.get("USER_CACHE_TTL", 300),
+        depends_on={"users", "roles", "workshops"},
+    )
+
+
+def _column_values(instance) -> Optional[dict]:
+    if instance is None:
+        return None
+    return {attr.key: getattr(instance, attr.key) for attr in inspect(instance).mapper.column_attrs}
+
+
+def _detached(model, values: Optional[dict]):
+    if values is None:
+        return None
+    instance = model(**values)
+    make_transient_to_detached(instance)
+    return instance
+
+
 @login_manager.user_loader
 def load_user(user_id: str) -> Optional["User"]:
     if user_id is None:
         return None
-    return User.query.get(int(user_id))
+    identifier = int(user_id)
+    cache = identity_cache()
+    snapshot = cache.get(identifier)
+    if snapshot is None:
+        user = db.session.get(User, identifier, options=[joinedload(User.role), joinedload(User.workshop)])
+        if user is None:
+            return None
+        cache.set(identifier, (_column_values(user), _column_values(user.role), _column_values(user.workshop)))
+    else:
+        user_values, role_values, workshop_values = snapshot
+        user = _detached(User, user_values)
+        set_committed_value(user, "role", _detached(Role, role_values))
+        set_committed_value(user, "workshop", _detached(Workshop, workshop_values))
+        # Attach the rebuilt graph to the request session without a SELECT.
+        user = db.session.merge(user, load=False)
+    # Deactivated accounts lose their session on the next request.
+    return user if user.is_active else None
 
 
 class Aircraft(db.Model):
@@ -270,7 +324,8 @@ class MaterialSerial(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     material_id = db.Column(db.Integer, db.ForeignKey("materials.id"), nullable=False)
     serial_number = db.Column(db.String(120))
-    status = db.Column(db.String(30), default="stock")
+    # The previous status is loaded on change for the status event log.
+    status = column_property(db.Column(db.String(30), default="stock"), active_history=True)
     aircraft_id = db.Column(db.Integer, db.ForeignKey("aircraft.id"))
     da_reference = db.Column(db.String(80))
     da_status = db.Column(db.String(80))
@@ -287,6 +342,38 @@ class MaterialSerial(db.Model):
         return self.serial_number or f"ID#{self.id}"
 
 
+class MaterialSerialEvent(db.Model):
+    """Append-only log of serial status changes (see :mod:`gmao.materials.history`)."""
+
+    __tablename__ = "material_serial_events"
+    __table_args__ = (db.Index("ix_material_serial_events_designation", "designation", "occurred_at"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign keys: the log outlives deleted serials and materials.
+    serial_id = db.Column(db.Integer, nullable=False, index=True)
+    material_id = db.Column(db.Integer, nullable=False)
+    designation = db.Column(db.String(255), nullable=False)
+    from_status = db.Column(db.String(30))
+    to_status = db.Column(db.String(30))
+    source = db.Column(db.String(30), nullable=False, default="edit")
+    occurred_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class SerialStatusCheckpoint(db.Model):
+    """Serial counts per designation and status at the start of ``as_of``."""
+
+    __tablename__ = "serial_status_checkpoints"
+    __table_args__ = (
+        db.UniqueConstraint("as_of", "designation", "status", name="uq_serial_status_checkpoints"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    as_of = db.Column(db.Date, nullable=False)
+    designation = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(30), nullable=False)
+    count = db.Column(db.Integer, nullable=False)
+
+
 class WorkshopMaterial(db.Model):
     __tablename__ = "workshop_materials"
 
@@ -301,6 +388,8 @@ class WorkshopMaterial(db.Model):
 
 class PersonnelStatus(db.Model):
     __tablename__ = "personnel_statuses"
+    # Serves the "current status per person" window query and the history pages.
+    __table_args__ = (db.Index("ix_personnel_statuses_latest", "personnel_id", "start_date", "id"),)
 
     id = db.Column(db.Integer, primary_key=True)
     personnel_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -336,6 +425,33 @@ class MaintenanceVisit(db.Model):
         return {task.lead for task in self.tasks if task.lead is not None}
 
 
+class FleetPlanEntry(db.Model):
+    """One planned or projected package visit (see :mod:`gmao.maintenance.planner`)."""
+
+    __tablename__ = "fleet_plan_entries"
+    __table_args__ = (db.Index("ix_fleet_plan_entries_start", "start_date", "end_date"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    # No foreign keys: the plan is a cache, dropped with the aircraft by the planner.
+    aircraft_id = db.Column(db.Integer, nullable=False, index=True)
+    package = db.Column(db.String(10), nullable=False)
+    due_date = db.Column(db.Date, nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    planned = db.Column(db.Boolean, nullable=False, default=False)
+
+
+class FleetPlanState(db.Model):
+    """Month and horizon the plan entries of an aircraft were computed for."""
+
+    __tablename__ = "fleet_plan_states"
+
+    aircraft_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    computed_for = db.Column(db.Date, nullable=False)
+    months = db.Column(db.Integer, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class MaintenanceTask(db.Model):
     __tablename__ = "maintenance_tasks"
 
@@ -450,6 +566,22 @@ class JobCard(db.Model):
         return summary
 
 
+class AttachmentBlob(db.Model):
+    """One stored file, shared by every attachment with the same content."""
+
+    __tablename__ = "attachment_blobs"
+
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    storage_path = db.Column(db.String(512), nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False, default=0)
+    mime_type = db.Column(db.String(120))
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    attachments = db.relationship("JobCardAttachment", back_populates="blob", lazy="dynamic")
+
+
 class JobCardAttachment(db.Model):
     __tablename__ = "job_card_attachments"
 
@@ -459,9 +591,38 @@ class JobCardAttachment(db.Model):
     original_name = db.Column(db.String(255))
     file_path = db.Column(db.String(512), nullable=False, server_default="")
     mime_type = db.Column(db.String(120))
+    sha256 = db.Column(db.String(64), index=True)
+    size_bytes = db.Column(db.Integer)
+    blob_id = db.Column(db.Integer, db.ForeignKey("attachment_blobs.id"), index=True)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     job_card = db.relationship("JobCard", back_populates="attachments")
+    blob = db.relationship("AttachmentBlob", back_populates="attachments")
+
+
+class AttachmentText(db.Model):
+    """Extraction state of one attachment content, keyed by its hash."""
+
+    __tablename__ = "attachment_texts"
+
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="indexed")
+    page_count = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String(255))
+    indexed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class AttachmentPage(db.Model):
+    """Text of one PDF page; mirrored into the full-text index on SQLite."""
+
+    __tablename__ = "attachment_pages"
+    __table_args__ = (db.UniqueConstraint("sha256", "page_number", name="uq_attachment_pages_page"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False)
+    page_number = db.Column(db.Integer, nullable=False)
+    content = db.Column(db.Text, nullable=False, default="")
 
 
 class JobCardParagraph(db.Model):
@@ -587,3 +748,20 @@ class DemandPrediction(db.Model):
     model = db.Column(db.String(80), default="wilson")
 
     material = db.relationship("Material")
+
+
+class DailyKpiRollup(db.Model):
+    """Fleet KPIs as of the end of one day, filled by ``flask rollup-kpis``."""
+
+    __tablename__ = "daily_kpi_rollups"
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, unique=True, nullable=False, index=True)
+    tasks_pending = db.Column(db.Integer, nullable=False, default=0)
+    tasks_in_progress = db.Column(db.Integer, nullable=False, default=0)
+    tasks_completed = db.Column(db.Integer, nullable=False, default=0)
+    visits_started = db.Column(db.Integer, nullable=False, default=0)
+    visits_closed = db.Column(db.Integer, nullable=False, default=0)
+    materials_under_dotation = db.Column(db.Integer, nullable=False, default=0)
+    personnel_on_site = db.Column(db.Integer, nullable=False, default=0)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,198 @@
+"""Who is available, per workshop, over a range of days.
+
+Statuses are intervals: ``start_date`` to ``end_date`` inclusive, open when
+``end_date`` is empty. When several statuses of a person overlap, the one
+that started last wins (the most recent entry on the same day), so a sick
+leave recorded inside an open-ended "on-site" period interrupts it and the
+person is back on site the day after.
+
+:func:`build_availability_index` resolves those overlaps once per person
+and keeps the result as sorted NumPy arrays of disjoint segments, plus the
+merged "on-site" intervals. A range query is then a vectorised comparison
+over the interval arrays. The index is cached per day and dropped whenever
+``users`` or ``personnel_statuses`` change (see :mod:`gmao.utils.cache`).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+from itertools import groupby
+from typing import Dict, List, Optional
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+
+from ..extensions import db
+from ..models import PersonnelStatus, User
+from ..utils.cache import get_cache
+
+AVAILABLE_STATUS = "on-site"
+AVAILABILITY_CACHE = "personnel-availability"
+# Exclusive end of the segments of open-ended statuses.
+OPEN_END = date.max.toordinal() + 1
+
+
+def _paint(segments: List[list], begin: int, finish: int, status: str) -> None:
+    """Lay ``[begin, finish)`` over the sorted, disjoint ``segments``."""
+
+    # Records come in start order, so only the last few segments can reach
+    # past ``begin``; they are the ones cut and replaced.
+    first = len(segments)
+    while first and segments[first - 1][1] > begin:
+        first -= 1
+    replaced = [[begin, finish, status]]
+    tail = []
+    for start, end, previous in segments[first:]:
+        if start < begin:
+            replaced.insert(0, [start, begin, previous])
+        if end > finish:
+            tail.append([max(start, finish), end, previous])
+    segments[first:] = replaced + tail
+
+
+def _resolve(records) -> List[list]:
+    """Disjoint ``[start, end, status]`` segments of one person's records."""
+
+    segments: List[list] = []
+    for _, status, start, end in records:
+        if start is None:
+            continue
+        finish = end.toordinal() + 1 if end is not None else OPEN_END
+        if finish > start.toordinal():
+            _paint(segments, start.toordinal(), finish, status)
+    return segments
+
+
+@dataclass
+class AvailabilityIndex:
+    """Resolved status segments and on-site intervals of every person."""
+
+    # One entry per segment, sorted by (user, start).
+    segment_users: np.ndarray
+    segment_starts: np.ndarray
+    segment_ends: np.ndarray
+    segment_statuses: np.ndarray
+    # Merged on-site intervals, sorted by (user, start).
+    interval_users: np.ndarray
+    interval_starts: np.ndarray
+    interval_ends: np.ndarray
+    # Active users and their workshop.
+    workshops: Dict[int, Optional[int]]
+
+    def available_users(self, start: date, end: Optional[date] = None, workshop_id: Optional[int] = None) -> List[int]:
+        """Active users on site every day of ``[start, end]``, by id."""
+
+        end = end or start
+        covering = (self.interval_starts <= start.toordinal()) & (self.interval_ends > end.toordinal())
+        users = np.unique(self.interval_users[covering]).tolist()
+        return [
+            user_id
+            for user_id in users
+            if user_id in self.workshops and (workshop_id is None or self.workshops[user_id] == workshop_id)
+        ]
+
+    def statuses_on(self, day: date) -> Dict[int, str]:
+        """Status in effect on ``day`` for every person who has one."""
+
+        ordinal = day.toordinal()
+        current = (self.segment_starts <= ordinal) & (self.segment_ends > ordinal)
+        return dict(zip(self.segment_users[current].tolist(), self.segment_statuses[current].tolist()))
+
+
+    def daily_headcount(self, start: date, end: date, workshop_ids: List[int]) -> np.ndarray:
+        """Active users on site per workshop (rows) and day of ``[start, end]`` (columns)."""
+
+        rows = {workshop_id: row for row, workshop_id in enumerate(workshop_ids)}
+        owners = np.array(
+            [rows.get(self.workshops.get(user_id), -1) for user_id in self.interval_users.tolist()], dtype=np.int64
+        )
+        kept = owners >= 0
+        counts = day_counts(
+            start, end, self.interval_starts[kept], self.interval_ends[kept], owners[kept], len(workshop_ids)
+        )
+        return counts.astype(np.int64)
+
+
+def day_counts(start: date, end: date, begins, finishes, rows=None, row_count: int = 1, weights=1) -> np.ndarray:
+    """Sum ``weights`` over ``[begins, finishes)`` day ordinals for each day of ``[start, end]``.
+
+    Items are bucketed into ``rows`` (all in row 0 by default) with a
+    difference array, so the cost is linear in items plus days.
+    """
+
+    size = (end - start).days + 1
+    first = np.clip(np.asarray(begins, dtype=np.int64) - start.toordinal(), 0, size)
+    last = np.clip(np.asarray(finishes, dtype=np.int64) - start.toordinal(), 0, size)
+    rows = np.zeros(len(first), dtype=np.int64) if rows is None else np.asarray(rows, dtype=np.int64)
+    delta = np.zeros((row_count, size + 1))
+    np.add.at(delta, (rows, first), weights)
+    np.add.at(delta, (rows, last), np.negative(weights))
+    return np.cumsum(delta[:, :size], axis=1)
+
+
+def build_availability_index() -> AvailabilityIndex:
+    rows = db.session.execute(
+        select(PersonnelStatus.personnel_id, PersonnelStatus.status, PersonnelStatus.start_date, PersonnelStatus.end_date)
+        .order_by(PersonnelStatus.personnel_id, PersonnelStatus.start_date, PersonnelStatus.id)
+    )
+    segments: List[tuple] = []
+    intervals: List[tuple] = []
+    for user_id, records in groupby(rows, key=lambda row: row[0]):
+        merged_end = None
+        for start, end, status in _resolve(records):
+            segments.append((user_id, start, end, status))
+            if status != AVAILABLE_STATUS:
+                continue
+            if merged_end == start:
+                intervals[-1] = (user_id, intervals[-1][1], end)
+            else:
+                intervals.append((user_id, start, end))
+            merged_end = end
+
+    workshops = dict(
+        db.session.execute(select(User.id, User.workshop_id).where(User.is_active_flag.is_not(False))).all()
+    )
+
+    def column(rows, position, dtype):
+        return np.array([row[position] for row in rows], dtype=dtype)
+
+    return AvailabilityIndex(
+        segment_users=column(segments, 0, np.int64),
+        segment_starts=column(segments, 1, np.int64),
+        segment_ends=column(segments, 2, np.int64),
+        segment_statuses=column(segments, 3, object),
+        interval_users=column(intervals, 0, np.int64),
+        interval_starts=column(intervals, 1, np.int64),
+        interval_ends=column(intervals, 2, np.int64),
+        workshops=workshops,
+    )
+
+
+def get_availability_index(today: Optional[date] = None) -> AvailabilityIndex:
+    """The index of the day, built on first use."""
+
+    cache = get_cache(
+        AVAILABILITY_CACHE,
+        maxsize=2,
+        ttl=current_app.config.get("PERSONNEL_AVAILABILITY_CACHE_TTL", 3600),
+        depends_on={"personnel_statuses", "users"},
+    )
+    return cache.get_or_set(today or date.today(), build_availability_index)
+
+
+def available_personnel(start: date, end: Optional[date] = None, workshop_id: Optional[int] = None) -> List[int]:
+    """Ids of the active users on site every day of ``[start, end]``."""
+
+    return get_availability_index().available_users(start, end, workshop_id)
+
+
+def count_available(day: date) -> int:
+    return len(get_availability_index().available_users(day))
+
+
+def on_site_days(start: date, end: date) -> List[int]:
+    """Number of people on site on each day of ``[start, end]``, any account state."""
+
+    index = get_availability_index()
+    return day_counts(start, end, index.interval_starts, index.interval_ends)[0].astype(np.int64).tolist()
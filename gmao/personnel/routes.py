@@ -1,10 +1,14 @@
 from datetime import date
 
-from flask import Blueprint, flash, redirect, render_template, request, url_for
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
 from flask_login import login_required
 
+from sqlalchemy import select
+
 from ..extensions import db
 from ..models import PersonnelStatus, User, Workshop
+from .availability import get_availability_index
+from .status import current_statuses, status_history, status_options
 
 bp = Blueprint("personnel", __name__, url_prefix="/personnel")
 
@@ -13,22 +17,19 @@ bp = Blueprint("personnel", __name__, url_prefix="/personnel")
 @login_required
 def index():
     status_filter = request.args.get("status")
+    latest_status = current_statuses()
     query = User.query
     if status_filter:
-        query = query.join(PersonnelStatus).filter(PersonnelStatus.status == status_filter)
+        query = query.filter(
+            User.id.in_([user_id for user_id, record in latest_status.items() if record.status == status_filter])
+        )
     users = query.order_by(User.rank.desc()).all()
-    statuses = PersonnelStatus.query.order_by(PersonnelStatus.start_date.desc()).all()
-    latest_status = {}
-    for record in statuses:
-        latest_status.setdefault(record.personnel_id, record)
-    status_options = sorted({record.status for record in statuses})
     workshops = Workshop.query.order_by(Workshop.name).all()
     return render_template(
         "personnel/index.html",
         users=users,
-        statuses=statuses,
         latest_status=latest_status,
-        status_options=status_options,
+        status_options=status_options(),
         status_filter=status_filter,
         workshops=workshops,
         manage_mode=False,
@@ -60,3 +61,62 @@ def update_status(user_id: int):
     db.session.commit()
     flash("Statut mis à jour", "success")
     return redirect(url_for("personnel.index"))
+
+
+@bp.route("/<int:user_id>/history")
+@login_required
+def status_history_page(user_id: int):
+    if db.session.get(User, user_id) is None:
+        return jsonify({"error": "Personnel introuvable"}), 404
+    page = status_history(
+        user_id,
+        page=request.args.get("page", 1, type=int),
+        per_page=current_app.config["PERSONNEL_HISTORY_PAGE_SIZE"],
+    )
+    return jsonify(
+        {
+            "page": page.page,
+            "has_next": page.has_next,
+            "records": [
+                {
+                    "status": record.status,
+                    "details": record.details,
+                    "start_date": record.start_date.isoformat() if record.start_date else None,
+                    "end_date": record.end_date.isoformat() if record.end_date else None,
+                }
+                for record in page.records
+            ],
+        }
+    )
+
+
+@bp.route("/availability")
+@login_required
+def availability():
+    """Users on site every day of ``start``..``end``, optionally for one workshop."""
+
+    try:
+        start = date.fromisoformat(request.args["start"]) if request.args.get("start") else date.today()
+        end = date.fromisoformat(request.args["end"]) if request.args.get("end") else start
+    except ValueError:
+        return jsonify({"error": "Dates attendues au format AAAA-MM-JJ"}), 400
+    if end < start:
+        return jsonify({"error": "La fin précède le début"}), 400
+    workshop_id = request.args.get("workshop_id", type=int)
+    user_ids = get_availability_index().available_users(start, end, workshop_id)
+    people = db.session.execute(
+        select(User.id, User.full_name, User.rank, User.workshop_id)
+        .where(User.id.in_(user_ids))
+        .order_by(User.full_name)
+    ).all()
+    return jsonify(
+        {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "workshop_id": workshop_id,
+            "available": [
+                {"id": user_id, "full_name": full_name, "rank": rank, "workshop_id": person_workshop}
+                for user_id, full_name, rank, person_workshop in people
+            ],
+        }
+    )
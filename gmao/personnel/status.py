@@ -0,0 +1,77 @@
+"""Current status of each person, without loading the status history.
+
+A person's current status is their ``personnel_statuses`` row with the
+latest ``start_date`` (the most recent entry wins on the same day). It is
+picked in SQL with ``ROW_NUMBER()`` over the composite index
+``(personnel_id, start_date, id)``, so the personnel pages run one query
+whatever the length of the history. The history itself is read a page at
+a time by :func:`status_history`.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func, select
+
+from ..extensions import db
+from ..models import PersonnelStatus
+
+
+@dataclass
+class HistoryPage:
+    records: List[PersonnelStatus]
+    page: int
+    has_next: bool
+
+
+def current_status_query():
+    """``PersonnelStatus`` rows that are the current status of their person."""
+
+    ranked = select(
+        PersonnelStatus.id,
+        func.row_number()
+        .over(
+            partition_by=PersonnelStatus.personnel_id,
+            order_by=(PersonnelStatus.start_date.desc(), PersonnelStatus.id.desc()),
+        )
+        .label("position"),
+    ).subquery()
+    return select(PersonnelStatus).join(ranked, ranked.c.id == PersonnelStatus.id).where(ranked.c.position == 1)
+
+
+def current_statuses(user_ids: Optional[Iterable[int]] = None) -> Dict[int, PersonnelStatus]:
+    """Current status of every person (or of ``user_ids``), by user id."""
+
+    statement = current_status_query()
+    if user_ids is not None:
+        statement = statement.where(PersonnelStatus.personnel_id.in_(list(user_ids)))
+    return {record.personnel_id: record for record in db.session.scalars(statement)}
+
+
+def status_options() -> List[str]:
+    return list(
+        db.session.scalars(
+            select(PersonnelStatus.status)
+            .where(PersonnelStatus.status.is_not(None))
+            .distinct()
+            .order_by(PersonnelStatus.status)
+        )
+    )
+
+
+def status_history(user_id: int, page: int = 1, per_page: int = 20) -> HistoryPage:
+    """One page of a person's statuses, latest first."""
+
+    page = max(page, 1)
+    # One extra row tells whether a next page exists without a COUNT(*).
+    records = list(
+        db.session.scalars(
+            select(PersonnelStatus)
+            .where(PersonnelStatus.personnel_id == user_id)
+            .order_by(PersonnelStatus.start_date.desc(), PersonnelStatus.id.desc())
+            .offset((page - 1) * per_page)
+            .limit(per_page + 1)
+        )
+    )
+    return HistoryPage(records=records[:per_page], page=page, has_next=len(records) > per_page)
@@ -1,5 +1,5 @@
 """Utility helpers for the GMAO application."""
 
-from .uploads import UploadError, save_job_card_file
+from .uploads import SavedUpload, UploadError, save_job_card_file
 
-__all__ = ["UploadError", "save_job_card_file"]
+__all__ = ["SavedUpload", "UploadError", "save_job_card_file"]
@@ -0,0 +1,216 @@
+"""Garbage collection of attachment files and rows.
+
+``flask gc-attachments`` compares the upload tree with the database in both
+directions. Files nobody references are orphans, and so are attachment or
+blob rows whose file is gone.
+
+Both sides are read in the same order and merged like a sort-merge join.
+The tree is walked one directory at a time with entries sorted so that
+paths come out in code-point order. The database streams ``file_path`` and
+``storage_path`` with a binary collation. Memory therefore stays flat
+whatever the size of the tree, bounded by the largest directory plus the
+orphans found.
+
+Files modified less than ``ATTACHMENT_GC_GRACE_SECONDS`` ago are left alone.
+An upload is written before its row is committed, so a fresh file may just
+not be visible yet.
+"""
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass, field
+from itertools import groupby
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import click
+from flask import current_app
+from sqlalchemy import delete, literal, select, union_all, update
+
+from ..extensions import db
+from ..models import AttachmentBlob, JobCardAttachment
+
+STREAM_BATCH_SIZE = 1000
+
+
+@dataclass
+class GcResult:
+    files_scanned: int = 0
+    bytes_scanned: int = 0
+    rows_scanned: int = 0
+    orphan_files: List[str] = field(default_factory=list)
+    orphan_bytes: int = 0
+    missing_paths: List[str] = field(default_factory=list)
+    attachments_removed: int = 0
+    blobs_removed: int = 0
+    skipped_recent: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files_scanned / self.elapsed if self.elapsed else 0.0
+
+
+def _entry_key(entry: os.DirEntry) -> str:
+    # A directory sorts as "name/" so that its descendants stay in string order
+    # relative to siblings such as "name-2" or "name0".
+    return entry.name + "/" if entry.is_dir(follow_symlinks=False) else entry.name
+
+
+def _walk(directory: Path, prefix: str) -> Iterator[Tuple[str, os.stat_result]]:
+    try:
+        entries = sorted(os.scandir(directory), key=_entry_key)
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        relative = f"{prefix}{entry.name}"
+        if entry.is_dir(follow_symlinks=False):
+            yield from _walk(Path(entry.path), relative + "/")
+        elif entry.is_file(follow_symlinks=False):
+            yield relative, entry.stat(follow_symlinks=False)
+
+
+def iter_upload_files(config) -> Iterator[Tuple[str, os.stat_result]]:
+    """Attachment files under ``UPLOAD_ROOT`` as sorted POSIX relative paths."""
+
+    root = Path(config["UPLOAD_ROOT"])
+    subdirs = {config.get("JOB_CARD_UPLOAD_SUBDIR", "job_cards"), config.get("ATTACHMENT_BLOB_SUBDIR", "blobs")}
+    for subdir in sorted(subdirs, key=lambda name: name + "/"):
+        yield from _walk(root / subdir, subdir + "/")
+
+
+def _remove(root: Path, path: str) -> None:
+    """Delete ``path`` and the directories it leaves empty, up to the subdirectory."""
+
+    target = root / path
+    target.unlink(missing_ok=True)
+    parent = target.parent
+    while parent != root and parent.parent != root:
+        try:
+            parent.rmdir()
+        except OSError:
+            break
+        parent = parent.parent
+
+
+def _binary_order(column):
+    if db.engine.dialect.name == "sqlite":
+        return column
+    return column.collate("C")
+
+
+def iter_referenced_paths() -> Iterator[Tuple[str, list]]:
+    """Paths known to the database with their ``(attachment_id, blob_id)`` rows."""
+
+    rows = union_all(
+        select(
+            JobCardAttachment.file_path.label("path"),
+            JobCardAttachment.id.label("attachment_id"),
+            literal(None).label("blob_id"),
+        ).where(JobCardAttachment.file_path.is_not(None)),
+        select(AttachmentBlob.storage_path, literal(None), AttachmentBlob.id),
+    ).subquery()
+    result = db.session.execute(
+        select(rows.c.path, rows.c.attachment_id, rows.c.blob_id)
+        .order_by(_binary_order(rows.c.path))
+        .execution_options(yield_per=STREAM_BATCH_SIZE)
+    )
+    for path, group in groupby(result, key=lambda row: row.path):
+        yield path.replace("\\", "/"), [(row.attachment_id, row.blob_id) for row in group]
+
+
+def collect_garbage(dry_run: bool = False, grace_seconds: Optional[int] = None) -> GcResult:
+    config = current_app.config
+    root = Path(config["UPLOAD_ROOT"])
+    if grace_seconds is None:
+        grace_seconds = config.get("ATTACHMENT_GC_GRACE_SECONDS", 3600)
+    cutoff = time.time() - grace_seconds
+    result = GcResult()
+    started = time.perf_counter()
+    attachment_ids: List[int] = []
+    blob_ids: List[int] = []
+
+    def missing(path: str, rows: list) -> None:
+        # Rows outside the scanned subdirectories are checked individually.
+        if (root / path).is_file():
+            return
+        result.missing_paths.append(path)
+        for attachment_id, blob_id in rows:
+            if attachment_id is not None:
+                attachment_ids.append(attachment_id)
+            if blob_id is not None:
+                blob_ids.append(blob_id)
+
+    files = iter_upload_files(config)
+    referenced = iter_referenced_paths()
+    current_file = next(files, None)
+    current_ref = next(referenced, None)
+    while current_file is not None or current_ref is not None:
+        if current_ref is None or (current_file is not None and current_file[0] < current_ref[0]):
+            path, stat = current_file
+            result.files_scanned += 1
+            result.bytes_scanned += stat.st_size
+            if stat.st_mtime > cutoff:
+                result.skipped_recent += 1
+            else:
+                result.orphan_files.append(path)
+                result.orphan_bytes += stat.st_size
+                if not dry_run:
+                    _remove(root, path)
+            current_file = next(files, None)
+        elif current_file is None or current_ref[0] < current_file[0]:
+            result.rows_scanned += len(current_ref[1])
+            missing(*current_ref)
+            current_ref = next(referenced, None)
+        else:
+            result.files_scanned += 1
+            result.bytes_scanned += current_file[1].st_size
+            result.rows_scanned += len(current_ref[1])
+            current_file = next(files, None)
+            current_ref = next(referenced, None)
+
+    result.attachments_removed = len(attachment_ids)
+    result.blobs_removed = len(blob_ids)
+    if not dry_run and (attachment_ids or blob_ids):
+        for start in range(0, len(attachment_ids), STREAM_BATCH_SIZE):
+            batch = attachment_ids[start : start + STREAM_BATCH_SIZE]
+            db.session.execute(delete(JobCardAttachment).where(JobCardAttachment.id.in_(batch)))
+        for start in range(0, len(blob_ids), STREAM_BATCH_SIZE):
+            batch = blob_ids[start : start + STREAM_BATCH_SIZE]
+            db.session.execute(
+                update(JobCardAttachment).where(JobCardAttachment.blob_id.in_(batch)).values(blob_id=None)
+            )
+            db.session.execute(delete(AttachmentBlob).where(AttachmentBlob.id.in_(batch)))
+        db.session.commit()
+    else:
+        db.session.rollback()
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def register_gc_commands(app):
+    @app.cli.command("gc-attachments")
+    @click.option("--dry-run", is_flag=True, help="Report orphans without deleting anything.")
+    @click.option("--grace", type=int, default=None, help="Ignore files modified in the last N seconds.")
+    @click.option("--verbose", "-v", is_flag=True, help="List every orphan path.")
+    def gc_attachments_command(dry_run, grace, verbose):
+        """Remove attachment files without rows and rows without files."""
+
+        result = collect_garbage(dry_run=dry_run, grace_seconds=grace)
+        prefix = "[simulation] " if dry_run else ""
+        if verbose:
+            for path in result.orphan_files:
+                click.echo(f"{prefix}fichier orphelin : {path}")
+            for path in result.missing_paths:
+                click.echo(f"{prefix}fichier manquant : {path}")
+        click.echo(
+            f"{prefix}{len(result.orphan_files)} fichier(s) orphelin(s) "
+            f"({result.orphan_bytes / (1024 * 1024):.1f} Mo), {result.attachments_removed} pièce(s) jointe(s) "
+            f"et {result.blobs_removed} blob(s) sans fichier, {result.skipped_recent} fichier(s) récent(s) ignoré(s)"
+        )
+        click.echo(
+            f"{result.files_scanned} fichier(s) ({result.bytes_scanned / (1024 * 1024):.1f} Mo) et "
+            f"{result.rows_scanned} ligne(s) parcourus en {result.elapsed:.2f}s "
+            f"({result.files_per_second:.0f} fichiers/s)"
+        )
@@ -0,0 +1,256 @@
+"""Content-addressed storage for job card attachments.
+
+Each distinct file is stored once under ``UPLOAD_ROOT/<ATTACHMENT_BLOB_SUBDIR>``
+at ``ab/cd/<sha256>``, sharded by the first two bytes of its hash so that no
+directory grows too large. :class:`~gmao.models.AttachmentBlob` records the
+file and how many attachments reference it. Attachments keep ``file_path``
+pointing at the blob, so downloads do not need to know about the store.
+
+Reference counts change in the caller's transaction. Files are only removed
+once that transaction has committed, using the paths returned by
+:func:`release_attachment`. An upload waits in the store's ``tmp`` directory
+until its blob row is held, and then always takes its blob path: a release
+committed meanwhile may have removed the stored copy.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import secrets
+import shutil
+import time
+from pathlib import Path
+from typing import Iterable, List, Mapping, Optional
+
+import click
+from flask import current_app
+from sqlalchemy import select, update
+
+from ..extensions import db
+from ..models import AttachmentBlob, JobCardAttachment
+from .uploads import DEFAULT_CHUNK_SIZE, SavedUpload, UploadError, receive_upload
+
+
+def blob_root(config: Mapping[str, object]) -> Path:
+    return Path(config.get("UPLOAD_ROOT")) / config.get("ATTACHMENT_BLOB_SUBDIR", "blobs")
+
+
+def blob_relative_path(sha256: str, config: Mapping[str, object]) -> str:
+    subdir = Path(config.get("ATTACHMENT_BLOB_SUBDIR", "blobs"))
+    return str(subdir / sha256[:2] / sha256[2:4] / sha256)
+
+
+def _place(source: Path, sha256: str, config: Mapping[str, object], keep_source: bool = False) -> str:
+    """Put ``source`` at the blob path of ``sha256`` and return that path.
+
+    A stored copy is replaced, it has the same content. With ``keep_source``
+    the file is hard-linked, or copied, instead of moved.
+    """
+
+    relative = blob_relative_path(sha256, config)
+    destination = Path(config.get("UPLOAD_ROOT")) / relative
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    if keep_source:
+        staged = blob_root(config) / "tmp" / f"{sha256}-{secrets.token_hex(8)}"
+        staged.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(source, staged)
+            # A link keeps the source's age, which gc-attachments would take for an old orphan.
+            os.utime(staged)
+        except OSError:
+            shutil.copyfile(source, staged)
+        source = staged
+    try:
+        os.replace(source, destination)
+    except BaseException:
+        if keep_source:
+            source.unlink(missing_ok=True)
+        raise
+    return relative
+
+
+def store_blob(file, config: Mapping[str, object]) -> SavedUpload:
+    """Stream an upload into the store's ``tmp`` directory and return its metadata.
+
+    ``relative_path`` is the temporary file; :func:`attach_upload` moves it
+    to its blob path. Duplicate content is detected from the hash and not
+    stored twice.
+    """
+
+    filename = file.filename or ""
+    if not filename:
+        raise UploadError("Aucun fichier fourni.")
+    # Temporary files live inside the store so that the final rename is atomic.
+    received = receive_upload(file, blob_root(config) / "tmp", config)
+    relative = received.path.relative_to(Path(config.get("UPLOAD_ROOT")))
+    return SavedUpload(received.sha256, str(relative), received.mime_type, filename, received.sha256, received.size)
+
+
+def acquire_blob(
+    sha256: str,
+    size: int,
+    mime_type: Optional[str],
+    source: Path,
+    config: Mapping[str, object],
+    keep_source: bool = False,
+) -> AttachmentBlob:
+    """Return the blob row for ``sha256`` with one more reference, its file written from ``source``.
+
+    The file is placed once the row is held, so that a release committed
+    between the upload and this call cannot leave the row without its file.
+    """
+
+    blob = AttachmentBlob.query.filter_by(sha256=sha256).first()
+    if blob is None:
+        blob = AttachmentBlob(
+            sha256=sha256,
+            storage_path=blob_relative_path(sha256, config),
+            size_bytes=size,
+            mime_type=mime_type,
+            ref_count=1,
+        )
+        db.session.add(blob)
+        db.session.flush()
+    else:
+        db.session.execute(
+            update(AttachmentBlob)
+            .where(AttachmentBlob.id == blob.id)
+            .values(ref_count=AttachmentBlob.ref_count + 1)
+            .execution_options(synchronize_session="fetch")
+        )
+    _place(source, sha256, config, keep_source=keep_source)
+    return blob
+
+
+def attach_upload(card, saved: SavedUpload, config: Mapping[str, object]) -> JobCardAttachment:
+    source = Path(config.get("UPLOAD_ROOT")) / saved.relative_path
+    try:
+        blob = acquire_blob(saved.sha256, saved.size, saved.mime_type, source, config)
+    except BaseException:
+        source.unlink(missing_ok=True)
+        raise
+    attachment = JobCardAttachment(
+        job_card=card,
+        filename=saved.stored_name,
+        original_name=saved.original_name,
+        file_path=blob.storage_path,
+        mime_type=saved.mime_type,
+        sha256=saved.sha256,
+        size_bytes=saved.size,
+        blob=blob,
+    )
+    db.session.add(attachment)
+    return attachment
+
+
+def release_attachment(attachment: JobCardAttachment, config: Mapping[str, object]) -> Optional[Path]:
+    """Drop the reference of ``attachment`` and return the file to delete, if any.
+
+    Legacy attachments stored outside the blob store own their file. The
+    returned path must only be unlinked after the transaction commits.
+    """
+
+    root = Path(config.get("UPLOAD_ROOT"))
+    blob = attachment.blob
+    if blob is None:
+        return root / attachment.file_path if attachment.file_path else None
+    db.session.execute(
+        update(AttachmentBlob)
+        .where(AttachmentBlob.id == blob.id)
+        .values(ref_count=AttachmentBlob.ref_count - 1)
+        .execution_options(synchronize_session="fetch")
+    )
+    if blob.ref_count > 0:
+        return None
+    attachment.blob = None
+    db.session.delete(blob)
+    return root / blob.storage_path
+
+
+def remove_files(paths: Iterable[Optional[Path]]) -> None:
+    for path in paths:
+        if path is None:
+            continue
+        try:
+            path.unlink(missing_ok=True)
+        except OSError:
+            current_app.logger.warning("Impossible de supprimer %s", path, exc_info=True)
+
+
+def _hash_file(path: Path, chunk_size: int = DEFAULT_CHUNK_SIZE) -> tuple[str, int]:
+    digest = hashlib.sha256()
+    size = 0
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def migrate_legacy_attachments(dry_run: bool = False, batch_size: int = 200) -> dict:
+    """Move attachments stored per card into the blob store.
+
+    Files are hashed in chunks, linked (or copied) to their blob path and the
+    rows repointed, committing every ``batch_size`` attachments. The legacy
+    files are only removed once their rows are committed, so an interrupted
+    run leaves every row pointing at a file and can simply be restarted.
+    """
+
+    config = current_app.config
+    root = Path(config["UPLOAD_ROOT"])
+    stats = {"migrated": 0, "deduplicated": 0, "missing": 0, "bytes_saved": 0}
+    seen = set()
+    migrated: List[Path] = []
+    pending = db.session.scalars(
+        select(JobCardAttachment).where(JobCardAttachment.blob_id.is_(None)).order_by(JobCardAttachment.id)
+    ).all()
+    for attachment in pending:
+        source = root / attachment.file_path if attachment.file_path else None
+        if source is None or not source.is_file():
+            stats["missing"] += 1
+            continue
+        sha256, size = _hash_file(source)
+        exists = sha256 in seen or (
+            db.session.scalar(select(AttachmentBlob.id).where(AttachmentBlob.sha256 == sha256)) is not None
+        )
+        seen.add(sha256)
+        stats["migrated"] += 1
+        if exists:
+            stats["deduplicated"] += 1
+            stats["bytes_saved"] += size
+        if dry_run:
+            continue
+        blob = acquire_blob(sha256, size, attachment.mime_type, source, config, keep_source=True)
+        attachment.blob = blob
+        attachment.file_path = blob.storage_path
+        attachment.sha256 = sha256
+        attachment.size_bytes = size
+        migrated.append(source)
+        if len(migrated) == batch_size:
+            db.session.commit()
+            remove_files(migrated)
+            migrated = []
+    if dry_run:
+        db.session.rollback()
+    else:
+        db.session.commit()
+        remove_files(migrated)
+    return stats
+
+
+def register_blob_commands(app):
+    @app.cli.command("migrate-attachments")
+    @click.option("--dry-run", is_flag=True, help="Report what would be migrated without touching files.")
+    def migrate_attachments_command(dry_run):
+        """Move per-card attachment files into the content-addressed store."""
+
+        started = time.perf_counter()
+        stats = migrate_legacy_attachments(dry_run=dry_run)
+        elapsed = time.perf_counter() - started
+        prefix = "[simulation] " if dry_run else ""
+        click.echo(
+            f"{prefix}{stats['migrated']} pièce(s) jointe(s) migrée(s), {stats['deduplicated']} doublon(s) "
+            f"({stats['bytes_saved'] / (1024 * 1024):.1f} Mo économisés), {stats['missing']} fichier(s) "
+            f"introuvable(s) en {elapsed:.2f}s"
+        )
+
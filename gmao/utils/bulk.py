@@ -0,0 +1,81 @@
+"""Set-based insert helpers shared by the seeders and bulk importers."""
+from __future__ import annotations
+
+from typing import Dict, Hashable, Iterable, List, Sequence
+
+from sqlalchemy import func, insert, select
+
+from ..extensions import db
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def bulk_insert(model, rows: Sequence[dict], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Insert ``rows`` with one multi-row ``INSERT`` per batch.
+
+    ``None`` values are rendered as ``NULL`` instead of being omitted so that
+    rows with and without optional values stay in the same batch.
+    """
+
+    statement = insert(model).execution_options(render_nulls=True)
+    for offset in range(0, len(rows), batch_size):
+        batch = rows[offset : offset + batch_size]
+        if batch:
+            db.session.execute(statement, list(batch))
+    return len(rows)
+
+
+def next_id(model) -> int:
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+
+def insert_with_ids(model, rows: Sequence[dict], batch_size: int = DEFAULT_BATCH_SIZE) -> List[int]:
+    """Insert ``rows`` and return their primary keys, in input order.
+
+    Identifiers are allocated up front from the current maximum so each batch
+    stays a single multi-row ``INSERT``: SQLite cannot guarantee the order of
+    ``RETURNING`` rows and SQLAlchemy falls back to one statement per row when
+    asked to sort them. Callers must run inside the transaction that holds the
+    database write lock.
+    """
+
+    start = next_id(model)
+    ids = list(range(start, start + len(rows)))
+    bulk_insert(model, [dict(row, id=identifier) for identifier, row in zip(ids, rows)], batch_size)
+    return ids
+
+
+def existing_ids(column, keys: Iterable[Hashable]) -> Dict[Hashable, int]:
+    """Map each value of ``column`` found among ``keys`` to its row id."""
+
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return {}
+    model = column.class_
+    found: Dict[Hashable, int] = {}
+    # Chunked to stay well below the bound parameter limit of SQLite.
+    for offset in range(0, len(keys), 500):
+        chunk = keys[offset : offset + 500]
+        found.update(db.session.execute(select(column, model.id).where(column.in_(chunk))).tuples().all())
+    return found
+
+
+def ensure_rows(column, rows: Sequence[dict], batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[Hashable, int]:
+    """Insert the ``rows`` whose ``column`` value is missing and map every key to its id.
+
+    The existence check is a single set-based query instead of one lookup per
+    row; rows sharing a key with an existing record are left untouched.
+    """
+
+    key = column.key
+    found = existing_ids(column, [row[key] for row in rows])
+    missing: List[dict] = []
+    seen = set(found)
+    for row in rows:
+        if row[key] not in seen:
+            seen.add(row[key])
+            missing.append(row)
+    if missing:
+        ids = insert_with_ids(column.class_, missing, batch_size)
+        found.update({row[key]: identifier for row, identifier in zip(missing, ids)})
+    return found
@@ -0,0 +1,158 @@
+"""Small in-process caches with TTL, LRU eviction and table-based invalidation.
+
+Caches are registered per application under ``app.extensions`` and declare
+the tables they are derived from. A session listener records the tables
+written by each transaction (ORM flushes and ORM-enabled bulk statements)
+and, once the transaction commits, clears every cache depending on one of
+them. The TTL bounds staleness for writes made by other processes.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_MISSING = object()
+_CHANGED_TABLES_KEY = "gmao_changed_tables"
+
+
+class TTLCache:
+    """Thread-safe mapping whose entries expire after ``ttl`` seconds.
+
+    At most ``maxsize`` entries are kept, the least recently used being
+    evicted first. A ``ttl`` or ``maxsize`` of zero disables the cache.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float = 60.0, depends_on: Iterable[str] = ()) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.depends_on = frozenset(depends_on)
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable = _MISSING) -> None:
+        with self._lock:
+            if key is _MISSING:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+_registry_lock = threading.Lock()
+
+
+def _caches() -> Dict[str, TTLCache]:
+    return current_app.extensions.setdefault("gmao_caches", {})
+
+
+def get_cache(
+    name: str,
+    maxsize: int = 128,
+    ttl: float = 60.0,
+    depends_on: Iterable[str] = (),
+) -> TTLCache:
+    """Return the cache called ``name`` for the current application.
+
+    The sizing arguments are only used the first time the cache is created.
+    """
+
+    caches = _caches()
+    cache = caches.get(name)
+    if cache is None:
+        with _registry_lock:
+            cache = caches.get(name)
+            if cache is None:
+                cache = caches[name] = TTLCache(maxsize=maxsize, ttl=ttl, depends_on=depends_on)
+    return cache
+
+
+def invalidate_tables(tables: Iterable[str]) -> None:
+    """Clear every cache of the current application derived from ``tables``."""
+
+    tables = set(tables)
+    for cache in list(_caches().values()):
+        if cache.depends_on & tables:
+            cache.invalidate()
+
+
+def clear_caches() -> None:
+    for cache in list(_caches().values()):
+        cache.invalidate()
+
+
+def _record_tables(session: Session, tables: Iterable[Optional[str]]) -> None:
+    session.info.setdefault(_CHANGED_TABLES_KEY, set()).update(name for name in tables if name)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_tables(session, flush_context):
+    _record_tables(
+        session,
+        (
+            getattr(getattr(instance, "__table__", None), "name", None)
+            for collection in (session.new, session.dirty, session.deleted)
+            for instance in collection
+        ),
+    )
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_statements(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, "table", None)
+        _record_tables(orm_execute_state.session, [getattr(table, "name", None)])
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_tables(session):
+    tables = session.info.pop(_CHANGED_TABLES_KEY, None)
+    if tables and has_app_context():
+        invalidate_tables(tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_tables(session):
+    session.info.pop(_CHANGED_TABLES_KEY, None)
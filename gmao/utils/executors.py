@@ -0,0 +1,27 @@
+"""Named thread pools shared by the requests of one application."""
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+_lock = threading.Lock()
+
+
+def get_thread_pool(name: str, max_workers: int) -> ThreadPoolExecutor:
+    """Return the pool called ``name``, creating it on first use.
+
+    ``max_workers`` is only read when the pool is created.
+    """
+
+    pools = current_app.extensions.setdefault("gmao_thread_pools", {})
+    pool = pools.get(name)
+    if pool is None:
+        with _lock:
+            pool = pools.get(name)
+            if pool is None:
+                pool = pools[name] = ThreadPoolExecutor(
+                    max_workers=max(1, max_workers), thread_name_prefix=f"gmao-{name}"
+                )
+    return pool
@@ -0,0 +1,78 @@
+"""Password hashing policy and login verification.
+
+The hashing method is taken from ``PASSWORD_HASH_METHOD`` and uses the
+werkzeug notation (``"scrypt:32768:8:1"``, ``"pbkdf2:sha256:600000"``), so
+each environment can pick its own cost. Hashes produced with another method
+are upgraded on the next successful login.
+
+Login verification runs on a small dedicated thread pool. hashlib releases
+the GIL while hashing, and the pool caps how many hashes are computed at
+once, so a burst of logins queues there instead of taking the CPU from the
+other requests. A login waiting longer than ``LOGIN_QUEUE_TIMEOUT`` seconds
+fails with :class:`LoginBusyError`.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from typing import Optional
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from .executors import get_thread_pool
+
+DEFAULT_HASH_METHOD = "scrypt"
+
+
+class LoginBusyError(RuntimeError):
+    """Raised when the login pool cannot verify a password in time."""
+
+
+def hash_method() -> str:
+    return current_app.config.get("PASSWORD_HASH_METHOD") or DEFAULT_HASH_METHOD
+
+
+@lru_cache(maxsize=8)
+def _stored_method(method: str) -> str:
+    """Method prefix werkzeug writes for ``method``, defaults included."""
+
+    return generate_password_hash("", method=method).split("$", 1)[0]
+
+
+def hash_password(password: str, method: Optional[str] = None) -> str:
+    return generate_password_hash(password, method=method or hash_method())
+
+
+def needs_rehash(password_hash: str, method: Optional[str] = None) -> bool:
+    return password_hash.split("$", 1)[0] != _stored_method(method or hash_method())
+
+
+def _verify(password_hash: str, password: str, method: str) -> tuple[bool, Optional[str]]:
+    if not check_password_hash(password_hash, password):
+        return False, None
+    if needs_rehash(password_hash, method):
+        return True, generate_password_hash(password, method=method)
+    return True, None
+
+
+def _login_executor() -> ThreadPoolExecutor:
+    return get_thread_pool("login", current_app.config.get("LOGIN_HASH_WORKERS", 2))
+
+
+def authenticate(user, password: str) -> bool:
+    """Check ``password`` for ``user`` and upgrade an outdated hash in place.
+
+    The caller commits the session when the hash was replaced.
+    """
+
+    future = _login_executor().submit(_verify, user.password_hash, password, hash_method())
+    try:
+        valid, new_hash = future.result(timeout=current_app.config.get("LOGIN_QUEUE_TIMEOUT", 10))
+    except FutureTimeoutError as exc:
+        future.cancel()
+        raise LoginBusyError("Trop de connexions simultanées, veuillez réessayer.") from exc
+    if new_hash is not None:
+        user.password_hash = new_hash
+    return valid
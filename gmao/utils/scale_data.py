@@ -0,0 +1,384 @@
+"""Fleet-scale synthetic dataset used to reproduce production volumes.
+
+The curated demo dataset (:mod:`gmao.utils.demo_data`) only holds a handful of
+rows per table. This generator produces deterministic data at arbitrary scale
+with batched multi-row inserts so that benchmarks can be run against realistic
+table sizes.
+"""
+from __future__ import annotations
+
+import random
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Sequence
+
+
+from ..extensions import db
+from ..models import (
+    Aircraft,
+    InventorySnapshot,
+    JobCard,
+    JobCardMaterial,
+    JobCardParagraph,
+    JobCardStep,
+    JobCardSubstep,
+    MaintenanceTask,
+    MaintenanceVisit,
+    Material,
+    MaterialRequirement,
+    MaterialSerial,
+    PersonnelStatus,
+    Role,
+    User,
+    Workshop,
+    WorkshopMaterial,
+)
+from ..materials.history import record_baseline_events
+from .bulk import bulk_insert, insert_with_ids, next_id
+from .passwords import hash_password
+
+SCALE_VISIT_TYPES = ["A", "B", "C", "D1"]
+SCALE_VISIT_DURATION_DAYS = {"A": 7, "B": 14, "C": 21, "D1": 60}
+SCALE_TASK_STATUSES = ["pending", "in_progress", "completed", "interrupted"]
+SCALE_SERIAL_STATUSES = ["avionnee", "att_rpn", "rpn", "litige", "nivellement", "stock", "sous_garantie"]
+SCALE_PERSONNEL_STATUSES = ["on-site", "on-site", "on-site", "day-off", "holidays", "sick", "other"]
+SCALE_DESIGNATIONS = [
+    "VALVE REGULATION CARBURANT",
+    "POMPE HYDRAULIQUE",
+    "DEMARREUR TURBINE",
+    "ALTERNATEUR",
+    "VANNE PRELEVEMENT AIR",
+    "ACTIONNEUR VOLET",
+    "CALCULATEUR HELICE",
+    "RADIO VHF",
+    "INDICATEUR TEMPERATURE",
+    "SERVOCOMMANDE",
+]
+
+TASKS_PER_VISIT = 8
+REQUIREMENTS_PER_TASK = 2
+SNAPSHOTS_PER_MATERIAL = 6
+
+
+def populate_scale_data(
+    aircraft: int = 50,
+    materials: int = 2000,
+    visits: int = 500,
+    serials_per_material: int = 10,
+    personnel: int | None = None,
+    job_cards: int | None = None,
+    batch_size: int = 1000,
+    seed: int = 1,
+) -> Dict[str, int]:
+    """Insert a synthetic fleet-scale dataset and return row counts per table.
+
+    Every table is filled with multi-row ``INSERT`` batches of ``batch_size``
+    rows; the session is committed once at the end. The generator is
+    deterministic for a given ``seed`` and can be run several times against
+    the same database, new identifiers being derived from the current maxima.
+    """
+
+    rng = random.Random(seed)
+    today = date.today()
+    personnel = personnel if personnel is not None else max(aircraft * 4, 20)
+    job_cards = job_cards if job_cards is not None else max(visits // 5, 20)
+
+    workshop_ids = [row.id for row in Workshop.query.order_by(Workshop.id).all()]
+    if not workshop_ids:
+        workshop_ids = insert_with_ids(
+            Workshop, [{"name": f"ATELIER-{idx:02d}"} for idx in range(1, 11)], batch_size
+        )
+    technician_role = Role.query.filter_by(name="technician").first()
+    if technician_role is None:
+        technician_role = Role(name="technician", description="Maintenance technician")
+        db.session.add(technician_role)
+        db.session.flush()
+
+    password_hash = hash_password("password")
+    counts: Dict[str, int] = {}
+
+    user_base = next_id(User)
+    user_rows = [
+        {
+            "username": f"scale{user_base + idx:06d}",
+            "full_name": f"Technicien {user_base + idx}",
+            "rank": rng.choice(["SGT", "SGT/CH", "ADJ", "CPL", "CCH"]),
+            "password_hash": password_hash,
+            "role_id": technician_role.id,
+            "workshop_id": rng.choice(workshop_ids),
+            "is_active_flag": True,
+        }
+        for idx in range(personnel)
+    ]
+    user_ids = insert_with_ids(User, user_rows, batch_size)
+    counts["users"] = len(user_ids)
+
+    status_rows = []
+    for user_id in user_ids:
+        cursor = today - timedelta(days=90)
+        while cursor <= today:
+            status = rng.choice(SCALE_PERSONNEL_STATUSES)
+            length = rng.randint(1, 21)
+            end = cursor + timedelta(days=length - 1)
+            status_rows.append(
+                {
+                    "personnel_id": user_id,
+                    "status": status,
+                    "details": None,
+                    "start_date": cursor,
+                    "end_date": None if status == "on-site" and end >= today else end,
+                }
+            )
+            cursor = end + timedelta(days=1)
+    bulk_insert(PersonnelStatus, status_rows, batch_size)
+    counts["personnel_statuses"] = len(status_rows)
+
+    aircraft_base = next_id(Aircraft)
+    aircraft_rows = [
+        {
+            "tail_number": f"SC-{aircraft_base + idx:06d}",
+            "aircraft_type": "C-130H",
+            "location": rng.choice(["3BAFRA", "BASG"]),
+            "status": rng.choice(["Disponible", "VM", "ATT VM", "MOD"]),
+            "notes": "Flotte synthétique",
+        }
+        for idx in range(aircraft)
+    ]
+    aircraft_ids = insert_with_ids(Aircraft, aircraft_rows, batch_size)
+    counts["aircraft"] = len(aircraft_ids)
+
+    material_base = next_id(Material)
+    material_rows = []
+    serial_rows_by_material: List[List[dict]] = []
+    for idx in range(materials):
+        number = material_base + idx
+        designation = f"{SCALE_DESIGNATIONS[number % len(SCALE_DESIGNATIONS)]} {number:06d}"
+        serial_rows = []
+        status_counts = {status: 0 for status in SCALE_SERIAL_STATUSES}
+        for serial_idx in range(serials_per_material):
+            status = rng.choice(SCALE_SERIAL_STATUSES)
+            status_counts[status] += 1
+            serial_rows.append(
+                {
+                    "serial_number": f"SN-{number:06d}-{serial_idx:04d}",
+                    "status": status,
+                    "aircraft_id": rng.choice(aircraft_ids) if status == "avionnee" and aircraft_ids else None,
+                    "da_reference": f"DA-{number:06d}" if status in {"att_rpn", "rpn"} else None,
+                    "da_status": "En cours" if status in {"att_rpn", "rpn"} else None,
+                    "under_warranty": status == "sous_garantie",
+                }
+            )
+        serial_rows_by_material.append(serial_rows)
+        material_rows.append(
+            {
+                "designation": designation,
+                "part_number": f"PN-{number:06d}",
+                "niin": f"{number:09d}",
+                "nsn": f"1560-{number:09d}",
+                "category": "reparable",
+                "dotation": serials_per_material,
+                "avionnee": status_counts["avionnee"],
+                "stock": status_counts["stock"],
+                "unavailable_for_repair": status_counts["att_rpn"],
+                "in_repair": status_counts["rpn"],
+                "litigation": status_counts["litige"],
+                "nivellement": status_counts["nivellement"],
+                "scrapped": 0,
+                "warranty": status_counts["sous_garantie"] > 0,
+                "per_aircraft": rng.randint(1, 4),
+                "annual_consumption": rng.randint(0, 40),
+                "workshop_id": rng.choice(workshop_ids),
+            }
+        )
+    material_ids = insert_with_ids(Material, material_rows, batch_size)
+    counts["materials"] = len(material_ids)
+
+    serial_rows = [
+        dict(row, material_id=material_id)
+        for material_id, rows in zip(material_ids, serial_rows_by_material)
+        for row in rows
+    ]
+    bulk_insert(MaterialSerial, serial_rows, batch_size)
+    counts["material_serials"] = len(serial_rows)
+    record_baseline_events()
+
+    link_rows = [
+        {"workshop_id": row["workshop_id"], "material_id": material_id, "quantity": row["stock"]}
+        for material_id, row in zip(material_ids, material_rows)
+    ]
+    bulk_insert(WorkshopMaterial, link_rows, batch_size)
+    counts["workshop_materials"] = len(link_rows)
+
+    snapshot_rows = []
+    now = datetime.utcnow()
+    for material_id, row in zip(material_ids, material_rows):
+        for offset in range(SNAPSHOTS_PER_MATERIAL):
+            snapshot_rows.append(
+                {
+                    "material_id": material_id,
+                    "taken_at": now - timedelta(days=30 * offset),
+                    "available": max(row["stock"] - rng.randint(0, 2), 0),
+                    "reserved": rng.randint(0, 3),
+                    "consumption_window_days": 30,
+                }
+            )
+    bulk_insert(InventorySnapshot, snapshot_rows, batch_size)
+    counts["inventory_snapshots"] = len(snapshot_rows)
+
+    card_ids, card_materials = _insert_job_cards(
+        rng, job_cards, workshop_ids, material_ids, batch_size
+    )
+    counts["job_cards"] = len(card_ids)
+
+    visit_rows = []
+    for idx in range(visits):
+        vp_type = rng.choice(SCALE_VISIT_TYPES)
+        start = today - timedelta(days=rng.randint(-180, 3 * 365))
+        end = start + timedelta(days=SCALE_VISIT_DURATION_DAYS[vp_type])
+        if start > today:
+            status = "planned"
+        elif end >= today:
+            status = "ongoing"
+        else:
+            status = "completed"
+        visit_rows.append(
+            {
+                "name": f"VP {vp_type} #{idx + 1}",
+                "aircraft_id": rng.choice(aircraft_ids),
+                "vp_type": vp_type,
+                "status": status,
+                "start_date": start,
+                "end_date": end if status != "planned" else None,
+                "description": "Visite synthétique",
+            }
+        )
+    visit_ids = insert_with_ids(MaintenanceVisit, visit_rows, batch_size)
+    counts["maintenance_visits"] = len(visit_ids)
+
+    task_rows = []
+    for visit_id, visit in zip(visit_ids, visit_rows):
+        for task_idx in range(TASKS_PER_VISIT):
+            if visit["status"] == "completed":
+                status = "completed"
+            elif visit["status"] == "planned":
+                status = "pending"
+            else:
+                status = rng.choice(SCALE_TASK_STATUSES)
+            started_at = None
+            completed_at = None
+            if status != "pending":
+                started_at = datetime.combine(visit["start_date"], datetime.min.time()) + timedelta(hours=8 * task_idx)
+            if status == "completed":
+                completed_at = started_at + timedelta(hours=rng.randint(2, 12))
+            task_rows.append(
+                {
+                    "visit_id": visit_id,
+                    "job_card_id": rng.choice(card_ids) if card_ids else None,
+                    "workshop_id": rng.choice(workshop_ids),
+                    "lead_id": rng.choice(user_ids) if user_ids else None,
+                    "name": f"Tâche {task_idx + 1} VP {visit['vp_type']}",
+                    "status": status,
+                    "estimated_hours": float(rng.randint(2, 16)),
+                    "started_at": started_at,
+                    "completed_at": completed_at,
+                    "is_package_item": False,
+                }
+            )
+    task_ids = insert_with_ids(MaintenanceTask, task_rows, batch_size)
+    counts["maintenance_tasks"] = len(task_ids)
+
+    requirement_rows = []
+    for task_id, task in zip(task_ids, task_rows):
+        for _ in range(REQUIREMENTS_PER_TASK):
+            requirement_rows.append(
+                {
+                    "task_id": task_id,
+                    "material_id": rng.choice(material_ids),
+                    "quantity": rng.randint(1, 3),
+                    "fulfilled": task["status"] == "completed",
+                }
+            )
+    bulk_insert(MaterialRequirement, requirement_rows, batch_size)
+    counts["material_requirements"] = len(requirement_rows)
+    counts["job_card_materials"] = card_materials
+
+    db.session.commit()
+    return counts
+
+
+def _insert_job_cards(
+    rng: random.Random,
+    total: int,
+    workshop_ids: Sequence[int],
+    material_ids: Sequence[int],
+    batch_size: int,
+) -> tuple[List[int], int]:
+    card_base = next_id(JobCard)
+    card_rows = [
+        {
+            "card_number": f"SC-{card_base + idx:06d}",
+            "title": f"Carte synthétique {card_base + idx}",
+            "revision": "A",
+            "summary": "Procédure générée",
+            "content": None,
+            "created_at": datetime.utcnow(),
+        }
+        for idx in range(total)
+    ]
+    card_ids = insert_with_ids(JobCard, card_rows, batch_size)
+
+    paragraph_rows = [
+        {
+            "job_card_id": card_id,
+            "title": f"Paragraphe {order + 1}",
+            "order_index": order,
+            "workshop_id": rng.choice(workshop_ids),
+            "estimated_minutes": rng.randint(10, 60),
+        }
+        for card_id in card_ids
+        for order in range(3)
+    ]
+    paragraph_ids = insert_with_ids(JobCardParagraph, paragraph_rows, batch_size)
+
+    step_rows = [
+        {
+            "job_card_id": paragraph["job_card_id"],
+            "paragraph_id": paragraph_id,
+            "title": None,
+            "description": f"Étape {order + 1}",
+            "order_index": order,
+            "workshop_id": paragraph["workshop_id"],
+            "estimated_minutes": rng.randint(5, 45),
+        }
+        for paragraph_id, paragraph in zip(paragraph_ids, paragraph_rows)
+        for order in range(4)
+    ]
+    step_ids = insert_with_ids(JobCardStep, step_rows, batch_size)
+
+    substep_rows = [
+        {
+            "job_card_id": step["job_card_id"],
+            "step_id": step_id,
+            "description": f"Sous-étape {order + 1}",
+            "order_index": order,
+            "workshop_id": step["workshop_id"],
+            "estimated_minutes": rng.randint(0, 15),
+        }
+        for step_id, step in zip(step_ids, step_rows)
+        for order in range(2)
+    ]
+    bulk_insert(JobCardSubstep, substep_rows, batch_size)
+
+    material_rows = []
+    if material_ids:
+        for step_id, step in zip(step_ids, step_rows):
+            if step["order_index"] == 0:
+                material_rows.append(
+                    {
+                        "job_card_id": step["job_card_id"],
+                        "material_id": rng.choice(material_ids),
+                        "step_id": step_id,
+                        "quantity": float(rng.randint(1, 4)),
+                    }
+                )
+    bulk_insert(JobCardMaterial, material_rows, batch_size)
+    return card_ids, len(material_rows)
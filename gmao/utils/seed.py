@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import time
 from datetime import date, timedelta
 from typing import Dict, Iterable, List
 
+import click
 from flask import current_app
-from werkzeug.security import generate_password_hash
+from sqlalchemy import select
 
 from ..extensions import db
 from ..models import (
@@ -21,7 +23,10 @@ from ..models import (
     User,
     Workshop,
 )
+from .bulk import bulk_insert, ensure_rows, insert_with_ids
 from .demo_data import AIRCRAFT_DATA, MATERIAL_DATA, PERSONNEL_DATA, generate_visit_schedule
+from .passwords import hash_password
+from .scale_data import populate_scale_data
 
 WORKSHOP_NAMES: List[str] = [
     "MOTEUR",
@@ -37,9 +42,6 @@ WORKSHOP_NAMES: List[str] = [
     "NDI",
 ]
 
-ADMIN_PASSWORD_HASH = generate_password_hash("admin123")
-DEFAULT_USER_PASSWORD_HASH = generate_password_hash("password")
-
 
 def register_seed_commands(app):
     @app.cli.command("seed-demo")
@@ -53,10 +55,59 @@ def register_seed_commands(app):
         else:
             current_app.logger.info("Demo data already present; skipped seeding")
 
+    @app.cli.command("restore-demo")
+    @click.option("--rebuild", is_flag=True, help="Reseed the snapshot even if it is current.")
+    def restore_demo_command(rebuild):
+        """Reset the database to the golden demo snapshot."""
+
+        from .snapshot import SnapshotError, restore_demo
+
+        started = time.perf_counter()
+        try:
+            path = restore_demo(current_app.config["DEMO_SNAPSHOT_DIR"], rebuild=rebuild)
+        except SnapshotError as exc:
+            raise click.ClickException(str(exc)) from exc
+        click.echo(f"Demo database restored from {path} in {time.perf_counter() - started:.2f}s")
+
+    @app.cli.command("seed-scale")
+    @click.option("--aircraft", default=50, show_default=True, help="Number of aircraft.")
+    @click.option("--materials", default=2000, show_default=True, help="Number of materials.")
+    @click.option("--visits", default=500, show_default=True, help="Number of maintenance visits.")
+    @click.option(
+        "--serials-per-material",
+        default=10,
+        show_default=True,
+        help="Serial numbers generated for each material.",
+    )
+    @click.option("--personnel", default=None, type=int, help="Number of technicians (default: 4 per aircraft).")
+    @click.option("--batch-size", default=1000, show_default=True, help="Rows per INSERT batch.")
+    @click.option("--seed", "random_seed", default=1, show_default=True, help="Random seed.")
+    def seed_scale(aircraft, materials, visits, serials_per_material, personnel, batch_size, random_seed):
+        """Append a synthetic fleet-scale dataset using bulk inserts."""
+
+        started = time.perf_counter()
+        counts = populate_scale_data(
+            aircraft=aircraft,
+            materials=materials,
+            visits=visits,
+            serials_per_material=serials_per_material,
+            personnel=personnel,
+            batch_size=batch_size,
+            seed=random_seed,
+        )
+        elapsed = time.perf_counter() - started
+        total = sum(counts.values())
+        for table, count in counts.items():
+            click.echo(f"{table:<24} {count:>10}")
+        click.echo(f"{total} rows inserted in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f} rows/s)")
+
 
 def populate_demo_data(reset: bool = False, skip_if_exists: bool = True) -> bool:
     """Populate the database with curated demo data.
 
+    Existence checks are done with one set-based query per table and the
+    missing rows are written with multi-row ``INSERT`` batches.
+
     Args:
         reset: When True the schema is dropped and recreated before loading data.
         skip_if_exists: When True the function will return immediately if demo
@@ -75,24 +126,21 @@ def populate_demo_data(reset: bool = False, skip_if_exists: bool = True) -> bool
 
     roles = _ensure_roles()
     workshops = _ensure_workshops()
-    admin_user = _ensure_admin_user(roles)
-    engineers = _ensure_engineers(roles)
-    technicians = _ensure_technicians(roles, workshops)
+    # Every demo account shares a password, so each hash is computed once.
+    default_password_hash = hash_password("password")
+    admin_id = _ensure_admin_user(roles, hash_password("admin123"))
+    engineers = _ensure_engineers(roles, default_password_hash)
+    technicians = _ensure_technicians(roles, workshops, default_password_hash)
 
     _ensure_personnel_statuses(technicians)
     aircraft = _ensure_aircraft()
     materials = _ensure_materials()
     _ensure_inventory_snapshots(materials)
 
-    visits_created = False
     if MaintenanceVisit.query.count() == 0:
         visits = _create_visits(aircraft)
-        visits_created = True
-    else:
-        visits = MaintenanceVisit.query.order_by(MaintenanceVisit.start_date).all()
-
-    if visits_created and MaintenanceTask.query.count() == 0:
-        _create_tasks(visits, technicians, materials, workshops)
+        if MaintenanceTask.query.count() == 0:
+            _create_tasks(visits, technicians, materials, workshops)
 
     if JobCard.query.count() == 0:
         _create_job_cards()
@@ -104,14 +152,14 @@ def populate_demo_data(reset: bool = False, skip_if_exists: bool = True) -> bool
 
     current_app.logger.debug(
         "Demo seed complete: %s admin=%s engineers=%d technicians=%d aircraft=%d materials=%d",
-        "reset" if reset else "initial", admin_user.username, len(engineers), len(technicians), len(aircraft), len(materials)
+        "reset" if reset else "initial", admin_id, len(engineers), len(technicians), len(aircraft), len(materials)
     )
     return True
 
 
 def _demo_records_exist() -> bool:
     return any(
-        model.query.count() > 0
+        db.session.query(model.query.exists()).scalar()
         for model in (
             Aircraft,
             Material,
@@ -121,91 +169,84 @@ def _demo_records_exist() -> bool:
     )
 
 
-def _ensure_roles() -> Dict[str, Role]:
+def _ensure_roles() -> Dict[str, int]:
     definitions = {
         "admin": "Full access",
         "engineer": "Engineering management",
         "technician": "Workshop technician",
     }
-    roles: Dict[str, Role] = {}
-    for name, description in definitions.items():
-        role = Role.query.filter_by(name=name).first()
-        if role is None:
-            role = Role(name=name, description=description)
-            db.session.add(role)
-        roles[name] = role
-    db.session.flush()
-    return roles
-
-
-def _ensure_workshops() -> Dict[str, Workshop]:
-    workshops: Dict[str, Workshop] = {}
-    for name in WORKSHOP_NAMES:
-        workshop = Workshop.query.filter_by(name=name).first()
-        if workshop is None:
-            workshop = Workshop(name=name)
-            db.session.add(workshop)
-        workshops[name] = workshop
-    db.session.flush()
-    return workshops
-
-
-def _ensure_admin_user(roles: Dict[str, Role]) -> User:
-    admin = User.query.filter_by(username="admin").first()
-    if admin is None:
-        admin = User(
-            username="admin",
-            full_name="Admin GMAO",
-            rank="CPT",
-            role=roles["admin"],
-        )
-        admin.password_hash = ADMIN_PASSWORD_HASH
-        db.session.add(admin)
-        db.session.flush()
-    return admin
-
-
-def _ensure_engineers(roles: Dict[str, Role]) -> List[User]:
-    engineers: List[User] = []
-    for idx in range(1, 4):
-        username = f"eng{idx}"
-        engineer = User.query.filter_by(username=username).first()
-        if engineer is None:
-            engineer = User(
-                username=username,
-                full_name=f"Engineer {idx}",
-                rank="ING",
-                role=roles["engineer"],
-            )
-            engineer.password_hash = DEFAULT_USER_PASSWORD_HASH
-            db.session.add(engineer)
-        db.session.flush()
-        engineers.append(engineer)
-    return engineers
-
-
-def _ensure_technicians(roles: Dict[str, Role], workshops: Dict[str, Workshop]) -> List[User]:
-    technicians: List[User] = []
-    for record in PERSONNEL_DATA:
-        username = record["Matricule"].lower()
-        technician = User.query.filter_by(username=username).first()
-        if technician is None:
-            technician = User(
-                username=username,
-                full_name=f"{record['Prénom']} {record['Nom']}",
-                rank=record["Grade"],
-                role=roles["technician"],
-                workshop=workshops.get(record["Atelier"]),
-            )
-            technician.password_hash = DEFAULT_USER_PASSWORD_HASH
-            db.session.add(technician)
-        db.session.flush()
-        technicians.append(technician)
-    return technicians
+    return ensure_rows(
+        Role.name,
+        [{"name": name, "description": description} for name, description in definitions.items()],
+    )
 
 
-def _ensure_personnel_statuses(technicians: Iterable[User]) -> None:
-    existing = {status.personnel_id for status in PersonnelStatus.query.all()}
+def _ensure_workshops() -> Dict[str, int]:
+    return ensure_rows(Workshop.name, [{"name": name} for name in WORKSHOP_NAMES])
+
+
+def _ensure_admin_user(roles: Dict[str, int], password_hash: str) -> int:
+    ids = ensure_rows(
+        User.username,
+        [
+            {
+                "username": "admin",
+                "full_name": "Admin GMAO",
+                "rank": "CPT",
+                "role_id": roles["admin"],
+                "password_hash": password_hash,
+                "is_active_flag": True,
+            }
+        ],
+    )
+    return ids["admin"]
+
+
+def _ensure_engineers(roles: Dict[str, int], password_hash: str) -> List[int]:
+    rows = [
+        {
+            "username": f"eng{idx}",
+            "full_name": f"Engineer {idx}",
+            "rank": "ING",
+            "role_id": roles["engineer"],
+            "password_hash": password_hash,
+            "is_active_flag": True,
+        }
+        for idx in range(1, 4)
+    ]
+    ids = ensure_rows(User.username, rows)
+    return [ids[row["username"]] for row in rows]
+
+
+def _ensure_technicians(
+    roles: Dict[str, int], workshops: Dict[str, int], password_hash: str
+) -> Dict[str, int]:
+    """Return technician ids keyed by username, in ``PERSONNEL_DATA`` order."""
+
+    rows = [
+        {
+            "username": record["Matricule"].lower(),
+            "full_name": f"{record['Prénom']} {record['Nom']}",
+            "rank": record["Grade"],
+            "role_id": roles["technician"],
+            "workshop_id": workshops.get(record["Atelier"]),
+            "password_hash": password_hash,
+            "is_active_flag": True,
+        }
+        for record in PERSONNEL_DATA
+    ]
+    ids = ensure_rows(User.username, rows)
+    return {row["username"]: ids[row["username"]] for row in rows}
+
+
+def _ensure_personnel_statuses(technicians: Dict[str, int]) -> None:
+    existing = set(
+        db.session.scalars(
+            select(PersonnelStatus.personnel_id).where(
+                PersonnelStatus.personnel_id.in_(list(technicians.values()))
+            )
+        )
+    )
     record_map = {record["Matricule"].lower(): record for record in PERSONNEL_DATA}
 
     status_duration = {
@@ -218,169 +259,198 @@ def _ensure_personnel_statuses(technicians: Iterable[User]) -> None:
         "autres": None,
     }
 
-    for idx, technician in enumerate(technicians):
-        if technician.id in existing:
+    rows = []
+    for idx, (username, technician_id) in enumerate(technicians.items()):
+        if technician_id in existing:
             continue
-        record = record_map[technician.username]
+        record = record_map[username]
         status_label = record["Status"]
         start_offset = idx % 21
         start = date.today() - timedelta(days=start_offset)
         duration = status_duration.get(status_label)
         end = start + timedelta(days=duration) if duration else None
-        status = PersonnelStatus(
-            personnel=technician,
-            status=status_label,
-            details=f"Situation familiale: {record['Situation Familiale']}",
-            start_date=start,
-            end_date=end,
+        rows.append(
+            {
+                "personnel_id": technician_id,
+                "status": status_label,
+                "details": f"Situation familiale: {record['Situation Familiale']}",
+                "start_date": start,
+                "end_date": end,
+            }
         )
-        db.session.add(status)
-
-
-def _ensure_aircraft() -> List[Aircraft]:
-    aircraft_objects: List[Aircraft] = []
-    for record in AIRCRAFT_DATA:
-        tail_number = record["Matricule"]
-        aircraft = Aircraft.query.filter_by(tail_number=tail_number).first()
-        if aircraft is None:
-            aircraft = Aircraft(
-                tail_number=tail_number,
-                aircraft_type=record["Type"],
-                location=record["Position"],
-                status=record["Statut"],
-                notes="Flotte RMAF C-130H",
-            )
-            db.session.add(aircraft)
-            db.session.flush()
-        aircraft_objects.append(aircraft)
-    return aircraft_objects
+    bulk_insert(PersonnelStatus, rows)
+
+
+def _ensure_aircraft() -> Dict[str, int]:
+    """Return aircraft ids keyed by tail number."""
+
+    rows = [
+        {
+            "tail_number": record["Matricule"],
+            "aircraft_type": record["Type"],
+            "location": record["Position"],
+            "status": record["Statut"],
+            "notes": "Flotte RMAF C-130H",
+        }
+        for record in AIRCRAFT_DATA
+    ]
+    return ensure_rows(Aircraft.tail_number, rows)
 
 
-def _ensure_materials() -> List[Material]:
-    materials: List[Material] = []
+def _ensure_materials() -> List[dict]:
+    """Return one mapping per demo material with its id and seeded quantities."""
+
+    rows = []
     for record in MATERIAL_DATA:
         part_number = record["PN"]
-        serial = record["SN"]
-        material = Material.query.filter_by(part_number=part_number, serial_number=serial).first()
-        if material is None:
-            designation = record["Designation"]
-            category = "hydraulique" if "VALVE" in designation else "instrumentation"
-            material = Material(
-                designation=designation,
-                part_number=part_number,
-                serial_number=serial,
-                category=category,
-                dotation=int(record["dotation"] or 0),
-                avionnee=int(record["avionne"] or 0),
-                stock=int(record["stock"] or 0),
-                unavailable_for_repair=int(record["indispo att rpn"] or 0),
-                in_repair=int(record["en rpn"] or 0),
-                litigation=int(record["litige"] or 0),
-                scrapped=int(record["reforme"] or 0),
-                warranty=False,
-                contract_type="cadre" if "REG" in part_number else "ferme",
-                per_aircraft=1,
-                annual_consumption=int(record["consommation annuelle"] or 0),
-                da_reference=record["DA"],
-                da_status=record["status DA"],
-            )
-            db.session.add(material)
-            db.session.flush()
-        materials.append(material)
+        designation = record["Designation"]
+        rows.append(
+            {
+                "designation": designation,
+                "part_number": part_number,
+                "serial_number": record["SN"],
+                "category": "hydraulique" if "VALVE" in designation else "instrumentation",
+                "dotation": int(record["dotation"] or 0),
+                "avionnee": int(record["avionne"] or 0),
+                "stock": int(record["stock"] or 0),
+                "unavailable_for_repair": int(record["indispo att rpn"] or 0),
+                "in_repair": int(record["en rpn"] or 0),
+                "litigation": int(record["litige"] or 0),
+                "scrapped": int(record["reforme"] or 0),
+                "warranty": False,
+                "contract_type": "cadre" if "REG" in part_number else "ferme",
+                "per_aircraft": 1,
+                "annual_consumption": int(record["consommation annuelle"] or 0),
+                "da_reference": record["DA"],
+                "da_status": record["status DA"],
+            }
+        )
+    # The serial number is unique on materials, so it identifies demo rows.
+    ids = ensure_rows(Material.serial_number, rows)
+    materials = []
+    for row in rows:
+        material_id = ids[row["serial_number"]]
+        materials.append(dict(row, id=material_id))
     return materials
 
 
-def _ensure_inventory_snapshots(materials: Iterable[Material]) -> None:
-    for material in materials:
-        snapshot = InventorySnapshot.query.filter_by(material_id=material.id).first()
-        if snapshot is None:
-            snapshot = InventorySnapshot(
-                material=material,
-                available=material.stock,
-                reserved=max(material.avionnee - material.stock, 0),
-                consumption_window_days=30,
-            )
-            db.session.add(snapshot)
+def _ensure_inventory_snapshots(materials: List[dict]) -> None:
+    material_ids = [material["id"] for material in materials]
+    existing = set(
+        db.session.scalars(
+            select(InventorySnapshot.material_id)
+            .where(InventorySnapshot.material_id.in_(material_ids))
+            .distinct()
+        )
+    )
+    rows = [
+        {
+            "material_id": material["id"],
+            "available": material["stock"],
+            "reserved": max(material["avionnee"] - material["stock"], 0),
+            "consumption_window_days": 30,
+        }
+        for material in materials
+        if material["id"] not in existing
+    ]
+    bulk_insert(InventorySnapshot, rows)
 
 
-def _create_visits(aircraft: List[Aircraft]) -> List[MaintenanceVisit]:
+def _create_visits(aircraft: Dict[str, int]) -> List[dict]:
     visit_records = generate_visit_schedule(100)
-    aircraft_by_tail = {item.tail_number: item for item in aircraft}
-    visits: List[MaintenanceVisit] = []
-    for record in visit_records:
-        aircraft_obj = aircraft_by_tail[record["aircraft"]]
-        visit = MaintenanceVisit(
-            name=record["name"],
-            aircraft=aircraft_obj,
-            vp_type=record["vp_type"],
-            status=record["status"],
-            start_date=record["start_date"],
-            end_date=record["end_date"],
-            description=f"Programme {record['vp_type']} de la flotte RMAF",
-        )
-        db.session.add(visit)
-        visits.append(visit)
-    db.session.flush()
-    return visits
+    rows = [
+        {
+            "name": record["name"],
+            "aircraft_id": aircraft[record["aircraft"]],
+            "vp_type": record["vp_type"],
+            "status": record["status"],
+            "start_date": record["start_date"],
+            "end_date": record["end_date"],
+            "description": f"Programme {record['vp_type']} de la flotte RMAF",
+        }
+        for record in visit_records
+    ]
+    ids = insert_with_ids(MaintenanceVisit, rows)
+    return [dict(row, id=visit_id) for row, visit_id in zip(rows, ids)]
 
 
 def _create_tasks(
-    visits: List[MaintenanceVisit],
-    technicians: List[User],
-    materials: List[Material],
-    workshops: Dict[str, Workshop],
+    visits: List[dict],
+    technicians: Dict[str, int],
+    materials: List[dict],
+    workshops: Dict[str, int],
 ) -> None:
     task_templates = [
         ("Inspection structure", "pending"),
         ("Tests moteurs", "in_progress"),
         ("Validation documentation", "completed"),
     ]
-    workshop_cycle = list(workshops.values())
+    workshop_cycle = [workshops[name] for name in WORKSHOP_NAMES]
+    technician_ids = list(technicians.values())
 
+    task_rows = []
+    requirement_specs = []
     for visit_idx, visit in enumerate(visits):
         for task_idx, (task_name, base_status) in enumerate(task_templates):
             task_status = base_status
-            if visit.status == "ongoing" and task_idx == 0:
+            if visit["status"] == "ongoing" and task_idx == 0:
                 task_status = "ongoing"
-            task = MaintenanceTask(
-                visit=visit,
-                workshop=workshop_cycle[(visit_idx + task_idx) % len(workshop_cycle)],
-                lead=technicians[(visit_idx + task_idx) % len(technicians)],
-                name=f"{task_name} {visit.vp_type}",
-                status=task_status,
-                estimated_hours=6 + task_idx * 3,
+            task_rows.append(
+                {
+                    "visit_id": visit["id"],
+                    "workshop_id": workshop_cycle[(visit_idx + task_idx) % len(workshop_cycle)],
+                    "lead_id": technician_ids[(visit_idx + task_idx) % len(technician_ids)],
+                    "name": f"{task_name} {visit['vp_type']}",
+                    "status": task_status,
+                    "estimated_hours": 6 + task_idx * 3,
+                    "is_package_item": False,
+                }
             )
-            db.session.add(task)
-
-            for requirement_idx in range(2):
-                material = materials[(visit_idx + requirement_idx + task_idx) % len(materials)]
-                requirement = MaterialRequirement(
-                    task=task,
-                    material=material,
-                    quantity=1 + (task_idx + requirement_idx) % 3,
-                    fulfilled=task_status == "completed",
-                )
-                db.session.add(requirement)
+            requirement_specs.append((visit_idx, task_idx, task_status))
+
+    task_ids = insert_with_ids(MaintenanceTask, task_rows)
+
+    requirement_rows = []
+    for task_id, (visit_idx, task_idx, task_status) in zip(task_ids, requirement_specs):
+        for requirement_idx in range(2):
+            material = materials[(visit_idx + requirement_idx + task_idx) % len(materials)]
+            requirement_rows.append(
+                {
+                    "task_id": task_id,
+                    "material_id": material["id"],
+                    "quantity": 1 + (task_idx + requirement_idx) % 3,
+                    "fulfilled": task_status == "completed",
+                }
+            )
+    bulk_insert(MaterialRequirement, requirement_rows)
 
 
 def _create_job_cards() -> None:
-    for idx in range(1, 11):
-        job_card = JobCard(
-            card_number=f"JC-{idx:04d}",
-            title=f"Maintenance Card {idx}",
-            revision="A",
-            summary="Standard maintenance procedure",
-            content="Detailed steps for the maintenance activity.",
-        )
-        db.session.add(job_card)
+    bulk_insert(
+        JobCard,
+        [
+            {
+                "card_number": f"JC-{idx:04d}",
+                "title": f"Maintenance Card {idx}",
+                "revision": "A",
+                "summary": "Standard maintenance procedure",
+                "content": "Detailed steps for the maintenance activity.",
+            }
+            for idx in range(1, 11)
+        ],
+    )
 
 
-def _create_demand_predictions(materials: Iterable[Material]) -> None:
-    for material in materials:
-        prediction = DemandPrediction(
-            material=material,
-            window_days=30,
-            predicted_need=max(material.annual_consumption / 12, 1),
-            model="wilson",
-        )
-        db.session.add(prediction)
+def _create_demand_predictions(materials: Iterable[dict]) -> None:
+    bulk_insert(
+        DemandPrediction,
+        [
+            {
+                "material_id": material["id"],
+                "window_days": 30,
+                "predicted_need": max(material["annual_consumption"] / 12, 1),
+                "model": "wilson",
+            }
+            for material in materials
+        ],
+    )
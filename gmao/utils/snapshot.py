@@ -0,0 +1,126 @@
+"""Golden snapshot of the demo database for fast resets.
+
+Seeding the demo dataset drops and recreates the schema before inserting
+every row. The snapshot helpers seed once into a SQLite file and then copy
+that file into the application database with the SQLite online backup API,
+which is a page-level copy and works for file databases and ``:memory:``.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+from datetime import date
+from pathlib import Path
+
+from sqlalchemy.schema import CreateTable
+
+from ..extensions import db
+from . import demo_data, seed
+from .cache import clear_caches
+
+SNAPSHOT_PREFIX = "demo-"
+SNAPSHOT_SUFFIX = ".sqlite"
+
+
+class SnapshotError(RuntimeError):
+    """Raised when the demo snapshot cannot be built or restored."""
+
+
+def _driver_connection():
+    if db.engine.dialect.name != "sqlite":
+        raise SnapshotError("Les snapshots de démonstration nécessitent une base SQLite.")
+    return db.engine.raw_connection()
+
+
+def snapshot_fingerprint() -> str:
+    """Identify the schema and demo dataset a snapshot was built from.
+
+    The demo dataset uses dates relative to today, so the day is part of the
+    fingerprint and snapshots are rebuilt once per day.
+    """
+
+    digest = hashlib.sha1()
+    for table in db.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=db.engine.dialect)).encode())
+    for module in (demo_data, seed):
+        digest.update(Path(module.__file__).read_bytes())
+    digest.update(date.today().isoformat().encode())
+    return digest.hexdigest()[:16]
+
+
+def snapshot_path(directory: Path) -> Path:
+    return Path(directory) / f"{SNAPSHOT_PREFIX}{snapshot_fingerprint()}{SNAPSHOT_SUFFIX}"
+
+
+def save_snapshot(path: Path) -> Path:
+    """Copy the application database into ``path`` atomically."""
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(path.name + ".tmp")
+    db.session.commit()
+    db.session.remove()
+    raw = _driver_connection()
+    try:
+        target = sqlite3.connect(temporary)
+        try:
+            raw.driver_connection.backup(target)
+        finally:
+            target.close()
+    finally:
+        raw.close()
+    os.replace(temporary, path)
+    return path
+
+
+def restore_snapshot(path: Path) -> None:
+    """Replace the content of the application database with ``path``."""
+
+    path = Path(path)
+    if not path.exists():
+        raise SnapshotError(f"Snapshot introuvable : {path}")
+    db.session.remove()
+    raw = _driver_connection()
+    try:
+        source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            source.backup(raw.driver_connection)
+        finally:
+            source.close()
+    finally:
+        raw.close()
+    # The copy bypasses the ORM, so no commit event invalidates the caches.
+    clear_caches()
+
+
+def ensure_demo_snapshot(directory: Path, rebuild: bool = False) -> Path:
+    """Return the current demo snapshot, seeding it first when needed.
+
+    Building the snapshot seeds the application database itself, which is
+    then copied to the snapshot file. Snapshots left over from another schema
+    or day are removed.
+    """
+
+    directory = Path(directory)
+    path = snapshot_path(directory)
+    if path.exists() and not rebuild:
+        return path
+
+    seed.populate_demo_data(reset=True, skip_if_exists=False)
+    save_snapshot(path)
+    for stale in directory.glob(f"{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return path
+
+
+def restore_demo(directory: Path, rebuild: bool = False) -> Path:
+    """Reset the application database to the demo snapshot."""
+
+    path = snapshot_path(Path(directory))
+    if rebuild or not path.exists():
+        # Building the snapshot leaves the database in the snapshot state.
+        return ensure_demo_snapshot(directory, rebuild=True)
+    restore_snapshot(path)
+    return path
@@ -1,39 +1,55 @@
 from __future__ import annotations
 
-import mimetypes
+import hashlib
+import os
 import secrets
+import tempfile
 from pathlib import Path
-from typing import Iterable, Mapping, Tuple
+from typing import BinaryIO, Iterable, Mapping, NamedTuple
 
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 
 
+DEFAULT_CHUNK_SIZE = 64 * 1024
+PDF_HEADER_WINDOW = 1024
+
+
 class UploadError(ValueError):
     """Raised when an uploaded file does not meet validation rules."""
 
 
-def _normalise_mime_type(candidate: str | None, filename: str | None) -> str:
-    mimetype = (candidate or "").lower()
-    if mimetype:
-        return mimetype
-    guessed, _ = mimetypes.guess_type(filename or "")
-    return (guessed or "application/octet-stream").lower()
+class ReceivedUpload(NamedTuple):
+    path: Path
+    mime_type: str
+    sha256: str
+    size: int
 
 
-def _ensure_allowed(mimetype: str, filename: str, allowed: Iterable[str]) -> str:
-    allowed_normalised = {item.lower() for item in allowed}
-    if not allowed_normalised:
-        return mimetype
+class SavedUpload(NamedTuple):
+    stored_name: str
+    relative_path: str
+    mime_type: str
+    original_name: str
+    sha256: str
+    size: int
 
-    if mimetype in allowed_normalised:
-        return mimetype
 
-    suffix = Path(filename).suffix.lower()
-    if suffix == ".pdf" and "application/pdf" in allowed_normalised:
+def _sniff_mime_type(head: bytes) -> str | None:
+    """Identify the content from its first bytes instead of trusting the client."""
+
+    # The PDF header may be preceded by junk, readers accept it in the first KiB.
+    if b"%PDF-" in head[:PDF_HEADER_WINDOW]:
         return "application/pdf"
+    return None
+
 
-    raise UploadError("Les pièces jointes doivent être au format PDF.")
+def _ensure_allowed(head: bytes, allowed: Iterable[str]) -> str:
+    mimetype = _sniff_mime_type(head) or "application/octet-stream"
+    allowed_normalised = {item.lower() for item in allowed}
+    if allowed_normalised and mimetype not in allowed_normalised:
+        raise UploadError("Les pièces jointes doivent être au format PDF.")
+    return mimetype
 
 
 def _generate_storage_name(filename: str) -> str:
@@ -47,15 +63,64 @@ def _generate_storage_name(filename: str) -> str:
     return f"{stem}-{token}{suffix.lower()}"
 
 
+def _copy_stream(source: BinaryIO, target: BinaryIO, max_size: int, chunk_size: int, allowed: Iterable[str]):
+    """Copy ``source`` into ``target`` chunk by chunk, hashing and checking it.
+
+    The content type is checked on the first chunk, before anything else is
+    read. Returns ``(mimetype, sha256, size)``.
+    """
+
+    digest = hashlib.sha256()
+    size = 0
+    head = source.read(max(chunk_size, PDF_HEADER_WINDOW))
+    mimetype = _ensure_allowed(head, allowed)
+    chunk = head
+    while chunk:
+        size += len(chunk)
+        if max_size and size > max_size:
+            raise UploadError(
+                f"Le fichier dépasse la taille maximale autorisée ({max_size / (1024 * 1024):.0f} Mo)."
+            )
+        digest.update(chunk)
+        target.write(chunk)
+        chunk = source.read(chunk_size)
+    if size == 0:
+        raise UploadError("Le fichier est vide.")
+    return mimetype, digest.hexdigest(), size
+
+
+def receive_upload(file: FileStorage, directory: Path, config: Mapping[str, object]) -> ReceivedUpload:
+    """Stream ``file`` into a new temporary file inside ``directory``.
+
+    The upload is copied in ``UPLOAD_CHUNK_SIZE`` chunks, hashed with SHA-256
+    on the way and flushed to disk. The caller renames the temporary file
+    into place, which is atomic as long as it stays on the same filesystem.
+    """
+
+    allowed = config.get("JOB_CARD_ALLOWED_MIME_TYPES", set())
+    max_size = int(config.get("JOB_CARD_MAX_UPLOAD_BYTES", 0) or 0)
+    chunk_size = int(config.get("UPLOAD_CHUNK_SIZE", DEFAULT_CHUNK_SIZE))
+
+    directory.mkdir(parents=True, exist_ok=True)
+    file.stream.seek(0)
+    handle, temporary = tempfile.mkstemp(prefix=".upload-", suffix=".part", dir=directory)
+    try:
+        with os.fdopen(handle, "wb") as target:
+            mimetype, sha256, size = _copy_stream(file.stream, target, max_size, chunk_size, allowed)
+            target.flush()
+            os.fsync(target.fileno())
+    except BaseException:
+        Path(temporary).unlink(missing_ok=True)
+        raise
+    return ReceivedUpload(Path(temporary), mimetype, sha256, size)
+
+
 def save_job_card_file(
     file: FileStorage,
     card_id: int,
     config: Mapping[str, object],
-) -> Tuple[str, str, str, str]:
-    """Persist a job card attachment and return its metadata.
-
-    Returns a tuple of ``(stored_name, relative_path, mimetype, original_name)``.
-    """
+) -> SavedUpload:
+    """Persist a job card attachment under its card directory and return its metadata."""
 
     filename = file.filename or ""
     if not filename:
@@ -63,17 +128,16 @@ def save_job_card_file(
 
     root = Path(config.get("UPLOAD_ROOT"))
     subdir = Path(config.get("JOB_CARD_UPLOAD_SUBDIR", "job_cards")) / str(card_id)
-    mimetype = _normalise_mime_type(file.mimetype, filename)
-    allowed = config.get("JOB_CARD_ALLOWED_MIME_TYPES", set())
-    mimetype = _ensure_allowed(mimetype, filename, allowed)
-
     stored_name = _generate_storage_name(filename)
     relative_path = subdir / stored_name
     destination = root / relative_path
-    destination.parent.mkdir(parents=True, exist_ok=True)
-
-    file.stream.seek(0)
-    file.save(destination)
 
-    original_name = filename
-    return stored_name, str(relative_path), mimetype, original_name
+    received = receive_upload(file, destination.parent, config)
+    try:
+        os.replace(received.path, destination)
+    except BaseException:
+        received.path.unlink(missing_ok=True)
+        raise
+    return SavedUpload(
+        stored_name, str(relative_path), received.mime_type, filename, received.sha256, received.size
+    )
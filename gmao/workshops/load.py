@@ -0,0 +1,116 @@
+"""Planned hours per workshop and day against the people on site.
+
+Each open task (status set and not ``completed``) puts its
+``estimated_hours`` on its workshop. A started task starts on the day of
+``started_at``. A task not started yet is due from its visit start date,
+or from today when that date has passed. The hours are spread evenly over
+``ceil(hours / WORKSHOP_DAY_HOURS)`` consecutive days. The capacity of a
+day is the headcount on site that day (see
+:mod:`gmao.personnel.availability`) times ``WORKSHOP_DAY_HOURS``.
+
+The matrix is built with difference arrays over all tasks at once and is
+cached per date range until a task, visit, workshop, user or status
+changes.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select
+
+from ..extensions import db
+from ..models import MaintenanceTask, MaintenanceVisit, Workshop
+from ..personnel.availability import day_counts, get_availability_index
+from ..utils.cache import get_cache
+
+LOAD_CACHE = "workshop-load"
+MAX_LOAD_DAYS = 366
+
+
+@dataclass
+class WorkshopLoad:
+    days: List[date]
+    workshops: List[Tuple[int, str]]
+    # Rows follow ``workshops``, columns follow ``days``.
+    load_hours: np.ndarray
+    headcount: np.ndarray
+    day_hours: float
+
+    @property
+    def capacity_hours(self) -> np.ndarray:
+        return self.headcount * self.day_hours
+
+    def as_dict(self) -> dict:
+        return {
+            "days": [day.isoformat() for day in self.days],
+            "workshops": [{"id": workshop_id, "name": name} for workshop_id, name in self.workshops],
+            "load_hours": np.round(self.load_hours, 1).tolist(),
+            "headcount": self.headcount.tolist(),
+            "capacity_hours": np.round(self.capacity_hours, 1).tolist(),
+            "day_hours": self.day_hours,
+        }
+
+
+def _as_date(value) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def compute_workshop_load(start: date, end: date, today: Optional[date] = None) -> WorkshopLoad:
+    today = today or date.today()
+    day_hours = float(current_app.config.get("WORKSHOP_DAY_HOURS", 8))
+    workshops = db.session.execute(select(Workshop.id, Workshop.name).order_by(Workshop.name)).all()
+    rows = {workshop_id: row for row, (workshop_id, _) in enumerate(workshops)}
+    tasks = db.session.execute(
+        select(
+            MaintenanceTask.workshop_id,
+            MaintenanceTask.started_at,
+            MaintenanceVisit.start_date,
+            MaintenanceTask.estimated_hours,
+        )
+        .join(MaintenanceVisit, MaintenanceVisit.id == MaintenanceTask.visit_id)
+        .where(
+            MaintenanceTask.workshop_id.is_not(None),
+            MaintenanceTask.status.is_not(None),
+            MaintenanceTask.status != "completed",
+            MaintenanceTask.estimated_hours > 0,
+        )
+    ).all()
+
+    owners = np.array([rows[task[0]] for task in tasks], dtype=np.int64)
+    begins = np.array(
+        [
+            _as_date(started_at).toordinal() if started_at else max(visit_start, today).toordinal()
+            for _, started_at, visit_start, _ in tasks
+        ],
+        dtype=np.int64,
+    )
+    hours = np.array([task[3] for task in tasks], dtype=np.float64)
+    spans = np.maximum(np.ceil(hours / day_hours), 1)
+    load = day_counts(start, end, begins, begins + spans.astype(np.int64), owners, len(workshops), hours / spans)
+
+    headcount = get_availability_index(today).daily_headcount(start, end, list(rows))
+    return WorkshopLoad(
+        days=[start + timedelta(days=offset) for offset in range((end - start).days + 1)],
+        workshops=[tuple(workshop) for workshop in workshops],
+        load_hours=load,
+        headcount=headcount,
+        day_hours=day_hours,
+    )
+
+
+def get_workshop_load(start: date, end: date) -> WorkshopLoad:
+    """Cached :func:`compute_workshop_load` for ``[start, end]``."""
+
+    cache = get_cache(
+        LOAD_CACHE,
+        maxsize=32,
+        ttl=current_app.config.get("WORKSHOP_LOAD_CACHE_TTL", 300),
+        depends_on={"maintenance_tasks", "maintenance_visits", "workshops", "users", "personnel_statuses"},
+    )
+    today = date.today()
+    # Unstarted overdue tasks move with today, so the day is part of the key.
+    return cache.get_or_set((start, end, today), lambda: compute_workshop_load(start, end, today))
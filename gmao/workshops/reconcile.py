@@ -0,0 +1,290 @@
+"""Reconcile workshop material holdings with an inventory count.
+
+The inventory is a CSV with one line per counted item: ``workshop`` (name),
+``part_number`` and/or ``niin``, and ``quantity``. Lines for the same
+workshop and material are added up, since an item is often counted on
+several shelves. The file is the full count of every workshop it names.
+For those workshops, links missing from the file are deleted unless
+``keep_missing`` is set. Other workshops are left alone.
+
+Materials are matched on the part number first, then the NIIN. Both are
+compared without spaces, dashes or case. A 13-digit NSN given as NIIN is
+reduced to its last nine digits. When several materials share a
+reference, the lowest id wins, as with the job card import. Both indexes
+come from a single query over ``materials``.
+
+Every line is checked before anything is written. The differences are then
+applied with one multi-row ``INSERT``, one ``UPDATE`` by primary key and a
+chunked ``DELETE``, in a single transaction.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import click
+from sqlalchemy import delete, select, update
+
+from ..extensions import db
+from ..models import Material, Workshop, WorkshopMaterial
+from ..utils.bulk import bulk_insert
+
+COLUMN_ALIASES = {
+    "atelier": "workshop",
+    "pn": "part_number",
+    "p/n": "part_number",
+    "reference": "part_number",
+    "référence": "part_number",
+    "nsn": "niin",
+    "qty": "quantity",
+    "quantite": "quantity",
+    "quantité": "quantity",
+}
+MAX_REPORTED_ERRORS = 50
+
+
+class ReconcileError(ValueError):
+    """Raised when an inventory cannot be applied; ``errors`` lists every problem."""
+
+    def __init__(self, errors: List[str]) -> None:
+        super().__init__("; ".join(errors[:5]))
+        self.errors = errors
+
+
+@dataclass
+class LineDiff:
+    workshop: str
+    designation: str
+    reference: str
+    before: int
+    after: int
+
+
+@dataclass
+class ReconcileResult:
+    lines: int = 0
+    added: List[LineDiff] = field(default_factory=list)
+    changed: List[LineDiff] = field(default_factory=list)
+    removed: List[LineDiff] = field(default_factory=list)
+    unchanged: int = 0
+    applied: bool = False
+    elapsed: float = 0.0
+
+    @property
+    def differences(self) -> List[Tuple[str, LineDiff]]:
+        return (
+            [("ajout", line) for line in self.added]
+            + [("écart", line) for line in self.changed]
+            + [("retrait", line) for line in self.removed]
+        )
+
+    def summary(self) -> str:
+        verb = "appliqué(s)" if self.applied else "à appliquer"
+        return (
+            f"{self.lines} ligne(s) d'inventaire : {len(self.added)} ajout(s), {len(self.changed)} écart(s), "
+            f"{len(self.removed)} retrait(s) {verb}, {self.unchanged} ligne(s) conforme(s) "
+            f"en {self.elapsed:.2f}s"
+        )
+
+    def report_csv(self) -> str:
+        """The differences as CSV (``;`` separated, for Excel)."""
+
+        out = io.StringIO()
+        writer = csv.writer(out, delimiter=";")
+        writer.writerow(["type", "workshop", "part_number", "designation", "before", "after", "delta"])
+        for kind, line in self.differences:
+            delta = line.after - line.before
+            writer.writerow([kind, line.workshop, line.reference, line.designation, line.before, line.after, delta])
+        return out.getvalue()
+
+
+def normalise_reference(value: Optional[str]) -> Optional[str]:
+    if not value:
+        return None
+    return re.sub(r"[^0-9A-Z]", "", value.upper()) or None
+
+
+def normalise_niin(value: Optional[str]) -> Optional[str]:
+    digits = normalise_reference(value)
+    # NSN = 4-digit supply class + 9-digit NIIN.
+    if digits and len(digits) == 13 and digits.isdigit():
+        return digits[4:]
+    return digits
+
+
+def read_inventory(stream) -> List[dict]:
+    """Rows of an inventory CSV with normalised column names."""
+
+    import pandas as pd
+
+    try:
+        # sep=None sniffs the delimiter: French Excel exports use ";".
+        frame = pd.read_csv(stream, dtype=str, keep_default_na=False, sep=None, engine="python")
+    except (ValueError, UnicodeDecodeError, pd.errors.ParserError) as exc:
+        raise ReconcileError([f"Fichier illisible : {exc}"]) from exc
+    columns = [str(column).strip().lower() for column in frame.columns]
+    frame.columns = [COLUMN_ALIASES.get(column, column) for column in columns]
+    missing = {"workshop", "quantity"} - set(frame.columns)
+    if missing or not {"part_number", "niin"} & set(frame.columns):
+        raise ReconcileError(["Colonnes attendues : workshop, part_number et/ou niin, quantity."])
+    return frame.to_dict("records")
+
+
+class MaterialIndex:
+    """Part number and NIIN lookups over every material, loaded in one query."""
+
+    def __init__(self) -> None:
+        self.by_part_number: Dict[str, int] = {}
+        self.by_niin: Dict[str, int] = {}
+        self.labels: Dict[int, Tuple[str, str]] = {}
+        rows = db.session.execute(
+            select(Material.id, Material.part_number, Material.niin, Material.designation).order_by(Material.id)
+        )
+        for material_id, part_number, niin, designation in rows:
+            self.labels[material_id] = (part_number or niin or "", designation)
+            part_key, niin_key = normalise_reference(part_number), normalise_niin(niin)
+            if part_key:
+                self.by_part_number.setdefault(part_key, material_id)
+            if niin_key:
+                self.by_niin.setdefault(niin_key, material_id)
+
+    def resolve(self, part_number: Optional[str], niin: Optional[str]) -> Optional[int]:
+        found = self.by_part_number.get(normalise_reference(part_number)) if part_number else None
+        if found is None and niin:
+            found = self.by_niin.get(normalise_niin(niin))
+        return found
+
+
+def _text(value) -> Optional[str]:
+    text = str(value).strip() if value is not None else ""
+    return text or None
+
+
+def _counted(records: List[dict], materials: MaterialIndex) -> Dict[Tuple[int, int], int]:
+    """Validated ``(workshop_id, material_id) -> quantity``; raises on any bad line."""
+
+    workshops = {
+        name.strip().upper(): workshop_id for workshop_id, name in db.session.execute(select(Workshop.id, Workshop.name))
+    }
+    counted: Dict[Tuple[int, int], int] = {}
+    errors: List[str] = []
+    for line, record in enumerate(records, start=2):
+        where = f"Ligne {line}"
+        workshop_name = _text(record.get("workshop"))
+        part_number, niin = _text(record.get("part_number")), _text(record.get("niin"))
+        workshop_id = workshops.get(workshop_name.upper()) if workshop_name else None
+        if workshop_id is None:
+            errors.append(f"{where} : atelier inconnu « {workshop_name or ''} ».")
+        material_id = materials.resolve(part_number, niin)
+        if material_id is None:
+            errors.append(f"{where} : matériel inconnu « {part_number or niin or ''} ».")
+        quantity_text = _text(record.get("quantity")) or "0"
+        try:
+            value = float(quantity_text.replace(",", "."))
+        except ValueError:
+            value = -1.0
+        # Counts are whole units; "3.0" from a spreadsheet cell is fine, "2,7" is a typo.
+        quantity = int(value) if value.is_integer() else -1
+        if quantity < 0:
+            errors.append(f"{where} : quantité « {quantity_text} » invalide.")
+        if len(errors) >= MAX_REPORTED_ERRORS:
+            errors.append("Trop d'erreurs, vérification interrompue.")
+            break
+        if not errors:
+            key = (workshop_id, material_id)
+            counted[key] = counted.get(key, 0) + quantity
+    if errors:
+        raise ReconcileError(errors)
+    return counted
+
+
+def reconcile_inventory(records: List[dict], keep_missing: bool = False, dry_run: bool = False) -> ReconcileResult:
+    """Bring ``workshop_materials`` in line with ``records``; the caller commits."""
+
+    started = time.perf_counter()
+    result = ReconcileResult(lines=len(records))
+    materials = MaterialIndex()
+    counted = _counted(records, materials)
+    workshop_ids = {workshop_id for workshop_id, _ in counted}
+    workshop_names = dict(
+        db.session.execute(select(Workshop.id, Workshop.name).where(Workshop.id.in_(workshop_ids))).all()
+    )
+
+    def diff(workshop_id: int, material_id: int, before: int, after: int) -> LineDiff:
+        reference, designation = materials.labels.get(material_id, ("", ""))
+        return LineDiff(workshop_names[workshop_id], designation, reference, before, after)
+
+    existing = db.session.execute(
+        select(
+            WorkshopMaterial.id,
+            WorkshopMaterial.workshop_id,
+            WorkshopMaterial.material_id,
+            WorkshopMaterial.quantity,
+        )
+        .where(WorkshopMaterial.workshop_id.in_(workshop_ids))
+        .order_by(WorkshopMaterial.id)
+    ).all()
+    inserts, updates, deletions = [], [], []
+    seen = set()
+    for link_id, workshop_id, material_id, quantity in existing:
+        key = (workshop_id, material_id)
+        quantity = quantity or 0
+        if key in seen:
+            # Duplicate link: the first one carries the counted quantity.
+            deletions.append(link_id)
+            result.removed.append(diff(workshop_id, material_id, quantity, 0))
+            continue
+        seen.add(key)
+        if key not in counted:
+            if not keep_missing:
+                deletions.append(link_id)
+                result.removed.append(diff(workshop_id, material_id, quantity, 0))
+            continue
+        if counted[key] != quantity:
+            updates.append({"id": link_id, "quantity": counted[key]})
+            result.changed.append(diff(workshop_id, material_id, quantity, counted[key]))
+        else:
+            result.unchanged += 1
+    for (workshop_id, material_id), quantity in counted.items():
+        if (workshop_id, material_id) not in seen:
+            inserts.append({"workshop_id": workshop_id, "material_id": material_id, "quantity": quantity})
+            result.added.append(diff(workshop_id, material_id, 0, quantity))
+
+    if not dry_run:
+        bulk_insert(WorkshopMaterial, inserts)
+        if updates:
+            db.session.execute(update(WorkshopMaterial), updates)
+        for offset in range(0, len(deletions), 500):
+            chunk = deletions[offset : offset + 500]
+            db.session.execute(delete(WorkshopMaterial).where(WorkshopMaterial.id.in_(chunk)))
+        result.applied = True
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def register_reconcile_commands(app):
+    @app.cli.command("reconcile-inventory")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+    @click.option("--keep-missing", is_flag=True, help="Keep links of counted workshops that are absent from the file.")
+    @click.option("--dry-run", is_flag=True, help="Only report the differences.")
+    @click.option("--report", type=click.Path(dir_okay=False, path_type=Path), help="Write the differences to this CSV.")
+    def reconcile_inventory_command(path, keep_missing, dry_run, report):
+        """Reconcile workshop materials with an inventory CSV."""
+
+        try:
+            with path.open("rb") as stream:
+                result = reconcile_inventory(read_inventory(stream), keep_missing=keep_missing, dry_run=dry_run)
+        except ReconcileError as exc:
+            db.session.rollback()
+            for error in exc.errors:
+                click.echo(error, err=True)
+            raise click.ClickException("Inventaire rejeté, aucune dotation n'a été modifiée.") from exc
+        db.session.commit()
+        if report:
+            report.write_text(result.report_csv(), encoding="utf-8")
+        click.echo(result.summary())
@@ -1,8 +1,12 @@
-from flask import Blueprint, flash, redirect, render_template, request, url_for
+from datetime import date, timedelta
+
+from flask import Blueprint, Response, flash, jsonify, redirect, render_template, request, url_for
 from flask_login import login_required
 
 from ..extensions import db
 from ..models import Material, Workshop, WorkshopMaterial
+from .load import MAX_LOAD_DAYS, get_workshop_load
+from .reconcile import ReconcileError, read_inventory, reconcile_inventory
 
 bp = Blueprint("workshops", __name__, url_prefix="/workshops")
 
@@ -11,7 +15,20 @@ bp = Blueprint("workshops", __name__, url_prefix="/workshops")
 @login_required
 def index():
     workshops = Workshop.query.order_by(Workshop.name).all()
-    return render_template("workshops/index.html", workshops=workshops)
+    return render_template("workshops/index.html", workshops=workshops, today=date.today())
+
+
+@bp.route("/load")
+@login_required
+def load():
+    """Planned hours and headcount per workshop and day, from ``start`` for ``days`` days."""
+
+    try:
+        start = date.fromisoformat(request.args["start"]) if request.args.get("start") else date.today()
+    except ValueError:
+        return jsonify({"error": "Date attendue au format AAAA-MM-JJ"}), 400
+    days = min(max(request.args.get("days", 28, type=int), 1), MAX_LOAD_DAYS)
+    return jsonify(get_workshop_load(start, start + timedelta(days=days - 1)).as_dict())
 
 
 @bp.route("/create", methods=["POST"])
@@ -32,6 +49,34 @@ def create():
     return redirect(url_for("workshops.detail", workshop_id=workshop.id))
 
 
+@bp.route("/reconcile", methods=["POST"])
+@login_required
+def reconcile():
+    file = request.files.get("inventory")
+    if not file or not file.filename:
+        flash("Merci de choisir le fichier CSV de l'inventaire.", "danger")
+        return redirect(url_for("workshops.index"))
+    dry_run = bool(request.form.get("dry_run"))
+    try:
+        result = reconcile_inventory(
+            read_inventory(file.stream), keep_missing=bool(request.form.get("keep_missing")), dry_run=dry_run
+        )
+    except ReconcileError as exc:
+        db.session.rollback()
+        shown = exc.errors[:5]
+        more = f" (+{len(exc.errors) - len(shown)} autre(s))" if len(exc.errors) > len(shown) else ""
+        flash("Inventaire rejeté : " + " ".join(shown) + more, "danger")
+        return redirect(url_for("workshops.index"))
+    db.session.commit()
+    if request.form.get("report") == "csv":
+        return Response(
+            result.report_csv(),
+            mimetype="text/csv",
+            headers={"Content-Disposition": "attachment; filename=ecarts-inventaire.csv"},
+        )
+    return render_template("workshops/reconcile.html", result=result, dry_run=dry_run)
+
+
 @bp.route("/<int:workshop_id>")
 @login_required
 def detail(workshop_id: int):
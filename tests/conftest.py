@@ -0,0 +1,39 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.utils.snapshot import ensure_demo_snapshot, restore_snapshot
+
+
+@pytest.fixture(scope="session")
+def demo_snapshot(tmp_path_factory):
+    """Seed the demo dataset once per test session into a SQLite file."""
+
+    app = create_app(TestingConfig)
+    with app.app_context():
+        path = ensure_demo_snapshot(tmp_path_factory.mktemp("snapshots"))
+        db.session.remove()
+    return path
+
+
+@pytest.fixture
+def demo_app(demo_snapshot):
+    """Application whose in-memory database is restored from the demo snapshot."""
+
+    app = create_app(TestingConfig)
+    app.config["WTF_CSRF_ENABLED"] = False
+    ctx = app.app_context()
+    ctx.push()
+    restore_snapshot(demo_snapshot)
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
@@ -0,0 +1,178 @@
+import io
+import zlib
+from pathlib import Path
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.archive import search
+from gmao.archive import pdf_text
+from gmao.archive.pdf_text import PdfError, extract_file, extract_pages
+from gmao.archive.search import index_pending_attachments, search_attachments
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.models import AttachmentPage, AttachmentText, JobCard
+
+TO_UNICODE = b"""/CIDInit /ProcSet findresource begin 12 dict begin begincmap
+1 begincodespacerange <0000> <FFFF> endcodespacerange
+2 beginbfchar <0001> <0056> <0002> <00E9> endbfchar
+1 beginbfrange <0010> <0012> <0072> endbfrange
+endcmap CMapName currentdict /CMap defineresource pop end end"""
+
+
+def make_pdf(pages, compress=False, to_unicode=None) -> bytes:
+    """Build a small PDF whose pages draw the given content streams."""
+
+    objects = []
+
+    def stream(data: bytes, extra: bytes = b"") -> bytes:
+        if compress:
+            data = zlib.compress(data)
+            extra += b" /Filter /FlateDecode"
+        return b"<< /Length %d%s >>\nstream\n%s\nendstream" % (len(data), extra, data)
+
+    if to_unicode:
+        objects.append(stream(to_unicode))
+        objects.append(b"<< /Type /Font /Subtype /Type0 /BaseFont /Cid /ToUnicode 1 0 R >>")
+    else:
+        objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    font_id = len(objects)
+    pages_id = len(objects) + 2 * len(pages) + 1
+    kids = []
+    for content in pages:
+        objects.append(stream(content))
+        objects.append(b"<< /Type /Page /Parent %d 0 R /Contents %d 0 R >>" % (pages_id, len(objects)))
+        kids.append(b"%d 0 R" % len(objects))
+    objects.append(
+        b"<< /Type /Pages /Kids [%s] /Count %d /Resources << /Font << /F1 %d 0 R >> >> >>"
+        % (b" ".join(kids), len(kids), font_id)
+    )
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+    out = bytearray(b"%PDF-1.4\n")
+    for number, body in enumerate(objects, start=1):
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\n%%%%EOF\n" % (len(objects) + 1, len(objects))
+    return bytes(out)
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(TestingConfig)
+    app.config.update(WTF_CSRF_ENABLED=False, UPLOAD_ROOT=tmp_path)
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post("/auth/login", data={"username": "admin", "password": "admin123"})
+    return client
+
+
+def _card(number: str, title: str) -> JobCard:
+    card = JobCard(card_number=number, title=title)
+    db.session.add(card)
+    db.session.commit()
+    return card
+
+
+def _upload(client, card, payload: bytes, name: str) -> None:
+    client.post(
+        f"/archive/{card.id}/attachments",
+        data={"attachment": (io.BytesIO(payload), name, "application/pdf")},
+        content_type="multipart/form-data",
+    )
+
+
+def test_extracts_text_operators_and_unicode_maps():
+    plain = make_pdf(
+        [
+            b"BT /F1 12 Tf 72 720 Td (D\\351pose du train \\(avant\\)) Tj 0 -14 Td "
+            b"[(Couple de ser) 30 (rage) -300 (45 Nm)] TJ ET",
+            b"BT /F1 12 Tf (Page deux) Tj T* (suite) ' ET",
+        ]
+    )
+    mapped = make_pdf([b"BT /F1 10 Tf <00010002001000110012> Tj ET"], compress=True, to_unicode=TO_UNICODE)
+
+    assert extract_pages(plain) == ["Dépose du train (avant) Couple de serrage 45 Nm", "Page deux\nsuite"]
+    assert extract_pages(mapped) == ["Vérst"]
+
+
+def test_malformed_and_oversized_pdfs_fail_cleanly(tmp_path, monkeypatch):
+    bad_font = make_pdf([b"BT /F1 12 Tf (Texte) Tj ET"]).replace(b"/Font << /F1 1 0 R >>", b"/Font 5")
+    bad_object_stream = (
+        b"%PDF-1.5\n1 0 obj\n<< /Type /ObjStm /N 1 /First 2 0 R /Length 8 >>\nstream\n3 0 (x)\nendstream\nendobj\n"
+        b"2 0 obj\n4\nendobj\ntrailer\n<< /Size 3 >>\n%%EOF\n"
+    )
+    for name, payload in (("font.pdf", bad_font), ("objstm.pdf", bad_object_stream)):
+        (tmp_path / name).write_bytes(payload)
+    monkeypatch.setattr(pdf_text, "MAX_STREAM_BYTES", 1000)
+    bomb = make_pdf([b"BT (Bombe) Tj ET " + b" " * 5000], compress=True)
+
+    assert extract_file(str(tmp_path / "font.pdf"))[1].startswith("AttributeError")
+    assert extract_file(str(tmp_path / "objstm.pdf"))[1].startswith("TypeError")
+    with pytest.raises(PdfError):
+        extract_pages(bomb)
+
+
+def test_indexing_is_incremental_and_shared_by_hash(app, client):
+    hydraulics = make_pdf([b"BT (Purge circuit) Tj ET", b"BT (Remplacer le filtre hydraulique) Tj ET"])
+    first, second = _card("JC-100", "Hydraulique"), _card("JC-200", "Train")
+    _upload(client, first, hydraulics, "hyd.pdf")
+    _upload(client, second, hydraulics, "copie.pdf")
+    _upload(client, second, b"%PDF-1.4 broken", "casse.pdf")
+    _upload(client, second, make_pdf([b"BT (x) Tj ET"]).replace(b"/Font << /F1 1 0 R >>", b"/Font 5"), "police.pdf")
+
+    result = index_pending_attachments(workers=2)
+
+    assert (result.indexed, result.failed, result.pages) == (1, 2, 2)
+    assert AttachmentText.query.filter_by(status="failed").count() == 2
+    assert AttachmentPage.query.count() == 2
+    assert index_pending_attachments(workers=1).indexed == 0
+
+    hits = search_attachments("filtre hydraul")
+    assert sorted((hit.card_number, hit.page_number) for hit in hits) == [("JC-100", 2), ("JC-200", 2)]
+    assert "<mark>filtre</mark>" in hits[0].snippet
+
+
+def test_archive_search_lists_page_hits(app, client):
+    card = _card("JC-300", "Moteur")
+    _upload(client, card, make_pdf([b"BT (Inspection) Tj ET", b"BT (Contr\\364le du b\\342ti moteur) Tj ET"]), "m.pdf")
+    _card("JC-301", "Sans rapport")
+    index_pending_attachments(workers=1)
+
+    page = client.get("/archive/", query_string={"search": "bati"}).get_data(as_text=True)
+
+    assert "JC-300" in page and "JC-301" not in page
+    assert "m.pdf · p. 2" in page
+    assert "<mark>bâti</mark>" in page
+
+
+def test_like_fallback_escapes_snippets(app, client, monkeypatch):
+    card = _card("JC-400", "Cabine")
+    pages = [
+        b"BT (<script> joint de porte) Tj ET",
+        b"BT (Couple 500 Nm, vis A-12) Tj ET",
+        b"BT (Usure 50% vis A_1) Tj ET",
+    ]
+    _upload(client, card, make_pdf(pages), "c.pdf")
+    index_pending_attachments(workers=1)
+    monkeypatch.setattr(search, "_has_fts", lambda: False)
+
+    hits = search_attachments("joint")
+
+    assert [(hit.card_number, hit.page_number) for hit in hits] == [("JC-400", 1)]
+    assert "&lt;script&gt;" in hits[0].snippet and "<mark>joint</mark>" in hits[0].snippet
+    # LIKE wildcards typed by users are taken literally.
+    assert [hit.page_number for hit in search_attachments("50%")] == [3]
+    assert [hit.page_number for hit in search_attachments("A_1")] == [3]
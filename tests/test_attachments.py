@@ -0,0 +1,286 @@
+import hashlib
+import io
+import os
+from pathlib import Path
+import sys
+
+import pytest
+from werkzeug.datastructures import FileStorage
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.models import AttachmentBlob, JobCard, JobCardAttachment
+from gmao.utils import blobs
+from gmao.utils.blobs import attach_upload, release_attachment, remove_files, store_blob
+
+PDF_BYTES = b"%PDF-1.4\n" + b"0" * 200_000 + b"\n%%EOF\n"
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(TestingConfig)
+    app.config.update(WTF_CSRF_ENABLED=False, UPLOAD_ROOT=tmp_path, UPLOAD_CHUNK_SIZE=4096)
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post("/auth/login", data={"username": "admin", "password": "admin123"})
+    return client
+
+
+@pytest.fixture
+def card(app):
+    card = JobCard(card_number="JC-UP-1", title="Upload")
+    db.session.add(card)
+    db.session.commit()
+    return card
+
+
+def _upload(client, card, payload, name="carte.pdf", mimetype="application/pdf"):
+    return client.post(
+        f"/archive/{card.id}/attachments",
+        data={"attachment": (io.BytesIO(payload), name, mimetype)},
+        content_type="multipart/form-data",
+    )
+
+
+def _stored_files(root: Path):
+    return sorted(path for path in root.rglob("*") if path.is_file())
+
+
+def test_upload_streams_file_and_records_hash(app, client, card, tmp_path):
+    response = _upload(client, card, PDF_BYTES)
+
+    assert response.status_code == 302
+    attachment = JobCardAttachment.query.one()
+    assert attachment.sha256 == hashlib.sha256(PDF_BYTES).hexdigest()
+    assert attachment.size_bytes == len(PDF_BYTES)
+    assert attachment.mime_type == "application/pdf"
+    assert _stored_files(tmp_path) == [tmp_path / attachment.file_path]
+    assert (tmp_path / attachment.file_path).read_bytes() == PDF_BYTES
+
+
+def test_upload_checks_content_not_declared_type(app, client, card, tmp_path):
+    _upload(client, card, b"MZ\x90\x00 not a pdf", name="carte.pdf")
+
+    assert JobCardAttachment.query.count() == 0
+    assert _stored_files(tmp_path) == []
+
+
+def test_upload_rejects_files_above_limit(app, client, card, tmp_path):
+    app.config["JOB_CARD_MAX_UPLOAD_BYTES"] = 100_000
+
+    _upload(client, card, PDF_BYTES)
+
+    assert JobCardAttachment.query.count() == 0
+    assert _stored_files(tmp_path) == []
+
+    app.config["MAX_CONTENT_LENGTH"] = 50_000
+    response = _upload(client, card, PDF_BYTES)
+    assert response.status_code == 302
+    assert JobCardAttachment.query.count() == 0
+
+
+def test_duplicate_uploads_share_one_blob(app, client, card, tmp_path):
+    other = JobCard(card_number="JC-UP-2", title="Autre")
+    db.session.add(other)
+    db.session.commit()
+
+    _upload(client, card, PDF_BYTES)
+    _upload(client, other, PDF_BYTES, name="copie.pdf")
+
+    blob = AttachmentBlob.query.one()
+    assert blob.ref_count == 2
+    assert {attachment.blob_id for attachment in JobCardAttachment.query} == {blob.id}
+    assert _stored_files(tmp_path) == [tmp_path / blob.storage_path]
+
+
+def test_blob_file_removed_with_last_reference(app, client, card, tmp_path):
+    _upload(client, card, PDF_BYTES)
+    _upload(client, card, PDF_BYTES, name="copie.pdf")
+    first, second = JobCardAttachment.query.order_by(JobCardAttachment.id).all()
+    blob_path = tmp_path / first.file_path
+
+    client.post(f"/archive/attachments/{first.id}/delete")
+    db.session.expire_all()
+    assert AttachmentBlob.query.one().ref_count == 1
+    assert blob_path.is_file()
+
+    client.post(f"/archive/attachments/{second.id}/delete")
+    assert AttachmentBlob.query.count() == 0
+    assert _stored_files(tmp_path) == []
+
+
+def test_upload_rewrites_blob_removed_by_a_concurrent_release(app, client, card, tmp_path):
+    _upload(client, card, PDF_BYTES)
+    first = JobCardAttachment.query.one()
+    saved = store_blob(FileStorage(io.BytesIO(PDF_BYTES), "copie.pdf"), app.config)
+
+    # The last reference goes away while the duplicate waits for its row.
+    orphaned = release_attachment(first, app.config)
+    db.session.delete(first)
+    db.session.commit()
+    remove_files([orphaned])
+    attach_upload(card, saved, app.config)
+    db.session.commit()
+
+    blob = AttachmentBlob.query.one()
+    assert blob.ref_count == 1
+    assert _stored_files(tmp_path) == [tmp_path / blob.storage_path]
+
+
+def test_migrate_command_moves_and_deduplicates_legacy_files(app, card, tmp_path):
+    legacy = tmp_path / "job_cards" / str(card.id)
+    legacy.mkdir(parents=True)
+    for name in ("a.pdf", "b.pdf"):
+        (legacy / name).write_bytes(PDF_BYTES)
+        db.session.add(
+            JobCardAttachment(
+                job_card=card, filename=name, original_name=name, file_path=f"job_cards/{card.id}/{name}"
+            )
+        )
+    db.session.add(JobCardAttachment(job_card=card, filename="x.pdf", original_name="x.pdf", file_path="absent.pdf"))
+    db.session.commit()
+    runner = app.test_cli_runner()
+
+    dry_run = runner.invoke(args=["migrate-attachments", "--dry-run"])
+    assert "2 pièce(s) jointe(s) migrée(s), 1 doublon(s)" in dry_run.output
+    assert AttachmentBlob.query.count() == 0
+
+    result = runner.invoke(args=["migrate-attachments"])
+
+    assert result.exit_code == 0, result.output
+    blob = AttachmentBlob.query.one()
+    assert blob.ref_count == 2
+    assert blob.sha256 == hashlib.sha256(PDF_BYTES).hexdigest()
+    assert _stored_files(tmp_path) == [tmp_path / blob.storage_path]
+    assert "1 fichier(s) introuvable(s)" in result.output
+
+
+def test_download_supports_validators_and_ranges(app, client, card):
+    _upload(client, card, PDF_BYTES)
+    attachment = JobCardAttachment.query.one()
+    url = f"/archive/attachments/{attachment.id}"
+
+    full = client.get(url)
+    assert full.status_code == 200
+    assert full.data == PDF_BYTES
+    assert full.headers["ETag"] == f'"{attachment.sha256}"'
+    assert full.headers["Last-Modified"]
+    assert full.headers["Accept-Ranges"] == "bytes"
+    assert "private" in full.headers["Cache-Control"]
+
+    repeat = client.get(url, headers={"If-None-Match": full.headers["ETag"]})
+    assert repeat.status_code == 304
+    assert repeat.data == b""
+
+    partial = client.get(url, headers={"Range": "bytes=0-7"})
+    assert partial.status_code == 206
+    assert partial.data == PDF_BYTES[:8]
+    assert partial.headers["Content-Range"] == f"bytes 0-7/{len(PDF_BYTES)}"
+
+
+def test_download_offloads_to_front_end_server(app, client, card, tmp_path):
+    _upload(client, card, PDF_BYTES)
+    attachment = JobCardAttachment.query.one()
+    url = f"/archive/attachments/{attachment.id}"
+
+    app.config.update(ATTACHMENT_OFFLOAD="x-accel-redirect", ATTACHMENT_ACCEL_PREFIX="/protected/")
+    accel = client.get(url)
+    assert accel.headers["X-Accel-Redirect"] == f"/protected/{attachment.file_path}"
+    assert accel.data == b""
+    assert accel.headers["ETag"] == f'"{attachment.sha256}"'
+    assert client.get(url, headers={"If-None-Match": accel.headers["ETag"]}).status_code == 304
+
+    app.config["ATTACHMENT_OFFLOAD"] = "x-sendfile"
+    sendfile = client.get(url)
+    assert sendfile.headers["X-Sendfile"] == str(tmp_path / attachment.file_path)
+    assert sendfile.data == b""
+
+    attachment.original_name = "手順書 révisé.pdf"
+    db.session.commit()
+    disposition = client.get(url).headers["Content-Disposition"]
+    app.config["ATTACHMENT_OFFLOAD"] = "x-accel-redirect"
+    accel_disposition = client.get(url).headers["Content-Disposition"]
+    assert accel_disposition == disposition
+    assert accel_disposition.encode("latin-1")
+    assert "filename*=UTF-8''%E6%89%8B%E9%A0%86%E6%9B%B8%20r%C3%A9vis%C3%A9.pdf" in accel_disposition
+
+
+def test_gc_removes_orphans_in_both_directions(app, client, card, tmp_path):
+    _upload(client, card, PDF_BYTES)
+    live = JobCardAttachment.query.one()
+    stale = tmp_path / "job_cards" / "99" / "old.pdf"
+    stale.parent.mkdir(parents=True)
+    stale.write_bytes(b"%PDF-old")
+    os.utime(stale, (0, 0))
+    fresh = tmp_path / "blobs" / "tmp" / "upload-in-progress"
+    fresh.write_bytes(b"%PDF-new")
+    db.session.add(
+        JobCardAttachment(job_card=card, filename="gone.pdf", original_name="gone.pdf", file_path="job_cards/1/gone.pdf")
+    )
+    db.session.commit()
+    runner = app.test_cli_runner()
+
+    dry_run = runner.invoke(args=["gc-attachments", "--dry-run", "-v"])
+    assert "fichier orphelin : job_cards/99/old.pdf" in dry_run.output
+    assert "fichier manquant : job_cards/1/gone.pdf" in dry_run.output
+    assert stale.is_file() and JobCardAttachment.query.count() == 2
+
+    result = runner.invoke(args=["gc-attachments"])
+
+    assert result.exit_code == 0, result.output
+    assert "1 fichier(s) orphelin(s)" in result.output
+    assert "1 fichier(s) récent(s) ignoré(s)" in result.output
+    assert not stale.parent.exists()
+    assert fresh.is_file()
+    assert [attachment.id for attachment in JobCardAttachment.query] == [live.id]
+    assert (tmp_path / live.file_path).is_file()
+
+
+def test_interrupted_migration_keeps_every_row_on_a_file(app, card, tmp_path, monkeypatch):
+    legacy = tmp_path / "job_cards" / str(card.id)
+    legacy.mkdir(parents=True)
+    for index in range(3):
+        name = f"{index}.pdf"
+        (legacy / name).write_bytes(PDF_BYTES + bytes([index]))
+        db.session.add(
+            JobCardAttachment(
+                job_card=card, filename=name, original_name=name, file_path=f"job_cards/{card.id}/{name}"
+            )
+        )
+    db.session.commit()
+    acquire = blobs.acquire_blob
+    calls = []
+
+    def crash_on_third(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 3:
+            raise RuntimeError("interrompu")
+        return acquire(*args, **kwargs)
+
+    monkeypatch.setattr(blobs, "acquire_blob", crash_on_third)
+    with pytest.raises(RuntimeError):
+        blobs.migrate_legacy_attachments(batch_size=2)
+    db.session.rollback()
+
+    for attachment in JobCardAttachment.query:
+        assert (tmp_path / attachment.file_path).is_file()
+    assert sorted(path.name for path in legacy.iterdir()) == ["2.pdf"]
+
+    monkeypatch.setattr(blobs, "acquire_blob", acquire)
+    assert blobs.migrate_legacy_attachments()["missing"] == 0
+    assert AttachmentBlob.query.count() == 3
+    assert not any(legacy.iterdir())
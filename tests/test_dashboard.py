@@ -1,3 +1,4 @@
+from datetime import date
 from pathlib import Path
 import sys
 
@@ -10,7 +11,10 @@ if str(PROJECT_ROOT) not in sys.path:
 
 from gmao import create_app
 from gmao.config import TestingConfig
+from gmao.dashboard.summary import CHART_BUILDERS, get_chart, get_charts, get_dashboard_summary
 from gmao.extensions import db
+from gmao.models import Aircraft, MaintenanceVisit
+from gmao.utils.profiling import count_queries
 
 
 @pytest.fixture
@@ -44,43 +48,96 @@ def captured_templates(app):
         template_rendered.disconnect(record, app)
 
 
-def _get_dashboard_context(recorded):
-    for template, context in recorded:
-        if template.name == "dashboard.html":
-            return context
-    raise AssertionError("dashboard.html was not rendered")
-
-
-def test_dashboard_includes_chart_datasets(client, captured_templates):
-    login_response = client.post(
+def _login(client):
+    response = client.post(
         "/auth/login",
         data={"username": "admin", "password": "admin123"},
         follow_redirects=True,
     )
-    assert login_response.status_code == 200
+    assert response.status_code == 200
+
+
+def test_dashboard_page_renders_without_chart_payloads(client, captured_templates):
+    _login(client)
 
     response = client.get("/", follow_redirects=True)
     assert response.status_code == 200
+    assert b'data-chart-url="/api/dashboard/visit-progress"' in response.data
 
-    context = _get_dashboard_context(captured_templates)
+    template, context = captured_templates[-1]
+    assert template.name == "dashboard.html"
+    assert "visit_progress_chart" not in context
 
-    task_chart = context.get("task_status_chart")
-    assert task_chart is not None
+
+def test_dashboard_chart_endpoints_return_datasets(client):
+    _login(client)
+
+    task_chart = client.get("/api/dashboard/task-status").get_json()
     assert isinstance(task_chart.get("labels"), list)
     assert isinstance(task_chart.get("datasets"), list)
 
-    visit_chart = context.get("visit_progress_chart")
-    assert visit_chart is not None
+    visit_chart = client.get("/api/dashboard/visit-progress").get_json()
     assert len(visit_chart.get("labels", [])) == 6
     datasets = visit_chart.get("datasets", [])
     assert len(datasets) == 2
     for dataset in datasets:
         assert len(dataset.get("data", [])) == 6
 
-    material_chart = context.get("material_shortages_chart")
-    assert material_chart is not None
+    material_chart = client.get("/api/dashboard/material-shortages").get_json()
     assert isinstance(material_chart.get("labels"), list)
     material_datasets = material_chart.get("datasets", [])
     assert len(material_datasets) == 2
     for dataset in material_datasets:
         assert len(dataset.get("data", [])) == len(material_chart.get("labels"))
+
+    assert client.get("/api/dashboard/unknown").status_code == 404
+
+
+def test_dashboard_chart_endpoint_sets_cache_headers(client):
+    _login(client)
+
+    response = client.get("/api/dashboard/task-status")
+    assert response.status_code == 200
+    assert "private" in response.headers["Cache-Control"]
+    assert "max-age=60" in response.headers["Cache-Control"]
+    etag = response.headers["ETag"]
+
+    revalidated = client.get("/api/dashboard/task-status", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+
+
+def test_cold_charts_are_built_concurrently_on_file_database(tmp_path):
+    config = type(
+        "FileDatabaseConfig",
+        (TestingConfig,),
+        {"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'dashboard.db'}", "DASHBOARD_CHART_WORKERS": 3},
+    )
+    app = create_app(config)
+    with app.app_context():
+        charts = get_charts(CHART_BUILDERS)
+        assert set(charts) == set(CHART_BUILDERS)
+        assert "dashboard" in app.extensions["gmao_thread_pools"]
+        with count_queries(db.engine) as counter:
+            assert get_chart("visit-progress") == charts["visit-progress"]
+        assert counter.count == 0
+        db.session.remove()
+        db.drop_all()
+
+
+def test_dashboard_summary_is_cached_until_a_dependent_table_changes(app):
+    first = get_dashboard_summary()
+    with count_queries(db.engine) as counter:
+        assert get_dashboard_summary() is first
+    assert counter.count == 0
+
+    aircraft = Aircraft(tail_number="C130-DASH")
+    db.session.add(aircraft)
+    db.session.add(
+        MaintenanceVisit(name="VP Dash", aircraft=aircraft, vp_type="A", status="ongoing", start_date=date.today())
+    )
+    db.session.commit()
+
+    refreshed = get_dashboard_summary()
+    assert refreshed.aircraft_total == first.aircraft_total + 1
+    assert [visit.tail_number for visit in refreshed.ongoing_visits] == ["C130-DASH"]
+    assert sum(get_chart("visit-progress")["datasets"][0]["data"]) == 1
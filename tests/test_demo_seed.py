@@ -0,0 +1,98 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.models import (
+    Aircraft,
+    MaintenanceTask,
+    MaintenanceVisit,
+    Material,
+    MaterialRequirement,
+    PersonnelStatus,
+    User,
+)
+from gmao.utils.demo_data import AIRCRAFT_DATA, MATERIAL_DATA, PERSONNEL_DATA
+from gmao.utils.seed import populate_demo_data
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    app.config["WTF_CSRF_ENABLED"] = False
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+def test_populate_demo_data_loads_curated_dataset(app):
+    assert populate_demo_data(reset=True, skip_if_exists=False) is True
+
+    assert Aircraft.query.count() == len(AIRCRAFT_DATA)
+    assert Material.query.count() == len(MATERIAL_DATA)
+    assert PersonnelStatus.query.count() == len(PERSONNEL_DATA)
+    assert MaintenanceVisit.query.count() == 100
+    assert MaintenanceTask.query.count() == 300
+    assert MaterialRequirement.query.count() == 600
+
+    technician = User.query.filter_by(username=PERSONNEL_DATA[0]["Matricule"].lower()).first()
+    assert technician.role.name == "technician"
+    assert technician.workshop.name == PERSONNEL_DATA[0]["Atelier"]
+    assert technician.check_password("password")
+
+
+def test_populate_demo_data_is_idempotent(app):
+    populate_demo_data(reset=True, skip_if_exists=False)
+    assert populate_demo_data(skip_if_exists=True) is False
+
+    assert populate_demo_data(skip_if_exists=False) is True
+    assert User.query.count() == 1 + 3 + len(PERSONNEL_DATA)
+    assert Aircraft.query.count() == len(AIRCRAFT_DATA)
+    assert Material.query.count() == len(MATERIAL_DATA)
+    assert PersonnelStatus.query.count() == len(PERSONNEL_DATA)
+    assert MaintenanceVisit.query.count() == 100
+
+
+def test_demo_snapshot_restores_seeded_state(demo_app):
+    assert Aircraft.query.count() == len(AIRCRAFT_DATA)
+    assert MaintenanceTask.query.count() == 300
+
+    Aircraft.query.delete()
+    db.session.commit()
+    assert Aircraft.query.count() == 0
+
+    client = demo_app.test_client()
+    response = client.post(
+        "/auth/login",
+        data={"username": "admin", "password": "admin123"},
+        follow_redirects=True,
+    )
+    assert response.status_code == 200
+
+
+def test_restore_demo_command_builds_then_restores(app, tmp_path):
+    app.config["DEMO_SNAPSHOT_DIR"] = tmp_path
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=["restore-demo"])
+    assert result.exit_code == 0, result.output
+    snapshots = list(tmp_path.glob("demo-*.sqlite"))
+    assert len(snapshots) == 1
+
+    Material.query.delete()
+    db.session.commit()
+
+    result = runner.invoke(args=["restore-demo"])
+    assert result.exit_code == 0, result.output
+    assert Material.query.count() == len(MATERIAL_DATA)
+    assert list(tmp_path.glob("demo-*.sqlite")) == snapshots
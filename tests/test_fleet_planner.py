@@ -0,0 +1,174 @@
+from datetime import date
+from pathlib import Path
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.maintenance import planner
+from gmao.maintenance.planner import load_plan
+from gmao.models import Aircraft, FleetPlanEntry, FleetPlanState, MaintenanceVisit
+from gmao.utils.bulk import bulk_insert
+
+TODAY = date(2025, 6, 15)
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    app.config["WTF_CSRF_ENABLED"] = False
+    app.config["HANGAR_CAPACITY"] = 1
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+@pytest.fixture
+def planes(app):
+    MaintenanceVisit.query.delete()
+    Aircraft.query.delete()
+    planes = [Aircraft(tail_number=f"TST-0{index}") for index in range(1, 4)]
+    db.session.add_all(planes)
+    db.session.add_all(
+        MaintenanceVisit(name=vp_type, aircraft=plane, vp_type=vp_type, status=status, start_date=start_date)
+        for plane, vp_type, status, start_date in (
+            (planes[0], "A", "completed", date(2025, 1, 10)),
+            (planes[0], "C", "completed", date(2023, 3, 1)),
+            (planes[2], "B", "planned", date(2025, 8, 1)),
+        )
+    )
+    db.session.commit()
+    return planes
+
+
+def test_plan_lists_next_due_packages_and_hangar_overloads(app, planes):
+    plan = load_plan(TODAY, months=24)
+    db.session.commit()
+
+    visits = {
+        (visit["tail_number"], visit["package"], visit["start_date"], visit["end_date"])
+        for visit in plan.as_dict()["visits"]
+    }
+    assert visits == {
+        # B overdue since 2024-09-01, placed at the start of the month.
+        ("TST-01", "B", "2025-06-01", "2025-06-14"),
+        ("TST-01", "C", "2026-03-01", "2026-03-21"),
+        ("TST-01", "A", "2026-12-01", "2026-12-07"),
+        ("TST-02", "A", "2026-03-01", "2026-03-07"),
+        ("TST-02", "B", "2026-12-01", "2026-12-14"),
+        ("TST-03", "B", "2025-08-01", "2025-08-14"),
+        ("TST-03", "A", "2026-05-01", "2026-05-07"),
+        ("TST-03", "B", "2027-02-01", "2027-02-14"),
+    }
+    # A and B are covered by the overdue B, C by the C of March 2026.
+    assert plan.next_due[0] == [date(2024, 9, 1), date(2024, 9, 1), date(2026, 3, 1), None, None]
+    assert [(conflict.start, conflict.end, conflict.peak) for conflict in plan.conflicts] == [
+        (date(2026, 3, 1), date(2026, 3, 7), 2),
+        (date(2026, 12, 1), date(2026, 12, 7), 2),
+    ]
+    assert [tail for tail, _, _ in plan.conflicts[0].visits] == ["TST-01", "TST-02"]
+    assert plan.recomputed == 3
+
+
+def test_open_visits_started_last_month_still_hold_a_hangar_place(app):
+    MaintenanceVisit.query.delete()
+    Aircraft.query.delete()
+    first, second = Aircraft(tail_number="X1"), Aircraft(tail_number="X2")
+    db.session.add_all(
+        [
+            MaintenanceVisit(
+                name="D1",
+                aircraft=first,
+                vp_type="D1",
+                status="in_progress",
+                start_date=date(2025, 5, 20),
+                end_date=date(2025, 8, 1),
+            ),
+            MaintenanceVisit(
+                name="A",
+                aircraft=second,
+                vp_type="A",
+                status="planned",
+                start_date=date(2025, 6, 20),
+                end_date=date(2025, 6, 27),
+            ),
+        ]
+    )
+    db.session.commit()
+
+    plan = load_plan(TODAY, months=12)
+
+    assert [(conflict.start, conflict.end, conflict.peak) for conflict in plan.conflicts] == [
+        (date(2025, 6, 20), date(2025, 6, 27), 2)
+    ]
+    assert [tail for tail, _, _ in plan.conflicts[0].visits] == ["X1", "X2"]
+    ongoing = plan.as_dict()["visits"][0]
+    assert (ongoing["tail_number"], ongoing["start_date"], ongoing["due_date"]) == ("X1", "2025-06-01", "2025-05-20")
+    # The D1 in progress covers A: the next one is projected nine months after its start.
+    assert plan.next_due[0][0] == date(2026, 2, 20)
+    assert "0 en retard" in plan.summary()
+
+
+def test_plan_only_recomputes_aircraft_whose_visits_changed(app, planes):
+    load_plan(TODAY, months=24)
+    db.session.commit()
+
+    assert load_plan(TODAY, months=24).recomputed == 0
+
+    db.session.add(
+        MaintenanceVisit(name="A", aircraft=planes[1], vp_type="A", status="completed", start_date=date(2025, 5, 2))
+    )
+    db.session.commit()
+    plan = load_plan(TODAY, months=24)
+    db.session.commit()
+
+    assert plan.recomputed == 1
+    assert plan.next_due[1][0] == date(2026, 2, 2)
+    assert FleetPlanEntry.query.filter_by(aircraft_id=planes[0].id).count() == 3
+    # A new month rolls the whole plan over.
+    assert load_plan(date(2025, 7, 1), months=24).recomputed == 3
+
+
+def test_concurrent_refresh_reads_the_plan_written_first(app, planes, monkeypatch):
+    load_plan(TODAY, months=24)
+    db.session.commit()
+    delete_plan = planner._delete_plan
+
+    def delete_then_lose_the_race(aircraft_ids, session, entries=True):
+        delete_plan(aircraft_ids, session, entries)
+        # Another request commits the states of the same aircraft meanwhile.
+        bulk_insert(
+            FleetPlanState,
+            [
+                {"aircraft_id": aircraft_id, "computed_for": date(2025, 7, 1), "months": 24}
+                for aircraft_id in aircraft_ids
+            ],
+        )
+
+    monkeypatch.setattr(planner, "_delete_plan", delete_then_lose_the_race)
+    plan = load_plan(date(2025, 7, 1), months=24)
+    db.session.commit()
+
+    assert plan.recomputed == 0
+    assert FleetPlanEntry.query.count() == 8
+    assert {state.computed_for for state in FleetPlanState.query} == {date(2025, 6, 1)}
+
+
+def test_plan_endpoint(app, planes):
+    client = app.test_client()
+    client.post("/auth/login", data={"username": "admin", "password": "admin123"})
+
+    payload = client.get("/maintenance/plan?months=36").get_json()
+
+    assert payload["packages"] == ["A", "B", "C", "D1", "D2"]
+    assert [row["tail_number"] for row in payload["aircraft"]] == ["TST-01", "TST-02", "TST-03"]
+    assert payload["capacity"] == 1 and payload["recomputed"] == 3
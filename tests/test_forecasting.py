@@ -0,0 +1,105 @@
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+import sys
+
+import numpy as np
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.analytics.forecasting import backtest, croston, forecast_catalog, moving_average, ses
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.models import DemandPrediction, InventorySnapshot, Material
+from gmao.utils.bulk import bulk_insert, insert_with_ids
+
+TODAY = date.today()
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    app.config["WTF_CSRF_ENABLED"] = False
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+def test_models_forecast_every_period_from_the_previous_ones():
+    demand = np.array([[4.0, 0, 0, 2, 0, 0]])
+
+    np.testing.assert_allclose(moving_average(demand, periods=2)[0], [0, 4, 2, 0, 1, 1, 0])
+    np.testing.assert_allclose(ses(demand, alpha=0.5)[0], [0, 4, 2, 1, 1.5, 0.75, 0.375])
+    # Croston: size 4 then 4 + 0.5 * (2 - 4) = 3, interval 1 then 1 + 0.5 * (3 - 1) = 2.
+    np.testing.assert_allclose(croston(demand, alpha=0.5)[0], [0, 4, 4, 4, 1.5, 1.5, 1.5])
+
+    # Periods before the first observation are ignored, not taken as zero demand.
+    late = np.array([[0.0, 0, 0, 3, 3, 0, 3]])
+    starts = np.array([3])
+    np.testing.assert_allclose(moving_average(late, starts, periods=4)[0], [0, 0, 0, 0, 3, 3, 2, 2.25])
+    np.testing.assert_allclose(ses(late, starts, alpha=0.5)[0][3:], [0, 3, 3, 1.5, 2.25])
+    np.testing.assert_allclose(croston(late, starts, alpha=0.5)[0][-1], (3 / 1.5))
+
+
+def test_backtest_picks_croston_for_intermittent_demand():
+    steady = np.full(40, 5.0)
+    intermittent = np.zeros(40)
+    intermittent[[2, 9, 11, 19, 26, 27, 35]] = 6
+    trend = np.arange(40, dtype=float)
+
+    result = backtest(np.vstack([steady, intermittent, trend]), holdout=12)
+
+    assert [result.models[index] for index in result.best] == ["moving_average", "croston", "moving_average"]
+    assert result.errors[:, 1].argmin() == 2 and result.next_period[2, 1] == pytest.approx(1.44, abs=0.01)
+
+
+def _history(material_id, levels):
+    start = datetime.combine(TODAY, time(10)) - timedelta(weeks=len(levels) - 1)
+    return [
+        {"material_id": material_id, "taken_at": start + timedelta(weeks=week), "available": level, "reserved": 0}
+        for week, level in enumerate(levels)
+    ]
+
+
+def test_catalog_forecast_is_saved_with_the_chosen_model(app):
+    ids = insert_with_ids(
+        Material,
+        [
+            {"designation": "Joint", "category": "consommable"},
+            {"designation": "Filtre", "category": "consommable"},
+            {"designation": "Pompe", "category": "reparable", "annual_consumption": 365},
+        ],
+    )
+    InventorySnapshot.query.delete()
+    # Two joints a week; a filter now and then, restocked the week after.
+    joints = [100 - 2 * week for week in range(40)]
+    filters = [9 if week in {2, 9, 11, 19, 26, 27, 35} else 10 for week in range(40)]
+    bulk_insert(InventorySnapshot, _history(ids[0], joints) + _history(ids[1], filters))
+    db.session.commit()
+
+    forecast = forecast_catalog(28, TODAY)
+
+    assert forecast.models == ["moving_average", "croston", "wilson"]
+    assert forecast.predicted_need[0] == pytest.approx(8)
+    assert 0.5 < forecast.predicted_need[1] < 1.5
+    # No history: Wilson on the annual consumption, as before.
+    assert forecast.predicted_need[2] == pytest.approx((2 * 28 * 1.5 / 0.7) ** 0.5)
+    assert forecast.last_snapshot[ids[0]].date() == TODAY
+    assert "3 matériel(s) prévus" in forecast.summary()
+
+    client = app.test_client()
+    client.post("/auth/login", data={"username": "admin", "password": "admin123"})
+    page = client.get("/analytics/predictions?window=28").get_data(as_text=True)
+
+    assert "Croston" in page
+    assert {(row.material_id, row.model) for row in DemandPrediction.query.filter_by(window_days=28)} == {
+        (ids[0], "moving_average"),
+        (ids[1], "croston"),
+        (ids[2], "wilson"),
+    }
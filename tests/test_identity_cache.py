@@ -0,0 +1,112 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.models import Role, User, identity_cache, load_user
+from gmao.utils.cache import TTLCache
+from gmao.utils.profiling import count_queries
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    app.config["WTF_CSRF_ENABLED"] = False
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+def _login(client, username="admin", password="admin123"):
+    return client.post("/auth/login", data={"username": username, "password": password})
+
+
+def _create_technician():
+    user = User(
+        username="tech1",
+        full_name="Technicien Un",
+        rank="Sergent",
+        role=Role.query.filter_by(name="technician").first() or Role(name="technician"),
+    )
+    user.set_password("secret")
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def test_ttl_cache_expires_and_evicts_least_recently_used(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("gmao.utils.cache.time.monotonic", lambda: clock[0])
+    cache = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+
+    clock[0] += 11
+    assert cache.get("a") is None
+    assert len(cache) == 1
+
+
+def test_cached_identity_loads_user_role_and_workshop_without_queries(app):
+    admin_id = User.query.filter_by(username="admin").first().id
+    db.session.remove()
+    with app.test_request_context():
+        load_user(str(admin_id))
+        db.session.remove()
+
+        with count_queries(db.engine) as counter:
+            user = load_user(str(admin_id))
+            assert user.username == "admin"
+            assert user.role.name == "admin"
+            assert user.workshop is None
+        assert counter.count == 0
+
+
+def test_user_management_invalidates_cached_identity():
+    # No application context is kept pushed here: Flask-Login memoises the
+    # user on ``g``, which would otherwise survive across test client requests.
+    app = create_app(TestingConfig)
+    app.config["WTF_CSRF_ENABLED"] = False
+    with app.app_context():
+        technician_id = _create_technician()
+        db.session.remove()
+    admin = app.test_client()
+    technician = app.test_client()
+    _login(admin)
+    _login(technician, "tech1", "secret")
+    assert admin.get("/").status_code == 200
+    assert technician.get("/").status_code == 200
+    with app.app_context():
+        assert len(identity_cache()) == 2
+
+    form = {"username": "tech1", "full_name": "Technicien Un", "rank": "Adjudant", "role": "technician"}
+    admin.post(f"/auth/users/{technician_id}/update", data=form)
+    with app.app_context():
+        assert len(identity_cache()) == 0
+    with app.test_request_context():
+        assert load_user(str(technician_id)).rank == "Adjudant"
+        db.session.remove()
+
+    admin.post(f"/auth/users/{technician_id}/update", data=dict(form, is_active="0"))
+    response = technician.get("/")
+    assert response.status_code == 302
+    assert "/auth/login" in response.headers["Location"]
+    assert _login(technician, "tech1", "secret").status_code == 200
+    assert technician.get("/").status_code == 302
+
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
@@ -0,0 +1,128 @@
+import io
+from pathlib import Path
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.models import Material, Workshop, WorkshopMaterial
+from gmao.utils.bulk import bulk_insert
+from gmao.utils.profiling import count_queries
+from gmao.workshops.reconcile import read_inventory, reconcile_inventory
+
+INVENTORY = """atelier;pn;niin;quantité
+moteur;PN-100;;3
+MOTEUR;pn 100;;2
+MOTEUR;;5330-01-234-5678;7
+RADIO;PN-300;;1
+"""
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    app.config["WTF_CSRF_ENABLED"] = False
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+@pytest.fixture
+def stock(app):
+    engines, radio = Workshop.query.filter_by(name="MOTEUR").one(), Workshop.query.filter_by(name="RADIO").one()
+    pump = Material(designation="Pompe", part_number="PN-100", category="reparable")
+    seal = Material(designation="Joint", niin="012345678", category="consommable")
+    radio_set = Material(designation="Poste", part_number="PN-300", category="reparable")
+    filter_ = Material(designation="Filtre", part_number="PN-400", category="consommable")
+    db.session.add_all([pump, seal, radio_set, filter_])
+    db.session.add_all(
+        [
+            WorkshopMaterial(workshop=engines, material=pump, quantity=4),
+            WorkshopMaterial(workshop=engines, material=filter_, quantity=2),
+            WorkshopMaterial(workshop=radio, material=radio_set, quantity=1),
+        ]
+    )
+    db.session.commit()
+    return {"engines": engines, "radio": radio, "pump": pump, "seal": seal, "filter": filter_}
+
+
+def _holdings():
+    return {(link.workshop.name, link.material.designation): link.quantity for link in WorkshopMaterial.query.all()}
+
+
+def test_reconcile_reports_and_applies_differences(app, stock):
+    records = read_inventory(io.BytesIO(INVENTORY.replace("5330-01-234-5678", "5330012345678").encode()))
+
+    preview = reconcile_inventory(records, dry_run=True)
+    assert _holdings()[("MOTEUR", "Pompe")] == 4
+
+    result = reconcile_inventory(records)
+    db.session.commit()
+
+    assert preview.summary().replace("à appliquer", "appliqué(s)").split(" en ")[0] == result.summary().split(" en ")[0]
+    assert [(line.designation, line.before, line.after) for line in result.added] == [("Joint", 0, 7)]
+    assert [(line.designation, line.before, line.after) for line in result.changed] == [("Pompe", 4, 5)]
+    assert [(line.designation, line.before, line.after) for line in result.removed] == [("Filtre", 2, 0)]
+    assert result.unchanged == 1
+    assert _holdings() == {("MOTEUR", "Pompe"): 5, ("MOTEUR", "Joint"): 7, ("RADIO", "Poste"): 1}
+    assert "ajout;MOTEUR;012345678;Joint;0;7;7" in result.report_csv()
+
+
+def test_unknown_references_reject_the_whole_file(app, stock):
+    records = read_inventory(
+        io.BytesIO(b'workshop,part_number,quantity\nMOTEUR,PN-100,"2,7"\nHANGAR,PN-999,x\nMOTEUR,PN-100,3.0\n')
+    )
+
+    with pytest.raises(ValueError) as excinfo:
+        reconcile_inventory(records)
+
+    assert excinfo.value.errors == [
+        "Ligne 2 : quantité « 2,7 » invalide.",
+        "Ligne 3 : atelier inconnu « HANGAR ».",
+        "Ligne 3 : matériel inconnu « PN-999 ».",
+        "Ligne 3 : quantité « x » invalide.",
+    ]
+    assert _holdings()[("MOTEUR", "Pompe")] == 4
+
+
+def test_large_inventory_uses_a_fixed_number_of_statements(app, stock, tmp_path):
+    articles = [
+        {"designation": f"Article {index}", "part_number": f"ART-{index}", "category": "consommable"}
+        for index in range(3000)
+    ]
+    bulk_insert(Material, articles)
+    db.session.commit()
+    lines = ["workshop;part_number;quantity"] + [f"MOTEUR;ART-{index};{index % 7}" for index in range(3000)]
+    inventory = tmp_path / "inventaire.csv"
+    inventory.write_text("\n".join(lines), encoding="utf-8")
+
+    with count_queries(db.engine) as counter:
+        result = app.test_cli_runner().invoke(args=["reconcile-inventory", str(inventory), "--keep-missing"])
+
+    assert result.exit_code == 0, result.output
+    assert "3000 ajout(s)" in result.output
+    assert counter.count < 15
+    assert WorkshopMaterial.query.filter_by(workshop_id=stock["engines"].id).count() == 3002
+
+
+def test_upload_endpoint_renders_the_report(app, stock):
+    client = app.test_client()
+    client.post("/auth/login", data={"username": "admin", "password": "admin123"})
+
+    page = client.post(
+        "/workshops/reconcile",
+        data={"inventory": (io.BytesIO(INVENTORY.encode()), "inventaire.csv"), "dry_run": "1"},
+        content_type="multipart/form-data",
+    ).get_data(as_text=True)
+
+    assert "Simulation" in page and "Filtre" in page
+    assert _holdings()[("MOTEUR", "Filtre")] == 2
@@ -0,0 +1,135 @@
+from datetime import date, datetime, timedelta
+from pathlib import Path
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.materials.serials import transition_serials
+from gmao.materials.snapshots import prune_snapshots
+from gmao.models import (
+    Aircraft,
+    InventorySnapshot,
+    MaintenanceTask,
+    MaintenanceVisit,
+    Material,
+    MaterialRequirement,
+    MaterialSerial,
+)
+from gmao.utils.bulk import bulk_insert
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    app.config["WTF_CSRF_ENABLED"] = False
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+@pytest.fixture
+def filter_(app):
+    material = Material(designation="Filtre", part_number="PN-F", category="consommable", consumable_stock=12)
+    db.session.add(material)
+    db.session.commit()
+    return material
+
+
+def _snapshots(material_id):
+    db.session.expire_all()
+    return [
+        (snapshot.available, snapshot.reserved)
+        for snapshot in InventorySnapshot.query.filter_by(material_id=material_id).order_by(InventorySnapshot.id)
+    ]
+
+
+def test_stock_changes_are_coalesced_per_material_and_day(app, filter_):
+    assert _snapshots(filter_.id) == [(12, 0)]
+
+    filter_.consumable_stock = 9
+    db.session.commit()
+    filter_.designation = "Filtre à huile"
+    db.session.commit()
+    filter_.consumable_stock = 7
+    db.session.flush()
+    db.session.rollback()
+
+    assert _snapshots(filter_.id) == [(9, 0)]
+
+    visit = MaintenanceVisit(name="VP", aircraft=Aircraft(tail_number="TST-01"), vp_type="A", start_date=date.today())
+    open_task = MaintenanceTask(visit=visit, name="Vidange", status="pending")
+    done_task = MaintenanceTask(visit=visit, name="Essai", status="completed")
+    db.session.add_all(
+        [
+            MaterialRequirement(task=open_task, material=filter_, quantity=3),
+            MaterialRequirement(task=open_task, material=filter_, quantity=5, fulfilled=True),
+            MaterialRequirement(task=done_task, material=filter_, quantity=4),
+        ]
+    )
+    db.session.commit()
+
+    assert _snapshots(filter_.id) == [(9, 3)]
+
+
+def test_bulk_serial_transitions_snapshot_every_peer(app):
+    first = Material(designation="Pompe HP", part_number="PN-1", category="reparable")
+    second = Material(designation="Pompe HP", part_number="PN-1A", category="reparable")
+    db.session.add_all([first, second])
+    db.session.flush()
+    db.session.add_all(
+        MaterialSerial(material=first, serial_number=f"SN-{index}", status="stock") for index in range(3)
+    )
+    db.session.commit()
+    InventorySnapshot.query.delete()
+    db.session.commit()
+
+    transition_serials(["SN-0", "SN-1"], "rpn", da_reference="DA-1", da_status="émise")
+    db.session.commit()
+
+    assert _snapshots(first.id) == [(1, 0)]
+    assert _snapshots(second.id) == [(1, 0)]
+
+
+def test_prune_keeps_one_snapshot_per_week_then_month(app, filter_):
+    today = date(2025, 6, 30)
+    InventorySnapshot.query.delete()
+    bulk_insert(
+        InventorySnapshot,
+        [
+            {
+                "material_id": filter_.id,
+                "taken_at": datetime(2025, 6, 30, 12) - timedelta(days=age),
+                "available": age,
+                "reserved": 0,
+            }
+            for age in range(1000)
+        ],
+    )
+    db.session.commit()
+
+    preview = prune_snapshots(today, dry_run=True)
+    removed = prune_snapshots(today)
+    db.session.commit()
+
+    assert preview == removed
+    expected, seen = set(), set()
+    for age in range(1000):
+        taken_at = datetime(2025, 6, 30, 12) - timedelta(days=age)
+        # Daily up to 90 days, then the newest of each week, then of each month.
+        key = age if age <= 90 else taken_at.strftime("W%Y-%W" if age <= 730 else "M%Y-%m")
+        if key not in seen:
+            seen.add(key)
+            expected.add(age)
+    assert {snapshot.available for snapshot in InventorySnapshot.query} == expected
+    assert sum(removed.values()) == 1000 - len(expected)
+    assert prune_snapshots(today) == {"week": 0, "month": 0}
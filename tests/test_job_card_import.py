@@ -0,0 +1,156 @@
+import io
+import json
+from pathlib import Path
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.archive.importer import import_job_cards, read_records
+from gmao.archive.tree import apply_tree_diff
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.models import JobCard, JobCardMaterial, JobCardStep, JobCardSubstep, Material, Workshop
+from gmao.utils.profiling import count_queries
+
+FLAT_CSV = """type;card_number;title;paragraph;step;substep;description;workshop;estimated_minutes;material;quantity
+card;SMP-32-10;Dépose train principal;;;;;;;;
+paragraph;SMP-32-10;Préparation;1;;;;Structure;30;;
+step;SMP-32-10;;1;1;;Mettre l'avion sur vérins;Structure;20;;
+substep;SMP-32-10;;1;1;1;Contrôler les vérins;;5;;
+material;SMP-32-10;;1;1;1;;;;PN-JACK;2
+step;SMP-32-10;;;1;;Essai final;;15;;
+material;SMP-32-10;;;;;;;;Joint torique;4
+"""
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    app.config["WTF_CSRF_ENABLED"] = False
+    ctx = app.app_context()
+    ctx.push()
+    db.session.add_all(
+        [
+            Workshop(name="Structure"),
+            Material(designation="Vérin", part_number="PN-JACK", category="outillage"),
+            Material(designation="Joint torique", category="consommable"),
+        ]
+    )
+    db.session.commit()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+def _nested(number="SMP-29-01", title="Pompe hydraulique", step="Déposer la pompe"):
+    return [
+        {
+            "card_number": number,
+            "title": title,
+            "paragraphs": [
+                {
+                    "title": "Dépose",
+                    "workshop": "Structure",
+                    "steps": [{"description": step, "substeps": [{"description": "Purger"}]}],
+                    "materials": [{"material": "PN-JACK"}],
+                }
+            ],
+        }
+    ]
+
+
+def test_cli_imports_flat_csv_tree(app, tmp_path):
+    bundle = tmp_path / "cartes.csv"
+    bundle.write_text(FLAT_CSV, encoding="utf-8")
+
+    result = app.test_cli_runner().invoke(args=["import-job-cards", str(bundle)])
+
+    assert result.exit_code == 0, result.output
+    assert "lignes/s" in result.output
+    card = JobCard.query.filter_by(card_number="SMP-32-10").one()
+    paragraph = card.paragraphs[0]
+    assert (paragraph.title, paragraph.workshop.name, paragraph.estimated_minutes) == ("Préparation", "Structure", 30)
+    assert [step.description for step in paragraph.steps] == ["Mettre l'avion sur vérins"]
+    assert [step.description for step in card.root_steps()] == ["Essai final"]
+    substep = JobCardSubstep.query.one()
+    assert substep.step.paragraph_id == paragraph.id
+    links = {link.material.designation: link for link in JobCardMaterial.query}
+    assert (links["Vérin"].substep_id, links["Vérin"].quantity) == (substep.id, 2.0)
+    assert (links["Joint torique"].step_id, links["Joint torique"].quantity) == (None, 4.0)
+
+
+def test_imported_materials_hang_on_their_deepest_level_only(app):
+    import_job_cards(read_records(io.BytesIO(FLAT_CSV.encode()), "cartes.csv"))
+    db.session.commit()
+    card = JobCard.query.filter_by(card_number="SMP-32-10").one()
+    paragraph, step = card.paragraphs[0], card.paragraphs[0].steps[0]
+
+    assert (paragraph.materials.count(), step.materials.count(), step.substeps[0].materials.count()) == (0, 0, 1)
+
+    # Moving the step out of its paragraph, then deleting the paragraph keeps the material.
+    apply_tree_diff(
+        card.id, {"steps": [{"id": step.id, "paragraph_id": None}], "delete": {"paragraphs": [paragraph.id]}}
+    )
+    db.session.commit()
+
+    assert sorted(link.material.designation for link in JobCardMaterial.query) == ["Joint torique", "Vérin"]
+
+
+def test_import_uses_a_fixed_number_of_statements(app):
+    records = [card for index in range(200) for card in _nested(number=f"SMP-{index:03d}")]
+
+    with count_queries(db.engine) as counter:
+        result = import_job_cards(records)
+        db.session.commit()
+
+    assert (result.cards_created, result.paragraphs, result.steps, result.substeps, result.materials) == (
+        200,
+        200,
+        200,
+        200,
+        200,
+    )
+    assert counter.count < 20
+
+
+def test_upload_endpoint_upserts_by_card_number(app):
+    client = app.test_client()
+    client.post("/auth/login", data={"username": "admin", "password": "admin123"})
+
+    def upload(records, upsert=False):
+        data = {"bundle": (io.BytesIO(json.dumps(records).encode()), "cartes.json")}
+        if upsert:
+            data["upsert"] = "1"
+        return client.post("/archive/import", data=data, content_type="multipart/form-data")
+
+    assert upload(_nested()).status_code == 302
+    upload(_nested(title="Autre titre"))
+    assert JobCard.query.one().title == "Pompe hydraulique"
+
+    upload(_nested(title="Pompe hydraulique rév. B", step="Déposer la pompe (rév. B)"), upsert=True)
+
+    card = JobCard.query.one()
+    assert card.title == "Pompe hydraulique rév. B"
+    assert [step.description for step in JobCardStep.query] == ["Déposer la pompe (rév. B)"]
+    assert JobCardSubstep.query.count() == 1 and JobCardMaterial.query.count() == 1
+
+
+def test_invalid_bundle_writes_nothing(app):
+    records = read_records(
+        io.BytesIO(FLAT_CSV.replace("Structure", "Atelier fantôme").replace("PN-JACK", "PN-404").encode()),
+        "cartes.csv",
+    )
+
+    with pytest.raises(ValueError) as excinfo:
+        import_job_cards(records)
+
+    assert "Atelier inconnu : Atelier fantôme." in excinfo.value.errors
+    assert "Matériel inconnu : PN-404." in excinfo.value.errors
+    db.session.rollback()
+    assert JobCard.query.count() == 0
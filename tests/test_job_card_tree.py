@@ -0,0 +1,151 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.models import JobCard, JobCardMaterial, JobCardParagraph, JobCardStep, JobCardSubstep, Material
+from gmao.utils.profiling import count_queries
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    app.config["WTF_CSRF_ENABLED"] = False
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post("/auth/login", data={"username": "admin", "password": "admin123"})
+    return client
+
+
+@pytest.fixture
+def card(app):
+    card = JobCard(card_number="JC-TREE", title="Train avant")
+    first = JobCardParagraph(job_card=card, title="Dépose", order_index=0, estimated_minutes=10)
+    second = JobCardParagraph(job_card=card, title="Repose", order_index=1, estimated_minutes=20)
+    db.session.add_all([card, first, second])
+    for index in range(30):
+        step = JobCardStep(
+            job_card=card,
+            paragraph=first if index % 2 else second,
+            description=f"Étape {index}",
+            order_index=index,
+            estimated_minutes=5,
+        )
+        db.session.add(JobCardSubstep(job_card=card, step=step, description=f"Contrôle {index}", estimated_minutes=1))
+    material = Material(designation="Joint", category="consommable")
+    db.session.add(JobCardMaterial(job_card=card, material=material, paragraph=second))
+    db.session.commit()
+    return card
+
+
+def _ids(model, **filters):
+    return [row.id for row in model.query.filter_by(**filters).order_by(model.id)]
+
+
+def test_diff_is_applied_with_a_fixed_number_of_statements(app, client, card):
+    first, second = _ids(JobCardParagraph)
+    steps = _ids(JobCardStep)
+    diff = {
+        "paragraphs": [{"id": first, "order_index": 1}, {"id": second, "order_index": 0, "estimated_minutes": 45}],
+        "steps": [
+            {"id": step_id, "order_index": len(steps) - position, "paragraph_id": first}
+            for position, step_id in enumerate(steps)
+        ],
+        "substeps": [{"id": substep_id, "estimated_minutes": 2} for substep_id in _ids(JobCardSubstep)],
+    }
+
+    with count_queries(db.engine) as counter:
+        response = client.post(f"/archive/{card.id}/tree", json=diff)
+
+    assert response.status_code == 200, response.get_json()
+    assert counter.count < 20
+    db.session.expire_all()
+    assert response.get_json()["estimated_minutes"] == card.estimated_minutes == 10 + 45 + 30 * 5 + 30 * 2
+    assert response.get_json()["updated"] == {"paragraphs": 2, "steps": 30, "substeps": 30}
+    assert {step.paragraph_id for step in JobCardStep.query} == {first}
+    assert [step.id for step in JobCardStep.query.order_by(JobCardStep.order_index)] == steps[::-1]
+
+
+def test_deleting_a_paragraph_keeps_steps_moved_out_of_it(app, client, card):
+    first, second = _ids(JobCardParagraph)
+    kept = _ids(JobCardStep, paragraph_id=second)[0]
+
+    response = client.post(
+        f"/archive/{card.id}/tree",
+        json={"steps": [{"id": kept, "paragraph_id": None}], "delete": {"paragraphs": [second]}},
+    )
+
+    assert response.get_json()["deleted"] == {"paragraphs": 1, "steps": 14, "substeps": 14}
+    assert _ids(JobCardParagraph) == [first]
+    assert db.session.get(JobCardStep, kept).paragraph_id is None
+    assert JobCardStep.query.count() == 16 and JobCardSubstep.query.count() == 16
+    assert JobCardMaterial.query.count() == 0
+
+
+def test_substeps_cannot_follow_a_step_deleted_with_its_paragraph(app, client, card):
+    first, second = _ids(JobCardParagraph)
+    kept, doomed = _ids(JobCardStep, paragraph_id=second)[:2]
+    substep = _ids(JobCardSubstep, step_id=_ids(JobCardStep, paragraph_id=first)[0])[0]
+
+    response = client.post(
+        f"/archive/{card.id}/tree",
+        json={"substeps": [{"id": substep, "step_id": doomed}], "delete": {"paragraphs": [second]}},
+    )
+
+    assert response.status_code == 400
+    assert response.get_json()["errors"] == [
+        f"substeps : la sous-étape {substep} est déplacée vers une étape supprimée."
+    ]
+    assert JobCardSubstep.query.count() == 30
+
+    response = client.post(
+        f"/archive/{card.id}/tree",
+        json={
+            "steps": [{"id": kept, "paragraph_id": first}],
+            "substeps": [{"id": substep, "step_id": kept}],
+            "delete": {"paragraphs": [second]},
+        },
+    )
+
+    assert response.status_code == 200, response.get_json()
+    assert db.session.get(JobCardSubstep, substep).step_id == kept
+
+
+def test_invalid_diff_changes_nothing(app, client, card):
+    other = JobCard(card_number="JC-OTHER", title="Autre")
+    foreign = JobCardParagraph(job_card=other, title="Étranger")
+    db.session.add_all([other, foreign])
+    db.session.commit()
+    step_id = _ids(JobCardStep)[0]
+
+    response = client.post(
+        f"/archive/{card.id}/tree",
+        json={
+            "steps": [{"id": step_id, "estimated_minutes": 99, "paragraph_id": foreign.id}],
+            "substeps": [{"id": _ids(JobCardSubstep)[0], "estimated_minutes": -3}],
+            "delete": {"paragraphs": [foreign.id]},
+        },
+    )
+
+    assert response.status_code == 400
+    assert len(response.get_json()["errors"]) == 3
+    db.session.expire_all()
+    assert db.session.get(JobCardStep, step_id).estimated_minutes == 5
+    assert JobCardParagraph.query.count() == 3
+    assert client.post("/archive/9999/tree", json={}).status_code == 404
@@ -0,0 +1,135 @@
+from datetime import date, datetime, timedelta
+from pathlib import Path
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.dashboard.rollup import rollup_kpis
+from gmao.dashboard.summary import build_kpi_trend_chart, build_visit_progress_chart
+from gmao.extensions import db
+from gmao.models import (
+    Aircraft,
+    DailyKpiRollup,
+    InventorySnapshot,
+    MaintenanceTask,
+    MaintenanceVisit,
+    Material,
+    PersonnelStatus,
+    User,
+)
+from gmao.utils.profiling import count_queries
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    app.config["WTF_CSRF_ENABLED"] = False
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+TODAY = date.today()
+
+
+def _day(offset: int) -> date:
+    return TODAY - timedelta(days=offset)
+
+
+def _at(offset: int) -> datetime:
+    return datetime.combine(_day(offset), datetime.min.time()) + timedelta(hours=10)
+
+
+def _populate():
+    aircraft = Aircraft(tail_number="C130-ROLL")
+    visit = MaintenanceVisit(
+        name="VP Roll", aircraft=aircraft, vp_type="A", status="completed", start_date=_day(10), end_date=_day(3)
+    )
+    db.session.add_all(
+        [
+            aircraft,
+            visit,
+            MaintenanceTask(visit=visit, name="Dépose", status="completed", started_at=_at(8), completed_at=_at(5)),
+            MaintenanceTask(visit=visit, name="Repose", status="in_progress", started_at=_at(4)),
+            MaintenanceTask(visit=visit, name="Essais", status="pending"),
+        ]
+    )
+    material = Material(designation="Pompe", category="reparable", dotation=4, stock=5)
+    db.session.add(material)
+    db.session.flush()
+    db.session.add_all(
+        [
+            InventorySnapshot(material_id=material.id, taken_at=_at(9), available=5),
+            InventorySnapshot(material_id=material.id, taken_at=_at(6), available=2),
+        ]
+    )
+    admin = User.query.filter_by(username="admin").first()
+    db.session.add(PersonnelStatus(personnel=admin, status="on-site", start_date=_day(7), end_date=_day(4)))
+    db.session.commit()
+
+
+def test_rollup_rebuilds_daily_state_from_timestamps(app):
+    _populate()
+
+    result = rollup_kpis()
+
+    assert result.days == 10
+    assert (result.first_day, result.last_day) == (_day(10), _day(1))
+    rows = {row.day: row for row in DailyKpiRollup.query.all()}
+    assert [rows[_day(9)].tasks_pending, rows[_day(9)].tasks_in_progress] == [3, 0]
+    assert [rows[_day(6)].tasks_pending, rows[_day(6)].tasks_in_progress, rows[_day(6)].tasks_completed] == [2, 1, 0]
+    assert [rows[_day(4)].tasks_pending, rows[_day(4)].tasks_in_progress, rows[_day(4)].tasks_completed] == [1, 1, 1]
+    assert rows[_day(10)].visits_started == 1 and rows[_day(3)].visits_closed == 1
+    assert [rows[_day(offset)].materials_under_dotation for offset in (9, 7, 6, 1)] == [0, 0, 1, 1]
+    assert [rows[_day(offset)].personnel_on_site for offset in (8, 7, 4, 3)] == [0, 1, 1, 0]
+
+
+def test_rollup_only_processes_missing_days(app):
+    _populate()
+    rollup_kpis(until=_day(5))
+
+    result = rollup_kpis()
+
+    assert (result.days, result.first_day) == (4, _day(4))
+    assert rollup_kpis().days == 0
+    assert DailyKpiRollup.query.count() == 10
+
+
+def test_trend_chart_reads_the_rollup_and_visit_chart_stays_live(app):
+    _populate()
+    rollup_kpis()
+
+    # A visit dated back into rolled-up days still shows on the six-month chart.
+    aircraft = Aircraft.query.one()
+    db.session.add(MaintenanceVisit(name="VP Tardive", aircraft=aircraft, vp_type="A", start_date=_day(9)))
+    db.session.commit()
+    started = build_visit_progress_chart()["datasets"][0]["data"]
+    assert sum(started) == 2
+
+    with count_queries(db.engine) as counter:
+        trend = build_kpi_trend_chart()
+    assert counter.count == 1
+    assert "maintenance_visits" not in counter.statements[0]
+    assert len(trend["labels"]) == 36
+    assert sum(trend["datasets"][1]["data"]) == 1
+
+
+def test_rollup_command(app):
+    _populate()
+    runner = app.test_cli_runner()
+
+    first = runner.invoke(args=["rollup-kpis"])
+    second = runner.invoke(args=["rollup-kpis"])
+
+    assert first.exit_code == 0, first.output
+    assert "10 jour(s)" in first.output
+    assert "Aucun jour" in second.output
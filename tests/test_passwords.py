@@ -0,0 +1,68 @@
+from pathlib import Path
+import sys
+import threading
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.models import User
+from gmao.utils.passwords import LoginBusyError, _login_executor, authenticate, hash_password, needs_rehash
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    app.config["WTF_CSRF_ENABLED"] = False
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+def test_hashes_follow_configured_method(app):
+    password_hash = hash_password("secret")
+    assert password_hash.startswith("pbkdf2:sha256:1000$")
+    assert not needs_rehash(password_hash)
+    assert needs_rehash(hash_password("secret", method="pbkdf2:sha256:2000"))
+
+
+def test_login_rehashes_outdated_password(app):
+    admin = User.query.filter_by(username="admin").first()
+    admin.password_hash = hash_password("admin123", method="pbkdf2:sha256:2000")
+    db.session.commit()
+
+    response = app.test_client().post("/auth/login", data={"username": "admin", "password": "admin123"})
+
+    assert response.status_code == 302
+    db.session.expire_all()
+    stored = User.query.filter_by(username="admin").first().password_hash
+    assert stored.startswith("pbkdf2:sha256:1000$")
+    assert User.query.filter_by(username="admin").first().check_password("admin123")
+
+
+def test_wrong_password_keeps_outdated_hash(app):
+    admin = User.query.filter_by(username="admin").first()
+    outdated = hash_password("admin123", method="pbkdf2:sha256:2000")
+    admin.password_hash = outdated
+    assert authenticate(admin, "wrong") is False
+    assert admin.password_hash == outdated
+
+
+def test_saturated_login_pool_reports_busy(app):
+    app.config.update(LOGIN_HASH_WORKERS=1, LOGIN_QUEUE_TIMEOUT=0.05)
+    admin = User.query.filter_by(username="admin").first()
+    release = threading.Event()
+    _login_executor().submit(release.wait)
+    try:
+        with pytest.raises(LoginBusyError):
+            authenticate(admin, "admin123")
+    finally:
+        release.set()
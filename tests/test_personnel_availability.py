@@ -0,0 +1,109 @@
+from datetime import date, timedelta
+from pathlib import Path
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.dashboard.summary import build_dashboard_summary
+from gmao.extensions import db
+from gmao.models import PersonnelStatus, Role, User, Workshop
+from gmao.personnel.availability import available_personnel, get_availability_index
+from gmao.utils.profiling import count_queries
+
+DAY = date(2024, 3, 1)
+
+
+def _day(offset: int) -> date:
+    return DAY + timedelta(days=offset)
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    app.config["WTF_CSRF_ENABLED"] = False
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+@pytest.fixture
+def crew(app):
+    role = Role.query.filter_by(name="technician").one()
+    engines, radio = Workshop.query.filter_by(name="MOTEUR").one(), Workshop.query.filter_by(name="RADIO").one()
+    people = {}
+    members = (("alpha", engines, True), ("bravo", engines, True), ("charlie", radio, True), ("delta", engines, False))
+    for name, workshop, active in members:
+        people[name] = User(
+            username=name,
+            full_name=name.title(),
+            rank="Sgt",
+            role=role,
+            workshop=workshop,
+            is_active_flag=active,
+            password_hash="x",
+        )
+    db.session.add_all(people.values())
+    db.session.add_all(
+        [
+            # Sick leave inside an open-ended on-site period.
+            PersonnelStatus(personnel=people["alpha"], status="on-site", start_date=_day(0)),
+            PersonnelStatus(personnel=people["alpha"], status="sick", start_date=_day(10), end_date=_day(12)),
+            # Two back-to-back on-site periods count as one.
+            PersonnelStatus(personnel=people["bravo"], status="on-site", start_date=_day(0), end_date=_day(9)),
+            PersonnelStatus(personnel=people["bravo"], status="on-site", start_date=_day(10), end_date=_day(30)),
+            PersonnelStatus(personnel=people["charlie"], status="on-site", start_date=_day(0), end_date=_day(5)),
+            PersonnelStatus(personnel=people["delta"], status="on-site", start_date=_day(0)),
+        ]
+    )
+    db.session.commit()
+    return people
+
+
+def test_overlapping_statuses_resolve_to_the_latest(app, crew):
+    ids = {name: person.id for name, person in crew.items()}
+    engines = crew["alpha"].workshop_id
+
+    assert available_personnel(_day(5), workshop_id=engines) == [ids["alpha"], ids["bravo"]]
+    assert available_personnel(_day(5), _day(20), workshop_id=engines) == [ids["bravo"]]
+    assert available_personnel(_day(13), _day(40)) == [ids["alpha"]]
+    assert available_personnel(_day(-1)) == []
+    assert get_availability_index().statuses_on(_day(11))[ids["alpha"]] == "sick"
+
+
+def test_index_is_cached_until_statuses_change(app, crew):
+    get_availability_index()
+    with count_queries(db.engine) as counter:
+        get_availability_index()
+    assert counter.count == 0
+
+    db.session.add(PersonnelStatus(personnel=crew["bravo"], status="holidays", start_date=_day(15), end_date=_day(16)))
+    db.session.commit()
+
+    assert crew["bravo"].id not in available_personnel(_day(5), _day(20))
+
+
+def test_availability_api_and_dashboard_count(app, crew):
+    client = app.test_client()
+    client.post("/auth/login", data={"username": "admin", "password": "admin123"})
+
+    data = client.get(
+        "/personnel/availability",
+        query_string={
+            "start": _day(1).isoformat(),
+            "end": _day(4).isoformat(),
+            "workshop_id": crew["charlie"].workshop_id,
+        },
+    ).get_json()
+
+    assert [person["full_name"] for person in data["available"]] == ["Charlie"]
+    assert client.get("/personnel/availability", query_string={"start": "hier"}).status_code == 400
+    assert build_dashboard_summary(_day(35)).available_personnel == 1
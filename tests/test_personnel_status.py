@@ -0,0 +1,87 @@
+from datetime import date, timedelta
+from pathlib import Path
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.models import PersonnelStatus, Role, User
+from gmao.personnel.status import current_statuses
+from gmao.utils.bulk import bulk_insert
+from gmao.utils.profiling import count_queries
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    app.config.update(WTF_CSRF_ENABLED=False, PERSONNEL_HISTORY_PAGE_SIZE=5)
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post("/auth/login", data={"username": "admin", "password": "admin123"})
+    return client
+
+
+@pytest.fixture
+def crew(app):
+    role = Role.query.filter_by(name="technician").one()
+    people = [User(username=f"tech{index}", full_name=f"Tech {index}", rank="Sgt", role=role) for index in range(3)]
+    for person in people:
+        person.password_hash = "x"
+    db.session.add_all(people)
+    db.session.commit()
+    start = date(2024, 1, 1)
+    rows = [
+        {"personnel_id": person.id, "status": "on-site", "start_date": start + timedelta(days=day)}
+        for person in people
+        for day in range(60)
+    ]
+    rows += [
+        {"personnel_id": people[0].id, "status": "sick", "start_date": start + timedelta(days=59)},
+        {"personnel_id": people[1].id, "status": "holidays", "start_date": start + timedelta(days=90)},
+    ]
+    bulk_insert(PersonnelStatus, rows)
+    db.session.commit()
+    return people
+
+
+def test_current_status_is_the_latest_entry_per_person(app, crew):
+    latest = current_statuses()
+
+    assert latest[crew[0].id].status == "sick"
+    assert latest[crew[1].id].status == "holidays"
+    assert latest[crew[2].id].start_date == date(2024, 2, 29)
+    assert set(current_statuses([crew[2].id])) == {crew[2].id}
+
+
+def test_personnel_page_filters_on_current_status_in_few_queries(app, client, crew):
+    with count_queries(db.engine) as counter:
+        page = client.get("/personnel/", query_string={"status": "holidays"}).get_data(as_text=True)
+
+    assert "Tech 1" in page and "Tech 0" not in page and "Tech 2" not in page
+    assert not any("FROM personnel_statuses ORDER BY" in statement for statement in counter.statements)
+    assert client.get("/auth/users").status_code == 200
+
+
+def test_history_is_paginated(app, client, crew):
+    first = client.get(f"/personnel/{crew[1].id}/history").get_json()
+    last = client.get(f"/personnel/{crew[1].id}/history", query_string={"page": 13}).get_json()
+
+    assert first["has_next"] and len(first["records"]) == 5
+    assert first["records"][0] == {"status": "holidays", "details": None, "start_date": "2024-03-31", "end_date": None}
+    assert (last["has_next"], len(last["records"])) == (False, 1)
+    assert client.get("/personnel/9999/history").status_code == 404
@@ -0,0 +1,68 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.models import Aircraft, MaintenanceTask, MaintenanceVisit, Material, MaterialSerial
+from gmao.utils.profiling import count_queries, percentile
+from gmao.utils.scale_data import TASKS_PER_VISIT, populate_scale_data
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    app.config["WTF_CSRF_ENABLED"] = False
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+def test_populate_scale_data_uses_batched_inserts(app):
+    with count_queries(db.engine) as counter:
+        counts = populate_scale_data(
+            aircraft=4, materials=30, visits=12, serials_per_material=3, personnel=10, batch_size=500
+        )
+
+    assert Aircraft.query.count() == 4
+    assert Material.query.count() == 30
+    assert MaterialSerial.query.count() == 90
+    assert MaintenanceVisit.query.count() == 12
+    assert MaintenanceTask.query.count() == 12 * TASKS_PER_VISIT
+    assert counts["material_serials"] == 90
+    # One statement per table batch, not one per row.
+    assert counter.count < 40
+
+    material = Material.query.first()
+    assert material.dotation == 3
+    assert sum(material.serial_status_counts().values()) == 3
+
+
+def test_seed_scale_command_appends_rows(app):
+    runner = app.test_cli_runner()
+    result = runner.invoke(
+        args=["seed-scale", "--aircraft", "2", "--materials", "5", "--visits", "3", "--serials-per-material", "2"]
+    )
+    assert result.exit_code == 0, result.output
+    result = runner.invoke(
+        args=["seed-scale", "--aircraft", "2", "--materials", "5", "--visits", "3", "--serials-per-material", "2"]
+    )
+    assert result.exit_code == 0, result.output
+    assert "rows inserted" in result.output
+    assert Aircraft.query.count() == 4
+    assert Material.query.count() == 10
+
+
+def test_percentile_interpolates():
+    assert percentile([], 50) == 0.0
+    assert percentile([10.0, 20.0, 30.0, 40.0], 50) == pytest.approx(25.0)
+    assert percentile([1.0, 2.0, 3.0], 100) == pytest.approx(3.0)
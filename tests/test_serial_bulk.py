@@ -0,0 +1,169 @@
+import io
+from pathlib import Path
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.materials.serials import import_serials, read_serial_records, transition_serials
+from gmao.models import Aircraft, Material, MaterialSerial
+from gmao.utils.profiling import count_queries
+
+SERIALS = """serial_number;status;aircraft;da_reference;da_status;notes;under_warranty
+SN-001;avionnee;TST-01;;;;
+SN-002;rpn;;DA-7;en cours;;
+SN-003;;;DA-8;;;oui
+SN-004;sous_garantie;;;;;
+"""
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    app.config["WTF_CSRF_ENABLED"] = False
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+@pytest.fixture
+def pumps(app):
+    plane = Aircraft(tail_number="TST-01")
+    first = Material(designation="Pompe HP", part_number="PN-1", category="reparable")
+    second = Material(designation="Pompe HP", part_number="PN-1A", category="reparable")
+    db.session.add_all([plane, first, second])
+    db.session.flush()
+    db.session.add(MaterialSerial(material=second, serial_number="SN-900", status="litige"))
+    db.session.commit()
+    return {"plane": plane, "first": first, "second": second}
+
+
+def _counters(material):
+    db.session.expire_all()
+    material = db.session.get(Material, material.id)
+    return {
+        "dotation": material.dotation,
+        "avionnee": material.avionnee,
+        "rpn": material.in_repair,
+        "litige": material.litigation,
+        "stock": material.stock,
+        "warranty": material.warranty,
+    }
+
+
+def test_import_adds_and_updates_serials_and_shared_counters(app, pumps):
+    records = read_serial_records(io.BytesIO(SERIALS.encode()), "sn.csv")
+    result = import_serials(pumps["first"], records)
+    db.session.commit()
+
+    assert (result.created, result.updated, result.designations) == (4, 0, 1)
+    expected = {"dotation": 5, "avionnee": 1, "rpn": 1, "litige": 1, "stock": 1, "warranty": True}
+    assert _counters(pumps["first"]) == expected
+    assert _counters(pumps["second"]) == expected
+    stock_serial = MaterialSerial.query.filter_by(serial_number="SN-003").one()
+    # A DA reference only makes sense for serials waiting for or in repair.
+    assert (stock_serial.status, stock_serial.da_reference, stock_serial.under_warranty) == ("stock", None, True)
+    assert MaterialSerial.query.filter_by(serial_number="SN-001").one().aircraft_id == pumps["plane"].id
+
+    records = read_serial_records(io.BytesIO(b"serial_number,status\nSN-001,stock\nSN-005,rpn\n"), "sn.csv")
+    result = import_serials(pumps["first"], records)
+    db.session.commit()
+
+    assert (result.created, result.updated) == (1, 1)
+    assert _counters(pumps["first"])["avionnee"] == 0
+    assert _counters(pumps["first"])["dotation"] == 6
+
+
+def test_bad_rows_reject_the_whole_import(app, pumps):
+    records = read_serial_records(
+        io.BytesIO(b"serial_number,status,aircraft\nSN-1,stock,\nSN-1,stock,\n,rpn,\nSN-2,casse,ZZ-99\n"), "sn.csv"
+    )
+
+    with pytest.raises(ValueError) as excinfo:
+        import_serials(pumps["first"], records)
+
+    assert excinfo.value.errors == [
+        "Ligne 3 : numéro de série SN-1 en double.",
+        "Ligne 4 : numéro de série manquant.",
+        "Ligne 5 : statut « casse » inconnu.",
+        "Ligne 5 : appareil ZZ-99 inconnu.",
+    ]
+    assert MaterialSerial.query.count() == 1
+
+
+def test_transition_moves_many_serials_in_a_fixed_number_of_statements(app, pumps):
+    db.session.add_all(
+        MaterialSerial(material=pumps["first"], serial_number=f"SN-{index:03d}", status="avionnee", aircraft=None)
+        for index in range(300)
+    )
+    db.session.commit()
+    targets = [f"SN-{index:03d}" for index in range(40)]
+
+    with count_queries(db.engine) as counter:
+        result = transition_serials(targets, "rpn", da_reference="DA-42", da_status="émise")
+        db.session.commit()
+
+    # Including the inventory snapshots written at commit.
+    assert counter.count < 15
+    assert (result.updated, result.designations) == (40, 1)
+    assert _counters(pumps["second"])["rpn"] == 40
+    assert _counters(pumps["second"])["dotation"] == 301
+    moved = MaterialSerial.query.filter_by(serial_number="SN-000").one()
+    assert (moved.status, moved.da_reference, moved.aircraft_id) == ("rpn", "DA-42", None)
+
+
+def test_transition_rejects_unknown_serials(app, pumps):
+    with pytest.raises(ValueError) as excinfo:
+        transition_serials(["SN-900", "SN-404"], "avionnee", aircraft="TST-01")
+
+    assert excinfo.value.errors == ["Numéro(s) de série introuvable(s) : SN-404."]
+    assert MaterialSerial.query.filter_by(serial_number="SN-900").one().status == "litige"
+
+
+def test_bulk_endpoints(app, pumps):
+    client = app.test_client()
+    client.post("/auth/login", data={"username": "admin", "password": "admin123"})
+
+    response = client.post(
+        f"/materials/{pumps['first'].id}/serials/import",
+        data={"serials": (io.BytesIO(SERIALS.encode()), "dotation.csv")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 302
+    assert MaterialSerial.query.count() == 5
+
+    response = client.post("/materials/serials/transition", json={"serial_numbers": ["SN-404"], "status": "rpn"})
+    assert response.status_code == 400
+    assert response.get_json()["errors"] == ["Numéro(s) de série introuvable(s) : SN-404."]
+
+    for payload, error in (
+        ({"status": 5}, "« status » doit être un texte."),
+        ({"status": "avionnee", "aircraft": 7}, "« aircraft » doit être un texte."),
+        ({"status": "rpn", "notes": ["x"]}, "« notes » doit être un texte."),
+        ({"status": "rpn", "material_id": "1"}, "« material_id » doit être un entier."),
+    ):
+        response = client.post("/materials/serials/transition", json={"serial_numbers": ["SN-001"], **payload})
+        assert response.status_code == 400
+        assert response.get_json() == {"errors": [error]}
+
+    response = client.post(
+        "/materials/serials/transition", json={"serial_numbers": ["SN-001", "SN-900"], "status": "nivellement"}
+    )
+    assert response.get_json() == {"updated": 2, "designations": 1}
+    assert _counters(pumps["first"])["stock"] == 1
+
+    response = client.post(
+        "/materials/serials/transition",
+        data={"material_id": pumps["first"].id, "serial_numbers": "SN-002\nSN-003", "status": "litige"},
+    )
+    assert response.status_code == 302
+    assert _counters(pumps["first"])["litige"] == 2
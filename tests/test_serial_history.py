@@ -0,0 +1,160 @@
+from datetime import date, datetime
+from pathlib import Path
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.materials.history import (
+    record_baseline_events,
+    status_counts_at,
+    status_history,
+    take_checkpoints,
+)
+from gmao.materials.serials import transition_serials
+from gmao.models import Material, MaterialSerial, MaterialSerialEvent, SerialStatusCheckpoint
+from gmao.utils.bulk import bulk_insert
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    app.config["WTF_CSRF_ENABLED"] = False
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+@pytest.fixture
+def pump(app):
+    material = Material(designation="Pompe HP", part_number="PN-1", category="reparable")
+    db.session.add(material)
+    db.session.commit()
+    return material
+
+
+def _event(serial_id, before, after, when, designation="Pompe HP"):
+    return {
+        "serial_id": serial_id,
+        "material_id": 1,
+        "designation": designation,
+        "from_status": before,
+        "to_status": after,
+        "source": "edit",
+        "occurred_at": when,
+    }
+
+
+def _timeline():
+    # Two units delivered in January, one sent to repair in February and
+    # back in April, a third unit delivered in March for another designation.
+    bulk_insert(
+        MaterialSerialEvent,
+        [
+            _event(1, None, "stock", datetime(2025, 1, 10, 9)),
+            _event(2, None, "stock", datetime(2025, 1, 10, 9)),
+            _event(1, "stock", "rpn", datetime(2025, 2, 3, 14)),
+            _event(3, None, "avionnee", datetime(2025, 3, 1, 0), "Radio"),
+            _event(1, "rpn", "stock", datetime(2025, 4, 20, 8)),
+            _event(2, "stock", None, datetime(2025, 4, 21, 8)),
+        ],
+    )
+    db.session.commit()
+
+
+def test_orm_and_bulk_changes_are_logged_in_the_same_transaction(app, pump):
+    serial = MaterialSerial(material=pump, serial_number="SN-1")
+    db.session.add(serial)
+    db.session.commit()
+    serial.status = "att_rpn"
+    db.session.commit()
+    serial.notes = "Sans changement de statut"
+    db.session.commit()
+    transition_serials(["SN-1"], "rpn", da_reference="DA-1", da_status="émise")
+    db.session.rollback()
+    transition_serials(["SN-1"], "rpn", da_reference="DA-1", da_status="émise")
+    db.session.commit()
+    db.session.delete(serial)
+    db.session.commit()
+
+    events = MaterialSerialEvent.query.order_by(MaterialSerialEvent.id).all()
+    assert [(event.from_status, event.to_status, event.source) for event in events] == [
+        (None, "stock", "edit"),
+        ("stock", "att_rpn", "edit"),
+        ("att_rpn", "rpn", "transition"),
+        ("rpn", None, "edit"),
+    ]
+    assert {event.designation for event in events} == {"Pompe HP"}
+
+
+def test_counts_at_a_date_match_with_and_without_checkpoints(app):
+    _timeline()
+    expected = {
+        date(2025, 1, 9): {},
+        date(2025, 2, 3): {"Pompe HP": {"rpn": 1, "stock": 1}},
+        date(2025, 3, 15): {"Pompe HP": {"rpn": 1, "stock": 1}, "Radio": {"avionnee": 1}},
+        date(2025, 4, 30): {"Pompe HP": {"stock": 1}, "Radio": {"avionnee": 1}},
+    }
+    assert {day: status_counts_at(day) for day in expected} == expected
+
+    written = take_checkpoints(date(2025, 6, 15))
+    db.session.commit()
+
+    # February to May; June repeats May and is skipped.
+    assert sorted({row.as_of for row in SerialStatusCheckpoint.query}) == [
+        date(2025, 2, 1),
+        date(2025, 3, 1),
+        date(2025, 4, 1),
+        date(2025, 5, 1),
+    ]
+    assert written == 1 + 2 + 3 + 2
+    assert {day: status_counts_at(day) for day in expected} == expected
+    assert status_counts_at(date(2025, 3, 15), ["Radio"]) == {"Radio": {"avionnee": 1}}
+    assert take_checkpoints(date(2025, 6, 15)) == 0
+
+
+def test_status_history_series_and_endpoint(app):
+    _timeline()
+
+    history = status_history(date(2025, 2, 1), date(2025, 4, 30), "Pompe HP")
+    series = dict(zip(history.statuses, history.counts.tolist()))
+    assert series["rpn"][0] == 0 and series["rpn"][2] == 1 and series["rpn"][-1] == 0
+    assert series["stock"][0] == 2 and series["stock"][-1] == 1
+
+    client = app.test_client()
+    client.post("/auth/login", data={"username": "admin", "password": "admin123"})
+    payload = client.get("/materials/serials/history?start=2025-03-01&end=2025-03-03").get_json()
+
+    assert payload["labels"] == ["2025-03-01", "2025-03-02", "2025-03-03"]
+    assert [(dataset["label"], dataset["data"]) for dataset in payload["datasets"]] == [
+        ("Avionnée", [1, 1, 1]),
+        ("RPN", [1, 1, 1]),
+        ("Stock", [1, 1, 1]),
+    ]
+    assert client.get("/materials/serials/history?start=2025-03-03&end=2025-03-01").status_code == 400
+
+
+def test_serials_without_events_get_a_baseline(app, pump):
+    bulk_insert(
+        MaterialSerial,
+        [
+            {"material_id": pump.id, "serial_number": "SN-1", "status": "litige", "created_at": datetime(2024, 5, 2)},
+            {"material_id": pump.id, "serial_number": "SN-2", "status": None, "created_at": datetime(2024, 6, 2)},
+        ],
+    )
+
+    assert record_baseline_events() == 2
+    assert record_baseline_events() == 0
+    db.session.commit()
+
+    assert status_counts_at(date(2024, 5, 31)) == {"Pompe HP": {"litige": 1}}
+    assert status_counts_at(date(2024, 6, 2)) == {"Pompe HP": {"litige": 1, "stock": 1}}
@@ -0,0 +1,117 @@
+from datetime import date
+from pathlib import Path
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.analytics.visit_demand import forecast_visit_parts, package_parts
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.maintenance.schedule import PACKAGES, month_start, project_visits
+from gmao.models import Aircraft, JobCard, JobCardMaterial, MaintenanceVisit, Material
+
+TODAY = date(2025, 6, 15)
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    app.config["WTF_CSRF_ENABLED"] = False
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+@pytest.fixture
+def fleet(app):
+    MaintenanceVisit.query.delete()
+    Aircraft.query.delete()
+    planes = [Aircraft(tail_number=f"TST-0{index}") for index in range(1, 4)]
+    db.session.add_all(planes)
+    db.session.add_all(
+        MaintenanceVisit(name=vp_type, aircraft=plane, vp_type=vp_type, status=status, start_date=start_date)
+        for plane, vp_type, status, start_date in (
+            (planes[0], "A", "completed", date(2025, 1, 10)),
+            (planes[0], "C-CHECK", "completed", date(2023, 3, 1)),
+            (planes[2], "B", "planned", date(2025, 8, 1)),
+        )
+    )
+    materials = [Material(designation=name, category="consommable") for name in ("Joint", "Filtre", "Durite")]
+    # A-16 is in every package, B-2 from B on, C-2 only in C.
+    for card_number, material, quantity in zip(("A-16", "B-2", "C-2"), materials, (2, 1, 5)):
+        card = JobCard(card_number=card_number, title=card_number)
+        db.session.add(JobCardMaterial(job_card=card, material=material, quantity=quantity))
+    db.session.commit()
+    return planes, materials
+
+
+def test_projection_restarts_lighter_packages_and_keeps_planned_visits(app, fleet):
+    planes, _ = fleet
+
+    visits = project_visits(TODAY, months=24)
+
+    projected = sorted(
+        (visits.aircraft_ids[aircraft], month_start(month).strftime("%Y-%m"), PACKAGES[package], bool(planned))
+        for aircraft, package, month, planned in zip(visits.aircraft, visits.package, visits.month, visits.planned)
+    )
+    first, second, third = (plane.id for plane in planes)
+    assert projected == [
+        # B overdue since the C of 2023, then the C due in March 2026 also covers the A.
+        (first, "2025-06", "B", False),
+        (first, "2026-03", "C", False),
+        (first, "2026-12", "A", False),
+        # No history: counted from the current month.
+        (second, "2026-03", "A", False),
+        (second, "2026-12", "B", False),
+        (third, "2025-08", "B", True),
+        (third, "2026-05", "A", False),
+        (third, "2027-02", "B", False),
+    ]
+
+
+def test_visit_parts_are_bucketed_by_month(app, fleet):
+    _, materials = fleet
+
+    forecast = forecast_visit_parts(TODAY, months=24)
+
+    assert forecast.totals() == {materials[0].id: 16.0, materials[1].id: 5.0, materials[2].id: 5.0}
+    march = forecast.months.index(date(2026, 3, 1))
+    assert forecast.quantities[:, march].tolist() == [4.0, 1.0, 5.0]
+    assert forecast.visits.sum() == 8
+
+    client = app.test_client()
+    client.post("/auth/login", data={"username": "admin", "password": "admin123"})
+    payload = client.get("/analytics/visit-demand?months=36").get_json()
+
+    assert len(payload["months"]) == 36 and payload["packages"] == PACKAGES
+    assert {row["id"] for row in payload["materials"]} == {material.id for material in materials}
+
+
+def test_heavy_visits_need_the_parts_of_the_lighter_packages(app, fleet):
+    _, materials = fleet
+
+    material_ids, parts = package_parts()
+
+    assert material_ids == [material.id for material in materials]
+    # D1 and D2 have no card of their own: they take the C cards once.
+    assert parts.tolist() == [[2.0, 0.0, 0.0], [2.0, 1.0, 0.0], [2.0, 1.0, 5.0], [2.0, 1.0, 5.0], [2.0, 1.0, 5.0]]
+
+    plane = Aircraft(tail_number="TST-D")
+    db.session.add(plane)
+    db.session.add(
+        MaintenanceVisit(name="D1", aircraft=plane, vp_type="D1", status="planned", start_date=date(2025, 9, 1))
+    )
+    db.session.commit()
+    forecast = forecast_visit_parts(TODAY, months=12)
+
+    september = forecast.months.index(date(2025, 9, 1))
+    assert forecast.visits[september, PACKAGES.index("D1")] == 1
+    assert forecast.quantities[:, september].tolist() == [2.0, 1.0, 5.0]
@@ -0,0 +1,88 @@
+from datetime import date, datetime, timedelta
+from pathlib import Path
+import sys
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from gmao import create_app
+from gmao.config import TestingConfig
+from gmao.extensions import db
+from gmao.models import Aircraft, MaintenanceTask, MaintenanceVisit, PersonnelStatus, User, Workshop
+from gmao.workshops.load import compute_workshop_load
+from gmao.utils.profiling import count_queries
+
+START = date.today() + timedelta(days=10)
+
+
+def _day(offset: int) -> date:
+    return START + timedelta(days=offset)
+
+
+@pytest.fixture
+def app():
+    app = create_app(TestingConfig)
+    app.config.update(WTF_CSRF_ENABLED=False, WORKSHOP_DAY_HOURS=8)
+    ctx = app.app_context()
+    ctx.push()
+    yield app
+    db.session.remove()
+    db.drop_all()
+    ctx.pop()
+
+
+@pytest.fixture
+def planned(app):
+    engines = Workshop.query.filter_by(name="MOTEUR").one()
+    admin = User.query.filter_by(username="admin").one()
+    admin.workshop = engines
+    aircraft = Aircraft(tail_number="5T-WAA")
+    visit = MaintenanceVisit(name="VP", aircraft=aircraft, vp_type="A", start_date=_day(0))
+    db.session.add_all(
+        [
+            visit,
+            MaintenanceTask(visit=visit, workshop=engines, name="Dépose", estimated_hours=20, status="pending"),
+            MaintenanceTask(
+                visit=visit,
+                workshop=engines,
+                name="Contrôle",
+                estimated_hours=4,
+                status="in_progress",
+                started_at=datetime.combine(_day(1), datetime.min.time()),
+            ),
+            MaintenanceTask(visit=visit, workshop=engines, name="Fini", estimated_hours=30, status="completed"),
+            PersonnelStatus(personnel=admin, status="on-site", start_date=_day(1), end_date=_day(2)),
+        ]
+    )
+    db.session.commit()
+    return engines
+
+
+def test_hours_are_spread_over_working_days(app, planned):
+    result = compute_workshop_load(_day(0), _day(4))
+
+    row = [workshop_id for workshop_id, _ in result.workshops].index(planned.id)
+    # 20 h over 3 days from the visit start, 4 h on the day the task started.
+    assert result.load_hours[row].round(2).tolist() == [6.67, 10.67, 6.67, 0.0, 0.0]
+    assert result.headcount[row].tolist() == [0, 1, 1, 0, 0]
+    assert result.capacity_hours[row].tolist() == [0, 8, 8, 0, 0]
+    assert result.load_hours.sum().round(6) == 24
+
+
+def test_load_endpoint_is_cached_per_range(app, planned):
+    client = app.test_client()
+    client.post("/auth/login", data={"username": "admin", "password": "admin123"})
+    query = {"start": _day(0).isoformat(), "days": 3}
+
+    first = client.get("/workshops/load", query_string=query).get_json()
+    with count_queries(db.engine) as counter:
+        again = client.get("/workshops/load", query_string=query).get_json()
+
+    assert again == first
+    assert not any("maintenance_tasks" in statement for statement in counter.statements)
+    row = [workshop["id"] for workshop in first["workshops"]].index(planned.id)
+    assert first["load_hours"][row] == [6.7, 10.7, 6.7]
+    assert "loadHeatmap" in client.get("/workshops/").get_data(as_text=True)